@@ -1,20 +1,100 @@
-"""Digital RF Python package."""
-
-from .digital_metadata import *
-from .digital_rf_hdf5 import *
-from . import list_drf
-from .list_drf import ilsdrf, lsdrf
-from . import util
-
-try:
-    from . import mirror
-    from . import ringbuffer
-    from . import watchdog_drf
-except ImportError:
-    # if no watchdog package, these fail to import, so just ignore
-    pass
-
-from ._version import get_versions
-
-__version__ = get_versions()["version"]
-del get_versions
+"""Digital RF Python package.
+
+Submodules and the reader/writer classes are imported on first access (PEP
+562), so that importing the package or one of its lightweight submodules
+(e.g. for the `drf ls` command) does not pay for h5py, the C extension, or
+watchdog. Python versions without module `__getattr__` import everything
+eagerly.
+
+"""
+import os as _os
+import sys as _sys
+from importlib import import_module as _import_module
+
+# disable file locking in HDF5 >= 1.10 (not present in earlier versions)
+# through only way possible: setting an environment variable
+# this allows reading and writing metadata using the same file, which should be
+# safe since we don't allow multiple or partial writes to the same sample index
+# and is something we've allowed in practice with HDF5 1.8 and earlier
+# (set here so that it is in place before h5py is first imported by any module)
+_os.environ["HDF5_USE_FILE_LOCKING"] = "FALSE"
+
+# attribute name -> submodule that defines it
+_LAZY_ATTRS = {
+    "DigitalMetadataReader": "digital_metadata",
+    "DigitalMetadataWriter": "digital_metadata",
+    "get_unix_time": "digital_rf_hdf5",
+    "recreate_properties_file": "digital_rf_hdf5",
+    "DigitalRFReader": "digital_rf_hdf5",
+    "DigitalRFWriter": "digital_rf_hdf5",
+    "DigitalRFCatalog": "catalog",
+    "ilsdrf": "list_drf",
+    "lsdrf": "list_drf",
+}
+_LAZY_MODULES = (
+    "catalog",
+    "digital_metadata",
+    "digital_rf_hdf5",
+    "list_drf",
+    "metrics",
+    "util",
+)
+# these require the watchdog package, without it they are not available
+_WATCHDOG_MODULES = ("mirror", "retention", "ringbuffer", "watchdog_drf")
+
+
+def _watchdog_available():
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        # Python 2
+        import imp
+
+        try:
+            imp.find_module("watchdog")
+        except ImportError:
+            return False
+        return True
+    return find_spec("watchdog") is not None
+
+
+__all__ = sorted(_LAZY_ATTRS) + list(_LAZY_MODULES)
+if _watchdog_available():
+    __all__ += list(_WATCHDOG_MODULES)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        value = getattr(_import_module("." + _LAZY_ATTRS[name], __name__), name)
+    elif name in _LAZY_MODULES or name in _WATCHDOG_MODULES:
+        try:
+            value = _import_module("." + name, __name__)
+        except ImportError:
+            if name not in _WATCHDOG_MODULES:
+                raise
+            # if no watchdog package, these fail to import, so just ignore
+            raise AttributeError(
+                "module {0!r} has no attribute {1!r} (requires the watchdog"
+                " package)".format(__name__, name)
+            )
+    elif name == "__version__":
+        from ._version import get_versions
+
+        value = get_versions()["version"]
+    else:
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name)
+        )
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | {"__version__"})
+
+
+if _sys.version_info < (3, 7):
+    # no module __getattr__, so import everything up front
+    for _name in __all__ + ["__version__"]:
+        __getattr__(_name)
+    del _name
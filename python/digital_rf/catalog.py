@@ -0,0 +1,640 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Module for keeping an on-disk catalog of Digital RF/Metadata files."""
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import pytz
+
+from . import list_drf, util
+from .list_drf import (
+    _RE_DMDPROPFILE,
+    _RE_DRFPROPFILE,
+    _RE_FILE,
+    _RE_PROPFILE,
+    _RE_SUBDIR,
+    RE_DRFDMD,
+    RE_DRFDMDPROP,
+)
+
+__all__ = ("CATALOG_FILENAME", "DigitalRFCatalog")
+
+# default name of the catalog database file, placed in the catalog root
+CATALOG_FILENAME = ".drf_catalog.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    channel TEXT NOT NULL,
+    subdir TEXT,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    time_ms INTEGER,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_channel_time ON files (channel, kind, time_ms);
+CREATE INDEX IF NOT EXISTS files_subdir ON files (subdir);
+CREATE TABLE IF NOT EXISTS subdirs (
+    path TEXT PRIMARY KEY,
+    channel TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+"""
+
+_RE_DRFDMD_PATH = re.compile(RE_DRFDMD)
+_RE_DRFDMDPROP_PATH = re.compile(RE_DRFDMDPROP)
+
+
+class DigitalRFCatalog(object):
+    """On-disk catalog of the Digital RF/Metadata files in a directory tree.
+
+    The catalog is a SQLite database recording the path, channel, kind
+    ('drf', 'dmd', or 'properties'), start time, size, and modification time
+    of every file in the channels found under its root directory. Once it is
+    built, file listings and sizes for a time range can be queried without
+    walking the directory tree.
+
+    The catalog must be kept up to date, either by calling `update`, which
+    rescans only the subdirectories that have changed, or by recording file
+    events as they happen with `add_files` and `remove_files` (see
+    `digital_rf.watchdog_drf.DigitalRFCatalogHandler`). A catalog object can
+    be shared between threads.
+
+    """
+
+    Record = namedtuple("Record", ("path", "kind", "time_ms", "size"))
+
+    def __init__(self, path=None, db_path=None):
+        """Open or create the catalog for the directory tree at `path`.
+
+        Parameters
+        ----------
+        path : string | None
+            Root directory of the catalog. If None, open the existing catalog
+            at `db_path` with the root directory that it was created with.
+
+        db_path : string | None
+            Path to the catalog database file. If None, use
+            `CATALOG_FILENAME` within `path`.
+
+        Raises
+        ------
+        ValueError
+            If an existing catalog database belongs to a different root
+            directory, or if no root directory is given or stored.
+
+        """
+        if path is None and db_path is None:
+            raise ValueError("One of `path` or `db_path` must be given.")
+        if db_path is None:
+            db_path = os.path.join(path, CATALOG_FILENAME)
+        self.db_path = os.path.abspath(db_path)
+        db_dir = os.path.dirname(self.db_path)
+        if path is None and not os.path.isfile(self.db_path):
+            raise ValueError("Catalog {0} does not exist.".format(self.db_path))
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        # the connection is shared by all threads and guarded by the lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            row = self._conn.execute(
+                "SELECT value FROM info WHERE key = 'root'"
+            ).fetchone()
+            stored_root = None if row is None else row[0]
+            if path is None:
+                path = stored_root
+            errstr = None
+            if path is None:
+                errstr = "Catalog {0} has no root directory.".format(self.db_path)
+            elif stored_root is None:
+                self._conn.execute(
+                    "INSERT INTO info (key, value) VALUES ('root', ?)",
+                    (os.path.abspath(path),),
+                )
+            elif stored_root != os.path.abspath(path):
+                errstr = "Catalog {0} is for directory {1}, not {2}.".format(
+                    self.db_path, stored_root, os.path.abspath(path)
+                )
+        if errstr is not None:
+            self._conn.close()
+            raise ValueError(errstr)
+        self.root = os.path.abspath(path)
+
+    def __repr__(self):
+        return "{0}({1!r}, {2!r})".format(
+            self.__class__.__name__, self.root, self.db_path
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        """Close the catalog database."""
+        with self._lock:
+            self._conn.close()
+
+    def _relpath(self, path):
+        """Return path relative to the root, or None if outside of it."""
+        relpath = os.path.relpath(os.path.abspath(path), self.root)
+        if relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+            return None
+        return relpath
+
+    def _abspath(self, relpath):
+        if relpath == os.curdir:
+            return self.root
+        return os.path.join(self.root, relpath)
+
+    @staticmethod
+    def _file_row(relpath, channel, subdir, m, stat):
+        """Return a row for the files table from a file name match and stat."""
+        if "secs" not in m.re.groupindex:
+            kind = "properties"
+            time_ms = None
+        else:
+            secs = m.group("secs")
+            frac = m.group("frac")
+            kind = "dmd" if frac is None else "drf"
+            time_ms = int(secs) * 1000 + (0 if frac is None else int(frac))
+        return (
+            relpath,
+            channel,
+            subdir,
+            m.group("name"),
+            kind,
+            time_ms,
+            stat.st_size,
+            stat.st_mtime,
+        )
+
+    def _scan_subdir(self, channel, subdir):
+        """Return rows for all Digital RF/Metadata files in a subdirectory."""
+        path = self._abspath(subdir)
+        rows = []
+        for name in list_drf._listdir(path):
+            m = _RE_FILE.match(name)
+            if not m:
+                continue
+            try:
+                stat = os.stat(os.path.join(path, name))
+            except OSError:
+                # file was deleted since the listing
+                continue
+            rows.append(
+                self._file_row(os.path.join(subdir, name), channel, subdir, m, stat)
+            )
+        return rows
+
+    def update(self):
+        """Update the catalog with changes to the directory tree.
+
+        Time-stamped subdirectories are only rescanned when their
+        modification time has changed, except that the newest subdirectory of
+        each channel is always rescanned since its files may still be
+        growing.
+
+        Returns
+        -------
+        n_changed : int
+            Number of files added to, updated in, or removed from the catalog.
+
+        """
+        with self._lock:
+            stored_subdirs = dict(
+                self._conn.execute("SELECT path, mtime FROM subdirs").fetchall()
+            )
+            seen_channels = set()
+            seen_subdirs = set()
+            n_changed = 0
+            for root, dirs, files in os.walk(self.root):
+                props = [f for f in files if _RE_PROPFILE.match(f)]
+                if not props:
+                    continue
+                channel = self._relpath(root)
+                seen_channels.add(channel)
+                dec_subdirs, others = list_drf._decorate_subdirs(dirs)
+                # don't walk into time-stamped subdirectories
+                dirs[:] = others
+                dec_subdirs.sort()
+
+                with self._conn:
+                    # property files
+                    prop_rows = []
+                    for f in props:
+                        try:
+                            stat = os.stat(os.path.join(root, f))
+                        except OSError:
+                            continue
+                        prop_rows.append(
+                            self._file_row(
+                                os.path.join(channel, f),
+                                channel,
+                                None,
+                                _RE_PROPFILE.match(f),
+                                stat,
+                            )
+                        )
+                    n_changed += self._replace_rows(
+                        "channel = ? AND subdir IS NULL", (channel,), prop_rows
+                    )
+                    # data files in changed subdirectories
+                    for k, (_time, d) in enumerate(dec_subdirs):
+                        subdir = os.path.join(channel, d)
+                        try:
+                            mtime = os.stat(os.path.join(root, d)).st_mtime
+                        except OSError:
+                            continue
+                        seen_subdirs.add(subdir)
+                        is_newest = k == len(dec_subdirs) - 1
+                        if not is_newest and stored_subdirs.get(subdir) == mtime:
+                            continue
+                        rows = self._scan_subdir(channel, subdir)
+                        n_changed += self._replace_rows("subdir = ?", (subdir,), rows)
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO subdirs (path, channel, mtime)"
+                            " VALUES (?, ?, ?)",
+                            (subdir, channel, mtime),
+                        )
+
+            # remove subdirectories and channels that no longer exist
+            with self._conn:
+                for subdir in set(stored_subdirs) - seen_subdirs:
+                    n_changed += self._replace_rows("subdir = ?", (subdir,), [])
+                    self._conn.execute("DELETE FROM subdirs WHERE path = ?", (subdir,))
+                for (channel,) in self._conn.execute(
+                    "SELECT DISTINCT channel FROM files"
+                ).fetchall():
+                    if channel not in seen_channels:
+                        n_changed += self._conn.execute(
+                            "DELETE FROM files WHERE channel = ?", (channel,)
+                        ).rowcount
+                        self._conn.execute(
+                            "DELETE FROM subdirs WHERE channel = ?", (channel,)
+                        )
+        return n_changed
+
+    def _replace_rows(self, where, params, rows):
+        """Replace the rows matching `where` with `rows`, return # changed."""
+        old = {
+            r[0]: r
+            for r in self._conn.execute(
+                "SELECT path, channel, subdir, name, kind, time_ms, size, mtime"
+                " FROM files WHERE " + where,
+                params,
+            )
+        }
+        new = {r[0]: r for r in rows}
+        removed = [(p,) for p in old if p not in new]
+        changed = [r for p, r in new.items() if old.get(p) != r]
+        self._conn.executemany("DELETE FROM files WHERE path = ?", removed)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", changed
+        )
+        return len(removed) + len(changed)
+
+    def add_files(self, paths):
+        """Add or update files in the catalog.
+
+        Paths that are not Digital RF/Metadata files within the catalog root
+        or that no longer exist are ignored.
+
+        """
+        rows = []
+        for path in paths:
+            path = os.path.abspath(path)
+            relpath = self._relpath(path)
+            if relpath is None:
+                continue
+            m = _RE_DRFDMD_PATH.match(path)
+            if m:
+                subdir = os.path.dirname(relpath)
+                channel = os.path.dirname(subdir) or os.curdir
+            else:
+                m = _RE_DRFDMDPROP_PATH.match(path)
+                if not m:
+                    continue
+                subdir = None
+                channel = os.path.dirname(relpath) or os.curdir
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            rows.append(self._file_row(relpath, channel, subdir, m, stat))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def remove_files(self, paths):
+        """Remove files from the catalog."""
+        relpaths = [(self._relpath(p),) for p in paths]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM files WHERE path = ?",
+                [r for r in relpaths if r[0] is not None],
+            )
+
+    def _channel_props(self):
+        """Return dict of channel -> list of property file names."""
+        props = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT channel, path FROM files WHERE kind = 'properties'"
+            ).fetchall()
+        for channel, path in rows:
+            props.setdefault(channel, []).append(os.path.basename(path))
+        return props
+
+    @staticmethod
+    def _walk_order(channels, reverse=False):
+        """Sort channel paths in the order that os.walk would visit them."""
+        tree = {}
+        for channel in channels:
+            node = tree
+            if channel != os.curdir:
+                for part in channel.split(os.sep):
+                    node = node.setdefault(part, {})
+            node[None] = channel
+
+        ordered = []
+
+        def visit(node):
+            if None in node:
+                ordered.append(node[None])
+            for part in sorted((p for p in node if p is not None), reverse=reverse):
+                visit(node[part])
+
+        visit(tree)
+        return ordered
+
+    def irecords(
+        self,
+        path=None,
+        recursive=True,
+        reverse=False,
+        starttime=None,
+        endtime=None,
+        include_drf=True,
+        include_dmd=True,
+        include_drf_properties=None,
+        include_dmd_properties=None,
+    ):
+        """Yield catalog records for files in the same way as `ilsdrf`.
+
+        Parameters and ordering are the same as for
+        `digital_rf.list_drf.ilsdrf`, with `path` defaulting to the catalog
+        root.
+
+
+        Yields
+        ------
+        Record
+            Named tuple of (path, kind, time_ms, size) for each file, where
+            `path` is absolute and `time_ms` is None for property files.
+
+        """
+        if path is None:
+            path = self.root
+        path = os.path.abspath(path)
+        relpath = self._relpath(path)
+        if relpath is None:
+            return
+
+        if starttime is not None:
+            if starttime.tzinfo is None:
+                starttime = pytz.utc.localize(starttime)
+            starttime = list_drf._timedelta_to_ms(starttime - util.epoch, round_up=True)
+        if endtime is not None:
+            if endtime.tzinfo is None:
+                endtime = pytz.utc.localize(endtime)
+            endtime = list_drf._timedelta_to_ms(endtime - util.epoch)
+
+        if include_drf_properties is None:
+            include_drf_properties = include_drf
+        if include_dmd_properties is None:
+            include_dmd_properties = include_dmd
+        prop_regexes = []
+        if include_drf_properties:
+            prop_regexes.append(_RE_DRFPROPFILE)
+        if include_dmd_properties:
+            prop_regexes.append(_RE_DMDPROPFILE)
+
+        # select channels under path, or the time-stamped subdirectory path
+        subdir = None
+        channel_props = self._channel_props()
+        head, tail = os.path.split(relpath)
+        if _RE_SUBDIR.match(tail) and (head or os.curdir) in channel_props:
+            channels = [head or os.curdir]
+            subdir = relpath
+            prop_regexes = []
+        elif relpath == os.curdir:
+            channels = list(channel_props) if recursive else [os.curdir]
+        else:
+            channels = [
+                c
+                for c in channel_props
+                if c == relpath or (recursive and c.startswith(relpath + os.sep))
+            ]
+        order = "DESC" if reverse else "ASC"
+
+        for channel in self._walk_order(channels, reverse=reverse):
+            props = channel_props.get(channel, [])
+            if not props:
+                continue
+            prop_names = sorted(
+                (f for f in props if any(r.match(f) for r in prop_regexes)),
+                reverse=reverse,
+            )
+            kinds = []
+            if include_drf and any(_RE_DRFPROPFILE.match(f) for f in props):
+                kinds.append("drf")
+            if include_dmd and any(_RE_DMDPROPFILE.match(f) for f in props):
+                kinds.append("dmd")
+
+            with self._lock:
+                prop_rows = [
+                    self._conn.execute(
+                        "SELECT path, kind, time_ms, size FROM files WHERE path = ?",
+                        (os.path.join(channel, f),),
+                    ).fetchone()
+                    for f in prop_names
+                ]
+                rows = []
+                if kinds:
+                    where = "channel = ? AND kind IN ({0})".format(
+                        ", ".join("?" * len(kinds))
+                    )
+                    params = [channel] + kinds
+                    if subdir is not None:
+                        where += " AND subdir = ?"
+                        params.append(subdir)
+                    start = starttime
+                    if start is not None and "dmd" in kinds and subdir is None:
+                        # forward fill to include the file in effect at
+                        # starttime, as ilsdrf does for metadata channels
+                        prior = self._conn.execute(
+                            "SELECT MAX(time_ms) FROM files WHERE "
+                            + where
+                            + " AND time_ms <= ?",
+                            params + [start],
+                        ).fetchone()[0]
+                        if prior is not None:
+                            start = prior
+                    if start is not None:
+                        where += " AND time_ms >= ?"
+                        params.append(start)
+                    if endtime is not None:
+                        where += " AND time_ms <= ?"
+                        params.append(endtime)
+                    rows = self._conn.execute(
+                        "SELECT path, kind, time_ms, size FROM files WHERE "
+                        + where
+                        + " ORDER BY time_ms {0}, path {0}".format(order),
+                        params,
+                    ).fetchall()
+            for p, kind, time_ms, size in [r for r in prop_rows if r] + rows:
+                yield self.Record(self._abspath(p), kind, time_ms, size)
+
+    def ifiles(self, *args, **kwargs):
+        """Yield file paths in the same way as `ilsdrf`.
+
+        Takes the same arguments as `irecords`.
+
+        """
+        for rec in self.irecords(*args, **kwargs):
+            yield rec.path
+
+    def get_size(self, *args, **kwargs):
+        """Return the total size in bytes of the selected files.
+
+        Takes the same arguments as `irecords`.
+
+        """
+        return sum(rec.size for rec in self.irecords(*args, **kwargs))
+
+
+def _build_catalog_parser(Parser, *args):
+    desc = (
+        "Create or update a catalog of the Digital RF/Metadata files in a"
+        " directory, which speeds up listing them with drf ls, ringbuffer, and"
+        " mirror."
+    )
+    parser = Parser(*args, description=desc)
+
+    parser.add_argument(
+        "dir",
+        nargs="?",
+        default=".",
+        help="""Root directory of the catalog. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--db",
+        dest="db_path",
+        default=None,
+        help="""Path to the catalog database file.
+                (default: {0} in `dir`)""".format(
+            CATALOG_FILENAME
+        ),
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="""Keep updating the catalog by watching the directory for file
+                events until interrupted. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "-i",
+        "--interval",
+        type=float,
+        default=3600,
+        help="""When watching, interval in seconds between full updates to
+                catch any missed events. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--force_polling",
+        action="store_true",
+        help="""Force watchdog to use polling instead of the default observer.""",
+    )
+    parser.add_argument(
+        "--inotify",
+        action="store_true",
+        help="""Use the Digital RF inotify observer (Linux only) when watching.
+                Falls back to the default observer if it is not supported.""",
+    )
+
+    parser.set_defaults(func=_run_catalog)
+
+    return parser
+
+
+def _run_catalog(args):
+    catalog = DigitalRFCatalog(args.dir, args.db_path)
+
+    def do_update():
+        t = time.time()
+        n_changed = catalog.update()
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        print(
+            "{0} | Updated {1} files in {2:.1f} s, {3} files cataloged.".format(
+                now, n_changed, time.time() - t, len(catalog)
+            )
+        )
+        sys.stdout.flush()
+
+    if not args.watch:
+        do_update()
+        return
+
+    from .watchdog_drf import DigitalRFCatalogHandler, DirWatcher
+
+    handler = DigitalRFCatalogHandler(catalog)
+    observer = DirWatcher(
+        catalog.root, force_polling=args.force_polling, inotify=args.inotify
+    )
+    observer.schedule(handler, catalog.root, recursive=True)
+    print("Type Ctrl-C to quit.")
+    # start watching before the update so no events are missed in between
+    observer.start()
+    try:
+        while True:
+            do_update()
+            next_update = time.time() + args.interval
+            while time.time() < next_update:
+                time.sleep(1)
+    except (KeyboardInterrupt, SystemExit):
+        observer.stop()
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+    observer.join()
+    catalog.close()
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = _build_catalog_parser(ArgumentParser)
+    args = parser.parse_args()
+    args.func(args)
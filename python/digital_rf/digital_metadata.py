@@ -17,6 +17,7 @@ DigitalMetadataReader and DigitalMetadataWriter.
 from __future__ import absolute_import, division, print_function
 
 import collections
+import contextlib
 import copy
 import datetime
 import fractions
@@ -24,6 +25,7 @@ import glob
 import itertools
 import os
 import re
+import tempfile
 import time
 import traceback
 import warnings
@@ -34,31 +36,18 @@ import h5py
 import numpy as np
 import packaging.version
 import six
-from six.moves import urllib, zip
+from six.moves import zip
 
 # local imports
-from . import list_drf
+from . import list_drf, remote, util
 from ._version import get_versions
 
-try:
-    import pandas
-except ImportError:
-    pass
-
 __version__ = get_versions()["version"]
 del get_versions
 
 __all__ = ("DigitalMetadataReader", "DigitalMetadataWriter")
 
 
-# disable file locking in HDF5 >= 1.10 (not present in earlier versions)
-# through only way possible: setting an environment variable
-# this allows reading and writing metadata using the same file, which should be
-# safe since we don't allow multiple or partial writes to the same sample index
-# and is something we've allowed in practice with HDF5 1.8 and earlier
-os.environ["HDF5_USE_FILE_LOCKING"] = "FALSE"
-
-
 def _recursive_items(d, prefix="", visited=None):
     """Generate (key, value) pairs for a dict, recursing into sub-dicts.
 
@@ -102,6 +91,284 @@ def _recursive_items(d, prefix="", visited=None):
             yield name, v
 
 
+def _values_equal(a, b):
+    """Return True if two metadata values are the same (NaN equals NaN)."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, np.ndarray):
+        return a.shape == b.shape and a.dtype == b.dtype and np.array_equal(a, b)
+    try:
+        if a == b:
+            return True
+        # NaN is the only value not equal to itself
+        return bool(a != a and b != b)
+    except (TypeError, ValueError):
+        return False
+
+
+class _ChangePointIndex(object):
+    """Run-length encoded change points of the fields of a metadata channel.
+
+    For each data file of the channel, the index stores only the samples at
+    which the value of a field changes from its previous value in that file,
+    together with the file's modification time and size. Files are only
+    re-read when they are new or their modification time or size differs, so
+    the index can be brought up to date incrementally as new files appear.
+
+    The index can optionally be persisted to an HDF5 file, which has the same
+    sample group layout as a Digital Metadata file but with a group for each
+    indexed data file.
+
+    """
+
+    _index_version = 1
+
+    def __init__(self, reader, index_file=None):
+        """Create index for the metadata channel of `reader`.
+
+        Parameters
+        ----------
+        reader : DigitalMetadataReader
+            Reader for the metadata channel to be indexed.
+
+        index_file : None | string
+            Path to the file where the index is persisted. If the file exists,
+            the index is loaded from it. If None, the index is only kept in
+            memory.
+
+        """
+        self._reader = reader
+        self.index_file = index_file
+        # relative file path -> (mtime, size, OrderedDict(sample -> changes))
+        self._files = collections.OrderedDict()
+        # subdirectory -> its mtime when it was last scanned
+        self._subdir_mtimes = {}
+        # cached merged change points, field name -> (samples, values)
+        self._columns = {}
+        self._column_names = None
+        if self.index_file is not None and os.path.exists(self.index_file):
+            self._load()
+
+    def update(self):
+        """Index new or modified data files and drop deleted ones.
+
+        Only the subdirectories whose modification time has changed since
+        they were last scanned (which happens when files are added to or
+        removed from them) and the newest subdirectory (whose files may
+        still be written to) are listed, and only their files are checked
+        for changes. The cost of an update is therefore a `stat` of each
+        subdirectory plus the scanning of the changed ones, not a `stat` of
+        every data file. Samples added to an existing file in an older
+        subdirectory are not seen until that subdirectory changes.
+
+        For a remote channel, subdirectory modification times are not
+        available, so once indexed only the newest subdirectory is checked
+        again. Files of a subdirectory being checked are fetched through the
+        reader's cache, and a file is re-read when its cached copy changes.
+
+        Returns
+        -------
+        bool
+            True if the index changed.
+
+        """
+        reader = self._reader
+        subdirs = reader._list_subdirs()
+        # existing entries grouped by subdirectory
+        subdir_files = defaultdict(list)
+        for relpath, entry in self._files.items():
+            subdir_files[os.path.dirname(relpath)].append((relpath, entry))
+
+        files = collections.OrderedDict()
+        subdir_mtimes = {}
+        changed = False
+        for k, subdir in enumerate(subdirs):
+            try:
+                # stat before listing so a concurrent change is seen next time
+                subdir_mtime = reader._get_subdir_mtime(subdir)
+                names = reader._list_subdir_files(subdir)
+            except (IOError, OSError):
+                # subdirectory doesn't exist anymore (or isn't a directory)
+                continue
+            subdir_mtimes[subdir] = subdir_mtime
+            if (
+                k < len(subdirs) - 1
+                and subdir in subdir_files
+                and self._subdir_mtimes.get(subdir, None) == subdir_mtime
+            ):
+                # unchanged subdirectory, keep its entries as they are
+                files.update(subdir_files[subdir])
+                continue
+            old_entries = dict(subdir_files.get(subdir, ()))
+            data_files = [reader._get_data_file(subdir, name) for name in names]
+            with reader._fetched_files(data_files) as paths:
+                for name, path in zip(names, paths):
+                    if path is None:
+                        # remote file doesn't exist anymore
+                        continue
+                    relpath = os.path.join(subdir, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        # file doesn't exist anymore
+                        continue
+                    try:
+                        mtime, size, changes = old_entries[relpath]
+                    except KeyError:
+                        mtime = size = None
+                    if mtime != stat.st_mtime or size != stat.st_size:
+                        changes = self._index_file(path)
+                        changed = True
+                    files[relpath] = (stat.st_mtime, stat.st_size, changes)
+        if set(files.keys()) != set(self._files.keys()):
+            changed = True
+        if subdir_mtimes != self._subdir_mtimes:
+            # record new subdirectory mtimes even if no files changed
+            changed = True
+        self._files = files
+        self._subdir_mtimes = subdir_mtimes
+
+        if changed:
+            self._columns.clear()
+            self._column_names = None
+            if self.index_file is not None:
+                self._save()
+        return changed
+
+    def get_column(self, column):
+        """Return (samples, values) change points of a field across files.
+
+        Parameters
+        ----------
+        column : string
+            Name of the field. Fields in sub-dictionaries are given by their
+            path, e.g. 'parent_key/key'.
+
+
+        Returns
+        -------
+        samples : 1-D array of type int64
+            Sorted sample indices where the value of the field changes.
+
+        values : list
+            Value of the field starting at the corresponding sample index.
+
+        """
+        try:
+            return self._columns[column]
+        except KeyError:
+            pass
+        samples = []
+        values = []
+        for _mtime, _size, changes in self._files.values():
+            for sample, fields in changes.items():
+                try:
+                    val = fields[column]
+                except KeyError:
+                    continue
+                if values and _values_equal(values[-1], val):
+                    # same as the last value of the previous file
+                    continue
+                samples.append(sample)
+                values.append(val)
+        result = (np.array(samples, dtype=np.int64), values)
+        self._columns[column] = result
+        return result
+
+    def get_column_names(self):
+        """Return the sorted names of all fields with change points."""
+        if self._column_names is not None:
+            return self._column_names
+        names = set()
+        for _mtime, _size, changes in self._files.values():
+            for fields in changes.values():
+                names.update(fields.keys())
+        self._column_names = sorted(names)
+        return self._column_names
+
+    def _index_file(self, path):
+        """Read a data file and return the field changes at each sample."""
+        data = collections.OrderedDict()
+        self._reader._add_metadata(data, path, None, 0, 0, is_edge=False)
+        return self._get_changes(data)
+
+    @staticmethod
+    def _get_changes(data):
+        """Return the field changes at each sample of metadata from `read`."""
+        changes = collections.OrderedDict()
+        last = {}
+        for sample, sample_dict in data.items():
+            sample_changes = {}
+            for key, val in _recursive_items(sample_dict):
+                if key in last and _values_equal(last[key], val):
+                    continue
+                last[key] = val
+                sample_changes[key] = val
+            if sample_changes:
+                changes[int(sample)] = sample_changes
+        return changes
+
+    def _load(self):
+        """Load the index from `index_file`."""
+        files = []
+        with h5py.File(self.index_file, "r") as f:
+            if f.attrs.get("index_version", None) != self._index_version:
+                # unknown format, rebuild from scratch
+                return
+            subdir_mtimes = {}
+            for subdir, subdir_grp in f["files"].items():
+                if "mtime" in subdir_grp.attrs:
+                    subdir_mtimes[subdir] = subdir_grp.attrs["mtime"].item()
+                for name, file_grp in subdir_grp.items():
+                    data = {}
+                    for sample, sample_grp in file_grp.items():
+                        self._reader._populate_data(data, sample_grp, int(sample))
+                    changes = collections.OrderedDict(
+                        (sample, dict(_recursive_items(data[sample])))
+                        for sample in sorted(data.keys())
+                    )
+                    relpath = os.path.join(subdir, name)
+                    mtime = file_grp.attrs["mtime"].item()
+                    size = file_grp.attrs["size"].item()
+                    key = (subdir, list_drf.sortkey_drf(name))
+                    files.append((key, relpath, (mtime, size, changes)))
+        files.sort(key=lambda f: f[0])
+        self._files = collections.OrderedDict(f[1:] for f in files)
+        self._subdir_mtimes = subdir_mtimes
+        self._columns.clear()
+        self._column_names = None
+
+    def _save(self):
+        """Save the index to `index_file`, replacing it atomically."""
+        index_dir, index_name = os.path.split(os.path.abspath(self.index_file))
+        # unique temporary file so that readers sharing the index don't
+        # write to the same file
+        fd, tmp_file = tempfile.mkstemp(prefix="tmp." + index_name, dir=index_dir)
+        os.close(fd)
+        try:
+            with h5py.File(tmp_file, "w") as f:
+                f.attrs["index_version"] = self._index_version
+                files_grp = f.create_group("files")
+                for subdir, subdir_mtime in self._subdir_mtimes.items():
+                    files_grp.create_group(subdir).attrs["mtime"] = subdir_mtime
+                for relpath, (mtime, size, changes) in self._files.items():
+                    subdir, name = os.path.split(relpath)
+                    file_grp = files_grp.require_group(subdir).create_group(name)
+                    file_grp.attrs["mtime"] = mtime
+                    file_grp.attrs["size"] = size
+                    for sample, sample_changes in changes.items():
+                        sample_grp = file_grp.create_group(str(sample))
+                        for key, val in sample_changes.items():
+                            sample_grp.create_dataset(key, data=val)
+            os.rename(tmp_file, self.index_file)
+        except Exception:
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            raise
+
+
 class DigitalMetadataWriter(object):
     """Write data in Digital Metadata HDF5 format."""
 
@@ -357,13 +624,37 @@ class DigitalMetadataWriter(object):
             this_file = os.path.join(subdir, file_basename)
 
             with h5py.File(this_file, "a") as f:
-                for sample in sample_group:
-                    try:
-                        grp = f.create_group(str(sample))
-                    except ValueError:
-                        errstr = "Sample %i already in data: no overwriting allowed"
-                        raise IOError(errstr % sample)
-                    yield grp
+                created = []
+                try:
+                    for sample in sample_group:
+                        try:
+                            grp = f.create_group(str(sample))
+                        except ValueError:
+                            errstr = "Sample %i already in data: no overwriting allowed"
+                            raise IOError(errstr % sample)
+                        created.append(int(sample))
+                        yield grp
+                finally:
+                    # store the file's sample bounds as attributes so that
+                    # readers can get them without listing every sample group,
+                    # including only the groups that were actually created
+                    if created:
+                        self._update_file_bounds(f, min(created), max(created))
+
+    @staticmethod
+    def _update_file_bounds(f, first_sample, last_sample):
+        """Extend the 'first_sample'/'last_sample' attributes of a file."""
+        if "first_sample" in f.attrs and "last_sample" in f.attrs:
+            first_sample = min(first_sample, int(f.attrs["first_sample"]))
+            last_sample = max(last_sample, int(f.attrs["last_sample"]))
+        else:
+            # file written without the bound attributes, so get them from the
+            # sample group names (which include the new samples)
+            keys = np.fromiter(f.keys(), dtype=np.int64, count=len(f))
+            first_sample = min(first_sample, int(keys.min()))
+            last_sample = max(last_sample, int(keys.max()))
+        f.attrs["first_sample"] = np.int64(first_sample)
+        f.attrs["last_sample"] = np.int64(last_sample)
 
     def _set_fields(self, field_names):
         """Set the field names used in this metadata channel.
@@ -491,7 +782,7 @@ class DigitalMetadataReader(object):
         packaging.version.parse(__version__).base_version
     )
 
-    def __init__(self, metadata_dir, accept_empty=True):
+    def __init__(self, metadata_dir, accept_empty=True, index_file=None, cache=None):
         """Initialize reader to metadata channel directory.
 
         Channel parameters are read from the attributes of the top-level file
@@ -503,13 +794,27 @@ class DigitalMetadataReader(object):
         metadata_dir : string
             Path to metadata channel directory, which contains a
             'dmd_properties.h5' file and timestamped subdirectories containing
-            data.
+            data. It can also be an 'http://' or 'https://' URL of a metadata
+            channel directory on a web server with directory listings enabled,
+            in which case files are fetched through `cache`.
 
         accept_empty : bool, optional
             If True, do not raise an IOError if the 'dmd_properties.h5' file is
             empty. If False, raise an IOError in that case and delete the
             empty 'dmd_properties.h5' file.
 
+        index_file : None | string, optional
+            Path to a file in which to persist the change-point index used by
+            `query`, so that it only has to be updated for new or modified
+            data files when the channel is opened again. If None, the index
+            is built when first needed and only kept in memory.
+
+        cache : None | HTTPFileCache, optional
+            Cache used to fetch files when `metadata_dir` is a URL. A cache can
+            be shared between readers to share connections and cached files.
+            If None, a new cache with default parameters is created. Ignored
+            for local directories.
+
 
         Raises
         ------
@@ -519,23 +824,27 @@ class DigitalMetadataReader(object):
 
         """
         self._metadata_dir = metadata_dir
-        if self._metadata_dir.find("http://") != -1:
+        self._index_file = index_file
+        self._index = None
+        # cached (stamps, sample) for the first and last sample, see get_bounds
+        self._bounds_cache = [None, None]
+        # (channel directory mtime, sorted subdirectories), see get_bounds
+        self._subdir_listing = None
+        if self._metadata_dir.startswith(("http://", "https://")):
             self._local = False
-            # put properties file in /tmp/dmd_properties_%i.h5 % (pid)
-            url = os.path.join(self._metadata_dir, "dmd_properties.h5")
+            self._metadata_dir = self._metadata_dir.rstrip("/")
+            if cache is None:
+                cache = remote.HTTPFileCache()
+            self._cache = cache
             try:
-                f = urllib.request.urlopen(url)
-            except (urllib.error.URLError, urllib.error.HTTPError):
-                url = os.path.join(self._metadata_dir, "metadata.h5")
-                f = urllib.request.urlopen(url)
-            tmp_file = os.path.join("/tmp", "dmd_properties_%i.h5" % (os.getpid()))
-            fo = open(tmp_file, "w")
-            fo.write(f.read())
-            f.close()
-            fo.close()
+                tmp_file = self._cache.get(self._metadata_dir + "/dmd_properties.h5")
+            except IOError:
+                # maybe an older version with metadata.h5
+                tmp_file = self._cache.get(self._metadata_dir + "/metadata.h5")
 
         else:
             self._local = True
+            self._cache = None
             # list and match first properties file
             tmp_file = next(
                 (
@@ -621,9 +930,6 @@ class DigitalMetadataReader(object):
                     field = field.decode("ascii")
                 self._fields.append(field)
 
-        if not self._local:
-            os.remove(tmp_file)
-
     def get_bounds(self):
         """Get indices of first- and last-known sample as a tuple.
 
@@ -644,22 +950,54 @@ class DigitalMetadataReader(object):
             If no data or first and last sample could not be determined.
 
         """
-        # loop through files in order to get first sample
-        first_sample = None
-        for path in list_drf.ilsdrf(
-            self._metadata_dir,
-            recursive=False,
-            reverse=False,
-            include_dmd=True,
-            include_drf=False,
-            include_dmd_properties=False,
-        ):
+        # directory listings of a remote channel shared by both searches
+        listings = {}
+        first_sample = self._get_edge_sample(reverse=False, listings=listings)
+        if first_sample is None:
+            raise IOError("All attempts to read first sample failed")
+
+        last_sample = self._get_edge_sample(reverse=True, listings=listings)
+        if last_sample is None:
+            raise IOError("All attempts to read last sample failed")
+
+        return (first_sample, last_sample)
+
+    def _get_edge_sample(self, reverse=False, listings=None):
+        """Return the first (or last if `reverse`) sample of the channel.
+
+        The sample is cached along with the modification times of the channel
+        directory, the subdirectory, and the file where it was found. Adding
+        or removing subdirectories or files, or writing to the file, changes
+        one of those, so as long as none of them has changed the cached sample
+        is still valid and can be returned after a few `stat` calls.
+
+        When the cached sample is no longer valid, the files are searched
+        from the edge subdirectory inward, so normally only the edge
+        subdirectory is listed.
+
+        For a remote channel, see `_get_remote_edge_sample`.
+
+        Returns None if no sample could be read.
+
+        """
+        if not self._local:
+            return self._get_remote_edge_sample(reverse, listings)
+
+        cached = self._bounds_cache[reverse]
+        if cached is not None:
+            stamps, sample = cached
             try:
-                with h5py.File(path, "r") as f:
-                    groups = list(f.keys())
-                    groups.sort()
-                    first_sample = int(groups[0])
-            except IOError:
+                if self._get_path_stamps(stamps[0]) == stamps:
+                    return sample
+            except OSError:
+                pass
+
+        for path in self._iter_edge_files(reverse=reverse):
+            try:
+                # stamp before reading so a concurrent write invalidates it
+                stamps = self._get_path_stamps(path)
+                first_sample, last_sample = self._get_file_bounds(path)
+            except (IOError, OSError):
                 # can't open file (e.g. doesn't exist anymore)
                 continue
             except IndexError:
@@ -669,42 +1007,182 @@ class DigitalMetadataReader(object):
                 )
                 print(errstr % path)
                 continue
-            else:
-                break
-        if first_sample is None:
-            raise IOError("All attempts to read first sample failed")
+            sample = last_sample if reverse else first_sample
+            self._bounds_cache[reverse] = (stamps, sample)
+            return sample
+        self._bounds_cache[reverse] = None
+        return None
 
-        # loop through files in reverse order to get last sample
-        last_sample = None
-        for path in list_drf.ilsdrf(
-            self._metadata_dir,
-            recursive=False,
-            reverse=True,
-            include_dmd=True,
-            include_drf=False,
-            include_dmd_properties=False,
-        ):
+    def _get_remote_edge_sample(self, reverse=False, listings=None):
+        """Return the first (or last if `reverse`) sample of a remote channel.
+
+        The sample is cached along with the URL of the file where it was
+        found and the modification time and size of the file's cached copy.
+        The channel directory listing and the edge subdirectory listing are
+        fetched to check that the file is still at the edge. For the last
+        sample, the file is then revalidated with the server (a conditional
+        request that transfers nothing if it is unchanged), while the first
+        sample is assumed not to change as long as its file is still first.
+
+        Returns None if no sample could be read.
+
+        """
+        cached = self._bounds_cache[reverse]
+        subdirs = self._list_subdirs(listings)
+        for subdir in reversed(subdirs) if reverse else subdirs:
             try:
-                with h5py.File(path, "r") as f:
-                    groups = list(f.keys())
-                    groups.sort()
-                    last_sample = int(groups[-1])
+                names = self._list_subdir_files(subdir, reverse, listings)
             except IOError:
-                # can't open file (e.g. doesn't exist anymore)
+                # subdirectory doesn't exist anymore
                 continue
-            except IndexError:
-                errstr = (
-                    "Corrupt or empty file %s found and ignored."
-                    " Deleting it will speed up get_bounds()."
-                )
-                print(errstr % path)
+            for name in names:
+                url = self._get_data_file(subdir, name)
+                if not reverse and cached is not None and cached[0][0] == url:
+                    return cached[1]
+                with self._cache.pinned([url]) as (path,):
+                    if path is None:
+                        # file doesn't exist anymore
+                        continue
+                    try:
+                        stat = os.stat(path)
+                        stamps = (url, stat.st_mtime, stat.st_size)
+                        if cached is not None and cached[0] == stamps:
+                            return cached[1]
+                        first_sample, last_sample = self._get_file_bounds(path)
+                    except (IOError, OSError, IndexError):
+                        continue
+                sample = last_sample if reverse else first_sample
+                self._bounds_cache[reverse] = (stamps, sample)
+                return sample
+        self._bounds_cache[reverse] = None
+        return None
+
+    def _iter_edge_files(self, reverse=False):
+        """Yield paths of the data files from the first (or last) inward.
+
+        The sorted list of subdirectories is kept and only listed again when
+        the modification time of the channel directory changes, and each
+        subdirectory is only listed when it is reached.
+
+        """
+        try:
+            channel_mtime = os.stat(self._metadata_dir).st_mtime
+            if self._subdir_listing is None or self._subdir_listing[0] != channel_mtime:
+                self._subdir_listing = (channel_mtime, self._list_subdirs())
+        except OSError:
+            # channel directory doesn't exist anymore
+            return
+        subdirs = self._subdir_listing[1]
+        for subdir in reversed(subdirs) if reverse else subdirs:
+            try:
+                names = self._list_subdir_files(subdir, reverse)
+            except OSError:
+                # subdirectory doesn't exist anymore
                 continue
-            else:
-                break
-        if last_sample is None:
-            raise IOError("All attempts to read last sample failed")
+            for name in names:
+                yield self._get_data_file(subdir, name)
 
-        return (first_sample, last_sample)
+    def _listdir(self, path, listings=None):
+        """List a local directory, or a remote one through the cache.
+
+        Remote listings are stored in the `listings` dict, if given, so that
+        repeated listings of the same directory can be avoided.
+
+        """
+        if self._local:
+            return os.listdir(path)
+        if listings is None:
+            return self._cache.listdir(path)
+        try:
+            return listings[path]
+        except KeyError:
+            names = listings[path] = self._cache.listdir(path)
+            return names
+
+    def _list_subdirs(self, listings=None):
+        """Return the sorted names of the channel's time subdirectories."""
+        return sorted(
+            d
+            for d in self._listdir(self._metadata_dir, listings)
+            if list_drf._RE_SUBDIR.match(d)
+        )
+
+    def _list_subdir_files(self, subdir, reverse=False, listings=None):
+        """Return the names of the data files in a subdirectory in order."""
+        subdir_path = self._get_data_file(subdir)
+        names = [
+            n
+            for n in self._listdir(subdir_path, listings)
+            if list_drf._RE_DMDFILE.match(n)
+        ]
+        names.sort(key=list_drf.sortkey_drf, reverse=reverse)
+        return names
+
+    def _get_subdir_mtime(self, subdir):
+        """Return the modification time of a subdirectory.
+
+        The time is not available for a remote channel, so 0 is returned.
+
+        """
+        if not self._local:
+            return 0.0
+        return os.stat(self._get_data_file(subdir)).st_mtime
+
+    def _get_data_file(self, subdir, name=None):
+        """Return the path (or URL if remote) of a subdirectory or file."""
+        parts = (subdir,) if name is None else (subdir, name)
+        if self._local:
+            return os.path.join(self._metadata_dir, *parts)
+        return "/".join((self._metadata_dir,) + parts)
+
+    @contextlib.contextmanager
+    def _fetched_files(self, file_list):
+        """Context giving local paths for data files from `_get_file_list`.
+
+        Local paths are passed through as they are. For a remote channel, the
+        files are fetched in parallel and kept in the cache until the context
+        exits, and the paths are those of the cached copies or None for files
+        that don't exist.
+
+        """
+        if self._local:
+            yield file_list
+        else:
+            with self._cache.pinned(file_list) as paths:
+                yield paths
+
+    def _get_path_stamps(self, path):
+        """Return (path, mtimes) identifying the state of a data file."""
+        subdir = os.path.dirname(path)
+        file_stat = os.stat(path)
+        return (
+            path,
+            os.stat(self._metadata_dir).st_mtime,
+            os.stat(subdir).st_mtime,
+            file_stat.st_mtime,
+            file_stat.st_size,
+        )
+
+    @staticmethod
+    def _get_file_bounds(path):
+        """Return (first_sample, last_sample) of a Digital Metadata file.
+
+        The bounds are read from the file's attributes when present, and
+        otherwise found from the sample group names. IndexError is raised if
+        the file contains no samples.
+
+        """
+        with h5py.File(path, "r") as f:
+            try:
+                return int(f.attrs["first_sample"]), int(f.attrs["last_sample"])
+            except KeyError:
+                # file from a writer that didn't store the bounds
+                pass
+            n = len(f)
+            if n == 0:
+                raise IndexError("No samples in file")
+            samples = np.fromiter(f.keys(), dtype=np.int64, count=n)
+        return int(samples.min()), int(samples.max())
 
     def get_fields(self):
         """Return list of the field names in this metadata."""
@@ -796,17 +1274,21 @@ class DigitalMetadataReader(object):
             #  [start_bound, start_sample] until last sample is found
             ffill_dict = collections.OrderedDict()
             start_bound, end_bound = self.get_bounds()
-            file_list = self._get_file_list(start_bound, start_sample)
+            file_names = self._file_names(start_bound, start_sample)
             # go through files in reverse to break at last found sample
-            for this_file in reversed(file_list):
-                self._add_metadata(
-                    ffill_dict,
-                    this_file,
-                    columns,
-                    start_bound,
-                    start_sample,
-                    is_edge=False,
-                )
+            for this_file in self._existing_files(reversed(file_names)):
+                with self._fetched_files([this_file]) as (path,):
+                    if path is None:
+                        continue
+                    self._add_metadata(
+                        ffill_dict,
+                        path,
+                        columns,
+                        start_bound,
+                        start_sample,
+                        # the file can contain samples after start_sample
+                        is_edge=True,
+                    )
                 if ffill_dict:
                     # get last entry of ffill_dict which will be latest found
                     # sample in the file
@@ -816,15 +1298,18 @@ class DigitalMetadataReader(object):
             # increment start sample so we don't re-add any data at that sample
             start_sample += 1
 
-        file_list = self._get_file_list(start_sample, end_sample)
-        for this_file in file_list:
-            if this_file in (file_list[0], file_list[-1]):
-                is_edge = True
-            else:
-                is_edge = False
-            self._add_metadata(
-                ret_dict, this_file, columns, start_sample, end_sample, is_edge
-            )
+        with self._fetched_files(
+            self._get_file_list(start_sample, end_sample)
+        ) as file_list:
+            file_list = [path for path in file_list if path is not None]
+            for this_file in file_list:
+                if this_file in (file_list[0], file_list[-1]):
+                    is_edge = True
+                else:
+                    is_edge = False
+                self._add_metadata(
+                    ret_dict, this_file, columns, start_sample, end_sample, is_edge
+                )
 
         return ret_dict
 
@@ -869,6 +1354,9 @@ class DigitalMetadataReader(object):
         read_flatdict : Read metadata into a flat dictionary, keyed by field.
 
         """
+        # pandas is optional and slow to import, so only import it when used
+        import pandas
+
         if isinstance(columns, six.string_types):
             # preserve column name in returned dictionary so it appears in DF
             columns = [columns]
@@ -967,7 +1455,7 @@ class DigitalMetadataReader(object):
         """Read the most recent metadata sample.
 
         This method calls `get_bounds` to find the last sample index and `read`
-        to read the latest metadata at or before the last sample.
+        to read the metadata at that sample.
 
         Parameters
         ----------
@@ -989,7 +1477,247 @@ class DigitalMetadataReader(object):
 
         """
         start_sample, last_sample = self.get_bounds()
-        return self.read(last_sample, columns=columns, method="ffill")
+        # the last sample exists, so read it directly instead of searching
+        # backwards from it with method='ffill'
+        return self.read(last_sample, last_sample, columns=columns)
+
+    def query(
+        self, column, predicate=None, start_sample=None, end_sample=None, update=True
+    ):
+        """Find the intervals over which a metadata field satisfies a predicate.
+
+        This method is backed by an index of the samples at which the value of
+        each field changes, so it does not need to read the metadata itself
+        once the index is built. The index is built when first needed and
+        updated incrementally with new or modified data files, and it is
+        persisted if the reader was created with an `index_file`.
+
+
+        Parameters
+        ----------
+        column : string
+            Name of the field to query. Fields in sub-dictionaries are given
+            by their path, e.g. 'parent_key/key'.
+
+        predicate : None | callable | object
+            If None, all intervals are returned. If callable, it is called with
+            the value of the field for each interval and the interval is
+            returned only if the result is True. Otherwise, only intervals
+            where the field is equal to `predicate` are returned.
+
+        start_sample : None | int
+            Sample index for start of query, given in the number of samples
+            since the epoch (time_since_epoch*sample_rate). The interval
+            containing `start_sample` is forward filled and included. If None,
+            start from the first sample.
+
+        end_sample : None | int
+            Sample index for end of query (inclusive), given in the number of
+            samples since the epoch (time_since_epoch*sample_rate). If None,
+            continue to the last sample.
+
+        update : bool
+            If True, update the index with new or modified data files before
+            querying. If False, use the index as it is (only building it if
+            it does not yet exist). An update costs a `stat` of each
+            subdirectory, with only the newest subdirectory and those that
+            have changed being listed and checked for modified files.
+
+
+        Returns
+        -------
+        list of tuples
+            List of (start, stop, value) tuples in ascending order, one for
+            each interval of constant value satisfying the predicate. The value
+            of the field is `value` from sample `start` up to but not
+            including sample `stop`. The `start` and `stop` sample indices are
+            clipped to the range given by `start_sample` and `end_sample`, and
+            `stop` is None if the last interval is open-ended. The `start` of
+            each interval (before clipping) is a sample where the field
+            changed value.
+
+
+        See Also
+        --------
+        read : Read metadata into an OrderedDict, keyed by sample index.
+
+        """
+        if self._fields is not None and column.split("/")[0] not in self._fields:
+            errstr = "Column %s not in metadata fields %s"
+            raise ValueError(errstr % (column, self._fields))
+
+        samples, values = self._get_index(update).get_column(column)
+
+        k0 = 0
+        if start_sample is not None:
+            k0 = max(np.searchsorted(samples, start_sample, side="right") - 1, 0)
+        k1 = len(samples)
+        if end_sample is not None:
+            k1 = np.searchsorted(samples, end_sample, side="right")
+
+        intervals = []
+        for k in range(k0, k1):
+            value = values[k]
+            if predicate is not None:
+                if callable(predicate):
+                    if not predicate(value):
+                        continue
+                elif isinstance(value, np.ndarray) or isinstance(predicate, np.ndarray):
+                    if not np.array_equal(value, predicate):
+                        continue
+                elif value != predicate:
+                    continue
+            start = int(samples[k])
+            if start_sample is not None:
+                start = max(start, start_sample)
+            stop = int(samples[k + 1]) if k + 1 < len(samples) else None
+            if end_sample is not None and (stop is None or stop > end_sample):
+                stop = end_sample + 1
+            intervals.append((start, stop, value))
+
+        return intervals
+
+    def _get_index(self, update=True):
+        """Return the change-point index, building or updating it as needed."""
+        if self._index is None:
+            self._index = _ChangePointIndex(self, self._index_file)
+            update = update or not self._index._files
+        if update:
+            self._index.update()
+        return self._index
+
+    def _read_states(self, samples, update=True):
+        """Return the metadata in effect at each of the given samples.
+
+        The value of each field at a sample is its latest value at or before
+        that sample, found from change points with one vectorized search per
+        field. The change-point index is used if it has already been built or
+        the reader has an `index_file` to persist it. Otherwise, only the
+        metadata from the first sample (forward filled) to the last is read,
+        so that a one-off read of a short range doesn't index the whole
+        channel. Samples with the same metadata (e.g. consecutive samples with
+        no change between them) share the same dictionary.
+
+
+        Parameters
+        ----------
+        samples : 1-D array_like of int
+            Sorted sample indices.
+
+        update : bool
+            If True, update the change-point index before reading (when the
+            index is used).
+
+
+        Returns
+        -------
+        list of dicts
+            Metadata dictionary for each sample, with the same nesting as the
+            dictionaries returned by `read` and fields that have no value at
+            or before the sample left out.
+
+        """
+        samples = np.asarray(samples, dtype=np.int64)
+        if len(samples) == 0:
+            return []
+        if self._index is None and self._index_file is None:
+            # index just the samples in range (not kept, since it's partial)
+            index = _ChangePointIndex(self)
+            data = self.read(int(samples[0]), int(samples[-1]), method="ffill")
+            if data:
+                changes = index._get_changes(data)
+                index._files["range"] = (None, None, changes)
+        else:
+            index = self._get_index(update)
+        columns = index.get_column_names()
+        if not columns:
+            return [{} for _ in range(len(samples))]
+        # (fields x samples) array of the change point in effect at a sample
+        states = np.empty((len(columns), len(samples)), dtype=np.int64)
+        column_values = []
+        for k, column in enumerate(columns):
+            change_samples, values = index.get_column(column)
+            states[k] = np.searchsorted(change_samples, samples, side="right") - 1
+            column_values.append(values)
+
+        # only build a dictionary where the state differs from the previous
+        # sample, and reuse dictionaries for states seen before
+        is_new = np.ones(len(samples), dtype=bool)
+        is_new[1:] = np.any(states[:, 1:] != states[:, :-1], axis=0)
+        state_dicts = {}
+        ret = []
+        d = None
+        for k in range(len(samples)):
+            if is_new[k]:
+                state = tuple(states[:, k])
+                try:
+                    d = state_dicts[state]
+                except KeyError:
+                    d = {}
+                    for column, values, idx in zip(columns, column_values, state):
+                        if idx < 0:
+                            continue
+                        sub = d
+                        path = column.split("/")
+                        for name in path[:-1]:
+                            sub = sub.setdefault(name, {})
+                        sub[path[-1]] = values[idx]
+                    state_dicts[state] = d
+            ret.append(d)
+        return ret
+
+    def _file_names(self, sample0, sample1):
+        """Get a lazy sequence of the data file names that could contain data.
+
+        This takes a first and last sample and generates the possible filenames
+        spanning that time according to the subdirectory and file cadences,
+        whether or not the files exist.
+
+
+        Parameters
+        ----------
+        sample0 : int
+            Sample index for start of read, given in the number of samples
+            since the epoch (time_since_epoch*sample_rate).
+
+        sample1 : int
+            Sample index for end of read (inclusive), given in the number of
+            samples since the epoch (time_since_epoch*sample_rate).
+
+
+        Returns
+        -------
+        sequence
+            Sequence of file paths (or URLs if remote) that fall in the given
+            time interval and conform to the subdirectory and file cadence
+            naming scheme. The paths are generated as they are accessed.
+
+        """
+        # exact times (in s, rounded down) of the first and last samples
+        start_ts, end_ts = (
+            util.samples_to_timedeltas(
+                [sample0, sample1],
+                self._sample_rate_numerator,
+                self._sample_rate_denominator,
+            )
+            // np.timedelta64(1, "s")
+        ).tolist()
+        # the writer finds files using long double arithmetic, which can put a
+        # sample at a file boundary in the previous file, so include that too
+        start_ts = min(start_ts, int(np.uint64(sample0 / self._samples_per_second)))
+        end_ts = max(end_ts, int(np.uint64(sample1 / self._samples_per_second)))
+
+        def make_path(subdir, file_ms):
+            file_basename = "%s@%i.h5" % (self._file_name, file_ms // 1000)
+            return self._get_data_file(subdir, file_basename)
+
+        return list_drf._FileNameRange(
+            start_ts * 1000,
+            end_ts * 1000,
+            self._file_cadence_secs * 1000,
+            self._subdir_cadence_secs,
+            make_path,
+        )
 
     def _get_file_list(self, sample0, sample1):
         """Get an ordered list of data file names that could contain data.
@@ -1014,52 +1742,49 @@ class DigitalMetadataReader(object):
         list
             List of file paths that exist on disk, fall in the given time
             interval, and conform to the subdirectory and file cadence naming
-            scheme.
+            scheme. For a remote channel, the URLs of the files found in the
+            subdirectory listings are returned, to be fetched with
+            `_fetched_files`.
 
         """
-        # need to go through numpy uint64 to prevent conversion to float
-        start_ts = int(np.uint64(sample0 / self._samples_per_second))
-        end_ts = int(np.uint64(sample1 / self._samples_per_second))
-
-        # convert ts to be divisible by self._file_cadence_secs
-        start_ts = (start_ts // self._file_cadence_secs) * self._file_cadence_secs
-        end_ts = (end_ts // self._file_cadence_secs) * self._file_cadence_secs
+        return list(self._existing_files(self._file_names(sample0, sample1)))
 
-        # get subdirectory start and end ts
-        start_sub_ts = (
-            start_ts // self._subdir_cadence_secs
-        ) * self._subdir_cadence_secs
-        end_sub_ts = (end_ts // self._subdir_cadence_secs) * self._subdir_cadence_secs
+    def _existing_files(self, file_names, listings=None):
+        """Generate the paths (or URLs) of the files in `file_names` that exist.
 
-        ret_list = []  # ordered list of full file paths to return
+        Local files are checked with `os.access`. For a remote channel, the
+        channel directory and each existing subdirectory are listed once
+        (storing the listings in `listings`, if given) and only URLs of files
+        in the listings are generated, so that files and subdirectories that
+        don't exist are never requested.
 
-        for sub_ts in range(
-            start_sub_ts,
-            end_sub_ts + self._subdir_cadence_secs,
-            self._subdir_cadence_secs,
-        ):
-            sub_datetime = datetime.datetime.utcfromtimestamp(sub_ts)
-            subdir = sub_datetime.strftime("%Y-%m-%dT%H-%M-%S")
-            # create numpy array of all file TS in subdir
-            file_ts_in_subdir = np.arange(
-                sub_ts, sub_ts + self._subdir_cadence_secs, self._file_cadence_secs
-            )
-            # file has valid samples if last time in file is after start time
-            # and first time in file is before end time
-            valid_in_subdir = np.logical_and(
-                file_ts_in_subdir + self._file_cadence_secs - 1 >= start_ts,
-                file_ts_in_subdir <= end_ts,
-            )
-            valid_file_ts_list = np.compress(valid_in_subdir, file_ts_in_subdir)
-            for valid_file_ts in valid_file_ts_list:
-                file_basename = "%s@%i.h5" % (self._file_name, valid_file_ts)
-                full_file = os.path.join(self._metadata_dir, subdir, file_basename)
-                # verify exists
-                if not os.access(full_file, os.R_OK):
-                    continue
-                ret_list.append(full_file)
-
-        return ret_list
+        """
+        if self._local:
+            for path in file_names:
+                if os.access(path, os.R_OK):
+                    yield path
+            return
+        if listings is None:
+            listings = {}
+        subdirs = None
+        subdir_names = {}
+        for url in file_names:
+            subdir_url, name = url.rsplit("/", 1)
+            try:
+                names = subdir_names[subdir_url]
+            except KeyError:
+                if subdirs is None:
+                    subdirs = set(self._list_subdirs(listings))
+                names = set()
+                if subdir_url.rsplit("/", 1)[1] in subdirs:
+                    try:
+                        names = set(self._listdir(subdir_url, listings))
+                    except IOError:
+                        # subdirectory doesn't exist anymore
+                        pass
+                subdir_names[subdir_url] = names
+            if name in names:
+                yield url
 
     def _add_metadata(self, ret_dict, this_file, columns, sample0, sample1, is_edge):
         """Read metadata from a single file and add it to `ret_dict`.
@@ -1113,7 +1838,11 @@ class DigitalMetadataReader(object):
                             self._populate_data(ret_dict[idx], value[column], column)
         except IOError:
             # decide whether this file is corrupt, or too new, or just missing
-            if os.access(this_file, os.R_OK) and os.access(this_file, os.W_OK):
+            if (
+                self._local
+                and os.access(this_file, os.R_OK)
+                and os.access(this_file, os.W_OK)
+            ):
                 if time.time() - os.path.getmtime(this_file) > self._file_cadence_secs:
                     traceback.print_exc()
                     errstr = (
@@ -21,6 +21,7 @@ import collections
 import datetime
 import fractions
 import glob
+import itertools
 import os
 import re
 import sys
@@ -33,7 +34,7 @@ import packaging.version
 import six
 
 # local imports
-from . import _py_rf_write_hdf5, digital_metadata, list_drf
+from . import _py_rf_write_hdf5, digital_metadata, list_drf, util
 from ._version import get_versions
 
 __version__ = get_versions()["version"]
@@ -181,6 +182,11 @@ def get_unix_time(unix_sample_index, sample_rate_numerator, sample_rate_denomina
     return (dt, picosecond)
 
 
+def _drf_file_path(subdir, file_ms):
+    """Return the subdir/filename of the data file starting at `file_ms`."""
+    return os.path.join(subdir, "rf@%i.%03i.h5" % divmod(file_ms, 1000))
+
+
 class DigitalRFWriter(object):
     """Write a channel of data in Digital RF HDF5 format."""
 
@@ -964,11 +970,13 @@ class DigitalRFReader(object):
         # first get the names of all possible files with data
         subdir_cadence_secs = file_properties["subdir_cadence_secs"]
         file_cadence_millisecs = file_properties["file_cadence_millisecs"]
-        samples_per_second = file_properties["samples_per_second"]
+        sample_rate_numerator = file_properties["sample_rate_numerator"]
+        sample_rate_denominator = file_properties["sample_rate_denominator"]
         filepaths = self._get_file_list(
             start_sample,
             end_sample,
-            samples_per_second,
+            sample_rate_numerator,
+            sample_rate_denominator,
             subdir_cadence_secs,
             file_cadence_millisecs,
         )
@@ -1097,26 +1105,38 @@ class DigitalRFReader(object):
 
         subdir_cadence_secs = global_properties["subdir_cadence_secs"]
         file_cadence_millisecs = global_properties["file_cadence_millisecs"]
-        samples_per_second = global_properties["samples_per_second"]
+        sample_rate_numerator = global_properties["sample_rate_numerator"]
+        sample_rate_denominator = global_properties["sample_rate_denominator"]
 
         file_list = self._get_file_list(
             sample,
             sample,
-            samples_per_second,
+            sample_rate_numerator,
+            sample_rate_denominator,
             subdir_cadence_secs,
             file_cadence_millisecs,
         )
 
-        if len(file_list) != 1:
+        if not file_list:
             raise ValueError("file_list is %s" % (str(file_list)))
 
         sample_properties = global_properties.copy()
-        for top_level_obj in self._channel_dict[channel_name].top_level_dir_meta_list:
+        for top_level_obj, filename in itertools.product(
+            self._channel_dict[channel_name].top_level_dir_meta_list,
+            reversed(file_list),
+        ):
             fullfile = os.path.join(
-                top_level_obj.top_level_dir, top_level_obj.channel_name, file_list[0]
+                top_level_obj.top_level_dir, top_level_obj.channel_name, filename
             )
             if os.access(fullfile, os.R_OK):
                 with h5py.File(fullfile, "r") as f:
+                    if len(file_list) > 1:
+                        # near a file boundary, use the file holding the sample
+                        rf_index = f["rf_data_index"]
+                        first = rf_index[0][0]
+                        last = rf_index[-1][0] + len(f["rf_data"]) - rf_index[-1][1] - 1
+                        if not first <= sample <= last:
+                            continue
                     md = {}
                     for key, val in f["rf_data"].attrs.items():
                         try:
@@ -1257,6 +1277,110 @@ class DigitalRFReader(object):
             ret_dict[start_sample] = added_metadata
         return ret_dict
 
+    def read_metadata_blocks(self, start_sample, end_sample, channel_name, block_size):
+        """Read the Digital Metadata in effect for each block of a sample range.
+
+        The range from `start_sample` to `end_sample` (inclusive) is divided
+        into blocks of `block_size` samples, and the metadata in effect at the
+        start of each block is returned. This is found from the samples where
+        each metadata field changes, so that tracking metadata (e.g. tuning)
+        changes over a sample range does not require handling every metadata
+        sample. If the channel's DigitalMetadataReader has built its
+        change-point index (see `DigitalMetadataReader.query`) or persists it
+        to an index file, the index is used and updated incrementally.
+        Otherwise, only the metadata in the requested range is read.
+
+
+        Parameters
+        ----------
+        start_sample : int
+            Sample index for start of the first block, given in the number of
+            samples since the epoch (time_since_epoch*sample_rate).
+
+        end_sample : int
+            Sample index for end of the range (inclusive), given in the number
+            of samples since the epoch (time_since_epoch*sample_rate). The last
+            block is the one containing `end_sample`.
+
+        channel_name : string
+            Name of channel to read from, one of ``get_channels()``.
+
+        block_size : int | fractions.Fraction
+            Number of samples in each block, at least 1. If it is not an
+            integer, block k starts at sample
+            ``start_sample + floor(k*block_size)``, e.g. use
+            ``Fraction(end_sample - start_sample, n)`` to divide the range
+            into `n` blocks.
+
+
+        Returns
+        -------
+        OrderedDict
+            The dictionary's keys are the start sample of each block. Each
+            value is the metadata in effect at that sample given as a
+            dictionary with column names as keys and numpy objects as leaf
+            values, where the value of each field is its latest value at or
+            before the block start. Blocks with the same metadata share the
+            same dictionary object, so the dictionaries should not be
+            modified.
+
+
+        Notes
+        -----
+        As with `read_metadata`, some pertinent metadata inherent to the
+        Digital RF channel is added to the Digital Metadata, including:
+
+            sample_rate_numerator : int
+            sample_rate_denominator : int
+            samples_per_second : np.longdouble
+
+
+        See Also
+        --------
+        read_metadata : Read the metadata samples within a sample range.
+
+        """
+        block_size = fractions.Fraction(block_size)
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        if start_sample > end_sample:
+            errstr = "Start sample %i more than end sample %i"
+            raise ValueError(errstr % (start_sample, end_sample))
+        properties = self.get_properties(channel_name)
+        added_metadata = {
+            key: properties[key]
+            for key in (
+                "sample_rate_numerator",
+                "sample_rate_denominator",
+                "samples_per_second",
+            )
+        }
+        n_blocks = (
+            (int(end_sample) - int(start_sample)) * block_size.denominator
+        ) // block_size.numerator + 1
+        block_starts = int(start_sample) + util._floor_muldiv(
+            np.arange(n_blocks, dtype=np.int64),
+            block_size.numerator,
+            block_size.denominator,
+        )
+        try:
+            reader = self.get_digital_metadata(channel_name)
+        except IOError:
+            states = [{}] * len(block_starts)
+        else:
+            states = reader._read_states(block_starts)
+
+        ret_dict = collections.OrderedDict()
+        with_added = {}
+        for block_start, state in zip(block_starts, states):
+            try:
+                d = with_added[id(state)]
+            except KeyError:
+                d = with_added[id(state)] = dict(state)
+                d.update(added_metadata)
+            ret_dict[int(block_start)] = d
+        return ret_dict
+
     def get_continuous_blocks(self, start_sample, end_sample, channel_name):
         """Find continuous blocks of data between start and end samples.
 
@@ -1296,11 +1420,13 @@ class DigitalRFReader(object):
         file_properties = self.get_properties(channel_name)
         subdir_cadence_secs = file_properties["subdir_cadence_secs"]
         file_cadence_millisecs = file_properties["file_cadence_millisecs"]
-        samples_per_second = file_properties["samples_per_second"]
+        sample_rate_numerator = file_properties["sample_rate_numerator"]
+        sample_rate_denominator = file_properties["sample_rate_denominator"]
         filepaths = self._get_file_list(
             start_sample,
             end_sample,
-            samples_per_second,
+            sample_rate_numerator,
+            sample_rate_denominator,
             subdir_cadence_secs,
             file_cadence_millisecs,
         )
@@ -1340,17 +1466,18 @@ class DigitalRFReader(object):
         file_properties = self.get_properties(channel_name)
         subdir_cadence_seconds = file_properties["subdir_cadence_secs"]
         file_cadence_millisecs = file_properties["file_cadence_millisecs"]
-        samples_per_second = file_properties["samples_per_second"]
+        sample_rate_numerator = file_properties["sample_rate_numerator"]
+        sample_rate_denominator = file_properties["sample_rate_denominator"]
         file_list = self._get_file_list(
             last_sample - 1,
             last_sample,
-            samples_per_second,
+            sample_rate_numerator,
+            sample_rate_denominator,
             subdir_cadence_seconds,
             file_cadence_millisecs,
         )
-        file_list.reverse()
         for key in self._top_level_dir_dict.keys():
-            for last_file in file_list:
+            for last_file in reversed(file_list):
                 full_last_file = os.path.join(key, channel_name, last_file)
                 if os.access(full_last_file, os.R_OK):
                     return (os.path.getmtime(full_last_file), full_last_file)
@@ -1541,7 +1668,8 @@ class DigitalRFReader(object):
     def _get_file_list(
         sample0,
         sample1,
-        samples_per_second,
+        sample_rate_numerator,
+        sample_rate_denominator,
         subdir_cadence_seconds,
         file_cadence_millisecs,
     ):
@@ -1561,8 +1689,11 @@ class DigitalRFReader(object):
             Sample index for end of read (inclusive), given in the number of
             samples since the epoch (time_since_epoch*sample_rate).
 
-        samples_per_second : np.longdouble
-            Sample rate.
+        sample_rate_numerator : int
+            Numerator of the sample rate in Hz.
+
+        sample_rate_denominator : int
+            Denominator of the sample rate in Hz.
 
         subdir_cadence_secs : int
             Number of seconds of data found in one subdir. For example, 3600
@@ -1575,9 +1706,10 @@ class DigitalRFReader(object):
 
         Returns
         -------
-        list
-            List of file paths that span the given time interval and conform
-            to the subdirectory and file cadence naming scheme.
+        sequence
+            Sequence of file paths that span the given time interval and
+            conform to the subdirectory and file cadence naming scheme. The
+            paths are generated lazily as they are accessed.
 
         """
         if (sample1 - sample0) > 1e12:
@@ -1585,49 +1717,30 @@ class DigitalRFReader(object):
             warnings.warn(warnstr % (sample1 - sample0), RuntimeWarning)
         sample0 = int(sample0)
         sample1 = int(sample1)
-        # need to go through numpy uint64 to prevent conversion to float
-        start_ts = int(np.uint64(sample0 / samples_per_second))
-        end_ts = int(np.uint64(sample1 / samples_per_second)) + 1
-        start_msts = int(np.uint64(sample0 / samples_per_second * 1000))
-        end_msts = int(np.uint64(sample1 / samples_per_second * 1000))
-
-        # get subdirectory start and end ts
-        start_sub_ts = int(
-            (start_ts // subdir_cadence_seconds) * subdir_cadence_seconds
+        # exact times (in ms, rounded down) of the first and last samples
+        start_msts, end_msts = (
+            util.samples_to_timedeltas(
+                [sample0, sample1], sample_rate_numerator, sample_rate_denominator
+            )
+            // np.timedelta64(1, "ms")
+        ).tolist()
+        # the writer names files using long double arithmetic, which can put a
+        # sample at a file boundary in the previous file, so include that too
+        samples_per_second = np.longdouble(
+            np.uint64(sample_rate_numerator)
+        ) / np.longdouble(np.uint64(sample_rate_denominator))
+        start_msts = min(
+            start_msts, int(np.uint64(sample0 / samples_per_second * 1000))
         )
-        end_sub_ts = int((end_ts // subdir_cadence_seconds) * subdir_cadence_seconds)
+        end_msts = max(end_msts, int(np.uint64(sample1 / samples_per_second * 1000)))
 
-        ret_list = []  # ordered list of full file paths to return
-
-        for sub_ts in range(
-            start_sub_ts,
-            int(end_sub_ts + subdir_cadence_seconds),
+        return list_drf._FileNameRange(
+            start_msts,
+            end_msts,
+            file_cadence_millisecs,
             subdir_cadence_seconds,
-        ):
-            sub_datetime = datetime.datetime.utcfromtimestamp(sub_ts)
-            subdir = sub_datetime.strftime("%Y-%m-%dT%H-%M-%S")
-            # create numpy array of all file TS in subdir
-            file_msts_in_subdir = np.arange(
-                sub_ts * 1000,
-                int(sub_ts + subdir_cadence_seconds) * 1000,
-                file_cadence_millisecs,
-            )
-            # file has valid samples if last time in file is after start time
-            # and first time in file is before end time
-            valid_in_subdir = np.logical_and(
-                file_msts_in_subdir + file_cadence_millisecs - 1 >= start_msts,
-                file_msts_in_subdir <= end_msts,
-            )
-            valid_file_ts_list = np.compress(valid_in_subdir, file_msts_in_subdir)
-            for valid_file_ts in valid_file_ts_list:
-                file_basename = "rf@%i.%03i.h5" % (
-                    valid_file_ts // 1000,
-                    valid_file_ts % 1000,
-                )
-                full_file = os.path.join(subdir, file_basename)
-                ret_list.append(full_file)
-
-        return ret_list
+            _drf_file_path,
+        )
 
     def _combine_blocks(self, cont_data_dict, len_only=False):
         """Order and combine data given as dictionary into continuous blocks.
@@ -1943,8 +2056,8 @@ class _top_level_dir_properties(object):
             Sample index for end of read (inclusive), given in the number of
             samples since the epoch (time_since_epoch*sample_rate).
 
-        filepaths : list
-            A list of all valid subdir/filename that might contain data.
+        filepaths : sequence
+            A sequence of all valid subdir/filename that might contain data.
 
         cont_data_dict : dict
             Dictionary to add entries to. The keys are the start sample of
@@ -8,24 +8,53 @@
 # ----------------------------------------------------------------------------
 from __future__ import absolute_import, division, print_function
 
+import sys
 from argparse import ArgumentParser
+from importlib import import_module
 
-from .list_drf import _build_cp_parser, _build_ls_parser, _build_mv_parser
+# command -> (module, parser builder), the module is only imported when the
+# command's parser is built so that e.g. `drf ls` doesn't import h5py/watchdog
+_COMMANDS = (
+    ("catalog", "catalog", "_build_catalog_parser"),
+    ("cp", "list_drf", "_build_cp_parser"),
+    ("ls", "list_drf", "_build_ls_parser"),
+    ("mv", "list_drf", "_build_mv_parser"),
+    ("receive", "push", "_build_receive_parser"),
+    ("summary", "summary", "_build_summary_parser"),
+    ("mirror", "mirror", "_build_mirror_parser"),
+    ("ringbuffer", "ringbuffer", "_build_ringbuffer_parser"),
+    ("watch", "watchdog_drf", "_build_watch_parser"),
+)
+_WATCHDOG_COMMANDS = ("mirror", "ringbuffer", "watch")
 
-try:
-    from .mirror import _build_mirror_parser
-    from .ringbuffer import _build_ringbuffer_parser
-    from .watchdog_drf import _build_watch_parser
-except ImportError:
-    # if no watchdog package, these fail to import, so just ignore
-    _WATCHDOG = False
-else:
-    _WATCHDOG = True
+
+def _get_builder(command):
+    """Import and return the parser builder for `command`, None if missing."""
+    module, builder = dict((c, (m, b)) for c, m, b in _COMMANDS)[command]
+    try:
+        module = import_module("." + module, __package__)
+    except ImportError:
+        if command not in _WATCHDOG_COMMANDS:
+            raise
+        # if no watchdog package, these fail to import, so just ignore
+        return None
+    return getattr(module, builder)
 
 
 def main(args=None):
+    argv = sys.argv[1:] if args is None else list(args)
+    # the command is the first positional argument, if it is a known one then
+    # only its parser is built and the others get (unused) placeholders
+    command = next((a for a in argv if not a.startswith("-")), None)
+    commands = [c for c, m, b in _COMMANDS]
+    if command in commands:
+        builders = {command: _get_builder(command)}
+    else:
+        builders = dict((c, _get_builder(c)) for c in commands)
+    watchdog = all(builders.get(c, True) is not None for c in _WATCHDOG_COMMANDS)
+
     epi = 'Type "drf <command> -h" to display help for a particular command.'
-    if not _WATCHDOG:
+    if not watchdog:
         s = (
             "(Install watchdog package to enable mirror, ringbuffer, and watch"
             " commands.)"
@@ -34,16 +63,14 @@ def main(args=None):
     parser = ArgumentParser(description="Digital RF command line tools.", epilog=epi)
     subparsers = parser.add_subparsers(title="Available commands")
 
-    _build_cp_parser(subparsers.add_parser, "cp")
-    _build_ls_parser(subparsers.add_parser, "ls")
-    _build_mv_parser(subparsers.add_parser, "mv")
-    if _WATCHDOG:
-        _build_mirror_parser(subparsers.add_parser, "mirror")
-        _build_ringbuffer_parser(subparsers.add_parser, "ringbuffer")
-        _build_watch_parser(subparsers.add_parser, "watch")
+    for c in commands:
+        if c not in builders:
+            subparsers.add_parser(c)
+        elif builders[c] is not None:
+            builders[c](subparsers.add_parser, c)
 
     # parse the command line and/or function call arguments
-    parsed = parser.parse_args(args)
+    parsed = parser.parse_args(argv)
     # use the function provided by the appropriate subparser to execute
     # the parsed arguments for that subparser
     parsed.func(parsed)
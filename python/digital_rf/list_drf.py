@@ -10,14 +10,27 @@
 from __future__ import absolute_import, division, print_function
 
 import bisect
+import calendar
+import collections
 import datetime
+import errno
 import os
 import re
 import shutil
+import sys
+import time
 
-import pytz
+try:
+    from collections.abc import Sequence
+except ImportError:
+    # Python 2
+    from collections import Sequence
 
-from . import util
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows
+    fcntl = None
 
 __all__ = (
     "GLOB_DMDFILE",
@@ -31,6 +44,8 @@ __all__ = (
     "RE_DRFDMD",
     "RE_DRFDMDPROP",
     "RE_DRFPROP",
+    "PathInfo",
+    "classify_path",
     "ilsdrf",
     "lsdrf",
     "sortkey_drf",
@@ -89,11 +104,124 @@ RE_DMDPROP = re.escape(os.sep).join((r"(?P<chpath>.*?)", RE_DMDPROPFILE))
 # properties file associated with Digital RF or Digital Metadata directory
 RE_DRFDMDPROP = re.escape(os.sep).join((r"(?P<chpath>.*?)", RE_PROPFILE))
 
+# Digital RF, Digital Metadata, or properties file, classified in one match
+_RE_CLASSIFY = re.compile(
+    r"^(?:(?P<name>(?!tmp\.).+?)@(?P<secs>[0-9]+)(?:\.(?P<frac>[0-9]{3}))?"
+    r"|(?P<prop>(?:drf|dmd)_properties|metadata))\.h5$"
+)
+# kinds of properties files, where the pre-2.5-style metadata.h5 can belong
+# to either type of channel
+_PROP_KINDS = {
+    "drf_properties": "drf_properties",
+    "dmd_properties": "dmd_properties",
+    "metadata": "properties",
+}
+
+PathInfo = collections.namedtuple("PathInfo", ("chpath", "kind", "name", "time"))
+PathInfo.__doc__ = """Classification of a Digital RF/Metadata file path.
+
+chpath : string
+    Channel directory path.
+
+kind : string
+    One of 'drf', 'dmd', 'drf_properties', 'dmd_properties', or 'properties'
+    (a pre-2.5-style metadata.h5 properties file of either type of channel).
+
+name : string
+    Name of the file before the '@' time, or of the properties file.
+
+time : int | None
+    Time of the file in integer milliseconds since the epoch, or None for a
+    properties file.
+
+"""
+
+
+def _classify_filename(filename):
+    """Return (kind, name, time in ms) for a file name, or None.
+
+    See `PathInfo` for the meaning of the values.
+
+    """
+    m = _RE_CLASSIFY.match(filename)
+    if m is None:
+        return None
+    # positional groups are (name, secs, frac, prop)
+    name, secs, frac, prop = m.groups()
+    if prop is not None:
+        return (_PROP_KINDS[prop], prop, None)
+    if frac is None:
+        return ("dmd", name, int(secs) * 1000)
+    # frac is exactly three digits, so this is secs * 1000 + frac
+    return ("drf", name, int(secs + frac))
+
+
+def classify_path(path):
+    """Classify a Digital RF/Metadata data or properties file path.
+
+    This takes a single regular expression match on the file name, and data
+    files must also be in a time-stamped subdirectory of their channel.
+
+
+    Parameters
+    ----------
+    path : string
+        File path, which must include at least the channel directory.
+
+
+    Returns
+    -------
+    PathInfo | None
+        Named tuple of (chpath, kind, name, time), or None if `path` is not a
+        Digital RF/Metadata file.
+
+    """
+    head, sep, filename = path.rpartition(os.sep)
+    if not sep:
+        return None
+    classified = _classify_filename(filename)
+    if classified is None:
+        return None
+    kind, name, time = classified
+    if time is None:
+        # properties files are directly in the channel directory
+        return PathInfo(head, kind, name, None)
+    chpath, sep, subdir = head.rpartition(os.sep)
+    if not sep or not _RE_SUBDIR.match(subdir):
+        return None
+    return PathInfo(chpath, kind, name, time)
+
+
+def _include_kinds(
+    include_drf=True,
+    include_dmd=True,
+    include_drf_properties=None,
+    include_dmd_properties=None,
+):
+    """Return the set of `classify_path` kinds for the included file types."""
+    if include_drf_properties is None:
+        include_drf_properties = include_drf
+    if include_dmd_properties is None:
+        include_dmd_properties = include_dmd
+    kinds = set()
+    if include_drf:
+        kinds.add("drf")
+    if include_dmd:
+        kinds.add("dmd")
+    if include_drf_properties:
+        kinds.update(("drf_properties", "properties"))
+    if include_dmd_properties:
+        kinds.update(("dmd_properties", "properties"))
+    return frozenset(kinds)
+
 
 def sortkey_drf(filename, regexes=None):
     """Get key for a Digital RF filename to sort first by sample time."""
     if regexes is None:
-        regexes = [_RE_FILE]
+        classified = _classify_filename(filename)
+        if classified is None or classified[2] is None:
+            return None
+        return (classified[2], classified[1])
     for r in regexes:
         m = r.match(filename)
         if m:
@@ -116,22 +244,187 @@ def sortkey_drf(filename, regexes=None):
     return None
 
 
-def _decorate_drf_files(subdir, filenames, file_regex):
-    """Match Digital RF/Metadata filenames and decorate into (time, f)."""
+def _listdir(path):
+    """List the entry names of a directory without stat calls."""
+    try:
+        scandir = os.scandir
+    except AttributeError:
+        # Python 2 has no scandir, but listdir doesn't stat either
+        return os.listdir(path)
+    it = scandir(path)
+    try:
+        return [entry.name for entry in it]
+    finally:
+        # scandir iterators only got a close method in Python 3.6
+        close = getattr(it, "close", None)
+        if close is not None:
+            close()
+
+
+def _timedelta_to_ms(td, round_up=False):
+    """Convert a timedelta to integer milliseconds, rounding down or up."""
+    us = (td.days * 86400 + td.seconds) * 1000000 + td.microseconds
+    if round_up:
+        return -(-us // 1000)
+    return us // 1000
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _datetime_to_ms(dt, round_up=False):
+    """Convert a datetime (UTC if naive) to integer milliseconds since epoch."""
+    if dt.tzinfo is not None:
+        dt = dt.replace(tzinfo=None) - dt.utcoffset()
+    return _timedelta_to_ms(dt - _EPOCH, round_up=round_up)
+
+
+# memoized names of time-stamped subdirectories, by UTC timestamp
+_subdir_names = {}
+
+
+def _subdir_name(ts):
+    """Return the name of the time-stamped subdirectory starting at `ts`."""
+    try:
+        return _subdir_names[ts]
+    except KeyError:
+        if len(_subdir_names) >= 100000:
+            _subdir_names.clear()
+        name = time.strftime("%Y-%m-%dT%H-%M-%S", time.gmtime(ts))
+        _subdir_names[ts] = name
+        return name
+
+
+class _FileNameRange(Sequence):
+    """Lazy sequence of the paths of the data files spanning a time range.
+
+    Item k is the path of the file starting `k*file_cadence_ms` after the
+    first file, which is the one containing `start_ms`, through the file
+    containing `end_ms`. Paths are made as they are needed with
+    ``make_path(subdir, file_ms)`` from the file's start time in milliseconds
+    and the (memoized) name of its time-stamped subdirectory, so no list of
+    names is built for long time ranges.
+
+    """
+
+    def __init__(
+        self, start_ms, end_ms, file_cadence_ms, subdir_cadence_secs, make_path
+    ):
+        self._file_cadence_ms = file_cadence_ms
+        self._subdir_cadence_ms = subdir_cadence_secs * 1000
+        self._make_path = make_path
+        self._first_ms = (start_ms // file_cadence_ms) * file_cadence_ms
+        self._len = max(0, (end_ms - self._first_ms) // file_cadence_ms + 1)
+
+    def _path(self, file_ms):
+        sub_ms = (file_ms // self._subdir_cadence_ms) * self._subdir_cadence_ms
+        return self._make_path(_subdir_name(sub_ms // 1000), file_ms)
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(self._len))]
+        if k < 0:
+            k += self._len
+        if not 0 <= k < self._len:
+            raise IndexError("file index out of range")
+        return self._path(self._first_ms + k * self._file_cadence_ms)
+
+    def _iter_range(self, start_ms, stop_ms, step_ms):
+        # name each subdirectory once for the files in it
+        sub_cad = self._subdir_cadence_ms
+        make_path = self._make_path
+        file_ms = start_ms
+        while (file_ms < stop_ms) if step_ms > 0 else (file_ms > stop_ms):
+            sub_ms = (file_ms // sub_cad) * sub_cad
+            subdir = _subdir_name(sub_ms // 1000)
+            if step_ms > 0:
+                sub_stop = min(stop_ms, sub_ms + sub_cad)
+            else:
+                sub_stop = max(stop_ms, sub_ms - 1)
+            for ms in range(file_ms, sub_stop, step_ms):
+                yield make_path(subdir, ms)
+            # first file at or past sub_stop on the step grid
+            file_ms += -((file_ms - sub_stop) // step_ms) * step_ms
+
+    def __iter__(self):
+        cad = self._file_cadence_ms
+        return self._iter_range(self._first_ms, self._first_ms + self._len * cad, cad)
+
+    def __reversed__(self):
+        cad = self._file_cadence_ms
+        return self._iter_range(
+            self._first_ms + (self._len - 1) * cad, self._first_ms - 1, -cad
+        )
+
+    def __repr__(self):
+        if self._len > 2:
+            return "[{0!r}, ..., {1!r}]".format(self[0], self[-1])
+        return repr(list(self))
+
+
+def _decorate_subdirs(dirs):
+    """Split dirs into time-stamped subdirectories and others.
+
+    The subdirectories are decorated into (time in ms, d) tuples.
+
+    """
+    dec_subdirs = []
+    others = []
+    for d in dirs:
+        m = _RE_SUBDIR.match(d)
+        if m:
+            secs = calendar.timegm(tuple(int(g) for g in m.groups()))
+            dec_subdirs.append((secs * 1000, d))
+        else:
+            others.append(d)
+    return dec_subdirs, others
+
+
+def _decorate_drf_files(subdir, filenames, kinds):
+    """Decorate filenames of the given kinds into (time in ms, f) tuples."""
     dec_files = []
     for filename in filenames:
-        m = file_regex.match(filename)
-        if m:
-            try:
-                frac = int(m.group("frac"))
-            except (IndexError, TypeError):
-                # regex matched but there is no 'frac' in regex (metadata)
-                frac = 0
-            time = datetime.timedelta(seconds=int(m.group("secs")), milliseconds=frac)
-            dec_files.append((time, os.path.join(subdir, filename)))
+        classified = _classify_filename(filename)
+        if classified is not None and classified[0] in kinds:
+            dec_files.append((classified[2], os.path.join(subdir, filename)))
     return dec_files
 
 
+def _list_decorated_subdir(root, subdir, kinds):
+    """List and decorate files in a subdirectory, sorted by time.
+
+    Returns None if the directory failed to list.
+
+    """
+    path = os.path.join(root, subdir)
+    try:
+        filenames = _listdir(path)
+    except OSError:
+        return None
+    dec_files = _decorate_drf_files(path, filenames, kinds)
+    dec_files.sort()
+    return dec_files
+
+
+def _imap_ordered(pool, func, iterable, window):
+    """Like pool.imap, but only running up to `window` calls ahead.
+
+    Results are yielded in the order of `iterable`. When the consumer stops
+    early, calls that have not been started yet are never submitted.
+
+    """
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
 def _decorated_list_slice(dec_list, starttime=None, endtime=None, ffill=False):
     """Get slice for sorted list of tuples with (time, ...)."""
     ks = 0
@@ -162,38 +455,23 @@ def _yield_matching_files(
     starttime=None,
     endtime=None,
     reverse=False,
+    pool=None,
 ):
-    """Yield matching files from a list of subdirectories in a channel dir."""
+    """Yield matching files from a list of subdirectories in a channel dir.
+
+    `starttime` and `endtime` are given in integer milliseconds since the
+    epoch. If `pool` is a thread pool, the subdirectories are listed
+    concurrently ahead of the files being yielded.
+
+    """
     yielding_drf_channel = any(_RE_DRFPROPFILE.match(f) for f in props) and include_drf
     yielding_dmd_channel = any(_RE_DMDPROPFILE.match(f) for f in props) and include_dmd
-    if yielding_drf_channel and yielding_dmd_channel:
-        file_regex = _RE_FILE
-    elif yielding_drf_channel:
-        file_regex = _RE_DRFFILE
-    elif yielding_dmd_channel:
-        file_regex = _RE_DMDFILE
-    else:
+    if not yielding_drf_channel and not yielding_dmd_channel:
         # not in a channel that we want to include
         return
+    kinds = _include_kinds(yielding_drf_channel, yielding_dmd_channel, False, False)
     # get time-stamped subdirectories from dirs list
-    dec_subdirs = []
-    others = []
-    for d in dirs:
-        m = _RE_SUBDIR.match(d)
-        if m:
-            dt = datetime.datetime(
-                year=int(m.group("year")),
-                month=int(m.group("month")),
-                day=int(m.group("day")),
-                hour=int(m.group("hour")),
-                minute=int(m.group("minute")),
-                second=int(m.group("second")),
-                tzinfo=pytz.utc,
-            )
-            time = dt - util.epoch
-            dec_subdirs.append((time, d))
-        else:
-            others.append(d)
+    dec_subdirs, others = _decorate_subdirs(dirs)
     # limit list of dirs for recursion by modifying in place
     dirs[:] = others
 
@@ -202,37 +480,36 @@ def _yield_matching_files(
     subdir_slice = _decorated_list_slice(
         dec_subdirs, starttime=starttime, endtime=endtime, ffill=True
     )
+    subdirs = [d for _time, d in dec_subdirs[subdir_slice]]
+    if reverse:
+        subdirs.reverse()
+
+    # list potential files and get groups of all matching files
+    args = ((root, subdir, kinds) for subdir in subdirs)
+    if pool is None:
+        listings = (_list_decorated_subdir(*a) for a in args)
+    else:
+        window = 2 * getattr(pool, "_processes", 1)
+        listings = _imap_ordered(pool, _list_decorated_subdir, args, window)
 
-    for k, (_time, subdir) in (
-        enumerate(dec_subdirs[subdir_slice])
-        if not reverse
-        else enumerate(list(reversed(dec_subdirs[subdir_slice])))
-    ):
-        # list potential files and get groups of all matching files
-        try:
-            subdir_files = os.listdir(os.path.join(root, subdir))
-        except OSError:
+    # index of the earliest subdirectory, where metadata is forward filled
+    k_first = len(subdirs) - 1 if reverse else 0
+    for k, dec_files in enumerate(listings):
+        if dec_files is None:
             # directory failed to list (e.g. doesn't exist anymore), skip
             continue
-        dec_files = _decorate_drf_files(
-            os.path.join(root, subdir), subdir_files, file_regex
-        )
-        dec_files.sort()
         if (
-            (k == 0)
+            (k == k_first)
             and yielding_dmd_channel
             and subdir_slice.start > 0
             and starttime
-            and dec_files[0][0] > starttime
+            and (not dec_files or dec_files[0][0] > starttime)
         ):
             # need to include files from earlier subdir so we can
             # forward fill and include the metadata file prior to starttime
             for k_subdir in range(subdir_slice.start - 1, -1, -1):
                 prior_subdir = dec_subdirs[k_subdir][-1]
-                prior_files = os.listdir(os.path.join(root, prior_subdir))
-                dec_prior_files = _decorate_drf_files(
-                    os.path.join(root, prior_subdir), prior_files, file_regex
-                )
+                dec_prior_files = _list_decorated_subdir(root, prior_subdir, kinds)
                 if dec_prior_files:
                     dec_prior_files.extend(dec_files)
                     dec_files = dec_prior_files
@@ -246,7 +523,7 @@ def _yield_matching_files(
             dec_files,
             starttime=starttime,
             endtime=endtime,
-            ffill=(k == 0) and yielding_dmd_channel,
+            ffill=(k == k_first) and yielding_dmd_channel,
         )
         for dec_file in dec_files[slc] if not reverse else reversed(dec_files[slc]):
             yield dec_file[-1]
@@ -262,6 +539,8 @@ def ilsdrf(
     include_dmd=True,
     include_drf_properties=None,
     include_dmd_properties=None,
+    workers=None,
+    catalog=None,
 ):
     """Yield Digital RF/Metadata files contained in a channel directory.
 
@@ -303,21 +582,45 @@ def ilsdrf(
         If True, include the Digital Metadata properties file in listing.
         If None, use `include_dmd` value.
 
+    workers : int | None
+        If greater than 1, list the time-stamped subdirectories of each
+        channel concurrently using a pool of this many threads. Files are
+        still yielded in the same order. This speeds up listing large
+        archives on network filesystems, where each directory listing has a
+        high latency.
+
+    catalog : digital_rf.catalog.DigitalRFCatalog | None
+        If not None, query the files from this catalog instead of listing
+        directories. `path` must be within the catalog's root directory, and
+        the catalog should be up to date.
+
 
     Yields
     ------
     Digital RF/Metadata files contained in `path`.
 
     """
-    # convert starttime and endtime to timedeltas for comparison
+    if catalog is not None:
+        for f in catalog.ifiles(
+            path,
+            recursive=recursive,
+            reverse=reverse,
+            starttime=starttime,
+            endtime=endtime,
+            include_drf=include_drf,
+            include_dmd=include_dmd,
+            include_drf_properties=include_drf_properties,
+            include_dmd_properties=include_dmd_properties,
+        ):
+            yield f
+        return
+
+    # convert starttime and endtime to integer milliseconds for comparison
+    # (rounding inward, since file times are whole milliseconds)
     if starttime is not None:
-        if starttime.tzinfo is None:
-            starttime = pytz.utc.localize(starttime)
-        starttime = starttime - util.epoch
+        starttime = _datetime_to_ms(starttime, round_up=True)
     if endtime is not None:
-        if endtime.tzinfo is None:
-            endtime = pytz.utc.localize(endtime)
-        endtime = endtime - util.epoch
+        endtime = _datetime_to_ms(endtime)
 
     if include_drf_properties is None:
         include_drf_properties = include_drf
@@ -334,60 +637,72 @@ def ilsdrf(
     else:
         include_properties = False
 
-    path = os.path.abspath(path)
-    if include_drf or include_dmd:
-        # check if path is already a time-stamped subdir with files,
-        # and yield the files if so
-        root, subdir = os.path.split(path)
-        if _RE_SUBDIR.match(subdir):
-            any_props = [f for f in os.listdir(root) if _RE_PROPFILE.match(f)]
+    pool = None
+    if workers is not None and workers > 1 and (include_drf or include_dmd):
+        # multiprocessing is slow to import, so only when a pool is used
+        from multiprocessing.pool import ThreadPool
+
+        pool = ThreadPool(workers)
+    try:
+        path = os.path.abspath(path)
+        if include_drf or include_dmd:
+            # check if path is already a time-stamped subdir with files,
+            # and yield the files if so
+            root, subdir = os.path.split(path)
+            if _RE_SUBDIR.match(subdir):
+                any_props = [f for f in os.listdir(root) if _RE_PROPFILE.match(f)]
+                if any_props:
+                    for f in _yield_matching_files(
+                        root,
+                        [subdir],
+                        any_props,
+                        include_drf,
+                        include_dmd,
+                        starttime=starttime,
+                        endtime=endtime,
+                        reverse=reverse,
+                        pool=pool,
+                    ):
+                        yield f
+
+        # now search for channel directories, starting with path
+        for root, dirs, files in os.walk(path):
+            # determine if root is a channel directory (i.e. has property file)
+            any_props = [f for f in files if _RE_PROPFILE.match(f)]
             if any_props:
-                for f in _yield_matching_files(
-                    root,
-                    [subdir],
-                    any_props,
-                    include_drf,
-                    include_dmd,
-                    starttime=starttime,
-                    endtime=endtime,
-                    reverse=reverse,
-                ):
-                    yield f
-
-    # now search for channel directories, starting with path
-    for root, dirs, files in os.walk(path):
-        # determine if root is a channel directory (i.e. has property file)
-        any_props = [f for f in files if _RE_PROPFILE.match(f)]
-        if any_props:
-            if include_properties:
-                # first yield property files
-                props = [
-                    os.path.join(root, f) for f in any_props if prop_regex.match(f)
-                ]
-                props.sort(reverse=reverse)
-                for prop in props:
-                    yield prop
-
-            if include_drf or include_dmd:
-                # list, match, filter, and yield files from subdirectories
-                for f in _yield_matching_files(
-                    root,
-                    dirs,
-                    any_props,
-                    include_drf,
-                    include_dmd,
-                    starttime=starttime,
-                    endtime=endtime,
-                    reverse=reverse,
-                ):
-                    yield f
-
-        if recursive:
-            # walk through (non-ts-subdir) directories in sorted order
-            dirs.sort(reverse=reverse)
-        else:
-            # don't go further if we're not recursive
-            del dirs[:]
+                if include_properties:
+                    # first yield property files
+                    props = [
+                        os.path.join(root, f) for f in any_props if prop_regex.match(f)
+                    ]
+                    props.sort(reverse=reverse)
+                    for prop in props:
+                        yield prop
+
+                if include_drf or include_dmd:
+                    # list, match, filter, and yield files from subdirectories
+                    for f in _yield_matching_files(
+                        root,
+                        dirs,
+                        any_props,
+                        include_drf,
+                        include_dmd,
+                        starttime=starttime,
+                        endtime=endtime,
+                        reverse=reverse,
+                        pool=pool,
+                    ):
+                        yield f
+
+            if recursive:
+                # walk through (non-ts-subdir) directories in sorted order
+                dirs.sort(reverse=reverse)
+            else:
+                # don't go further if we're not recursive
+                del dirs[:]
+    finally:
+        if pool is not None:
+            pool.terminate()
 
 
 def lsdrf(*args, **kwargs):
@@ -430,6 +745,14 @@ def lsdrf(*args, **kwargs):
         If True, include the Digital Metadata properties file in listing.
         If None, use `include_dmd` value.
 
+    workers : int | None
+        If greater than 1, list the time-stamped subdirectories of each
+        channel concurrently using a pool of this many threads.
+
+    catalog : digital_rf.catalog.DigitalRFCatalog | None
+        If not None, query the files from this catalog instead of listing
+        directories.
+
 
     Returns
     -------
@@ -572,6 +895,20 @@ def _build_ls_parser(Parser, *args):
         help="""Sort all files together before listing (normally only sorted
                 within subdirectories). (default: %(default)s)""",
     )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="""Number of threads used to list subdirectories concurrently,
+                which is faster on network filesystems. (default: 1)""",
+    )
+    parser.add_argument(
+        "--catalog",
+        default=None,
+        help="""Catalog database file (see drf catalog) from which to query
+                files instead of listing directories. (default: None)""",
+    )
 
     parser = _add_time_group(parser)
     parser = _add_include_group(parser)
@@ -581,7 +918,13 @@ def _build_ls_parser(Parser, *args):
     return parser
 
 
-def _run_ls(args):
+def _parse_time_args(args):
+    """Parse the starttime and endtime identifiers of `args` in place."""
+    if args.starttime is None and args.endtime is None:
+        return
+    # util (numpy, dateutil) is slow to import and only needed to parse times
+    from . import util
+
     if args.starttime is not None:
         args.starttime = util.parse_identifier_to_time(args.starttime)
     if args.endtime is not None:
@@ -589,6 +932,10 @@ def _run_ls(args):
             args.endtime, ref_datetime=args.starttime
         )
 
+
+def _run_ls(args):
+    _parse_time_args(args)
+
     if args.abs:
 
         def fixpath(path, start=None):
@@ -597,6 +944,11 @@ def _run_ls(args):
     else:
         fixpath = os.path.relpath
 
+    if args.catalog is not None:
+        from .catalog import DigitalRFCatalog
+
+        args.catalog = DigitalRFCatalog(db_path=args.catalog)
+
     kwargs = vars(args).copy()
     del kwargs["func"]
     del kwargs["dirs"]
@@ -644,6 +996,19 @@ def _add_srcdest_arguments(parser):
         help="""Traverse directories and include files in those directories in
                 reversed order. (default: %(default)s)""",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=4,
+        help="""Number of files to transfer concurrently. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="""Do not print a progress line. (default: %(default)s)""",
+    )
 
     parser = _add_time_group(parser)
     parser = _add_include_group(parser)
@@ -661,12 +1026,7 @@ def _parse_srcdest_args(args):
     if not args.srcdests:
         args.srcdests = [(args.src, args.dest)]
 
-    if args.starttime is not None:
-        args.starttime = util.parse_identifier_to_time(args.starttime)
-    if args.endtime is not None:
-        args.endtime = util.parse_identifier_to_time(
-            args.endtime, ref_datetime=args.starttime
-        )
+    _parse_time_args(args)
 
     kwargs = vars(args).copy()
     del kwargs["func"]
@@ -674,27 +1034,205 @@ def _parse_srcdest_args(args):
     del kwargs["dest"]
     del kwargs["chs"]
     del kwargs["srcdests"]
+    del kwargs["jobs"]
+    del kwargs["quiet"]
+    kwargs.pop("link", None)
+    # list subdirectories concurrently too
+    kwargs["workers"] = args.jobs
 
     return args, kwargs
 
 
+# ioctl request for cloning a file with a reflink on Linux (FICLONE)
+_FICLONE = 0x40049409
+
+
+def _copy_file_data(src, dest):
+    """Copy the contents of file `src` to `dest` as fast as possible.
+
+    A reflink clone is tried first (copy-on-write filesystems), then
+    os.copy_file_range and os.sendfile, which copy within the kernel without
+    passing data through Python. If none are supported, or one stops short of
+    the size of the file, the rest is copied with shutil.copyfileobj.
+
+    """
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        src_fd = fsrc.fileno()
+        dest_fd = fdest.fileno()
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dest_fd, _FICLONE, src_fd)
+            except (IOError, OSError):
+                pass
+            else:
+                return
+        size = os.fstat(src_fd).st_size
+        offset = 0
+        for name in ("copy_file_range", "sendfile"):
+            fun = getattr(os, name, None)
+            if fun is None:
+                continue
+            try:
+                while offset < size:
+                    if name == "copy_file_range":
+                        n = fun(src_fd, dest_fd, size - offset, offset, offset)
+                    else:
+                        n = fun(dest_fd, src_fd, offset, size - offset)
+                    if n == 0:
+                        break
+                    offset += n
+            except OSError:
+                if offset > 0:
+                    raise
+                # not supported for these files, try the next method
+                continue
+            if offset >= size:
+                return
+            if offset > 0:
+                # stopped short, copy the rest (to the end of the source)
+                break
+            # nothing copied, try the next method
+        fsrc.seek(offset)
+        fdest.seek(offset)
+        shutil.copyfileobj(fsrc, fdest, 2 ** 20)
+
+
+def _copy_file(src, dest, link=False):
+    """Copy a file with its metadata like shutil.copy2, return its size.
+
+    The file is written to a temporary name and then renamed to `dest`, so a
+    partially copied file is never visible under its final name. If `link` is
+    True, hard link the file instead if possible.
+
+    """
+    dest_dir, dest_name = os.path.split(dest)
+    tmp_dest = os.path.join(dest_dir, "tmp." + dest_name)
+    size = os.stat(src).st_size
+    if link:
+        if os.path.exists(dest) and os.path.samefile(src, dest):
+            # already linked (renaming a link over itself would do nothing)
+            return size
+        try:
+            if os.path.lexists(tmp_dest):
+                os.remove(tmp_dest)
+            os.link(src, tmp_dest)
+        except OSError:
+            # e.g. on different filesystems, so fall back to copying
+            pass
+        else:
+            os.rename(tmp_dest, dest)
+            return size
+    try:
+        _copy_file_data(src, tmp_dest)
+        shutil.copystat(src, tmp_dest)
+        os.rename(tmp_dest, dest)
+    except Exception:
+        if os.path.exists(tmp_dest):
+            os.remove(tmp_dest)
+        raise
+    return size
+
+
+def _move_file(src, dest):
+    """Move a file, renaming it when possible, and return its size."""
+    size = os.stat(src).st_size
+    try:
+        os.rename(src, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # on different filesystems, so copy and remove the source
+        _copy_file(src, dest)
+        os.remove(src)
+    return size
+
+
+def _transfer_files(args, kwargs, transfer):
+    """Transfer Digital RF files from the sources to destinations.
+
+    `transfer` is called with (srcpath, destpath) for each file and returns
+    the number of bytes transferred. Files are transferred concurrently using
+    `args.jobs` threads, and a progress line is written to stderr unless
+    `args.quiet` is True.
+
+    """
+
+    def iter_srcdest():
+        for (src, dest) in args.srcdests:
+            for srcpath in ilsdrf(src, **kwargs):
+                yield srcpath, os.path.join(dest, os.path.relpath(srcpath, src))
+
+    def run(srcdest):
+        srcpath, destpath = srcdest
+        destdir = os.path.dirname(destpath)
+        if not os.path.isdir(destdir):
+            try:
+                os.makedirs(destdir)
+            except OSError:
+                # another thread can create the directory at the same time
+                if not os.path.isdir(destdir):
+                    raise
+        return transfer(srcpath, destpath)
+
+    def print_progress(end="\r"):
+        if args.quiet:
+            return
+        elapsed = max(time.time() - start, 1e-6)
+        sys.stderr.write(
+            "{0} files, {1:.1f} MB in {2:.1f} s ({3:.1f} MB/s){4}".format(
+                nfiles, nbytes / 1e6, elapsed, nbytes / 1e6 / elapsed, end
+            )
+        )
+        sys.stderr.flush()
+
+    start = time.time()
+    last_print = start
+    nfiles = 0
+    nbytes = 0
+    pool = None
+    if args.jobs > 1:
+        from multiprocessing.pool import ThreadPool
+
+        pool = ThreadPool(args.jobs)
+        results = pool.imap_unordered(run, iter_srcdest())
+    else:
+        results = (run(sd) for sd in iter_srcdest())
+    try:
+        for size in results:
+            nfiles += 1
+            nbytes += size
+            if time.time() - last_print > 0.5:
+                print_progress()
+                last_print = time.time()
+    finally:
+        if pool is not None:
+            pool.terminate()
+    print_progress(end="\n")
+
+
 def _build_cp_parser(Parser, *args):
     desc = "Copy Digital RF/Metadata files from source to destination."
     parser = Parser(*args, description=desc)
     parser = _add_srcdest_arguments(parser)
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="""Hard link files instead of copying them when the source and
+                destination are on the same filesystem. Only use this if the
+                source files will not be modified in place.
+                (default: %(default)s)""",
+    )
     parser.set_defaults(func=_run_cp)
     return parser
 
 
 def _run_cp(args):
     args, kwargs = _parse_srcdest_args(args)
-    for (src, dest) in args.srcdests:
-        for srcpath in ilsdrf(src, **kwargs):
-            destpath = os.path.join(dest, os.path.relpath(srcpath, src))
-            destdir = os.path.dirname(destpath)
-            if not os.path.exists(destdir):
-                os.makedirs(destdir)
-            shutil.copy2(srcpath, destpath)
+
+    def transfer(srcpath, destpath):
+        return _copy_file(srcpath, destpath, link=args.link)
+
+    _transfer_files(args, kwargs, transfer)
 
 
 def _build_mv_parser(Parser, *args):
@@ -707,13 +1245,7 @@ def _build_mv_parser(Parser, *args):
 
 def _run_mv(args):
     args, kwargs = _parse_srcdest_args(args)
-    for (src, dest) in args.srcdests:
-        for srcpath in ilsdrf(src, **kwargs):
-            destpath = os.path.join(dest, os.path.relpath(srcpath, src))
-            destdir = os.path.dirname(destpath)
-            if not os.path.exists(destdir):
-                os.makedirs(destdir)
-            shutil.move(srcpath, destpath)
+    _transfer_files(args, kwargs, _move_file)
 
 
 if __name__ == "__main__":
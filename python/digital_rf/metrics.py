@@ -0,0 +1,267 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Operational metrics for the Digital RF daemons in Prometheus text format.
+
+The `Metrics` registry holds counters, gauges, and summaries that the
+watchdog event handlers, ringbuffer, and mirror update as they run, and
+`MetricsServer` serves them from a local HTTP endpoint (``/metrics``) for
+scraping by Prometheus or any compatible collector.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import math
+import threading
+from collections import OrderedDict
+
+import six
+from six.moves import BaseHTTPServer, socketserver
+
+__all__ = ("Metrics", "MetricsServer")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    """Format a sample value as Prometheus expects."""
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels):
+    """Format a tuple of (name, value) label pairs."""
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = (
+            six.text_type(value)
+            .replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace('"', '\\"')
+        )
+        pairs.append('{0}="{1}"'.format(name, value))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics(object):
+    """Thread-safe registry of metrics rendered in Prometheus text format.
+
+    Metrics are declared with `counter`, `gauge`, or `summary`, and then
+    updated with `inc`, `set`, and `observe`, optionally with labels given as
+    keyword arguments. A counter or gauge can instead be declared with a
+    function that is called for its value whenever the metrics are rendered,
+    which is useful for values (such as queue depths) that another object
+    already keeps.
+
+    """
+
+    def __init__(self, prefix="drf"):
+        """Create an empty registry whose metric names start with `prefix`."""
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # name -> [type, help, {labels: value}, function or None]
+        self._metrics = OrderedDict()
+
+    def _name(self, name):
+        if self.prefix:
+            return "{0}_{1}".format(self.prefix, name)
+        return name
+
+    def _declare(self, kind, name, help, fun):
+        with self._lock:
+            entry = self._metrics.get(name, None)
+            if entry is None:
+                self._metrics[name] = [kind, help, OrderedDict(), fun]
+            elif entry[0] != kind:
+                raise ValueError(
+                    "Metric {0} is already declared as a {1}.".format(name, entry[0])
+                )
+            elif fun is not None:
+                # e.g. replace a function bound to a restarted observer
+                entry[3] = fun
+
+    def counter(self, name, help, fun=None):
+        """Declare a counter, whose value is `fun()` if it is given."""
+        self._declare("counter", name, help, fun)
+
+    def gauge(self, name, help, fun=None):
+        """Declare a gauge, whose value is `fun()` if it is given."""
+        self._declare("gauge", name, help, fun)
+
+    def summary(self, name, help):
+        """Declare a summary, which keeps the sum and count of observations."""
+        self._declare("summary", name, help, None)
+
+    def inc(self, name, value=1, **labels):
+        """Increase a counter (or gauge) by `value`."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._metrics[name][2]
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Set the value of a gauge."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._metrics[name][2][key] = value
+
+    def observe(self, name, value, **labels):
+        """Add an observation to a summary."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._metrics[name][2]
+            total, count = values.get(key, (0, 0))
+            values[key] = (total + value, count + 1)
+
+    def value(self, name, **labels):
+        """Return the current value of a metric, or None if it has none."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            kind, help, values, fun = self._metrics[name]
+        if fun is not None and not labels:
+            return fun()
+        return values.get(key, None)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            entries = [
+                (name, kind, help, list(values.items()), fun)
+                for name, (kind, help, values, fun) in self._metrics.items()
+            ]
+        lines = []
+        for name, kind, help, samples, fun in entries:
+            fullname = self._name(name)
+            if fun is not None:
+                # functions are called outside of the lock, they can be slow
+                try:
+                    samples = [((), fun())]
+                except Exception:
+                    # e.g. the object the function reads is being replaced
+                    samples = []
+            lines.append("# HELP {0} {1}".format(fullname, help))
+            lines.append("# TYPE {0} {1}".format(fullname, kind))
+            for labels, value in samples:
+                if value is None:
+                    continue
+                if kind == "summary":
+                    total, count = value
+                    for suffix, v in (("_sum", total), ("_count", count)):
+                        lines.append(
+                            "{0}{1}{2} {3}".format(
+                                fullname,
+                                suffix,
+                                _format_labels(labels),
+                                _format_value(v),
+                            )
+                        )
+                else:
+                    lines.append(
+                        "{0}{1} {2}".format(
+                            fullname, _format_labels(labels), _format_value(value)
+                        )
+                    )
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serve the metrics of the server's registry at /metrics."""
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # don't clutter the daemon's status output with every scrape
+        pass
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MetricsServer(object):
+    """Local HTTP server exposing a `Metrics` registry at /metrics."""
+
+    def __init__(self, metrics, port=9090, host="localhost"):
+        """Create a server for `metrics` on `host`:`port`.
+
+        Parameters
+        ----------
+        metrics : Metrics
+            Registry of the metrics to serve.
+
+        port : int
+            Port to listen on. If 0, a free port is chosen and stored in the
+            `port` attribute.
+
+        host : string
+            Host name or address to listen on. The default only accepts local
+            connections.
+
+        """
+        self.metrics = metrics
+        self._server = _ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        self._server.metrics = metrics
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def start(self):
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="DigitalRFMetricsServer"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __str__(self):
+        """Return the URL of the metrics endpoint."""
+        return "http://{0}:{1}/metrics".format(self.host, self.port)
+
+
+def _add_metrics_group(parser):
+    metricsgroup = parser.add_argument_group(title="metrics")
+    metricsgroup.add_argument(
+        "--metrics_port",
+        type=int,
+        default=None,
+        help="""If given, serve operational metrics in Prometheus text format
+                at http://METRICS_HOST:METRICS_PORT/metrics.
+                (default: %(default)s)""",
+    )
+    metricsgroup.add_argument(
+        "--metrics_host",
+        default="localhost",
+        help="""Host name or address for the metrics endpoint to listen on.
+                (default: %(default)s)""",
+    )
+    return parser
@@ -10,19 +10,407 @@
 from __future__ import absolute_import, division, print_function
 
 import datetime
-import filecmp
+import errno
+import functools
 import os
 import shutil
 import sys
+import threading
 import time
 import traceback
+import zlib
+from collections import OrderedDict, deque
 from itertools import chain
 
+import h5py
 from watchdog.events import FileCreatedEvent
 
 from . import list_drf, ringbuffer, util, watchdog_drf
+from .catalog import DigitalRFCatalog
+from .metrics import Metrics, MetricsServer, _add_metrics_group
+from .push import DigitalRFPushClient, parse_address
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+__all__ = (
+    "DigitalRFMirrorHandler",
+    "DigitalRFPushHandler",
+    "DigitalRFMirror",
+    "transcode_drf_file",
+)
+
+CHECKSUMS = ("crc32", "xxhash")
+
+# maximum number of mirrored file records kept by a handler
+_MAX_RECORDS = 100000
+
+
+def _stat_signature(st):
+    """Return (size, mtime, inode) of a stat result for change detection."""
+    mtime = getattr(st, "st_mtime_ns", None)
+    if mtime is None:
+        mtime = st.st_mtime
+    return (st.st_size, mtime, st.st_ino)
+
+
+def _new_checksum(checksum):
+    """Return an object with update/hexdigest methods for `checksum`."""
+    if checksum == "xxhash":
+        if xxhash is None:
+            raise ValueError("The xxhash package is required for xxhash checksums.")
+        return xxhash.xxh64()
+    elif checksum == "crc32":
+        return _CRC32()
+    raise ValueError(
+        "Checksum must be one of {0}, not {1!r}.".format(CHECKSUMS, checksum)
+    )
+
+
+class _CRC32(object):
+    """Incremental CRC-32 with the interface of hashlib objects."""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return "{0:08x}".format(self.value & 0xFFFFFFFF)
+
+
+def _file_checksum(path, checksum, bufsize=1024 * 1024):
+    """Return the hex digest of a file's contents."""
+    h = _new_checksum(checksum)
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(bufsize), b""):
+            h.update(data)
+    return h.hexdigest()
+
+
+def _copy_with_checksum(src, dest, checksum, bufsize=1024 * 1024):
+    """Copy a file with its stat info, verifying the copy with a checksum.
 
-__all__ = ("DigitalRFMirrorHandler", "DigitalRFMirror")
+    The checksum of the source is computed from the data as it is copied, so
+    the source is read only once. Returns the hex digest.
+
+    """
+    h = _new_checksum(checksum)
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        for data in iter(lambda: fsrc.read(bufsize), b""):
+            h.update(data)
+            fdest.write(data)
+    shutil.copystat(src, dest)
+    digest = h.hexdigest()
+    dest_digest = _file_checksum(dest, checksum, bufsize)
+    if dest_digest != digest:
+        raise IOError(
+            "Checksum of {0} ({1}) does not match {2} ({3}).".format(
+                dest, dest_digest, src, digest
+            )
+        )
+    return digest
+
+
+def _channel_key(path):
+    """Return the channel directory of a Digital RF/Metadata file path."""
+    info = list_drf.classify_path(path)
+    if info is not None:
+        return info.chpath
+    dirname = os.path.dirname(path)
+    if list_drf._RE_SUBDIR.match(os.path.basename(dirname)):
+        return os.path.dirname(dirname)
+    # properties files are directly in the channel directory
+    return dirname
+
+
+def _parse_transcode(spec):
+    """Parse a 'filter[:level]' transcode string into h5py filter options.
+
+    The filter is one of 'gzip' (level 0-9, default 4), 'lzf', 'szip', or
+    'none' for no compression. A '+shuffle' suffix enables the shuffle filter,
+    e.g. 'gzip:6+shuffle'.
+
+    """
+    opts = dict(compression=None, compression_opts=None, shuffle=False)
+    spec = spec.strip().lower()
+    if spec.endswith("+shuffle"):
+        opts["shuffle"] = True
+        spec = spec[: -len("+shuffle")]
+    name, _, level = spec.partition(":")
+    if name == "gzip":
+        level = int(level) if level else 4
+        if not 0 <= level <= 9:
+            raise ValueError("gzip level must be 0-9, not {0}".format(level))
+        if level > 0:
+            opts.update(compression="gzip", compression_opts=level)
+    elif name == "lzf":
+        opts["compression"] = "lzf"
+    elif name == "szip":
+        opts.update(compression="szip", compression_opts=("nn", int(level or 8)))
+    elif name != "none":
+        raise ValueError(
+            "Transcode filter must be gzip[:level], lzf, szip[:pixels], or none,"
+            " not {0!r}".format(spec)
+        )
+    elif level:
+        raise ValueError("The none filter takes no level.")
+    return opts
+
+
+def transcode_drf_file(
+    src,
+    dest,
+    compression="gzip",
+    compression_opts=4,
+    shuffle=False,
+    chunks=None,
+    remove_src=False,
+    max_read_bytes=64 * 1024 * 1024,
+):
+    """Rewrite a Digital RF HDF5 file with different compression and chunking.
+
+    The `rf_data` dataset is rewritten with the given filters, keeping its
+    shape, data type, fill value, Fletcher-32 checksum setting, and
+    attributes. All other objects (including `rf_data_index`) and the file's
+    attributes are copied unchanged, so the sample indices of the data are
+    preserved exactly. The destination's access and modification times are
+    set from the source like `shutil.copy2`.
+
+
+    Parameters
+    ----------
+    src : string
+        Path of the source Digital RF file.
+
+    dest : string
+        Path of the destination file, which is overwritten.
+
+    compression : None | 'gzip' | 'lzf' | 'szip'
+        HDF5 compression filter for the data, or None for no compression.
+
+    compression_opts : None | int | tuple
+        Options for the compression filter, e.g. the gzip level.
+
+    shuffle : bool
+        If True, apply the shuffle filter before compression.
+
+    chunks : None | int
+        Number of samples in each chunk of `rf_data`. If None, keep the
+        source chunking, or choose it automatically if the source is not
+        chunked and chunks are needed.
+
+    remove_src : bool
+        If True, remove the source file once it has been transcoded, so that
+        this can be used as a move function.
+
+    max_read_bytes : int
+        Maximum number of bytes of data read from the source at once.
+
+
+    Returns
+    -------
+    string
+        The destination path.
+
+    """
+    try:
+        with h5py.File(src, "r") as fsrc, h5py.File(dest, "w") as fdest:
+            for key, val in fsrc.attrs.items():
+                fdest.attrs.create(key, val, dtype=fsrc.attrs.get_id(key).dtype)
+            for name in fsrc:
+                if name != "rf_data":
+                    fsrc.copy(fsrc[name], fdest, name=name)
+                    continue
+                dsrc = fsrc[name]
+                if chunks is not None:
+                    dchunks = (min(int(chunks), max(dsrc.shape[0], 1)),)
+                    dchunks += dsrc.shape[1:]
+                elif dsrc.chunks is not None:
+                    dchunks = dsrc.chunks
+                elif compression is not None or shuffle or dsrc.fletcher32:
+                    dchunks = True
+                else:
+                    dchunks = None
+                ddest = fdest.create_dataset(
+                    name,
+                    shape=dsrc.shape,
+                    dtype=dsrc.dtype,
+                    maxshape=dsrc.maxshape,
+                    chunks=dchunks,
+                    compression=compression,
+                    compression_opts=compression_opts,
+                    shuffle=shuffle,
+                    fletcher32=dsrc.fletcher32,
+                    fillvalue=dsrc.fillvalue,
+                )
+                for key, val in dsrc.attrs.items():
+                    ddest.attrs.create(key, val, dtype=dsrc.attrs.get_id(key).dtype)
+                # copy data in blocks of whole destination chunks
+                row_bytes = max(dsrc.dtype.itemsize, 1)
+                for n in dsrc.shape[1:]:
+                    row_bytes *= n
+                step = max(max_read_bytes // max(row_bytes, 1), 1)
+                if ddest.chunks is not None:
+                    step = max(step // ddest.chunks[0], 1) * ddest.chunks[0]
+                for k in range(0, dsrc.shape[0], step):
+                    ddest[k : k + step] = dsrc[k : k + step]
+        shutil.copystat(src, dest)
+    except Exception:
+        # don't leave a partial file behind
+        try:
+            os.remove(dest)
+        except OSError:
+            pass
+        raise
+    if remove_src:
+        os.remove(src)
+    return dest
+
+
+class _OrderedWorkerPool(object):
+    """Pool of worker threads that runs tasks in submission order per key.
+
+    Tasks with the same key are run one at a time in the order they were
+    submitted, while tasks with different keys run concurrently. The number of
+    queued tasks is bounded so that `submit` blocks when the workers fall
+    behind instead of letting the backlog grow without bound. A task that is
+    already queued (and not yet running) for a key is not queued again.
+
+    """
+
+    def __init__(self, workers=4, max_queue=1000):
+        self.workers = max(int(workers), 1)
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        # key -> deque of (fun, args) waiting to run
+        self._pending = {}
+        # keys that have pending tasks and are not running
+        self._ready = deque()
+        self._running = set()
+        self._n_pending = 0
+        self._closed = False
+        # statistics for status output
+        self.n_done = 0
+        self.bytes_done = 0
+        self._last_status = (time.time(), 0, 0)
+        self._threads = []
+        for k in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name="MirrorWorker-{0}".format(k)
+            )
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __len__(self):
+        """Return the number of queued and running tasks."""
+        with self._cond:
+            return self._n_pending + len(self._running)
+
+    def submit(self, key, fun, *args):
+        """Queue ``fun(*args)``, blocking while the queue is full."""
+        task = (fun, args)
+        with self._cond:
+            while (
+                self.max_queue
+                and self._n_pending >= self.max_queue
+                and not self._closed
+            ):
+                self._cond.wait()
+            if self._closed:
+                return
+            tasks = self._pending.setdefault(key, deque())
+            if task in tasks:
+                # duplicate of a task that hasn't started yet (e.g. repeated
+                # modified events for a metadata file), no need to run twice
+                return
+            tasks.append(task)
+            self._n_pending += 1
+            if len(tasks) == 1 and key not in self._running:
+                self._ready.append(key)
+                self._cond.notify_all()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key = self._ready.popleft()
+                self._running.add(key)
+                fun, args = self._pending[key].popleft()
+                self._n_pending -= 1
+                self._cond.notify_all()
+            try:
+                nbytes = fun(*args)
+            except Exception:
+                traceback.print_exc()
+                nbytes = None
+            with self._cond:
+                self.n_done += 1
+                self.bytes_done += nbytes or 0
+                self._running.discard(key)
+                if self._pending[key]:
+                    self._ready.append(key)
+                else:
+                    del self._pending[key]
+                self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """Wait until all queued tasks are done, returning True if they are."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while (self._n_pending or self._running) and not self._closed:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not (self._n_pending or self._running)
+
+    def shutdown(self, wait=True):
+        """Stop the workers, discarding queued tasks that haven't started.
+
+        Returns the number of discarded tasks.
+
+        """
+        with self._cond:
+            self._closed = True
+            n_discarded = self._n_pending
+            self._pending = dict((key, deque()) for key in self._running)
+            self._ready.clear()
+            self._n_pending = 0
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        return n_discarded
+
+    def status(self):
+        """Return status string of queue depth and throughput since last call."""
+        now = time.time()
+        with self._cond:
+            n_queued = self._n_pending
+            n_running = len(self._running)
+            n_done = self.n_done
+            bytes_done = self.bytes_done
+        last_time, last_done, last_bytes = self._last_status
+        self._last_status = (now, n_done, bytes_done)
+        elapsed = max(now - last_time, 1e-6)
+        return (
+            "{0} queued, {1} active, {2} files mirrored,"
+            " {3:.1f} files/s, {4:.2f} MB/s"
+        ).format(
+            n_queued,
+            n_running,
+            n_done,
+            (n_done - last_done) / elapsed,
+            (bytes_done - last_bytes) / elapsed / 1e6,
+        )
 
 
 class DigitalRFMirrorHandler(watchdog_drf.DigitalRFEventHandler):
@@ -45,9 +433,18 @@ class DigitalRFMirrorHandler(watchdog_drf.DigitalRFEventHandler):
         include_dmd=True,
         include_drf_properties=True,
         include_dmd_properties=True,
+        pool=None,
+        checksum=None,
+        debounce=None,
+        compare_size=True,
     ):
         """Create Digital RF mirror handler given source and destination.
 
+        Files are only mirrored when they differ from the destination, which
+        is decided from the size, modification time, and inode of the source
+        and destination files as recorded when they were last mirrored. File
+        contents are never compared.
+
         Other Parameters
         ----------------
         starttime : datetime.datetime
@@ -72,11 +469,42 @@ class DigitalRFMirrorHandler(watchdog_drf.DigitalRFEventHandler):
             If True, include the Digital Metadata properties file.
             If None, use `include_dmd` value.
 
+        pool : _OrderedWorkerPool | None
+            If not None, worker pool to which mirroring of each file is
+            submitted (in order for each channel) so that events are not
+            blocked by slow transfers. Otherwise, files are mirrored
+            synchronously when their event is dispatched.
+
+        checksum : None | 'crc32' | 'xxhash'
+            If not None, files are copied (instead of using `mirror_fun`)
+            while computing this checksum of the source data, and the copy
+            is verified against it before being renamed into place. The
+            'xxhash' checksum requires the xxhash package.
+
+        debounce : float | None
+            Quiet period in seconds for coalescing the modified events of a
+            file before it is mirrored (see `DigitalRFEventHandler`).
+
+        compare_size : bool
+            If False, a destination file that was not mirrored by this
+            handler is considered current when just its modification time
+            matches the source. Use for a `mirror_fun` that changes the size
+            of files, e.g. `transcode_drf_file`.
+
         """
         self.src = os.path.abspath(src)
         self.dest = os.path.abspath(dest)
         self.verbose = verbose
         self.mirror_fun = mirror_fun
+        self.pool = pool
+        self.compare_size = compare_size
+        if checksum is not None:
+            # check that the checksum is available
+            _new_checksum(checksum)
+        self.checksum = checksum
+        # dest_path -> (src signature, dest signature, checksum)
+        self._records = OrderedDict()
+        self._records_lock = threading.Lock()
         super(DigitalRFMirrorHandler, self).__init__(
             starttime=starttime,
             endtime=endtime,
@@ -84,6 +512,7 @@ class DigitalRFMirrorHandler(watchdog_drf.DigitalRFEventHandler):
             include_dmd=include_dmd,
             include_drf_properties=include_drf_properties,
             include_dmd_properties=include_dmd_properties,
+            debounce=debounce,
         )
 
     def _get_dest_path(self, src_path):
@@ -91,15 +520,64 @@ class DigitalRFMirrorHandler(watchdog_drf.DigitalRFEventHandler):
         dest_path = os.path.join(self.dest, rel_path)
         return dest_path
 
+    def get_record(self, dest_path):
+        """Return (src signature, dest signature, checksum) of a mirrored file.
+
+        Returns None if the file has not been mirrored by this handler.
+
+        """
+        with self._records_lock:
+            return self._records.get(dest_path, None)
+
+    def _set_record(self, dest_path, record):
+        with self._records_lock:
+            self._records.pop(dest_path, None)
+            if record is not None:
+                self._records[dest_path] = record
+                while len(self._records) > _MAX_RECORDS:
+                    self._records.popitem(last=False)
+
+    def _is_mirrored(self, dest_path, src_sig):
+        """Return True if the destination file is current with the source."""
+        try:
+            dest_sig = _stat_signature(os.stat(dest_path))
+        except OSError:
+            return False
+        record = self.get_record(dest_path)
+        if record is not None:
+            return record[0] == src_sig and record[1] == dest_sig
+        # not mirrored by us, trust matching size and mtime like a shallow
+        # filecmp (mirroring preserves mtime), then remember the result
+        if dest_sig[1] == src_sig[1] and (
+            not self.compare_size or dest_sig[0] == src_sig[0]
+        ):
+            self._set_record(dest_path, (src_sig, dest_sig, None))
+            return True
+        return False
+
     def mirror_to_dest(self, src_path):
-        """Mirror file to its location in the destination directory."""
+        """Mirror file to its location in the destination directory.
+
+        Returns the number of bytes mirrored, which is 0 if the destination
+        file is already identical or the file could not be mirrored.
+
+        """
         dest_path = self._get_dest_path(src_path)
         dest_dir, dest_name = os.path.split(dest_path)
         tmp_dest_path = os.path.join(dest_dir, "tmp." + dest_name)
+        nbytes = 0
         try:
             if not os.path.exists(dest_dir):
-                os.makedirs(dest_dir)
-            if not os.path.exists(dest_path) or not filecmp.cmp(src_path, dest_path):
+                try:
+                    os.makedirs(dest_dir)
+                except OSError as e:
+                    # another worker may have created it in the meantime
+                    if e.errno != errno.EEXIST:
+                        raise
+            # stat before mirroring so that changes during the transfer get
+            # mirrored again on their own event
+            src_sig = _stat_signature(os.stat(src_path))
+            if not self._is_mirrored(dest_path, src_sig):
                 if self.verbose:
                     now = datetime.datetime.utcnow().replace(microsecond=0)
                     print("{0} | Mirroring {1}".format(now, src_path))
@@ -107,15 +585,30 @@ class DigitalRFMirrorHandler(watchdog_drf.DigitalRFEventHandler):
                     sys.stdout.write(".")
                     sys.stdout.flush()
                 # mirror to temporary name, then rename to final destination
-                self.mirror_fun(src_path, tmp_dest_path)
+                nbytes = src_sig[0]
+                digest = None
+                if self.checksum is not None:
+                    digest = _copy_with_checksum(src_path, tmp_dest_path, self.checksum)
+                else:
+                    self.mirror_fun(src_path, tmp_dest_path)
                 os.rename(tmp_dest_path, dest_path)
-        except OSError:
+                if os.path.exists(src_path):
+                    dest_sig = _stat_signature(os.stat(dest_path))
+                    self._set_record(dest_path, (src_sig, dest_sig, digest))
+                else:
+                    # moved, no need to remember
+                    self._set_record(dest_path, None)
+        except (IOError, OSError):
+            nbytes = 0
+            self._set_record(dest_path, None)
             if not os.path.isfile(src_path):
                 # file doesn't exist anymore, no need to notify
                 pass
             else:
                 # otherwise, print the error but don't stop mirroring
                 traceback.print_exc()
+                if self.metrics is not None:
+                    self.metrics.inc("errors_total", source="mirror")
 
         # try to clean up source directory in case it is empty
         src_dir, src_name = os.path.split(src_path)
@@ -125,13 +618,113 @@ class DigitalRFMirrorHandler(watchdog_drf.DigitalRFEventHandler):
             # directory not empty, just move on
             pass
 
+        return nbytes
+
+    def register_metrics(self, metrics):
+        """Record mirrored files and bytes in addition to the event metrics."""
+        super(DigitalRFMirrorHandler, self).register_metrics(metrics)
+        metrics.counter("mirrored_files_total", "Files mirrored to the destination.")
+        metrics.counter(
+            "mirrored_bytes_total", "Bytes of files mirrored to the destination."
+        )
+
+    def _mirror_task(self, src_path):
+        """Mirror a file, recording it in the metrics. Returns its size."""
+        nbytes = self.mirror_to_dest(src_path)
+        if self.metrics is not None and nbytes:
+            self.metrics.inc("mirrored_files_total")
+            self.metrics.inc("mirrored_bytes_total", nbytes)
+        return nbytes
+
+    def _mirror(self, src_path):
+        if self.pool is None:
+            self._mirror_task(src_path)
+        else:
+            self.pool.submit(_channel_key(src_path), self._mirror_task, src_path)
+
     def on_created(self, event):
         """Mirror newly-created file."""
-        self.mirror_to_dest(event.src_path)
+        self._mirror(event.src_path)
 
     def on_modified(self, event):
         """Mirror modified file."""
-        self.mirror_to_dest(event.src_path)
+        self._mirror(event.src_path)
+
+
+class DigitalRFPushHandler(DigitalRFMirrorHandler):
+    """Event handler for pushing Digital RF and Digital Metadata files.
+
+    This handler sends new or modified files from a source directory to a
+    `digital_rf.push.DigitalRFReceiver` with a push client, at the same
+    relative path below the receiver's directory. Moved and deleted files
+    are ignored.
+
+    """
+
+    def __init__(self, src, client, remove_src=False, **kwargs):
+        """Create push handler given source directory and push client.
+
+        Parameters
+        ----------
+        src : string
+            Source directory.
+
+        client : digital_rf.push.DigitalRFPushClient
+            Client connected to the receiver.
+
+        remove_src : bool
+            If True, remove source files once the receiver has stored them.
+
+        Other keyword arguments are passed to `DigitalRFMirrorHandler`.
+
+        """
+        self.client = client
+        self.remove_src = remove_src
+        super(DigitalRFPushHandler, self).__init__(src, src, **kwargs)
+
+    def mirror_to_dest(self, src_path):
+        """Push file to the receiver, returning the number of bytes sent."""
+        relpath = os.path.relpath(src_path, self.src)
+        try:
+            src_sig = _stat_signature(os.stat(src_path))
+        except OSError:
+            # file doesn't exist anymore, no need to notify
+            return 0
+        record = self.get_record(relpath)
+        if record is not None and record[0] == src_sig:
+            return 0
+        if self.verbose:
+            now = datetime.datetime.utcnow().replace(microsecond=0)
+            print("{0} | Pushing {1}".format(now, src_path))
+        else:
+            sys.stdout.write(".")
+            sys.stdout.flush()
+
+        def acknowledged(ok, error):
+            if not ok:
+                if os.path.isfile(src_path):
+                    print("Failed to push {0}: {1}".format(src_path, error))
+                    sys.stdout.flush()
+                return
+            if not self.remove_src:
+                self._set_record(relpath, (src_sig, None, None))
+                return
+            try:
+                os.remove(src_path)
+                # try to clean up source directory in case it is empty
+                os.rmdir(os.path.dirname(src_path))
+            except OSError:
+                pass
+
+        try:
+            self.client.send(src_path, relpath, callback=acknowledged)
+        except (IOError, OSError):
+            if os.path.isfile(src_path):
+                traceback.print_exc()
+                if self.metrics is not None:
+                    self.metrics.inc("errors_total", source="push")
+            return 0
+        return src_sig[0]
 
 
 class DigitalRFMirror(object):
@@ -157,6 +750,18 @@ class DigitalRFMirror(object):
         include_drf=True,
         include_dmd=True,
         force_polling=False,
+        inotify=False,
+        catalog=None,
+        workers=4,
+        max_queue=1000,
+        status_interval=10,
+        checksum=None,
+        debounce=0,
+        transcode=None,
+        transcode_chunks=None,
+        push=None,
+        metrics_port=None,
+        metrics_host="localhost",
     ):
         """Create Digital RF mirror object. Use start/run method to begin.
 
@@ -165,8 +770,8 @@ class DigitalRFMirror(object):
         src : str
             Source directory to monitor.
 
-        dest : str
-            Destination directory.
+        dest : str | None
+            Destination directory. Must be None if `push` is given.
 
         method : 'move' | 'copy'
             Mirroring method. New Digital RF files in the source directory will
@@ -205,9 +810,90 @@ class DigitalRFMirror(object):
             If True, force the watchdog to use polling instead of the default
             observer.
 
+        inotify : bool
+            If True (and not polling), use the Digital RF inotify observer,
+            which reads events in bulk and filters them on their file name
+            before creating them. It falls back to the default observer where
+            it is not supported. See `watchdog_drf.DirWatcher`.
+
+        catalog : digital_rf.catalog.DigitalRFCatalog | None
+            If not None, a catalog whose root contains `src`. It is updated and
+            queried to find the existing files when mirroring starts, instead
+            of walking the whole directory tree.
+
+        workers : int
+            Number of threads that mirror files concurrently. Files of the
+            same channel are always mirrored one at a time in the order of
+            their events, so only different channels are mirrored in
+            parallel. If 0, files are mirrored synchronously in the thread
+            dispatching the events.
+
+        max_queue : int | None
+            Maximum number of files waiting to be mirrored. When the queue is
+            full, event dispatching waits for the workers to catch up. If
+            None or 0, the queue is unbounded.
+
+        status_interval : None | int
+            Interval in seconds between printing the queue depth and
+            throughput of the workers. If None, status is never printed.
+
+        checksum : None | 'crc32' | 'xxhash'
+            If not None, copied files are verified with this checksum, which
+            is computed from the data as it is copied. Moved files are not
+            checksummed. The 'xxhash' checksum requires the xxhash package.
+
+        debounce : float | None
+            Quiet period in seconds after the last modification of a file
+            before it is mirrored, so that a Digital Metadata file being
+            appended is copied once it settles instead of on every write.
+            If None or 0, every modified event is mirrored. When moving,
+            a Digital Metadata file is removed from the source as soon as
+            the next one is created, so a held modified event can come too
+            late to mirror the file's last writes; keep the default of 0
+            unless files are known to be complete before the next one is
+            created.
+
+        transcode : None | str
+            If not None, Digital RF files are rewritten to the destination with
+            this compression filter instead of being copied or moved as is
+            (the source is removed afterward when `method` is 'move'). The
+            string is 'gzip[:level]', 'lzf', 'szip[:pixels]', or 'none',
+            optionally followed by '+shuffle'. See `transcode_drf_file`.
+            Properties and Digital Metadata files are mirrored unchanged.
+
+        transcode_chunks : None | int
+            Number of samples in each chunk of transcoded data. If None, the
+            source chunking is kept when there is one.
+
+        push : None | str | tuple
+            If not None, the 'host:port' or (host, port) address of a
+            `digital_rf.push.DigitalRFReceiver` (see ``drf receive``) to
+            which files are sent over a single TCP connection instead of
+            being mirrored to `dest`. Moved files are removed from the source
+            once the receiver has stored them.
+
+        metrics_port : int | None
+            If not None, serve operational metrics (events, queue depths,
+            mirrored bytes, handling lag, errors) in Prometheus text format at
+            http://`metrics_host`:`metrics_port`/metrics while running.
+
+        metrics_host : string
+            Host name or address for the metrics endpoint to listen on.
+
         """
+        if (dest is None) == (push is None):
+            raise ValueError("Exactly one of `dest` or `push` must be given.")
+        if push is not None and transcode is not None:
+            raise ValueError("Transcoding is not supported when pushing.")
         self.src = os.path.abspath(src)
-        self.dest = os.path.abspath(dest)
+        self.push = push
+        if push is not None:
+            host, port = parse_address(push)
+            self.push_client = DigitalRFPushClient(host, port)
+            self.dest = "{0}:{1}".format(host, port)
+        else:
+            self.push_client = None
+            self.dest = os.path.abspath(dest)
         if method not in ("move", "copy"):
             raise ValueError('Mirror method must be either "move" or "copy".')
         self.method = method
@@ -218,41 +904,73 @@ class DigitalRFMirror(object):
         self.include_drf = include_drf
         self.include_dmd = include_dmd
         self.force_polling = force_polling
+        self.inotify = inotify
+        self.catalog = catalog
+        self.workers = workers
+        self.max_queue = max_queue
+        self.status_interval = status_interval
+        self.checksum = checksum
+        self.debounce = debounce
+        self.transcode = transcode
+        self.transcode_chunks = transcode_chunks
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        if self.transcode is not None:
+            transcode_opts = _parse_transcode(self.transcode)
+            drf_mirror_fun = functools.partial(
+                transcode_drf_file,
+                chunks=self.transcode_chunks,
+                remove_src=(self.method == "move"),
+                **transcode_opts
+            )
+        elif self.method == "move":
+            drf_mirror_fun = shutil.move
+        else:
+            drf_mirror_fun = None
 
         if not self.include_drf and not self.include_dmd:
             errstr = "One of `include_drf` or `include_dmd` must be True."
             raise ValueError(errstr)
 
+        # copy and move handlers share a pool so the files of a channel are
+        # mirrored in order (e.g. properties before data)
+        if self.workers:
+            self.pool = _OrderedWorkerPool(self.workers, self.max_queue)
+        else:
+            self.pool = None
+
         self.event_handlers = []
         # have to copy properties files because static,
         # have to copy metadata because can be modified
-        copy_handler = DigitalRFMirrorHandler(
-            self.src,
-            self.dest,
-            verbose=verbose,
+        copy_handler = self._make_handler(
             mirror_fun=shutil.copy2,
+            verbose=verbose,
             starttime=self.starttime,
             endtime=self.endtime,
-            include_drf=(self.include_drf and self.method == "copy"),
+            include_drf=(self.include_drf and drf_mirror_fun is None),
             include_dmd=self.include_dmd,
             include_drf_properties=self.include_drf,
             include_dmd_properties=self.include_dmd,
+            pool=self.pool,
+            checksum=self.checksum,
+            debounce=self.debounce,
         )
         self.event_handlers.append(copy_handler)
 
-        if self.include_drf and self.method == "move":
-            # move RF files with a separate handler
-            drf_handler = DigitalRFMirrorHandler(
-                self.src,
-                self.dest,
+        if self.include_drf and drf_mirror_fun is not None:
+            # move or transcode RF files with a separate handler
+            drf_handler = self._make_handler(
+                mirror_fun=drf_mirror_fun,
                 verbose=verbose,
-                mirror_fun=shutil.move,
                 starttime=self.starttime,
                 endtime=self.endtime,
                 include_drf=True,
                 include_dmd=False,
                 include_drf_properties=False,
                 include_dmd_properties=False,
+                pool=self.pool,
+                debounce=self.debounce,
+                compare_size=(self.transcode is None),
             )
             self.event_handlers.append(drf_handler)
 
@@ -267,14 +985,56 @@ class DigitalRFMirror(object):
                 endtime=self.endtime,
                 include_drf=False,
                 include_dmd=True,
+                debounce=self.debounce,
             )
             self.event_handlers.append(md_ringbuffer_handler)
 
+        self.metrics = None
+        self.metrics_server = None
+        if self.metrics_port is not None:
+            self.metrics = Metrics()
+            self._register_metrics()
+
         self._init_observer()
 
+    def _register_metrics(self):
+        """Declare the mirror's metrics in its registry."""
+        metrics = self.metrics
+        for handler in self.event_handlers:
+            # (the Digital Metadata ringbuffer handler sees the same events
+            #  as the copy handler, so it is not counted)
+            if isinstance(handler, DigitalRFMirrorHandler):
+                handler.register_metrics(metrics)
+        # (the observer is replaced when it is restarted)
+        metrics.gauge(
+            "event_queue_depth",
+            "File events waiting to be handled.",
+            lambda: self.observer.event_queue.qsize(),
+        )
+        if self.pool is not None:
+            pool = self.pool
+            metrics.gauge(
+                "mirror_queue_depth",
+                "Files waiting to be mirrored or being mirrored.",
+                lambda: len(pool),
+            )
+
+    def _make_handler(self, mirror_fun, **kwargs):
+        """Return a mirror handler, or a push handler when pushing."""
+        if self.push_client is not None:
+            return DigitalRFPushHandler(
+                self.src,
+                self.push_client,
+                remove_src=(mirror_fun is not shutil.copy2),
+                **kwargs
+            )
+        return DigitalRFMirrorHandler(
+            self.src, self.dest, mirror_fun=mirror_fun, **kwargs
+        )
+
     def _init_observer(self):
         self.observer = watchdog_drf.DirWatcher(
-            self.src, force_polling=self.force_polling
+            self.src, force_polling=self.force_polling, inotify=self.inotify
         )
         for handler in self.event_handlers:
             self.observer.schedule(handler, self.src, recursive=True)
@@ -290,6 +1050,12 @@ class DigitalRFMirror(object):
                 now, self.method, self.src, self.dest
             )
         )
+        if self.metrics is not None:
+            self.metrics_server = MetricsServer(
+                self.metrics, port=self.metrics_port, host=self.metrics_host
+            )
+            self.metrics_server.start()
+            print("{0} | Serving metrics at {1}".format(now, self.metrics_server))
         sys.stdout.flush()
 
         if os.path.isdir(self.src):
@@ -297,12 +1063,15 @@ class DigitalRFMirror(object):
             # critical and duplicate events are not harmful (we will either
             # copy again or fail to move because the source doesn't exist)
             # mirror properties at minimum
+            if self.catalog is not None:
+                self.catalog.update()
             paths = list_drf.ilsdrf(
                 self.src,
                 include_drf=False,
                 include_dmd=False,
                 include_drf_properties=self.include_drf,
                 include_dmd_properties=self.include_dmd,
+                catalog=self.catalog,
             )
 
             if not self.ignore_existing:
@@ -315,6 +1084,7 @@ class DigitalRFMirror(object):
                     include_dmd=self.include_dmd,
                     include_drf_properties=False,
                     include_dmd_properties=False,
+                    catalog=self.catalog,
                 )
                 paths = chain(paths, more_paths)
 
@@ -327,15 +1097,31 @@ class DigitalRFMirror(object):
                 for handler in self.event_handlers:
                     handler.dispatch(event, match_time=False)
 
+            if self.pool is not None:
+                self.pool.wait()
+            if self.push_client is not None:
+                self.push_client.flush()
+
     def join(self):
         """Wait until a KeyboardInterrupt is received to stop mirroring."""
+        status_interval = self.status_interval
+        if status_interval is None or self.pool is None:
+            status_interval = float("inf")
+        last_status = time.time()
         try:
             while True:
+                if time.time() - last_status >= status_interval:
+                    last_status = time.time()
+                    now = datetime.datetime.utcnow().replace(microsecond=0)
+                    print("\n{0} | ({1})".format(now, self.pool.status()))
+                    sys.stdout.flush()
                 if not self.observer.all_alive():
                     # if not all threads of the observer are alive,
                     # reinitialize and restart
                     print("Found stopped thread, reinitializing and restarting.")
                     sys.stdout.flush()
+                    if self.metrics is not None:
+                        self.metrics.inc("errors_total", source="observer")
                     # make a new observer and start it ASAP
                     # (if we missed some events, can't help it)
                     self._init_observer()
@@ -356,8 +1142,36 @@ class DigitalRFMirror(object):
         self.join()
 
     def stop(self):
-        """Stop mirror process."""
+        """Stop mirror process.
+
+        Modified events held by debouncing are dispatched first. Files that
+        are being mirrored are finished, but files still waiting in the queue
+        are not mirrored (they will be when mirroring starts again, unless
+        existing files are ignored).
+
+        """
         self.observer.stop()
+        # handle modified events still held by debouncing
+        for handler in self.event_handlers:
+            handler.flush()
+        if self.pool is not None:
+            n_discarded = self.pool.shutdown()
+            if n_discarded:
+                print("\nStopped with {0} files not mirrored.".format(n_discarded))
+                sys.stdout.flush()
+        if self.push_client is not None:
+            # give files that were already sent a chance to be acknowledged
+            if not self.push_client.flush(timeout=10):
+                print(
+                    "\nStopped with {0} pushed files not acknowledged.".format(
+                        len(self.push_client)
+                    )
+                )
+                sys.stdout.flush()
+            self.push_client.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
 
 
 def _build_mirror_parser(Parser, *args):
@@ -366,7 +1180,12 @@ def _build_mirror_parser(Parser, *args):
 
     parser.add_argument("method", choices=["mv", "cp"], help="Mirroring method.")
     parser.add_argument("src", help="Source directory to monitor.")
-    parser.add_argument("dest", help="Destination directory.")
+    parser.add_argument(
+        "dest",
+        nargs="?",
+        default=None,
+        help="Destination directory (omit when using --push).",
+    )
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="Print the name of mirrored files."
     )
@@ -376,6 +1195,67 @@ def _build_mirror_parser(Parser, *args):
         help="Ignore existing files in source directory.",
     )
 
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=4,
+        help="""Number of threads mirroring files of different channels
+                concurrently. Files of the same channel are always mirrored
+                in order. Use 0 to mirror in the event thread.
+                (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--max_queue",
+        type=int,
+        default=1000,
+        help="""Maximum number of files waiting to be mirrored before event
+                handling waits for the workers. Use 0 for no limit.
+                (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "-p",
+        "--status_interval",
+        type=int,
+        default=10,
+        help="""Interval in seconds between printing the queue depth and
+                throughput. (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        "--checksum",
+        choices=CHECKSUMS,
+        default=None,
+        help="""Verify copied files with this checksum, computed as the data
+                is copied. The xxhash checksum requires the xxhash package.
+                (default: %(default)s)""",
+    )
+
+    parser.add_argument(
+        "--push",
+        default=None,
+        metavar="HOST:PORT",
+        help="""Push files over TCP to a receiver started with drf receive
+                instead of mirroring to a destination directory.
+                (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--transcode",
+        default=None,
+        help="""Rewrite Digital RF files to the destination with this
+                compression: gzip[:level], lzf, szip[:pixels], or none,
+                optionally followed by +shuffle (e.g. gzip:4+shuffle).
+                Sample indices and attributes are preserved.
+                (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--transcode_chunks",
+        type=int,
+        default=None,
+        help="""Number of samples in each chunk of transcoded data.
+                (default: source chunking)""",
+    )
+
     parser = list_drf._add_time_group(parser)
 
     includegroup = parser.add_argument_group(title="include")
@@ -394,7 +1274,16 @@ def _build_mirror_parser(Parser, *args):
                 (default: False)""",
     )
 
+    parser.add_argument(
+        "--catalog",
+        default=None,
+        help="""Catalog database file (see drf catalog) to update and query for
+                the existing source files instead of walking the directory
+                tree. (default: None)""",
+    )
+
     parser = watchdog_drf._add_watchdog_group(parser)
+    parser = _add_metrics_group(parser)
 
     parser.set_defaults(func=_run_mirror)
 
@@ -414,6 +1303,9 @@ def _run_mirror(args):
             args.endtime, ref_datetime=args.starttime
         )
 
+    if args.catalog is not None:
+        args.catalog = DigitalRFCatalog(db_path=args.catalog)
+
     kwargs = vars(args).copy()
     del kwargs["func"]
 
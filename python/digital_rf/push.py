@@ -0,0 +1,624 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Module for pushing Digital RF files to a remote receiver over TCP.
+
+A `DigitalRFPushClient` streams files over a single persistent connection to
+a `DigitalRFReceiver`, which writes them below its destination directory.
+
+The protocol is line-based JSON with raw file data in between. After the
+client sends the greeting ``DRFPUSH 1`` and the receiver answers ``OK 1``,
+each file is sent as a ``put`` request header line, the file data, and a
+trailer line with the CRC-32 of the whole file. The receiver writes the data
+to a temporary ``tmp.`` file and renames it into place once the checksum is
+verified, then acknowledges the request by its id. The client keeps sending
+while acknowledgements are outstanding (up to a window), so transfers are
+pipelined. After a disconnect the client reconnects, asks how much of each
+unacknowledged file the receiver already has with a ``resume`` request, and
+sends only the rest.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import errno
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import traceback
+import zlib
+from collections import OrderedDict
+
+import six
+from six.moves import socketserver
+
+from .list_drf import RE_DRFDMD, RE_DRFDMDPROP
+
+__all__ = ("DigitalRFPushClient", "DigitalRFReceiver")
+
+DEFAULT_PORT = 9527
+
+_GREETING = b"DRFPUSH 1\n"
+_GREETING_REPLY = b"OK 1\n"
+_BUFSIZE = 1024 * 1024
+
+# relative paths accepted by the receiver (Digital RF/Metadata files only)
+_RE_RELPATHS = (re.compile("^" + RE_DRFDMD), re.compile("^" + RE_DRFDMDPROP))
+
+
+def _send_json(sock, obj):
+    sock.sendall(json.dumps(obj).encode("utf-8") + b"\n")
+
+
+def _read_json(rfile):
+    line = rfile.readline()
+    if not line:
+        raise EOFError("Connection closed.")
+    return json.loads(line.decode("utf-8"))
+
+
+def _file_crc32(f, nbytes, crc=0):
+    """Return the CRC-32 of the next `nbytes` of file object `f`."""
+    while nbytes > 0:
+        data = f.read(min(_BUFSIZE, nbytes))
+        if not data:
+            break
+        crc = zlib.crc32(data, crc)
+        nbytes -= len(data)
+    return crc
+
+
+def parse_address(address, default_port=DEFAULT_PORT):
+    """Return (host, port) from a 'host[:port]' string or (host, port) tuple."""
+    if not isinstance(address, six.string_types):
+        host, port = address
+        return host, int(port)
+    host, sep, port = address.rpartition(":")
+    if not sep:
+        return address, default_port
+    return host, int(port)
+
+
+class _PendingFile(object):
+    """File that has been sent (or is queued to be sent) but not acknowledged."""
+
+    __slots__ = ("id", "src_path", "relpath", "size", "mtime", "callback")
+
+    def __init__(self, id, src_path, relpath, size, mtime, callback):
+        self.id = id
+        self.src_path = src_path
+        self.relpath = relpath
+        self.size = size
+        self.mtime = mtime
+        self.callback = callback
+
+
+class DigitalRFPushClient(object):
+    """Client for pushing files to a `DigitalRFReceiver`.
+
+    Files are sent in the order of calls to `send` over one connection, and
+    up to `window` files may be awaiting acknowledgement at once. If the
+    connection is lost, the client reconnects and resumes the unacknowledged
+    files from where the receiver left off.
+
+    """
+
+    def __init__(
+        self, host, port=DEFAULT_PORT, window=16, retry_interval=1, timeout=None
+    ):
+        """Create push client for the receiver at `host` and `port`.
+
+        Parameters
+        ----------
+        host : string
+            Host name or address of the receiver.
+
+        port : int
+            Port of the receiver.
+
+
+        Other Parameters
+        ----------------
+        window : int
+            Maximum number of files sent but not yet acknowledged. `send`
+            blocks while the window is full.
+
+        retry_interval : float
+            Seconds to wait between attempts to (re)connect.
+
+        timeout : float | None
+            Seconds to keep trying to connect before raising an IOError. If
+            None, keep trying until `close` is called.
+
+        """
+        self.host = host
+        self.port = int(port)
+        self.window = max(int(window), 1)
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        # guards the pending dict and the connection state
+        self._cond = threading.Condition()
+        # serializes writing to the connection and reconnecting
+        self._send_lock = threading.RLock()
+        self._pending = OrderedDict()
+        self._next_id = 0
+        self._sock = None
+        self._broken = False
+        self._closed = False
+        self._reader = None
+        self.n_sent = 0
+        self.bytes_sent = 0
+
+    def __len__(self):
+        """Return the number of files awaiting acknowledgement."""
+        with self._cond:
+            return len(self._pending)
+
+    def _connect(self):
+        """Connect and handshake, retrying until connected or timed out."""
+        deadline = None if self.timeout is None else time.time() + self.timeout
+        while True:
+            if self._closed:
+                raise IOError("Push client is closed.")
+            try:
+                sock = socket.create_connection((self.host, self.port))
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.sendall(_GREETING)
+                rfile = sock.makefile("rb")
+                if rfile.readline() != _GREETING_REPLY:
+                    rfile.close()
+                    sock.close()
+                    raise IOError("Unexpected reply from receiver.")
+            except (IOError, OSError, socket.error):
+                if deadline is not None and time.time() > deadline:
+                    raise
+                time.sleep(self.retry_interval)
+                continue
+            return sock, rfile
+
+    def _ensure_connected(self):
+        """Connect if needed and resend unacknowledged files after a reconnect.
+
+        Must be called with the send lock held.
+
+        """
+        while self._sock is None or self._broken:
+            self._disconnect()
+            sock, rfile = self._connect()
+            try:
+                with self._cond:
+                    entries = list(self._pending.values())
+                # ask where to resume each unacknowledged file
+                for entry in entries:
+                    _send_json(
+                        sock,
+                        dict(
+                            op="resume",
+                            id=entry.id,
+                            path=entry.relpath,
+                            size=entry.size,
+                            mtime=entry.mtime,
+                        ),
+                    )
+                offsets = {}
+                for entry in entries:
+                    reply = _read_json(rfile)
+                    offsets[reply["id"]] = reply["offset"]
+                with self._cond:
+                    self._sock = sock
+                    self._broken = False
+                for entry in entries:
+                    self._send_entry(entry, offsets.get(entry.id, 0))
+            except (IOError, OSError, EOFError, ValueError, socket.error):
+                with self._cond:
+                    self._sock = sock
+                    self._broken = True
+                rfile.close()
+                continue
+            self._reader = threading.Thread(
+                target=self._read_acks, args=(sock, rfile), name="DigitalRFPushAcks"
+            )
+            self._reader.daemon = True
+            self._reader.start()
+
+    def _disconnect(self):
+        with self._cond:
+            sock = self._sock
+            self._sock = None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except (OSError, socket.error):
+                pass
+            sock.close()
+        if self._reader is not None and self._reader is not threading.current_thread():
+            self._reader.join()
+        self._reader = None
+
+    def _send_entry(self, entry, offset=0):
+        """Send a put request for `entry`, starting at byte `offset`."""
+        try:
+            f = open(entry.src_path, "rb")
+        except (IOError, OSError) as e:
+            # source is gone, send an empty aborted put to get it acknowledged
+            _send_json(
+                self._sock,
+                dict(
+                    op="put",
+                    id=entry.id,
+                    path=entry.relpath,
+                    size=0,
+                    mtime=entry.mtime,
+                    offset=0,
+                ),
+            )
+            _send_json(self._sock, dict(abort=repr(e)))
+            return
+        _send_json(
+            self._sock,
+            dict(
+                op="put",
+                id=entry.id,
+                path=entry.relpath,
+                size=entry.size,
+                mtime=entry.mtime,
+                offset=offset,
+            ),
+        )
+        with f:
+            crc = _file_crc32(f, offset)
+            remaining = entry.size - offset
+            abort = None
+            while remaining > 0:
+                data = f.read(min(_BUFSIZE, remaining))
+                if not data:
+                    # file shrank after it was queued, pad and abort
+                    abort = "Source file shrank while being sent."
+                    data = b"\0" * min(_BUFSIZE, remaining)
+                crc = zlib.crc32(data, crc)
+                self._sock.sendall(data)
+                remaining -= len(data)
+        if abort is not None:
+            _send_json(self._sock, dict(abort=abort))
+        else:
+            _send_json(self._sock, dict(crc32=crc & 0xFFFFFFFF))
+        self.bytes_sent += entry.size - offset
+
+    def _read_acks(self, sock, rfile):
+        """Read acknowledgements and call the callbacks of pending files."""
+        try:
+            while True:
+                reply = _read_json(rfile)
+                with self._cond:
+                    entry = self._pending.pop(reply["id"], None)
+                    self._cond.notify_all()
+                if entry is None:
+                    continue
+                self.n_sent += 1
+                if entry.callback is not None:
+                    try:
+                        entry.callback(reply.get("ok", False), reply.get("error", None))
+                    except Exception:
+                        traceback.print_exc()
+        except (IOError, OSError, EOFError, ValueError, socket.error):
+            with self._cond:
+                if self._sock is sock:
+                    self._broken = True
+                self._cond.notify_all()
+        finally:
+            rfile.close()
+
+    def send(self, src_path, relpath, callback=None):
+        """Send a file to be stored at `relpath` below the receiver's directory.
+
+        Blocks while the window of unacknowledged files is full.
+
+        Parameters
+        ----------
+        src_path : string
+            Path of the local file to send.
+
+        relpath : string
+            Destination path relative to the receiver's directory.
+
+        callback : callable | None
+            Function called as ``callback(ok, error)`` from another thread
+            when the receiver acknowledges the file, where `ok` is True if the
+            file was stored and `error` is an error message if not.
+
+        """
+        st = os.stat(src_path)
+        with self._send_lock:
+            while True:
+                self._ensure_connected()
+                with self._cond:
+                    if len(self._pending) < self.window:
+                        break
+                    if not self._broken:
+                        self._cond.wait(1)
+            with self._cond:
+                self._next_id += 1
+                entry = _PendingFile(
+                    self._next_id,
+                    src_path,
+                    relpath.replace(os.sep, "/"),
+                    st.st_size,
+                    st.st_mtime,
+                    callback,
+                )
+                self._pending[entry.id] = entry
+            try:
+                self._send_entry(entry)
+            except (IOError, OSError, socket.error):
+                # resent with the other pending files when reconnected
+                with self._cond:
+                    self._broken = True
+
+    def flush(self, timeout=None):
+        """Wait until all sent files are acknowledged, reconnecting if needed.
+
+        Returns True if all files were acknowledged before the timeout.
+
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._cond:
+                if not self._pending:
+                    return True
+                if self._closed:
+                    return False
+                broken = self._broken
+                if not broken:
+                    self._cond.wait(0.1)
+            if broken:
+                with self._send_lock:
+                    self._ensure_connected()
+            if deadline is not None and time.time() > deadline:
+                return False
+
+    def close(self):
+        """Close the connection. Unacknowledged files are not resent."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        with self._send_lock:
+            self._disconnect()
+
+
+class _ReceiverHandler(socketserver.StreamRequestHandler):
+    """Handle one push connection, receiving files in order."""
+
+    def handle(self):
+        if self.rfile.readline() != _GREETING:
+            return
+        self.wfile.write(_GREETING_REPLY)
+        self.wfile.flush()
+        while True:
+            try:
+                request = _read_json(self.rfile)
+            except (EOFError, ValueError, socket.error):
+                return
+            if request.get("op") == "resume":
+                offset = self.server.resume_offset(request)
+                reply = dict(id=request["id"], offset=offset)
+            elif request.get("op") == "put":
+                reply = self.server.receive(request, self.rfile)
+                if reply is None:
+                    # disconnected in the middle of the file
+                    return
+            else:
+                return
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class DigitalRFReceiver(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Server that receives files from `DigitalRFPushClient` connections.
+
+    Files are written to a temporary ``tmp.`` name below the destination
+    directory, checked against the client's CRC-32, and renamed into place,
+    so complete files appear atomically. Only Digital RF and Digital Metadata
+    file paths are accepted. Partial files from an interrupted connection are
+    kept so that the client can resume them.
+
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, dest, host="127.0.0.1", port=DEFAULT_PORT, verbose=False):
+        """Create receiver writing to `dest`, listening on `host` and `port`.
+
+        Use port 0 to choose a free port, and `server_address` to get it.
+        Call `serve_forever` to start receiving and `shutdown` to stop.
+
+        """
+        self.dest = os.path.abspath(dest)
+        self.verbose = verbose
+        self.n_received = 0
+        self.bytes_received = 0
+        # relpath -> (size, mtime) of the version of its partial tmp file
+        self._partials = {}
+        self._lock = threading.Lock()
+        socketserver.TCPServer.__init__(self, (host, port), _ReceiverHandler)
+
+    def _get_paths(self, relpath):
+        """Return destination and temporary paths, or raise ValueError."""
+        relpath = os.path.normpath(relpath.replace("/", os.sep))
+        if (
+            os.path.isabs(relpath)
+            or relpath.split(os.sep)[0] == os.pardir
+            or not any(r.match(os.sep + relpath) for r in _RE_RELPATHS)
+        ):
+            raise ValueError("Path not allowed: {0}".format(relpath))
+        dest_path = os.path.join(self.dest, relpath)
+        dest_dir, dest_name = os.path.split(dest_path)
+        return relpath, dest_path, os.path.join(dest_dir, "tmp." + dest_name)
+
+    def resume_offset(self, request):
+        """Return the number of bytes already received of a requested file."""
+        try:
+            relpath, dest_path, tmp_path = self._get_paths(request["path"])
+        except ValueError:
+            return 0
+        with self._lock:
+            version = self._partials.get(relpath, None)
+        if version != (request["size"], request["mtime"]):
+            return 0
+        try:
+            return min(os.path.getsize(tmp_path), request["size"])
+        except OSError:
+            return 0
+
+    def receive(self, request, rfile):
+        """Receive the data of a put request, returning the reply.
+
+        Returns None if the connection ended before all data was received.
+
+        """
+        size = request["size"]
+        offset = request["offset"]
+        mtime = request["mtime"]
+        error = None
+        f = None
+        try:
+            relpath, dest_path, tmp_path = self._get_paths(request["path"])
+            dest_dir = os.path.dirname(dest_path)
+            try:
+                os.makedirs(dest_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            if offset > 0:
+                f = open(tmp_path, "r+b")
+                f.truncate(offset)
+                crc = _file_crc32(f, offset)
+                f.seek(offset)
+            else:
+                f = open(tmp_path, "wb")
+                crc = 0
+            with self._lock:
+                self._partials[relpath] = (size, mtime)
+        except (IOError, OSError, ValueError) as e:
+            error = repr(e)
+            if f is not None:
+                f.close()
+            f = None
+
+        # read the data even after an error to stay in sync with the client
+        remaining = size - offset
+        while remaining > 0:
+            data = rfile.read(min(_BUFSIZE, remaining))
+            if not data:
+                if f is not None:
+                    f.close()
+                return None
+            if f is not None:
+                f.write(data)
+                crc = zlib.crc32(data, crc)
+            remaining -= len(data)
+        if f is not None:
+            f.close()
+        try:
+            trailer = _read_json(rfile)
+        except (EOFError, ValueError, socket.error):
+            return None
+
+        if error is None:
+            with self._lock:
+                self._partials.pop(relpath, None)
+            if "abort" in trailer:
+                error = trailer["abort"]
+            elif trailer.get("crc32") != crc & 0xFFFFFFFF:
+                error = "Checksum mismatch for {0}".format(relpath)
+            if error is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        if error is None:
+            try:
+                os.utime(tmp_path, (mtime, mtime))
+                os.rename(tmp_path, dest_path)
+            except OSError as e:
+                error = repr(e)
+        if error is not None:
+            return dict(id=request["id"], ok=False, error=error)
+
+        with self._lock:
+            self.n_received += 1
+            self.bytes_received += size - offset
+        if self.verbose:
+            now = datetime.datetime.utcnow().replace(microsecond=0)
+            print("{0} | Received {1}".format(now, relpath))
+            sys.stdout.flush()
+        return dict(id=request["id"], ok=True)
+
+
+def _build_receive_parser(Parser, *args):
+    desc = (
+        "Receive Digital RF files pushed by drf mirror --push, writing them"
+        " below a destination directory."
+    )
+    parser = Parser(*args, description=desc)
+
+    parser.add_argument("dest", help="Destination directory.")
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="""Address on which to listen. Use 0.0.0.0 to accept connections
+                from other hosts. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "-p",
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="""Port on which to listen. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Print the name of received files."
+    )
+
+    parser.set_defaults(func=_run_receive)
+
+    return parser
+
+
+def _run_receive(args):
+    receiver = DigitalRFReceiver(
+        args.dest, host=args.host, port=args.port, verbose=args.verbose
+    )
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    print(
+        "{0} | Receiving to {1} on {2}:{3}".format(
+            now, receiver.dest, *receiver.server_address[:2]
+        )
+    )
+    print("Type Ctrl-C to quit.")
+    sys.stdout.flush()
+    try:
+        receiver.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.server_close()
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = _build_receive_parser(ArgumentParser)
+    args = parser.parse_args()
+    args.func(args)
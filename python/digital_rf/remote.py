@@ -0,0 +1,522 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Module for reading Digital RF and Digital Metadata files over HTTP.
+
+Remote files are downloaded into a bounded on-disk cache so that they can be
+opened with h5py like local files. Cached files are revalidated with the
+server using conditional requests (ETag/If-Modified-Since), so unchanged files
+are only transferred once.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import collections
+import contextlib
+import email.utils
+import errno
+import hashlib
+import json
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from six.moves import http_client, urllib
+
+__all__ = ("HTTPFileCache",)
+
+
+class HTTPFileCache(object):
+    """Local on-disk cache of files fetched over HTTP.
+
+    Files are stored in `cache_dir` under a name derived from their URL, with
+    a sidecar JSON file holding the validators (ETag and Last-Modified) from
+    the server's response. When a file is requested and its cached copy is
+    older than `max_age`, a conditional request is made so that the file is
+    only downloaded again if it has changed on the server.
+
+    The total size of the cached files is bounded by `max_size`, with the
+    least recently used files removed first. Files fetched through `pinned`
+    are never removed while they are in use, so `max_size` must be large
+    enough to hold each batch of files that is read together. Connections
+    are kept alive and reused for each server (per thread), and `fetch_many`
+    and `pinned` fetch files in parallel using a pool of worker threads.
+
+    A single cache can be shared by many readers. A cache directory can also
+    be shared by multiple processes, but files in use by one process are not
+    protected from eviction by another, so each process should have its own
+    directory unless `max_size` is comfortably larger than what they read.
+
+    """
+
+    _chunk_size = 1048576
+
+    def __init__(
+        self, cache_dir=None, max_size=2 ** 30, max_age=0, max_workers=8, timeout=60
+    ):
+        """Create cache for files fetched over HTTP.
+
+        Parameters
+        ----------
+        cache_dir : None | string, optional
+            Directory in which to store the cached files. It is created if it
+            does not exist. If None, a 'digital_rf_http_cache' directory in the
+            system's temporary directory is used.
+
+        max_size : int, optional
+            Maximum total size in bytes of the cached files. The least recently
+            used files are removed when the cache grows beyond this size.
+
+        max_age : float, optional
+            Time in seconds for which a cached file is used without checking
+            whether it has changed on the server. With the default of 0, every
+            access makes a (conditional) request.
+
+        max_workers : int, optional
+            Maximum number of parallel requests made by `fetch_many`.
+
+        timeout : float, optional
+            Timeout in seconds for connecting to and reading from the server.
+
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(tempfile.gettempdir(), "digital_rf_http_cache")
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        if not os.path.exists(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                # another process may have just created it
+                if not os.path.isdir(self.cache_dir):
+                    raise
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = None
+        # key -> number of users of a pinned file, see `pinned`
+        self._pins = collections.defaultdict(int)
+        # key -> size of cached file, in least to most recently used order
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._load_entries()
+
+    def __del__(self):
+        """Close the worker pool when the cache is deleted."""
+        pool = getattr(self, "_pool", None)
+        if pool is not None:
+            pool.terminate()
+
+    def get(self, url):
+        """Return the path to a local copy of the file at `url`.
+
+        The file is downloaded if it is not in the cache or if it has changed
+        on the server.
+
+
+        Parameters
+        ----------
+        url : string
+            URL of the file.
+
+
+        Returns
+        -------
+        string
+            Path to the cached copy of the file. Unless the file is pinned
+            (see `pinned`), it may be removed from the cache when other files
+            are fetched.
+
+
+        Raises
+        ------
+        IOError
+            If the file does not exist on the server or could not be fetched.
+
+        """
+        key = self._key(url)
+        path = os.path.join(self.cache_dir, key)
+        meta = self._read_meta(key)
+        if meta is not None and not os.path.exists(path):
+            meta = None
+
+        if meta is not None and time.time() - meta["checked"] < self.max_age:
+            self._touch(key, path)
+            return path
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        checked = time.time()
+        response = self._request(url, headers)
+        try:
+            if response.status == 304 and meta is not None:
+                # not modified, cached copy is still good
+                response.read()
+                meta["checked"] = checked
+                self._write_meta(key, meta)
+                self._touch(key, path)
+                return path
+            elif response.status == 200:
+                self._store(key, url, response, checked)
+                return path
+            response.read()
+            if response.status in (404, 410):
+                self._remove(key)
+                raise IOError(errno.ENOENT, "File not found on server", url)
+            errstr = "Request for {0} failed with HTTP status {1} {2}"
+            raise IOError(errstr.format(url, response.status, response.reason))
+        finally:
+            response.close()
+
+    def fetch_many(self, urls):
+        """Fetch files in parallel and return their local paths.
+
+        Parameters
+        ----------
+        urls : iterable of strings
+            URLs of the files.
+
+
+        Returns
+        -------
+        list
+            Path to the cached copy of each file, or None if the file does not
+            exist on the server, in the same order as `urls`.
+
+
+        Raises
+        ------
+        IOError
+            If a file could not be fetched for a reason other than it not
+            existing on the server.
+
+        """
+        urls = list(urls)
+        if len(urls) <= 1 or self.max_workers <= 1:
+            return [self.get_if_exists(url) for url in urls]
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPool(self.max_workers)
+        return self._pool.map(self.get_if_exists, urls, chunksize=1)
+
+    @contextlib.contextmanager
+    def pinned(self, urls):
+        """Fetch files and keep them in the cache until the context exits.
+
+        Use this when the cached copies will be read after fetching, so that
+        fetching other files in the meantime (in this or another thread)
+        can't remove them from the cache.
+
+
+        Parameters
+        ----------
+        urls : iterable of strings
+            URLs of the files.
+
+
+        Yields
+        ------
+        list
+            Path to the cached copy of each file, or None if the file does not
+            exist on the server, in the same order as `urls`.
+
+
+        Raises
+        ------
+        IOError
+            If a file could not be fetched for a reason other than it not
+            existing on the server, or if the pinned files don't fit in the
+            cache's `max_size`.
+
+        """
+        urls = list(urls)
+        keys = [self._key(url) for url in urls]
+        # pin before fetching so eviction by earlier fetches skips them
+        with self._lock:
+            for key in keys:
+                self._pins[key] += 1
+        try:
+            yield self.fetch_many(urls)
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._pins[key] -= 1
+                    if self._pins[key] <= 0:
+                        del self._pins[key]
+            # files that were kept beyond max_size can be removed now
+            self._evict(strict=False)
+
+    def listdir(self, url):
+        """Return the names of the entries in a directory served over HTTP.
+
+        The names are parsed from the links of the server's directory listing
+        page (e.g. as produced by Apache, nginx, or Python's http.server), so
+        the server must have directory listings enabled.
+
+
+        Parameters
+        ----------
+        url : string
+            URL of the directory.
+
+
+        Returns
+        -------
+        list
+            Names of the entries in the directory, without trailing slashes.
+
+
+        Raises
+        ------
+        IOError
+            If the directory does not exist or could not be listed.
+
+        """
+        if not url.endswith("/"):
+            url = url + "/"
+        response = self._request(url, {})
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        if response.status != 200:
+            errstr = "Listing of {0} failed with HTTP status {1} {2}"
+            raise IOError(errstr.format(url, response.status, response.reason))
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", "replace")
+
+        names = []
+        seen = set()
+        for href in re.findall(r"""href\s*=\s*["']([^"'?#]+)["']""", body, re.I):
+            name = urllib.parse.unquote(href)
+            if name.startswith(url):
+                name = name[len(url) :]
+            name = name.rstrip("/")
+            # skip links that aren't entries of this directory
+            if not name or "/" in name or name in (".", "..") or ":" in name:
+                continue
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+        return names
+
+    def clear(self):
+        """Remove all files from the cache."""
+        with self._lock:
+            keys = list(self._entries.keys())
+        for key in keys:
+            self._remove(key)
+
+    def get_if_exists(self, url):
+        """Return the path to a local copy of the file at `url`, or None.
+
+        This is the same as `get`, except that None is returned instead of
+        raising an IOError if the file does not exist on the server.
+
+        """
+        try:
+            return self.get(url)
+        except (IOError, OSError) as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+    def _key(self, url):
+        """Return the cache file name for `url`."""
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        ext = os.path.splitext(urllib.parse.urlsplit(url).path)[1]
+        return digest + ext
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _read_meta(self, key):
+        try:
+            with open(self._meta_path(key), "r") as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        fd, tmp_path = tempfile.mkstemp(prefix="tmp.", dir=self.cache_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.rename(tmp_path, self._meta_path(key))
+
+    def _store(self, key, url, response, checked):
+        """Write the body of `response` to the cache under `key`."""
+        fd, tmp_path = tempfile.mkstemp(prefix="tmp.", dir=self.cache_dir)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = response.read(self._chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    size += len(chunk)
+            os.rename(tmp_path, os.path.join(self.cache_dir, key))
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        last_modified = response.getheader("Last-Modified")
+        date = response.getheader("Date")
+        if last_modified and date:
+            # Last-Modified has a resolution of one second, so it can't be
+            # used to detect later changes to a file modified in the same
+            # second as it was served
+            try:
+                lm_ts = email.utils.mktime_tz(email.utils.parsedate_tz(last_modified))
+                date_ts = email.utils.mktime_tz(email.utils.parsedate_tz(date))
+            except TypeError:
+                # unparseable dates
+                last_modified = None
+            else:
+                if date_ts - lm_ts < 2:
+                    last_modified = None
+        meta = dict(
+            url=url,
+            etag=response.getheader("ETag"),
+            last_modified=last_modified,
+            checked=checked,
+        )
+        self._write_meta(key, meta)
+
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._size += size
+        self._evict(keep=key)
+
+    def _touch(self, key, path):
+        """Mark the cached file as most recently used."""
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            try:
+                size = self._entries.pop(key)
+            except KeyError:
+                # file was added to the cache directory by another process
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    return
+                self._size += size
+            self._entries[key] = size
+
+    def _remove(self, key):
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+        for path in (os.path.join(self.cache_dir, key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self, keep=None, strict=True):
+        """Remove least recently used files until within `max_size`.
+
+        Pinned files and the `keep` file are not removed. If that isn't
+        enough to get within `max_size`, an IOError is raised when `strict`
+        is True.
+
+        """
+        while True:
+            with self._lock:
+                if self._size <= self.max_size:
+                    return
+                key = next(
+                    (
+                        k
+                        for k in self._entries.keys()
+                        if k != keep and k not in self._pins
+                    ),
+                    None,
+                )
+                size = self._size
+                any_pinned = bool(self._pins)
+            if key is None:
+                if strict and any_pinned:
+                    errstr = (
+                        "Files in use need {0} bytes, which is more than the"
+                        " cache's max_size of {1} bytes"
+                    )
+                    raise IOError(errstr.format(size, self.max_size))
+                return
+            self._remove(key)
+
+    def _load_entries(self):
+        """Populate the LRU order from the files in the cache directory."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json") or name.startswith("tmp."):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+        entries.sort()
+        for _mtime, name, size in entries:
+            self._entries[name] = size
+            self._size += size
+
+    def _get_connection(self, scheme, netloc):
+        """Return this thread's persistent connection to a server."""
+        try:
+            conns = self._local.conns
+        except AttributeError:
+            conns = self._local.conns = {}
+        conn = conns.get((scheme, netloc), None)
+        if conn is None:
+            if scheme == "https":
+                conn = http_client.HTTPSConnection(netloc, timeout=self.timeout)
+            elif scheme == "http":
+                conn = http_client.HTTPConnection(netloc, timeout=self.timeout)
+            else:
+                raise ValueError("Unsupported URL scheme: {0}".format(scheme))
+            conns[(scheme, netloc)] = conn
+        return conn
+
+    def _request(self, url, headers):
+        """Make a GET request and return the response.
+
+        The request is retried once on a new connection if the persistent
+        connection turns out to have been closed by the server.
+
+        """
+        parts = urllib.parse.urlsplit(url)
+        target = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        for attempt in range(2):
+            conn = self._get_connection(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", target, headers=headers)
+                return conn.getresponse()
+            except (http_client.HTTPException, socket.error):
+                conn.close()
+                if attempt:
+                    raise IOError("Request for {0} failed".format(url))
@@ -0,0 +1,494 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Module for retiring expired ringbuffer files to slower storage tiers.
+
+Instead of deleting the files that a ringbuffer expires, an expire policy can
+move them to a tier directory, recompress them there, or replace them with a
+decimated copy at a lower sample rate. The tier directory mirrors the layout
+of the ringbuffer directory, and the properties files of each channel are
+copied there so that it can be read like any other Digital RF data.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import errno
+import fnmatch
+import fractions
+import os
+import shutil
+import threading
+import traceback
+
+import h5py
+import numpy as np
+
+from . import list_drf
+from .mirror import _OrderedWorkerPool, _parse_transcode, transcode_drf_file
+from .summary import _channel_kind
+
+__all__ = (
+    "ExpirePolicy",
+    "MovePolicy",
+    "RecompressPolicy",
+    "DecimatePolicy",
+    "TieredRetention",
+    "make_expire_policy",
+)
+
+
+def _makedirs(path):
+    """Create a directory and its parents if it doesn't exist."""
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        # another worker may have created it in the meantime
+        if e.errno != errno.EEXIST:
+            raise
+
+
+class ExpirePolicy(object):
+    """Base policy for retiring expired files to a tier directory.
+
+    Subclasses implement `_retire` to write the retired version of a file.
+
+    """
+
+    def __init__(self, root, dest, channels="*"):
+        """Create an expire policy.
+
+        Parameters
+        ----------
+        root : string
+            Ringbuffer directory containing the files that are expired.
+
+        dest : string
+            Tier directory to which retired files are written, at the same
+            path relative to `dest` as the expired file is relative to `root`.
+
+        channels : string
+            Glob pattern matching the channel paths (relative to `root`) that
+            this policy applies to.
+
+        """
+        self.root = os.path.abspath(root)
+        self.dest = os.path.abspath(dest)
+        self.channels = channels
+        # channel directories whose properties files have been written
+        self._prepared = set()
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        """Return string describing the policy."""
+        return "{0} {1} to {2}".format(type(self).__name__, self.channels, self.dest)
+
+    def matches(self, chpath):
+        """Return True if the policy applies to the channel at `chpath`."""
+        relpath = os.path.relpath(chpath, self.root)
+        return fnmatch.fnmatch(relpath, self.channels)
+
+    def dest_path(self, path):
+        """Return the tier path for a path in the ringbuffer directory."""
+        return os.path.join(self.dest, os.path.relpath(path, self.root))
+
+    def _write_properties(self, src, dest):
+        """Write the tier version of a channel properties file."""
+        shutil.copy2(src, dest)
+
+    def _prepare_channel(self, chpath):
+        """Write the properties files of a channel to the tier once."""
+        with self._lock:
+            if chpath in self._prepared:
+                return
+            dest_chpath = self.dest_path(chpath)
+            _makedirs(dest_chpath)
+            for name in list_drf._listdir(chpath):
+                if list_drf._RE_PROPFILE.match(name):
+                    dest = os.path.join(dest_chpath, name)
+                    if not os.path.exists(dest):
+                        self._write_properties(os.path.join(chpath, name), dest)
+            self._prepared.add(chpath)
+
+    def _retire(self, src, dest):
+        """Write the retired version of the file at `src` to `dest`."""
+        raise NotImplementedError
+
+    def expire(self, path, chpath):
+        """Retire an expired file of the channel at `chpath` to the tier.
+
+        The retired file is written with a temporary name and renamed into
+        place, and then the expired file is removed.
+
+
+        Returns
+        -------
+        string | None
+            Path of the retired file, or None if nothing was retired (e.g. a
+            file with too little data to decimate).
+
+        """
+        self._prepare_channel(chpath)
+        dest = self.dest_path(path)
+        dest_dir, dest_name = os.path.split(dest)
+        _makedirs(dest_dir)
+        tmp_dest = os.path.join(dest_dir, "tmp." + dest_name)
+        self._retire(path, tmp_dest)
+        if os.path.exists(tmp_dest):
+            os.rename(tmp_dest, dest)
+        else:
+            dest = None
+        if os.path.exists(path):
+            os.remove(path)
+        return dest
+
+
+class MovePolicy(ExpirePolicy):
+    """Policy that moves expired files to a tier directory unchanged."""
+
+    def _retire(self, src, dest):
+        """Move the file at `src` to `dest`."""
+        shutil.move(src, dest)
+
+
+class RecompressPolicy(ExpirePolicy):
+    """Policy that recompresses expired files into a tier directory.
+
+    The data of Digital RF files is rewritten with the given HDF5 filters
+    (see `digital_rf.mirror.transcode_drf_file`), and Digital Metadata files
+    are copied with their datasets recompressed in the same way.
+
+    """
+
+    def __init__(self, root, dest, channels="*", transcode="gzip:9+shuffle"):
+        """Create a recompressing expire policy.
+
+        Parameters
+        ----------
+        root : string
+            Ringbuffer directory containing the files that are expired.
+
+        dest : string
+            Tier directory to which retired files are written.
+
+        channels : string
+            Glob pattern matching the channel paths (relative to `root`) that
+            this policy applies to.
+
+        transcode : string
+            Compression as 'filter[:level][+shuffle]', where the filter is one
+            of 'gzip', 'lzf', 'szip', or 'none'.
+
+        """
+        super(RecompressPolicy, self).__init__(root, dest, channels=channels)
+        self.transcode = transcode
+        self._filter_opts = _parse_transcode(transcode)
+
+    def _retire(self, src, dest):
+        """Recompress the file at `src` into `dest`."""
+        transcode_drf_file(src, dest, **self._filter_opts)
+
+
+class DecimatePolicy(ExpirePolicy):
+    """Policy that replaces expired files with a decimated copy.
+
+    Each continuous block of Digital RF data is averaged over `factor`
+    samples, keeping only whole groups of samples aligned to multiples of
+    `factor` in the global sample index, and written to the same file name in
+    a tier channel whose sample rate is reduced by `factor`. The averaged
+    data is stored as floating point (complex integer data becomes complex
+    floating point). Digital Metadata files are moved unchanged.
+
+    """
+
+    def __init__(
+        self, root, dest, channels="*", factor=10, max_read_bytes=64 * 1024 * 1024
+    ):
+        """Create a decimating expire policy.
+
+        Parameters
+        ----------
+        root : string
+            Ringbuffer directory containing the files that are expired.
+
+        dest : string
+            Tier directory to which retired files are written.
+
+        channels : string
+            Glob pattern matching the channel paths (relative to `root`) that
+            this policy applies to.
+
+        factor : int
+            Decimation factor, the number of samples averaged together.
+
+        max_read_bytes : int
+            Approximate maximum number of bytes of data read at once.
+
+        """
+        super(DecimatePolicy, self).__init__(root, dest, channels=channels)
+        self.factor = int(factor)
+        if self.factor < 1:
+            raise ValueError("Decimation factor must be a positive integer.")
+        self.max_read_bytes = max_read_bytes
+
+    def _decimate_attrs(self, attrs, dtype=None):
+        """Update Digital RF attributes in place for the decimated data."""
+        if "sample_rate_numerator" in attrs:
+            rate = fractions.Fraction(
+                int(attrs["sample_rate_numerator"]),
+                int(attrs["sample_rate_denominator"]) * self.factor,
+            )
+            attrs["sample_rate_numerator"] = np.uint64(rate.numerator)
+            attrs["sample_rate_denominator"] = np.uint64(rate.denominator)
+        if "samples_per_second" in attrs:
+            attrs["samples_per_second"] = attrs["samples_per_second"] / self.factor
+        if dtype is not None and "H5Tget_class" in attrs:
+            # describe the floating point (component) type of the data
+            if dtype.kind == "c":
+                size = dtype.itemsize // 2
+            else:
+                size = dtype.itemsize
+            attrs["H5Tget_class"] = np.int64(1)
+            attrs["H5Tget_offset"] = np.int64(0)
+            attrs["H5Tget_order"] = np.int64(0)
+            attrs["H5Tget_precision"] = np.int64(size * 8)
+            attrs["H5Tget_size"] = np.int64(size)
+
+    @staticmethod
+    def _float_dtype(dtype):
+        """Return the floating point data type for averaged data."""
+        if dtype.names is not None:
+            # complex integer stored as a compound type with 'r' and 'i'
+            return np.dtype(np.complex64)
+        if dtype.kind in "fc":
+            return dtype
+        return np.dtype(np.float32)
+
+    def _write_properties(self, src, dest):
+        """Write properties with the decimated sample rate."""
+        shutil.copy2(src, dest)
+        if _channel_kind(src) != "drf":
+            return
+        with h5py.File(src, "r") as fsrc:
+            # the data type attributes describe the decimated float data
+            dtype = None
+            if fsrc.attrs.get("H5Tget_class", 1) != 1:
+                is_complex = bool(fsrc.attrs.get("is_complex", False))
+                dtype = np.dtype(np.complex64 if is_complex else np.float32)
+        with h5py.File(dest, "r+") as fdest:
+            self._decimate_attrs(fdest.attrs, dtype)
+
+    def _iter_decimated(self, dset, starts, locals_, stops):
+        """Yield (output start sample, averaged data) for each piece."""
+        f = self.factor
+        dtype = self._float_dtype(dset.dtype)
+        row_bytes = max(dset.dtype.itemsize * int(np.prod(dset.shape[1:])), 1)
+        step = max(self.max_read_bytes // (row_bytes * f), 1) * f
+        for start, local, stop in zip(starts, locals_, stops):
+            # output samples j cover input samples [j*f, (j+1)*f)
+            j0 = -(-start // f)
+            j1 = stop // f
+            for k in range(j0 * f, j1 * f, step):
+                n = min(step, j1 * f - k)
+                i = local + k - start
+                data = dset[i : i + n]
+                if data.dtype.names is not None:
+                    data = data["r"] + 1j * data["i"]
+                data = data.reshape((n // f, f) + data.shape[1:])
+                yield k // f, data.mean(axis=1).astype(dtype)
+
+    def _retire(self, src, dest):
+        """Write a decimated copy of the file at `src` to `dest`."""
+        if not list_drf._RE_DRFFILE.match(os.path.basename(src)):
+            # not Digital RF data, keep it as is
+            shutil.copy2(src, dest)
+            return
+        with h5py.File(src, "r") as fsrc:
+            dsrc = fsrc["rf_data"]
+            rf_index = fsrc["rf_data_index"][...].astype(np.int64)
+            n = dsrc.shape[0]
+            starts = rf_index[:, 0]
+            locals_ = rf_index[:, 1]
+            stops = starts + np.append(locals_[1:], n) - locals_
+            pieces = list(
+                self._iter_decimated(dsrc, starts.tolist(), locals_.tolist(), stops)
+            )
+            if not pieces:
+                # no whole group of samples to average
+                return
+            dtype = self._float_dtype(dsrc.dtype)
+            shape = (sum(len(d) for s, d in pieces),) + dsrc.shape[1:]
+            with h5py.File(dest, "w") as fdest:
+                for key, val in fsrc.attrs.items():
+                    fdest.attrs.create(key, val, dtype=fsrc.attrs.get_id(key).dtype)
+                ddest = fdest.create_dataset(
+                    "rf_data",
+                    shape=shape,
+                    dtype=dtype,
+                    maxshape=(None,) + shape[1:],
+                    chunks=True,
+                    compression=dsrc.compression,
+                    compression_opts=dsrc.compression_opts,
+                    shuffle=dsrc.shuffle,
+                    fletcher32=dsrc.fletcher32,
+                )
+                for key, val in dsrc.attrs.items():
+                    ddest.attrs.create(key, val, dtype=dsrc.attrs.get_id(key).dtype)
+                self._decimate_attrs(ddest.attrs, dtype)
+                # write the data and index its continuous blocks
+                index = []
+                local = 0
+                next_sample = None
+                for sample, data in pieces:
+                    if sample != next_sample:
+                        index.append((sample, local))
+                    ddest[local : local + len(data)] = data
+                    local += len(data)
+                    next_sample = sample + len(data)
+                fdest.create_dataset(
+                    "rf_data_index",
+                    data=np.array(index, dtype=np.uint64).reshape((-1, 2)),
+                )
+        shutil.copystat(src, dest)
+
+
+class TieredRetention(object):
+    """Retire expired ringbuffer files with per-channel expire policies.
+
+    The first policy that matches the channel of an expired file is used, and
+    files of channels without a matching policy are deleted as usual. The
+    policies run in a pool of worker threads, with the files of each channel
+    retired in the order they expired.
+
+    """
+
+    def __init__(self, policies, workers=2, max_queue=1000, verbose=False):
+        """Create a tiered retention for a ringbuffer handler.
+
+        Parameters
+        ----------
+        policies : iterable of ExpirePolicy
+            Expire policies, in order of precedence.
+
+        workers : int
+            Number of worker threads retiring files.
+
+        max_queue : int
+            Maximum number of files waiting to be retired before expiring
+            another file blocks.
+
+        verbose : bool
+            If True, print the files that are retired.
+
+        """
+        self.policies = list(policies)
+        self.verbose = verbose
+        self.pool = _OrderedWorkerPool(workers, max_queue)
+        # number of files that failed to retire
+        self.n_errors = 0
+        # channel path -> matching policy or None
+        self._channel_policies = {}
+
+    def policy(self, chpath):
+        """Return the policy for the channel at `chpath`, or None."""
+        try:
+            return self._channel_policies[chpath]
+        except KeyError:
+            policy = None
+            for p in self.policies:
+                if p.matches(chpath):
+                    policy = p
+                    break
+            self._channel_policies[chpath] = policy
+            return policy
+
+    def submit(self, path, chpath):
+        """Queue an expired file for retirement, returning False if no policy."""
+        policy = self.policy(chpath)
+        if policy is None:
+            return False
+        self.pool.submit(chpath, self._retire, policy, path, chpath)
+        return True
+
+    def _retire(self, policy, path, chpath):
+        """Retire a file, deleting it if that fails. Returns its size."""
+        try:
+            nbytes = os.path.getsize(path)
+            dest = policy.expire(path, chpath)
+        except Exception:
+            traceback.print_exc()
+            print("Failed to retire {0}, deleting it.".format(path))
+            self.n_errors += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        if self.verbose:
+            now = datetime.datetime.utcnow().replace(microsecond=0)
+            print("{0} | Retired {1} to {2}".format(now, path, dest))
+        # try to clean up directory in case it is empty
+        try:
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            # directory not empty, just move on
+            pass
+        return nbytes
+
+    def wait(self, timeout=None):
+        """Wait until the queued files are retired, returning True if so."""
+        return self.pool.wait(timeout)
+
+    def shutdown(self, wait=True):
+        """Stop the workers, returning the number of files left unretired."""
+        return self.pool.shutdown(wait)
+
+    def status(self):
+        """Return status string of the retirement queue."""
+        return self.pool.status()
+
+
+def make_expire_policy(spec, root, dest, channels="*"):
+    """Create an expire policy from a string.
+
+    Parameters
+    ----------
+    spec : string
+        One of 'move', 'recompress[:FILTER[:LEVEL]][+shuffle]' (default
+        'gzip:9+shuffle'), or 'decimate[:FACTOR]' (default 10).
+
+    root : string
+        Ringbuffer directory containing the files that are expired.
+
+    dest : string
+        Tier directory to which retired files are written.
+
+    channels : string
+        Glob pattern matching the channel paths (relative to `root`) that the
+        policy applies to.
+
+
+    Returns
+    -------
+    ExpirePolicy
+
+    """
+    name, _, arg = spec.strip().partition(":")
+    name = name.lower()
+    if name == "move" and not arg:
+        return MovePolicy(root, dest, channels=channels)
+    elif name == "recompress":
+        return RecompressPolicy(
+            root, dest, channels=channels, transcode=arg or "gzip:9+shuffle"
+        )
+    elif name == "decimate":
+        return DecimatePolicy(root, dest, channels=channels, factor=int(arg or 10))
+    raise ValueError(
+        "Expire policy must be move, recompress[:filter], or decimate[:factor],"
+        " not {0!r}".format(spec)
+    )
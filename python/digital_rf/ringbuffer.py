@@ -11,18 +11,118 @@ from __future__ import absolute_import, division, print_function
 
 import datetime
 import errno
+import gzip
+import heapq
+import itertools
+import json
 import os
 import re
 import sys
 import threading
 import time
 import traceback
-from collections import OrderedDict, defaultdict, deque, namedtuple
+import zlib
+from collections import OrderedDict, defaultdict, namedtuple
+
+from six.moves import zip
 
 from . import list_drf, util, watchdog_drf
+from .catalog import DigitalRFCatalog
+from .metrics import Metrics, MetricsServer, _add_metrics_group
 
 __all__ = ("DigitalRFRingbufferHandler", "DigitalRFRingbuffer")
 
+# version of the ringbuffer snapshot file format
+_SNAPSHOT_VERSION = 1
+# directories modified this recently (in seconds) when a snapshot is taken
+# are always relisted, since events for their latest changes may be pending
+_SNAPSHOT_SETTLE_SECS = 10
+
+
+def _dir_signature(path):
+    """Return (exact mtime, mtime in seconds) of a directory."""
+    st = os.stat(path)
+    mtime = getattr(st, "st_mtime_ns", None)
+    if mtime is None:
+        mtime = st.st_mtime
+    return mtime, st.st_mtime
+
+
+class _RecordQueue(object):
+    """Queue of (key, path) file records ordered by key.
+
+    Adding and removing records and getting the oldest or newest record are
+    O(log n) (amortized), using a min-heap and a max-heap whose removed
+    entries are left as tombstones until they reach the top of the heap or
+    the heaps are compacted.
+
+    """
+
+    __slots__ = ("_keys", "_minheap", "_maxheap")
+
+    def __init__(self):
+        # path -> key of records in the queue
+        self._keys = {}
+        # heaps of (key, path) and (-key, path), possibly with stale entries
+        self._minheap = []
+        self._maxheap = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, path):
+        return path in self._keys
+
+    def __iter__(self):
+        """Iterate over (key, path) records from oldest to newest."""
+        return iter(sorted((key, path) for path, key in self._keys.items()))
+
+    def add(self, key, path):
+        """Add a record, returning False if its path is already queued."""
+        if path in self._keys:
+            return False
+        self._keys[path] = key
+        heapq.heappush(self._minheap, (key, path))
+        heapq.heappush(self._maxheap, (-key, path))
+        return True
+
+    def remove(self, key, path):
+        """Remove a record, raising ValueError if it is not queued."""
+        if self._keys.get(path, None) != key:
+            raise ValueError("Record ({0}, {1}) not in queue.".format(key, path))
+        del self._keys[path]
+        if len(self._minheap) > 2 * len(self._keys) + 64:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the heaps without tombstones."""
+        self._minheap = [(key, path) for path, key in self._keys.items()]
+        heapq.heapify(self._minheap)
+        self._maxheap = [(-key, path) for key, path in self._minheap]
+        heapq.heapify(self._maxheap)
+
+    def _is_stale(self, key, path):
+        return self._keys.get(path, None) != key
+
+    def oldest(self):
+        """Return the (key, path) record with the smallest key."""
+        heap = self._minheap
+        while heap and self._is_stale(*heap[0]):
+            heapq.heappop(heap)
+        if not heap:
+            raise IndexError("Queue is empty.")
+        return heap[0]
+
+    def newest(self):
+        """Return the (key, path) record with the largest key."""
+        heap = self._maxheap
+        while heap and self._is_stale(-heap[0][0], heap[0][1]):
+            heapq.heappop(heap)
+        if not heap:
+            raise IndexError("Queue is empty.")
+        negkey, path = heap[0]
+        return -negkey, path
+
 
 class DigitalRFRingbufferHandlerBase(watchdog_drf.DigitalRFEventHandler):
     """Base event handler for implementing a ringbuffer of Digital RF files.
@@ -43,6 +143,8 @@ class DigitalRFRingbufferHandlerBase(watchdog_drf.DigitalRFEventHandler):
         endtime=None,
         include_drf=True,
         include_dmd=True,
+        debounce=None,
+        retention=None,
     ):
         """Create a ringbuffer handler.
 
@@ -62,11 +164,20 @@ class DigitalRFRingbufferHandlerBase(watchdog_drf.DigitalRFEventHandler):
         include_dmd : bool
             If True, include Digital Metadata files.
 
+        debounce : float | None
+            Quiet period in seconds for coalescing the modified events of a
+            file before its record is updated (see `DigitalRFEventHandler`).
+
+        retention : digital_rf.retention.TieredRetention | None
+            If not None, expired files of the channels that it has a policy
+            for are retired to a tier by its worker pool instead of deleted.
+
         """
         self.verbose = verbose
         self.dryrun = dryrun
+        self.retention = retention
         # separately track file groups (ch path, name) with different queues
-        self.queues = defaultdict(deque)
+        self.queues = defaultdict(_RecordQueue)
         self.records = {}
         # acquire the record lock to modify the queue or record dicts
         self._record_lock = threading.RLock()
@@ -77,93 +188,105 @@ class DigitalRFRingbufferHandlerBase(watchdog_drf.DigitalRFEventHandler):
             include_dmd=include_dmd,
             include_drf_properties=False,
             include_dmd_properties=False,
+            debounce=debounce,
         )
 
     def status(self):
         """Return status string about state of the ringbuffer."""
         nfiles = sum(len(q) for q in self.queues.values())
-        return "{0} files".format(nfiles)
-
-    def _get_file_record(self, path):
-        """Return self.FileRecord tuple for file at path."""
-        # get time key (seconds) from file path
-        key = None
-        for r in self.regexes:
-            m = r.match(path)
-            try:
-                secs = int(m.group("secs"))
-            except (AttributeError, IndexError, TypeError):
-                # no match, or regex matched but there is no 'secs' in regex
-                continue
-            else:
-                try:
-                    frac = int(m.group("frac"))
-                except (IndexError, TypeError):
-                    frac = 0
-                # key is time in milliseconds
-                key = secs * 1000 + frac
-                break
-        if key is None:
+        status = "{0} files".format(nfiles)
+        if self.retention is not None:
+            status = "{0}, retiring {1}".format(status, self.retention.status())
+        return status
+
+    def register_metrics(self, metrics):
+        """Record ringbuffer metrics in addition to the event metrics."""
+        super(DigitalRFRingbufferHandlerBase, self).register_metrics(metrics)
+        metrics.gauge(
+            "ringbuffer_files", "Files in the ringbuffer.", lambda: len(self.records)
+        )
+        metrics.counter("expired_files_total", "Files expired from the ringbuffer.")
+        metrics.counter(
+            "expired_bytes_total", "Bytes of files expired from the ringbuffer."
+        )
+
+    def _get_file_record(self, path, size=None):
+        """Return self.FileRecord tuple for file at path.
+
+        If `size` is None, it is determined by calling stat on the file.
+
+        """
+        # get time key (milliseconds) and file group from file path
+        info = self._classify_path(path)
+        if info is None or info.time is None:
             return
 
         # ringbuffer by file groups, which are a channel path and name
-        group = (m.group("chpath"), m.group("name"))
+        group = (info.chpath, info.name)
 
-        try:
-            stat = os.stat(path)
-        except OSError:
-            if self.verbose:
-                traceback.print_exc()
-            return
-        else:
-            size = stat.st_size
+        if size is None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if self.verbose:
+                    traceback.print_exc()
+                return
+            else:
+                size = stat.st_size
+
+        return self.FileRecord(key=info.time, size=size, path=path, group=group)
 
-        return self.FileRecord(key=key, size=size, path=path, group=group)
+    def _in_time_bounds(self, rec):
+        """Return True if the record's time is within starttime and endtime."""
+        time = datetime.timedelta(milliseconds=rec.key)
+        if self.starttime is not None and time < self.starttime:
+            return False
+        if self.endtime is not None and time > self.endtime:
+            return False
+        return True
 
     def _add_to_queue(self, rec):
-        """Add record to queue."""
-        # find insertion index for record (queue sorted in ascending order)
-        # we expect new records to go near the end (most recent)
-        queue = self.queues[rec.group]
+        """Add record to queue, returning False if it was already there."""
         with self._record_lock:
-            for k, (kkey, kpath) in enumerate(reversed(queue)):
-                if rec.key > kkey:
-                    # we've found the insertion point at index k from end
-                    break
-                elif rec.path == kpath:
-                    # already in ringbuffer, so simply return
-                    return
-            else:
-                # new key is oldest (or queue is empty),
-                # needs to be put at beginning
-                queue.appendleft((rec.key, rec.path))
-                k = None
-            if k is not None:
-                # insert record at index k
-                queue.rotate(k)
-                queue.append((rec.key, rec.path))
-                queue.rotate(-k)
+            return self.queues[rec.group].add(rec.key, rec.path)
 
     def _remove_from_queue(self, rec):
         """Remove record from queue."""
-        queue = self.queues[rec.group]
         with self._record_lock:
-            queue.remove((rec.key, rec.path))
+            self.queues[rec.group].remove(rec.key, rec.path)
 
-    def _expire_oldest_from_group(self, group):
-        """Expire oldest record from group and delete corresponding file."""
-        # oldest file is at start of sorted records deque
-        # (don't just popleft on the queue because we want to call
+    def _pop_oldest_from_group(self, group):
+        """Remove oldest record from group and return it."""
+        # (don't just pop from the queue because we want to call
         #  _remove_from_queue, which is overridden by subclasses)
         with self._record_lock:
-            key, path = self.queues[group][0]
+            key, path = self.queues[group].oldest()
             rec = self.records.pop(path)
             self._remove_from_queue(rec)
+        return rec
 
+    def _delete_expired(self, rec):
+        """Delete the file of an expired record."""
         if self.verbose:
             now = datetime.datetime.utcnow().replace(microsecond=0)
             print("{0} | Expired {1}".format(now, rec.path))
 
+        retired = (
+            self.retention is not None
+            and not self.dryrun
+            and self.retention.submit(rec.path, rec.group[0])
+        )
+        if self.metrics is not None:
+            if self.dryrun:
+                action = "dryrun"
+            else:
+                action = "retired" if retired else "deleted"
+            self.metrics.inc("expired_files_total", action=action)
+            self.metrics.inc("expired_bytes_total", rec.size, action=action)
+        if retired:
+            # retired by a worker of the tiered retention instead
+            return
+
         # delete file
         if not self.dryrun:
             try:
@@ -186,6 +309,11 @@ class DigitalRFRingbufferHandlerBase(watchdog_drf.DigitalRFEventHandler):
             # directory not empty, just move on
             pass
 
+    def _expire_oldest_from_group(self, group):
+        """Expire oldest record from group and delete corresponding file."""
+        rec = self._pop_oldest_from_group(group)
+        self._delete_expired(rec)
+
     def _expire(self, group):
         """Expire records until ringbuffer constraint is met."""
         # must override with mixins for any expiration to occur
@@ -246,10 +374,18 @@ class DigitalRFRingbufferHandlerBase(watchdog_drf.DigitalRFEventHandler):
             now = datetime.datetime.utcnow().replace(microsecond=0)
             print("{0} | Removed {1}".format(now, rec.path))
 
-    def add_files(self, paths, sort=True):
-        """Create file records from paths and add to ringbuffer."""
+    def add_files(self, paths, sort=True, sizes=None):
+        """Create file records from paths and add to ringbuffer.
+
+        If `sizes` is given, it is an iterable of the known sizes of the
+        files in `paths` so that they don't need to be determined with stat.
+
+        """
         # get records and add from oldest to newest by key (time)
-        records = (self._get_file_record(p) for p in paths)
+        if sizes is None:
+            records = (self._get_file_record(p) for p in paths)
+        else:
+            records = (self._get_file_record(p, s) for p, s in zip(paths, sizes))
         # filter out invalid paths (can't extract a time, doesn't exist)
         records = (r for r in records if r is not None)
         if sort:
@@ -290,6 +426,28 @@ class DigitalRFRingbufferHandlerBase(watchdog_drf.DigitalRFEventHandler):
         self.remove_files([event.src_path])
         self.add_files([event.dest_path])
 
+    def _dispatch_matched_batch(self, events):
+        """Handle consecutive events of the same type together.
+
+        Runs of created files are sorted and added at once, and likewise for
+        modified and deleted files, while keeping the order between runs.
+
+        """
+        batch_methods = {
+            "created": self.add_files,
+            "deleted": self.remove_files,
+            "modified": self.modify_files,
+        }
+        with self._dispatch_lock:
+            for event_type, group in itertools.groupby(
+                events, key=lambda e: e.event_type
+            ):
+                if event_type in batch_methods:
+                    batch_methods[event_type]([e.src_path for e in group])
+                else:
+                    for event in group:
+                        self._dispatch_matched(event)
+
 
 class CountExpirer(object):
     """Ringbuffer handler mixin to track the number of files in each channel.
@@ -348,8 +506,10 @@ class SizeExpirer(object):
     def _add_to_queue(self, rec):
         """Add record to queue, tracking file size."""
         with self._record_lock:
-            super(SizeExpirer, self)._add_to_queue(rec)
-            self.active_size += rec.size
+            added = super(SizeExpirer, self)._add_to_queue(rec)
+            if added:
+                self.active_size += rec.size
+            return added
 
     def _remove_from_queue(self, rec):
         """Remove record from queue, tracking file size."""
@@ -363,16 +523,15 @@ class SizeExpirer(object):
             # remove oldest regardless of group unless it would empty group,
             # but prefer `group` if tie
             removal_group = group
-            # oldest file is at start of sorted records deque
             try:
-                oldest_key, oldest_path = self.queues[group][0]
+                oldest_key, oldest_path = self.queues[group].oldest()
             except IndexError:
                 oldest_key = float("inf")
             for grp in self.queues.keys():
                 if grp != group:
                     queue = self.queues[grp]
                     if len(queue) > 1:
-                        key, path = queue[0]
+                        key, path = queue.oldest()
                         if key < oldest_key:
                             oldest_key = key
                             removal_group = grp
@@ -424,8 +583,8 @@ class TimeExpirer(object):
     def _queue_duration(queue):
         """Get time span in milliseconds of files in a queue."""
         try:
-            oldkey, _ = queue[0]
-            newkey, _ = queue[-1]
+            oldkey, _ = queue.oldest()
+            newkey, _ = queue.newest()
         except IndexError:
             return 0
         return newkey - oldkey
@@ -449,7 +608,182 @@ class TimeExpirer(object):
         super(TimeExpirer, self)._expire(group)
 
 
-def DigitalRFRingbufferHandler(size=None, count=None, duration=None, **kwargs):
+class FreeSpaceExpirer(object):
+    """Ringbuffer handler mixin to keep free space on the filesystem.
+
+    This expirer checks the free space of the filesystem holding the files
+    with `os.statvfs`, so space used by other writers counts too. When the
+    free space falls below the limit, a background thread deletes the oldest
+    files of any channel (unless it would empty the channel) in batches until
+    the free space exceeds the limit by a margin, so the thread adding files
+    never waits on deletions.
+
+    """
+
+    # maximum number of files deleted between checks of the free space
+    batch_size = 100
+    # maximum interval in seconds between checks of the free space
+    check_interval = 1
+
+    def __init__(self, *args, **kwargs):
+        """Create a ringbuffer handler."""
+        self.min_free = kwargs.pop("min_free", None)
+        self.max_used_fraction = kwargs.pop("max_used_fraction", None)
+        # margin above the limit to free, as a fraction of filesystem size
+        self.free_margin = kwargs.pop("free_margin", 0.01)
+        # path on the filesystem, and free space and its limit at last check
+        self._fs_path = None
+        self._free = None
+        self._free_limit = None
+        self._last_check = 0
+        self._added_since_check = 0
+        self._free_space_thread = None
+        super(FreeSpaceExpirer, self).__init__(*args, **kwargs)
+
+    def _statvfs(self, path):
+        """Return (free bytes, total bytes) of the filesystem at path."""
+        st = os.statvfs(path)
+        return st.f_frsize * st.f_bavail, st.f_frsize * st.f_blocks
+
+    def _check_free_space(self):
+        """Return (bytes needed to reach the low watermark, bytes short)."""
+        free, total = self._statvfs(self._fs_path)
+        min_free = 0 if self.min_free is None else self.min_free
+        if self.max_used_fraction is not None:
+            min_free = max(min_free, (1 - self.max_used_fraction) * total)
+        self._free = free
+        self._free_limit = min_free
+        self._last_check = time.time()
+        self._added_since_check = 0
+        low_watermark = min_free + self.free_margin * total
+        return max(low_watermark - free, 0), max(min_free - free, 0)
+
+    def status(self):
+        """Return status string about state of the ringbuffer."""
+        status = super(FreeSpaceExpirer, self).status()
+        if self._free is None:
+            return status
+        return ", ".join(
+            (
+                status,
+                "{0} MB free (limit {1} MB)".format(
+                    int(self._free // 1e6), int(self._free_limit // 1e6)
+                ),
+            )
+        )
+
+    def register_metrics(self, metrics):
+        """Record the free space at the last check in addition."""
+        super(FreeSpaceExpirer, self).register_metrics(metrics)
+        metrics.gauge(
+            "free_bytes",
+            "Free bytes on the ringbuffer filesystem at the last check.",
+            lambda: self._free,
+        )
+        metrics.gauge(
+            "free_limit_bytes",
+            "Free bytes the ringbuffer keeps on its filesystem.",
+            lambda: self._free_limit,
+        )
+
+    def _add_to_queue(self, rec):
+        """Add record to queue, tracking bytes added since the last check."""
+        with self._record_lock:
+            added = super(FreeSpaceExpirer, self)._add_to_queue(rec)
+            if added:
+                self._added_since_check += rec.size
+            return added
+
+    def _expire(self, group):
+        """Start deleting old records if the free space limit is exceeded."""
+        super(FreeSpaceExpirer, self)._expire(group)
+        with self._record_lock:
+            if self._fs_path is None:
+                # the filesystem holding the channel
+                self._fs_path = group[0]
+            thread = self._free_space_thread
+            if thread is not None and thread.is_alive():
+                return
+            # check with statvfs only if the estimated free space after the
+            # additions since the last check could be below the limit
+            if (
+                self._free is not None
+                and self._free - self._added_since_check >= self._free_limit
+                and time.time() - self._last_check < self.check_interval
+            ):
+                return
+            try:
+                needed, short = self._check_free_space()
+            except OSError:
+                if self.verbose:
+                    traceback.print_exc()
+                return
+            if not short:
+                return
+            thread = threading.Thread(target=self._run_free_space, args=(needed,))
+            thread.daemon = True
+            self._free_space_thread = thread
+            thread.start()
+
+    def _oldest_group(self):
+        """Return group with the oldest record that wouldn't empty it."""
+        oldest_key = None
+        oldest_group = None
+        for group, queue in self.queues.items():
+            if len(queue) > 1:
+                key, path = queue.oldest()
+                if oldest_key is None or key < oldest_key:
+                    oldest_key = key
+                    oldest_group = group
+        return oldest_group
+
+    def _run_free_space(self, needed):
+        """Delete the oldest files in batches until `needed` bytes are freed."""
+        while needed > 0:
+            batch = []
+            batch_size = 0
+            with self._record_lock:
+                while batch_size < needed and len(batch) < self.batch_size:
+                    group = self._oldest_group()
+                    if group is None:
+                        break
+                    rec = self._pop_oldest_from_group(group)
+                    batch.append(rec)
+                    batch_size += rec.size
+            if not batch:
+                # nothing left to expire
+                return
+            for rec in batch:
+                self._delete_expired(rec)
+            if self.retention is not None:
+                # retired files only free space once the workers are done
+                self.retention.wait()
+            if self.dryrun:
+                # the space isn't actually freed, so count the expired sizes
+                needed -= batch_size
+                continue
+            try:
+                needed, short = self._check_free_space()
+            except OSError:
+                if self.verbose:
+                    traceback.print_exc()
+                return
+
+    def join_expiry(self, timeout=None):
+        """Wait for background deletions to free space to finish."""
+        thread = self._free_space_thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+def DigitalRFRingbufferHandler(
+    size=None,
+    count=None,
+    duration=None,
+    min_free=None,
+    max_used_fraction=None,
+    **kwargs
+):
     """Create ringbuffer handler given constraints.
 
     Parameters
@@ -467,9 +801,23 @@ def DigitalRFRingbufferHandler(size=None, count=None, duration=None, **kwargs):
         Maximum time span *for each channel* in milliseconds. If None, no
         duration constraint is used.
 
+    min_free : float | int | None
+        Minimum free space in bytes to keep on the filesystem holding the
+        files, which is shared with any other writers. If None, no minimum
+        free space constraint is used.
+
+    max_used_fraction : float | None
+        Maximum fraction of the filesystem holding the files that can be
+        used. If None, no used fraction constraint is used.
+
 
     Other Parameters
     ----------------
+    free_margin : float
+        When a free space constraint is exceeded, files are deleted until
+        the free space exceeds the limit by this fraction of the filesystem
+        size.
+
     verbose : bool
         If True, print debugging info about the files that are created and
         deleted and how much space they consume.
@@ -494,13 +842,35 @@ def DigitalRFRingbufferHandler(size=None, count=None, duration=None, **kwargs):
         If True, include Digital Metadata files. If False, ignore Digital
         Metadata files.
 
+    debounce : float | None
+        Quiet period in seconds for coalescing the modified events of a file.
+
+    retention : digital_rf.retention.TieredRetention | None
+        If not None, expired files of the channels that it has a policy for
+        are retired to a tier instead of deleted.
+
     """
-    if size is None and count is None and duration is None:
-        errstr = "One of `size`, `count`, or `duration` must not be None."
+    if (
+        size is None
+        and count is None
+        and duration is None
+        and min_free is None
+        and max_used_fraction is None
+    ):
+        errstr = (
+            "One of `size`, `count`, `duration`, `min_free`, or"
+            " `max_used_fraction` must not be None."
+        )
         raise ValueError(errstr)
 
     bases = (DigitalRFRingbufferHandlerBase,)
     # add mixins in this particular order for expected results
+    if min_free is not None or max_used_fraction is not None:
+        bases = (FreeSpaceExpirer,) + bases
+        kwargs["min_free"] = min_free
+        kwargs["max_used_fraction"] = max_used_fraction
+    else:
+        kwargs.pop("free_margin", None)
     if size is not None:
         bases = (SizeExpirer,) + bases
         kwargs["size"] = size
@@ -517,7 +887,7 @@ def DigitalRFRingbufferHandler(size=None, count=None, duration=None, **kwargs):
         This class inherits from a base class (DigitalRFRingbufferHandlerBase)
         and some expirer mixins determined from the class factor arguments.
         The expirers determine when a file needs to be expired from the
-        ringbuffer based on size, count, or duration constraints.
+        ringbuffer based on size, count, duration, or free space constraints.
 
         """
     cls = type("DigitalRFRingbufferHandler", bases, {"__doc__": docstring})
@@ -541,6 +911,9 @@ class DigitalRFRingbuffer(object):
         size=-200e6,
         count=None,
         duration=None,
+        min_free=None,
+        max_used_fraction=None,
+        free_margin=0.01,
         verbose=False,
         status_interval=10,
         dryrun=False,
@@ -549,6 +922,15 @@ class DigitalRFRingbuffer(object):
         include_drf=True,
         include_dmd=True,
         force_polling=False,
+        inotify=False,
+        catalog=None,
+        debounce=1,
+        snapshot=None,
+        snapshot_interval=60,
+        tiers=None,
+        tier_workers=2,
+        metrics_port=None,
+        metrics_host="localhost",
     ):
         """Create Digital RF ringbuffer object. Use start/run method to begin.
 
@@ -570,9 +952,23 @@ class DigitalRFRingbuffer(object):
             Maximum time span *for each channel* in milliseconds. If None, no
             duration constraint is used.
 
+        min_free : float | int | None
+            Minimum free space in bytes to keep on the filesystem, which is
+            shared with any other writers. If None, no minimum free space
+            constraint is used.
+
+        max_used_fraction : float | None
+            Maximum fraction of the filesystem that can be used. If None, no
+            used fraction constraint is used.
+
 
         Other Parameters
         ----------------
+        free_margin : float
+            When a free space constraint is exceeded, the oldest files are
+            deleted in a background thread until the free space exceeds the
+            limit by this fraction of the filesystem size.
+
         verbose : bool
             If True, print debugging info about the files that are created and
             deleted and how much space they consume.
@@ -605,11 +1001,64 @@ class DigitalRFRingbuffer(object):
             If True, force the watchdog to use polling instead of the default
             observer.
 
+        inotify : bool
+            If True (and not polling), use the Digital RF inotify observer,
+            which reads events in bulk and filters them on their file name
+            before creating them. It falls back to the default observer where
+            it is not supported. See `watchdog_drf.DirWatcher`.
+
+        catalog : digital_rf.catalog.DigitalRFCatalog | None
+            If not None, a catalog whose root contains `path`. It is updated
+            and queried to find the existing files when the ringbuffer starts
+            or restarts, instead of walking the whole directory tree.
+
+        debounce : float | None
+            Quiet period in seconds after the last modification of a file
+            before its modified event is handled, so that a Digital Metadata
+            file being appended is re-measured once instead of on every
+            write. If None or 0, every modified event is handled.
+
+        snapshot : str | None
+            If not None, path of a file to which the ringbuffer's file records
+            are periodically saved. When the ringbuffer starts with an
+            existing snapshot, or restarts after its observer stops, only the
+            subdirectories whose modification time changed since the snapshot
+            are listed; the records of the others are taken from the snapshot
+            without any stat calls. Files modified in place keep their
+            snapshot size until their next modified event.
+
+        snapshot_interval : float
+            Interval in seconds between saving snapshots. A final snapshot is
+            saved when the ringbuffer stops.
+
+        tiers : list of (channels, policy, dest) tuples | None
+            Expire policies for retiring the expired files of some channels
+            to a slower tier instead of deleting them. `channels` is a glob
+            pattern matched against channel paths relative to `path`, `dest`
+            is the tier directory (outside of `path`), and `policy` is one of
+            'move', 'recompress[:filter]', or 'decimate[:factor]' (see
+            `digital_rf.retention.make_expire_policy`). The first matching
+            tier is used, and channels without one have their files deleted.
+
+        tier_workers : int
+            Number of worker threads retiring files to tiers.
+
+        metrics_port : int | None
+            If not None, serve operational metrics (events, queue depths,
+            expired bytes, handling lag, errors) in Prometheus text format at
+            http://`metrics_host`:`metrics_port`/metrics while running.
+
+        metrics_host : string
+            Host name or address for the metrics endpoint to listen on.
+
         """
         self.path = os.path.abspath(path)
         self.size = size
         self.count = count
         self.duration = duration
+        self.min_free = min_free
+        self.max_used_fraction = max_used_fraction
+        self.free_margin = free_margin
         self.verbose = verbose
         self.status_interval = status_interval
         self.dryrun = dryrun
@@ -618,11 +1067,33 @@ class DigitalRFRingbuffer(object):
         self.include_drf = include_drf
         self.include_dmd = include_dmd
         self.force_polling = force_polling
+        self.inotify = inotify
+        self.catalog = catalog
+        self.debounce = debounce
+        self.snapshot = snapshot
+        self.snapshot_interval = snapshot_interval
+        self.tiers = tiers
+        self.tier_workers = tier_workers
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
         self._start_time = None
         self._task_threads = []
-
-        if self.size is None and self.count is None and self.duration is None:
-            errstr = "One of `size`, `count`, or `duration` must not be None."
+        # subdirectory -> mtime of the last saved snapshot
+        self._snapshot_mtimes = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_stop = threading.Event()
+
+        if (
+            self.size is None
+            and self.count is None
+            and self.duration is None
+            and self.min_free is None
+            and self.max_used_fraction is None
+        ):
+            errstr = (
+                "One of `size`, `count`, `duration`, `min_free`, or"
+                " `max_used_fraction` must not be None."
+            )
             raise ValueError(errstr)
 
         if not self.include_drf and not self.include_dmd:
@@ -641,16 +1112,13 @@ class DigitalRFRingbuffer(object):
                     root = os.path.dirname(root)
                 statvfs = os.statvfs(root)
                 bytes_available = statvfs.f_frsize * statvfs.f_bavail
-                if os.path.isdir(self.path):
-                    existing = list_drf.ilsdrf(
-                        self.path,
-                        starttime=self.starttime,
-                        endtime=self.endtime,
-                        include_drf=self.include_drf,
-                        include_dmd=self.include_dmd,
-                        include_drf_properties=False,
-                        include_dmd_properties=False,
+                if os.path.isdir(self.path) and self.catalog is not None:
+                    self.catalog.update()
+                    bytes_available += self.catalog.get_size(
+                        self.path, **self._list_kwargs()
                     )
+                elif os.path.isdir(self.path):
+                    existing = list_drf.ilsdrf(self.path, **self._list_kwargs())
                     for p in existing:
                         try:
                             bytes_available += os.path.getsize(p)
@@ -661,44 +1129,269 @@ class DigitalRFRingbuffer(object):
                             return
                 self.size = max(bytes_available + self.size, 0)
 
+        self.retention = None
+        if self.tiers:
+            # (import here since the retention module imports mirror, which
+            #  imports this module)
+            from .retention import TieredRetention, make_expire_policy
+
+            policies = []
+            for channels, policy, dest in self.tiers:
+                dest = os.path.abspath(dest)
+                if dest == self.path or dest.startswith(self.path + os.sep):
+                    errstr = "Tier directory {0} must be outside of {1}."
+                    raise ValueError(errstr.format(dest, self.path))
+                policies.append(
+                    make_expire_policy(policy, self.path, dest, channels=channels)
+                )
+            self.retention = TieredRetention(
+                policies, workers=self.tier_workers, verbose=self.verbose
+            )
+
         self.event_handler = DigitalRFRingbufferHandler(
             size=self.size,
             count=self.count,
             duration=self.duration,
+            min_free=self.min_free,
+            max_used_fraction=self.max_used_fraction,
+            free_margin=self.free_margin,
             verbose=self.verbose,
             dryrun=self.dryrun,
             starttime=self.starttime,
             endtime=self.endtime,
             include_drf=self.include_drf,
             include_dmd=self.include_dmd,
+            debounce=self.debounce,
+            retention=self.retention,
         )
 
+        self.metrics = None
+        self.metrics_server = None
+        if self.metrics_port is not None:
+            self.metrics = Metrics()
+            self._register_metrics()
+
         self._init_observer()
 
+    def _register_metrics(self):
+        """Declare the ringbuffer's metrics in its registry."""
+        metrics = self.metrics
+        self.event_handler.register_metrics(metrics)
+        # (the observer is replaced when it is restarted)
+        metrics.gauge(
+            "event_queue_depth",
+            "File events waiting to be handled.",
+            lambda: self.observer.event_queue.qsize(),
+        )
+        if self.retention is not None:
+            pool = self.retention.pool
+            metrics.gauge(
+                "retention_queue_depth",
+                "Expired files waiting to be retired to a tier.",
+                lambda: len(pool),
+            )
+            metrics.counter(
+                "retired_bytes_total",
+                "Bytes of expired files retired to a tier.",
+                lambda: pool.bytes_done,
+            )
+            metrics.counter(
+                "retention_errors_total",
+                "Expired files that failed to retire and were deleted.",
+                lambda: self.retention.n_errors,
+            )
+
     def _init_observer(self):
         self.observer = watchdog_drf.DirWatcher(
-            self.path, force_polling=self.force_polling
+            self.path, force_polling=self.force_polling, inotify=self.inotify
         )
         self.observer.schedule(self.event_handler, self.path, recursive=True)
 
+    def _list_kwargs(self):
+        """Return keyword arguments for listing the ringbuffer's files."""
+        return dict(
+            starttime=self.starttime,
+            endtime=self.endtime,
+            include_drf=self.include_drf,
+            include_dmd=self.include_dmd,
+            include_drf_properties=False,
+            include_dmd_properties=False,
+        )
+
+    def _snapshot_options(self):
+        """Return the options that a snapshot must match to be used."""
+        options = self._list_kwargs()
+        for k in ("starttime", "endtime"):
+            if options[k] is not None:
+                options[k] = options[k].isoformat()
+        return options
+
+    def save_snapshot(self):
+        """Save the file records of the ringbuffer to the snapshot file.
+
+        The records are grouped by subdirectory along with the subdirectory's
+        modification time, so that unchanged subdirectories can be restored
+        from the snapshot without listing them.
+
+        """
+        if self.snapshot is None:
+            return
+        with self._snapshot_lock:
+            now = time.time()
+            with self.event_handler._record_lock:
+                records = [
+                    (r.path, r.size) for r in self.event_handler.records.values()
+                ]
+            entries = defaultdict(list)
+            for path, size in records:
+                subdir, name = os.path.split(path)
+                entries[subdir].append([name, size])
+            # stat after copying the records so that any change that could be
+            # missing from them has a recent mtime
+            mtimes = {}
+            subdirs = {}
+            for subdir, files in entries.items():
+                try:
+                    mtime, secs = _dir_signature(subdir)
+                except OSError:
+                    continue
+                if secs > now - _SNAPSHOT_SETTLE_SECS:
+                    # still settling, relist it instead of trusting records
+                    mtime = None
+                else:
+                    mtimes[subdir] = mtime
+                subdirs[os.path.relpath(subdir, self.path)] = [mtime, files]
+            snapshot = dict(
+                version=_SNAPSHOT_VERSION,
+                path=self.path,
+                options=self._snapshot_options(),
+                time=now,
+                subdirs=subdirs,
+            )
+            data = json.dumps(snapshot, separators=(",", ":")).encode("utf-8")
+            # write to a temporary file and rename so a crash can't leave a
+            # partial snapshot
+            tmp_path = self.snapshot + ".tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(data)
+            os.rename(tmp_path, self.snapshot)
+            self._snapshot_mtimes = mtimes
+
+    def _load_snapshot(self):
+        """Return {subdir: (mtime, [[name, size], ...])} from the snapshot.
+
+        None is returned if there is no usable snapshot.
+
+        """
+        if self.snapshot is None:
+            return None
+        try:
+            with gzip.open(self.snapshot, "rb") as f:
+                snapshot = json.loads(f.read().decode("utf-8"))
+        except (EnvironmentError, EOFError, ValueError, zlib.error):
+            if self.verbose and os.path.exists(self.snapshot):
+                traceback.print_exc()
+            return None
+        if (
+            snapshot.get("version") != _SNAPSHOT_VERSION
+            or snapshot.get("path") != self.path
+            or snapshot.get("options") != self._snapshot_options()
+        ):
+            print("Ignoring snapshot {0} of other options.".format(self.snapshot))
+            return None
+        subdirs = {}
+        for subdir, (mtime, files) in snapshot["subdirs"].items():
+            subdirs[os.path.join(self.path, subdir)] = (mtime, files)
+        return subdirs
+
+    def _list_changed_files(self, mtimes):
+        """List the files of subdirectories that changed since a snapshot.
+
+        Subdirectories in `mtimes` whose modification time still matches are
+        not listed.
+
+        Returns
+        -------
+        unchanged : set
+            Unchanged subdirectories.
+
+        paths : list
+            Paths of the ringbuffer's files in the other subdirectories.
+
+        """
+        unchanged = set()
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                rec = self.event_handler._get_file_record(
+                    os.path.join(dirpath, filename), size=0
+                )
+                if rec is not None and self.event_handler._in_time_bounds(rec):
+                    paths.append(rec.path)
+            keep = []
+            for d in dirnames:
+                subdir = os.path.join(dirpath, d)
+                mtime = mtimes.get(subdir)
+                if mtime is not None:
+                    try:
+                        if _dir_signature(subdir)[0] == mtime:
+                            unchanged.add(subdir)
+                            continue
+                    except OSError:
+                        continue
+                keep.append(d)
+            # only descend into changed directories
+            dirnames[:] = keep
+        return unchanged, paths
+
+    def _add_snapshot_files(self, subdirs):
+        """Add files to the ringbuffer from a snapshot and changed subdirs."""
+        mtimes = dict(
+            (subdir, mtime)
+            for subdir, (mtime, files) in subdirs.items()
+            if mtime is not None
+        )
+        unchanged, paths = self._list_changed_files(mtimes)
+        sizes = [None] * len(paths)
+        for subdir in unchanged:
+            for name, size in subdirs[subdir][1]:
+                paths.append(os.path.join(subdir, name))
+                sizes.append(size)
+        n_restored = len(paths) - sum(1 for s in sizes if s is None)
+        self.event_handler.add_files(paths, sort=True, sizes=sizes)
+        # the unchanged directories can also be skipped when restarting
+        self._snapshot_mtimes = dict((subdir, mtimes[subdir]) for subdir in unchanged)
+        now = datetime.datetime.utcnow().replace(microsecond=0)
+        msg = (
+            "{0} | Restored {1} files of {2} unchanged directories from snapshot,"
+            " listed {3} files of changed directories."
+        ).format(now, n_restored, len(unchanged), len(paths) - n_restored)
+        print(msg)
+        sys.stdout.flush()
+
     def _add_existing_files(self):
         """Add existing files on disk to ringbuffer."""
         # pause dispatching while we add existing files so files are added
         # to the ringbuffer in the correct order
         with self.observer.paused_dispatching():
+            subdirs = self._load_snapshot()
+            if subdirs is not None:
+                self._add_snapshot_files(subdirs)
+                return
             # add existing files to ringbuffer handler
-            existing = list_drf.ilsdrf(
-                self.path,
-                starttime=self.starttime,
-                endtime=self.endtime,
-                include_drf=self.include_drf,
-                include_dmd=self.include_dmd,
-                include_drf_properties=False,
-                include_dmd_properties=False,
-            )
-            # do not sort because existing will already be sorted and we
-            # don't want to convert to a list
-            self.event_handler.add_files(existing, sort=False)
+            # (do not sort because existing will already be sorted and we
+            #  don't want to convert to a list)
+            if self.catalog is not None:
+                self.catalog.update()
+                records = list(self.catalog.irecords(self.path, **self._list_kwargs()))
+                self.event_handler.add_files(
+                    (r.path for r in records),
+                    sort=False,
+                    sizes=(r.size for r in records),
+                )
+            else:
+                existing = list_drf.ilsdrf(self.path, **self._list_kwargs())
+                self.event_handler.add_files(existing, sort=False)
 
     def start(self):
         """Start ringbuffer process."""
@@ -711,6 +1404,12 @@ class DigitalRFRingbuffer(object):
             print("DRY RUN (files will not be deleted):")
         now = datetime.datetime.utcnow().replace(microsecond=0)
         print("{0} | Starting {1}:".format(now, self))
+        if self.metrics is not None:
+            self.metrics_server = MetricsServer(
+                self.metrics, port=self.metrics_port, host=self.metrics_host
+            )
+            self.metrics_server.start()
+            print("{0} | Serving metrics at {1}".format(now, self.metrics_server))
         sys.stdout.flush()
 
         # add files that already existed before the observer started
@@ -720,23 +1419,46 @@ class DigitalRFRingbuffer(object):
         thread.start()
         self._task_threads.append(thread)
 
-    def _verify_ringbuffer_files(self, inbuffer):
-        """Verify ringbuffer's `inbuffer` set of files with files on disk."""
+        if self.snapshot is not None:
+            self._snapshot_stop.clear()
+            thread = threading.Thread(target=self._run_snapshots)
+            thread.daemon = True
+            thread.start()
+
+    def _run_snapshots(self):
+        """Save snapshots periodically until the ringbuffer is stopped."""
+        while not self._snapshot_stop.wait(self.snapshot_interval):
+            # a snapshot taken while existing files are still being added
+            # could have a partial list for a directory that is up to date
+            if any(t.is_alive() for t in self._task_threads):
+                continue
+            try:
+                self.save_snapshot()
+            except EnvironmentError:
+                traceback.print_exc()
+
+    def _verify_ringbuffer_files(self, inbuffer, mtimes=None):
+        """Verify ringbuffer's `inbuffer` set of files with files on disk.
+
+        If `mtimes` is given, it maps subdirectories to their modification
+        time from a snapshot, and only the subdirectories that changed since
+        then are verified.
+
+        """
         # get set of all files that should be in the ringbuffer right away
         # so we duplicate as few files from new events as possible
         # events that happen while we build this file set can be duplicated
         # when we verify the ringbuffer state below, but that's ok
-        ondisk = set(
-            list_drf.ilsdrf(
-                self.path,
-                starttime=self.starttime,
-                endtime=self.endtime,
-                include_drf=self.include_drf,
-                include_dmd=self.include_dmd,
-                include_drf_properties=False,
-                include_dmd_properties=False,
+        if mtimes is not None:
+            unchanged, paths = self._list_changed_files(mtimes)
+            ondisk = set(paths)
+            inbuffer = set(p for p in inbuffer if os.path.dirname(p) not in unchanged)
+        else:
+            if self.catalog is not None:
+                self.catalog.update()
+            ondisk = set(
+                list_drf.ilsdrf(self.path, catalog=self.catalog, **self._list_kwargs())
             )
-        )
 
         # now any file in inbuffer that is not in ondisk is a missed or
         # duplicate deletion event, so remove those files
@@ -767,7 +1489,8 @@ class DigitalRFRingbuffer(object):
         # verify existing state of ringbuffer
         # (do it in another thread so we can get to join())
         thread = threading.Thread(
-            target=self._verify_ringbuffer_files, kwargs=dict(inbuffer=inbuffer)
+            target=self._verify_ringbuffer_files,
+            kwargs=dict(inbuffer=inbuffer, mtimes=self._snapshot_mtimes),
         )
         thread.daemon = True
         thread.start()
@@ -789,6 +1512,8 @@ class DigitalRFRingbuffer(object):
                     # reinitialize and restart
                     print("Found stopped thread, reinitializing and restarting.")
                     sys.stdout.flush()
+                    if self.metrics is not None:
+                        self.metrics.inc("errors_total", source="observer")
                     # first make sure all task threads have stopped
                     for thread in self._task_threads:
                         while thread.is_alive():
@@ -816,6 +1541,22 @@ class DigitalRFRingbuffer(object):
     def stop(self):
         """Stop ringbuffer process."""
         self.observer.stop()
+        # handle modified events still held by debouncing
+        self.event_handler.flush()
+        if self.retention is not None:
+            # files left unretired are still on disk, so they are expired
+            # again when the ringbuffer is next started
+            self.retention.wait(60)
+            n_left = self.retention.shutdown()
+            if n_left:
+                print("Left {0} expired files unretired.".format(n_left))
+        if self.snapshot is not None:
+            self._snapshot_stop.set()
+            if not any(t.is_alive() for t in self._task_threads):
+                self.save_snapshot()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
 
     def __str__(self):
         """Return string describing ringbuffer."""
@@ -826,7 +1567,14 @@ class DigitalRFRingbuffer(object):
             amounts.append("{0} files".format(self.count))
         if self.duration is not None:
             amounts.append("{0} s".format(self.duration / 1e3))
+        if self.min_free is not None:
+            amounts.append("{0} bytes free".format(self.min_free))
+        if self.max_used_fraction is not None:
+            amounts.append("{0}% used".format(self.max_used_fraction * 100))
         s = "DigitalRFRingbuffer of ({0}) in {1}".format(", ".join(amounts), self.path)
+        if self.retention is not None:
+            policies = ", ".join(str(p) for p in self.retention.policies)
+            s = "{0} retiring with ({1})".format(s, policies)
         return s
 
 
@@ -845,7 +1593,7 @@ def _build_ringbuffer_parser(Parser, *args):
         default=None,
         help="""Size of ringbuffer, in bytes or using unit symbols (e.g 100GB).
                 Negative values are used to indicate all available space except
-                the given amount. (default: -200MB if no count or duration)""",
+                the given amount. (default: -200MB if no other limit)""",
     )
     parser.add_argument(
         "-c",
@@ -861,6 +1609,28 @@ def _build_ringbuffer_parser(Parser, *args):
         help="""Max duration for each channel in seconds.
                 (default: %(default)s)""",
     )
+    parser.add_argument(
+        "--min_free",
+        default=None,
+        help="""Minimum free space to keep on the filesystem, in bytes or using
+                unit symbols (e.g. 500GB). Space used by other writers counts
+                too. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--max_used_fraction",
+        type=float,
+        default=None,
+        help="""Maximum used fraction of the filesystem, from 0 to 1.
+                (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--free_margin",
+        type=float,
+        default=0.01,
+        help="""When a free space limit is exceeded, delete the oldest files
+                until the free space exceeds the limit by this fraction of the
+                filesystem size. (default: %(default)s)""",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -900,53 +1670,113 @@ def _build_ringbuffer_parser(Parser, *args):
                 (default: False)""",
     )
 
-    parser = watchdog_drf._add_watchdog_group(parser)
+    parser.add_argument(
+        "--catalog",
+        default=None,
+        help="""Catalog database file (see drf catalog) to update and query for
+                the existing files instead of walking the directory tree.
+                (default: None)""",
+    )
+
+    parser.add_argument(
+        "--snapshot",
+        default=None,
+        help="""File in which to periodically save the ringbuffer's records, so
+                that a restart only needs to list the directories that changed
+                since the last snapshot. (default: None)""",
+    )
+    parser.add_argument(
+        "--snapshot_interval",
+        type=float,
+        default=60,
+        help="""Interval in seconds between saving snapshots.
+                (default: %(default)s)""",
+    )
+
+    tiergroup = parser.add_argument_group(title="tiers")
+    tiergroup.add_argument(
+        "--tier",
+        dest="tiers",
+        nargs=3,
+        action="append",
+        metavar=("CHANNELS", "POLICY", "DEST"),
+        default=None,
+        help="""Instead of deleting the expired files of channels matching the
+                CHANNELS glob pattern (relative to the ringbuffer path), retire
+                them to the DEST directory with POLICY, which is one of 'move',
+                'recompress[:FILTER[:LEVEL]][+shuffle]' (e.g. gzip:9+shuffle),
+                or 'decimate[:FACTOR]' (e.g. decimate:10, a block average).
+                Can be given multiple times, the first matching tier is used.
+                (default: None)""",
+    )
+    tiergroup.add_argument(
+        "--tier_workers",
+        type=int,
+        default=2,
+        help="""Number of worker threads retiring files to tiers.
+                (default: %(default)s)""",
+    )
+
+    parser = watchdog_drf._add_watchdog_group(parser, debounce=1)
+    parser = _add_metrics_group(parser)
 
     parser.set_defaults(func=_run_ringbuffer)
 
     return parser
 
 
+def _parse_size(size):
+    """Parse a size string with an optional unit suffix into bytes."""
+    suffixes = OrderedDict(
+        [
+            ("B", 1),
+            ("KB", 1000 ** 1),
+            ("KiB", 1024 ** 1),
+            ("MB", 1000 ** 2),
+            ("MiB", 1024 ** 2),
+            ("GB", 1000 ** 3),
+            ("GiB", 1024 ** 3),
+            ("TB", 1000 ** 4),
+            ("TiB", 1024 ** 4),
+            ("PB", 1000 ** 5),
+            ("PiB", 1024 ** 5),
+        ]
+    )
+    m = re.match(r"(?P<num>\-?\d+\.?\d*)(?P<suf>\D*)", size)
+    if not m:
+        raise ValueError(
+            "Size string not recognized. " "Use number followed by suffix."
+        )
+    sizenum = eval(m.group("num"))
+    suf = m.group("suf").strip()
+    if not suf:
+        return sizenum
+    elif suf in suffixes:
+        return sizenum * suffixes[suf]
+    else:
+        raise ValueError(
+            "Size suffix not recognized. Use one of:\n"
+            "{0}".format(list(suffixes.keys()))
+        )
+
+
 def _run_ringbuffer(args):
     import signal
 
-    # parse size string into number of bytes
+    # parse size strings into number of bytes
     if args.size == "":
         args.size = None
     if args.size is not None:
-        suffixes = OrderedDict(
-            [
-                ("B", 1),
-                ("KB", 1000 ** 1),
-                ("KiB", 1024 ** 1),
-                ("MB", 1000 ** 2),
-                ("MiB", 1024 ** 2),
-                ("GB", 1000 ** 3),
-                ("GiB", 1024 ** 3),
-                ("TB", 1000 ** 4),
-                ("TiB", 1024 ** 4),
-                ("PB", 1000 ** 5),
-                ("PiB", 1024 ** 5),
-            ]
-        )
-        m = re.match(r"(?P<num>\-?\d+\.?\d*)(?P<suf>\D*)", args.size)
-        if not m:
-            raise ValueError(
-                "Size string not recognized. " "Use number followed by suffix."
-            )
-        sizenum = eval(m.group("num"))
-        suf = m.group("suf").strip()
-        if not suf:
-            args.size = sizenum
-        elif suf in suffixes:
-            args.size = sizenum * suffixes[suf]
-        else:
-            raise ValueError(
-                "Size suffix not recognized. Use one of:\n"
-                "{0}".format(list(suffixes.keys()))
-            )
-    elif args.count is None and args.duration is None:
+        args.size = _parse_size(args.size)
+    elif (
+        args.count is None
+        and args.duration is None
+        and args.min_free is None
+        and args.max_used_fraction is None
+    ):
         args.size = -200e6
+    if args.min_free is not None:
+        args.min_free = _parse_size(args.min_free)
 
     # evaluate duration to float, from seconds to milliseconds
     if args.duration is not None:
@@ -959,6 +1789,9 @@ def _run_ringbuffer(args):
             args.endtime, ref_datetime=args.starttime
         )
 
+    if args.catalog is not None:
+        args.catalog = DigitalRFCatalog(db_path=args.catalog)
+
     kwargs = vars(args).copy()
     del kwargs["func"]
 
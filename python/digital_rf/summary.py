@@ -0,0 +1,354 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Module for summarizing the data coverage of Digital RF channels."""
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import fractions
+import json
+import multiprocessing
+import os
+import sys
+
+import h5py
+import numpy as np
+
+from . import list_drf, util
+from .digital_metadata import DigitalMetadataReader
+
+__all__ = ("summarize_channel",)
+
+
+def _read_sample_rate(properties_file):
+    """Return the sample rate as a Fraction from a properties file."""
+    with h5py.File(properties_file, "r") as f:
+        attrs = f.attrs
+        if "sample_rate_numerator" in attrs:
+            return fractions.Fraction(
+                int(attrs["sample_rate_numerator"]),
+                int(attrs["sample_rate_denominator"]),
+            )
+        return fractions.Fraction(
+            float(attrs["samples_per_second"])
+        ).limit_denominator()
+
+
+def _channel_kind(properties_file):
+    """Return 'drf' or 'dmd' for the channel of a properties file."""
+    name = os.path.basename(properties_file)
+    if list_drf._RE_DRFPROPFILE.match(name) and list_drf._RE_DMDPROPFILE.match(name):
+        # pre-2.5 metadata.h5 file, Digital Metadata has a fields dataset
+        with h5py.File(properties_file, "r") as f:
+            return "dmd" if "fields" in f else "drf"
+    elif list_drf._RE_DMDPROPFILE.match(name):
+        return "dmd"
+    return "drf"
+
+
+def _sample_to_isoformat(sample, sample_rate):
+    dt = util.sample_to_datetime(sample, np.longdouble(sample_rate))
+    return dt.replace(tzinfo=None).isoformat() + "Z"
+
+
+def _file_blocks(path):
+    """Return arrays of the start samples and lengths of blocks in a file."""
+    with h5py.File(path, "r") as f:
+        n = f["rf_data"].shape[0]
+        rf_index = f["rf_data_index"][...]
+    starts = rf_index[:, 0].astype(np.int64)
+    stops = np.append(rf_index[1:, 1], n).astype(np.int64)
+    return starts, stops - rf_index[:, 1].astype(np.int64)
+
+
+def _iter_properties_files(path, recursive=True):
+    """Yield the Digital RF/Metadata properties files in `path`."""
+    return list_drf.ilsdrf(
+        path,
+        recursive=recursive,
+        include_drf=False,
+        include_dmd=False,
+        include_drf_properties=True,
+        include_dmd_properties=True,
+    )
+
+
+def summarize_channel(
+    channel_dir, starttime=None, endtime=None, max_gaps=100, properties_file=None
+):
+    """Summarize the files and data coverage of a Digital RF/Metadata channel.
+
+    Only file sizes and the `rf_data_index` of each Digital RF file are read,
+    so the time taken is proportional to the number of files and not to the
+    amount of data.
+
+
+    Parameters
+    ----------
+    channel_dir : string
+        Channel directory to summarize.
+
+    starttime : datetime.datetime
+        Data covering this time or after will be included.
+
+    endtime : datetime.datetime
+        Data covering this time or earlier will be included.
+
+    max_gaps : int
+        Maximum number of gaps to list (all gaps are still counted).
+
+    properties_file : string | None
+        Properties file of the channel. If None, find it in `channel_dir`.
+
+
+    Returns
+    -------
+    dict
+        Summary with keys 'channel' (path), 'kind' ('drf' or 'dmd'),
+        'n_files', 'n_bytes', 'sample_rate', 'first_sample', 'last_sample',
+        'first_time', and 'last_time'. Digital RF channels also have
+        'n_samples', 'duty_cycle' (fraction of samples present between the
+        first and last), 'n_bad_files', 'n_gaps', and 'gaps', a list of
+        [start_sample, n_samples] for the gaps in the data. The sample and
+        time bounds are None if there is no data.
+
+    """
+    channel_dir = os.path.abspath(channel_dir)
+    if properties_file is None:
+        properties_file = next(_iter_properties_files(channel_dir, False), None)
+        if properties_file is None:
+            raise IOError("No properties file found in {0}".format(channel_dir))
+    kind = _channel_kind(properties_file)
+    summary = dict(channel=channel_dir, kind=kind)
+
+    if kind == "dmd":
+        reader = DigitalMetadataReader(channel_dir)
+        sample_rate = fractions.Fraction(
+            reader.get_sample_rate_numerator(),
+            reader.get_sample_rate_denominator(),
+        )
+        try:
+            first, last = reader.get_bounds()
+        except IOError:
+            first, last = None, None
+        files = list_drf.ilsdrf(
+            channel_dir,
+            recursive=False,
+            starttime=starttime,
+            endtime=endtime,
+            include_drf=False,
+            include_dmd=True,
+            include_dmd_properties=False,
+        )
+        n_files = 0
+        n_bytes = 0
+        for path in files:
+            try:
+                n_bytes += os.path.getsize(path)
+            except OSError:
+                continue
+            n_files += 1
+        summary.update(n_files=n_files, n_bytes=n_bytes)
+    else:
+        sample_rate = _read_sample_rate(properties_file)
+        sps = np.longdouble(sample_rate)
+        start_sample = None
+        end_sample = None
+        list_starttime = starttime
+        if starttime is not None:
+            start_sample = util.time_to_sample(starttime, sps)
+            # list from one file earlier to include the file covering start
+            with h5py.File(properties_file, "r") as f:
+                file_cadence_ms = int(f.attrs["file_cadence_millisecs"])
+            list_starttime = starttime - datetime.timedelta(
+                milliseconds=file_cadence_ms
+            )
+        if endtime is not None:
+            end_sample = util.time_to_sample(endtime, sps)
+        files = list_drf.ilsdrf(
+            channel_dir,
+            recursive=False,
+            starttime=list_starttime,
+            endtime=endtime,
+            include_drf=True,
+            include_dmd=False,
+            include_drf_properties=False,
+        )
+
+        n_files = 0
+        n_bytes = 0
+        n_bad_files = 0
+        n_samples = 0
+        first = None
+        # exclusive end of the current continuous block
+        block_end = None
+        gaps = []
+        n_gaps = 0
+        for path in files:
+            try:
+                size = os.path.getsize(path)
+                starts, lengths = _file_blocks(path)
+            except (IOError, OSError, KeyError, ValueError, IndexError):
+                n_bad_files += 1
+                continue
+            stops = starts + lengths
+            if start_sample is not None:
+                starts = np.maximum(starts, start_sample)
+            if end_sample is not None:
+                stops = np.minimum(stops, end_sample + 1)
+            keep = stops > starts
+            starts = starts[keep]
+            stops = stops[keep]
+            if len(starts) == 0:
+                continue
+            n_files += 1
+            n_bytes += size
+            n_samples += int(np.sum(stops - starts))
+            # gaps are between the end of one block and the start of the next
+            if first is None:
+                first = int(starts[0])
+                prev_stops = stops[:-1]
+                next_starts = starts[1:]
+            else:
+                # include the gap between the previous file and this one
+                prev_stops = np.insert(stops[:-1], 0, block_end)
+                next_starts = starts
+            gap_mask = next_starts > prev_stops
+            n_gaps += int(np.count_nonzero(gap_mask))
+            if len(gaps) < max_gaps:
+                for s, e in zip(prev_stops[gap_mask], next_starts[gap_mask]):
+                    if len(gaps) >= max_gaps:
+                        break
+                    gaps.append([int(s), int(e - s)])
+            block_end = int(stops[-1])
+
+        last = None if block_end is None else block_end - 1
+        summary.update(
+            n_files=n_files,
+            n_bytes=n_bytes,
+            n_bad_files=n_bad_files,
+            n_samples=n_samples,
+            duty_cycle=(None if first is None else n_samples / (last - first + 1)),
+            n_gaps=n_gaps,
+            gaps=gaps,
+        )
+
+    summary.update(
+        sample_rate=float(sample_rate),
+        first_sample=first,
+        last_sample=last,
+        first_time=None if first is None else _sample_to_isoformat(first, sample_rate),
+        last_time=None if last is None else _sample_to_isoformat(last, sample_rate),
+    )
+    return summary
+
+
+def _summarize_channel_star(args_kwargs):
+    """Call summarize_channel with (args, kwargs), for use with a Pool.
+
+    Errors are returned in the summary so that one unreadable channel doesn't
+    stop the summary of an entire archive.
+
+    """
+    args, kwargs = args_kwargs
+    try:
+        return summarize_channel(*args, **kwargs)
+    except Exception as e:
+        return dict(channel=os.path.abspath(args[0]), error=repr(e))
+
+
+def _build_summary_parser(Parser, *args):
+    desc = (
+        "Summarize the files and data coverage of Digital RF/Metadata channels,"
+        " writing one JSON object per channel as each one is finished."
+    )
+    parser = Parser(*args, description=desc)
+
+    parser.add_argument(
+        "dirs",
+        nargs="*",
+        default=["."],
+        help="""Directories in which to find channels. (default: .)""",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=4,
+        help="""Number of channels to summarize in parallel processes.
+                (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "-g",
+        "--max_gaps",
+        type=int,
+        default=100,
+        help="""Maximum number of gaps to list for each channel.
+                (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--indent",
+        type=int,
+        default=None,
+        help="""Indent the JSON output by this many spaces instead of writing
+                one line per channel. (default: %(default)s)""",
+    )
+
+    parser = list_drf._add_time_group(parser)
+
+    parser.set_defaults(func=_run_summary)
+
+    return parser
+
+
+def _run_summary(args):
+    if args.starttime is not None:
+        args.starttime = util.parse_identifier_to_time(args.starttime)
+    if args.endtime is not None:
+        args.endtime = util.parse_identifier_to_time(
+            args.endtime, ref_datetime=args.starttime
+        )
+
+    # find channel directories from their properties files
+    tasks = []
+    channels = set()
+    for d in args.dirs:
+        for properties_file in _iter_properties_files(d):
+            channel_dir = os.path.dirname(properties_file)
+            if channel_dir in channels:
+                continue
+            channels.add(channel_dir)
+            kwargs = dict(
+                starttime=args.starttime,
+                endtime=args.endtime,
+                max_gaps=args.max_gaps,
+                properties_file=properties_file,
+            )
+            tasks.append(((channel_dir,), kwargs))
+
+    pool = None
+    if args.jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(args.jobs, len(tasks)))
+        summaries = pool.imap_unordered(_summarize_channel_star, tasks)
+    else:
+        summaries = (_summarize_channel_star(t) for t in tasks)
+    try:
+        for summary in summaries:
+            print(json.dumps(summary, indent=args.indent, sort_keys=True))
+            sys.stdout.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = _build_summary_parser(ArgumentParser)
+    args = parser.parse_args()
+    args.func(args)
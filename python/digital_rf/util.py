@@ -11,8 +11,9 @@ from __future__ import absolute_import, division, print_function
 
 import ast
 import datetime
+import fractions
+import numbers
 
-import dateutil.parser
 import numpy as np
 import pytz
 
@@ -23,13 +24,19 @@ __all__ = (
     "epoch",
     "parse_identifier_to_sample",
     "parse_identifier_to_time",
+    "parse_identifiers_to_samples",
     "sample_to_datetime",
+    "samples_to_datetimes",
     "samples_to_timedelta",
+    "samples_to_timedeltas",
     "time_to_sample",
+    "times_to_samples",
 )
 
 
 epoch = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+_epoch_naive = datetime.datetime(1970, 1, 1)
+_NS_PER_SEC = 1000000000
 
 
 def time_to_sample(time, samples_per_second):
@@ -142,6 +149,195 @@ def datetime_to_timestamp(dt):
     return (dt - epoch).total_seconds()
 
 
+def _rational_rate(sample_rate_numerator, sample_rate_denominator):
+    """Return a sample rate as a tuple of positive (numerator, denominator)."""
+    rate = fractions.Fraction(sample_rate_numerator)
+    if isinstance(sample_rate_denominator, numbers.Integral):
+        rate /= int(sample_rate_denominator)
+    else:
+        rate /= fractions.Fraction(sample_rate_denominator)
+    if rate <= 0:
+        raise ValueError("Sample rate must be positive.")
+    return rate.numerator, rate.denominator
+
+
+def _floor_muldiv(a, num, den):
+    """Return floor(a * num / den) for an integer array, without round-off."""
+    a = np.asarray(a)
+    if a.dtype.kind not in "iu":
+        a = a.astype(np.int64)
+    if num * den >= 2 ** 62:
+        # intermediate products could overflow int64, use Python integers
+        return ((a.astype(object) * num) // den).astype(np.int64)
+    # a = q*den + r with 0 <= r < den, so only r*num needs to fit
+    q, r = np.divmod(a.astype(np.int64, copy=False), den)
+    return q * num + (r * num) // den
+
+
+def _time_to_ns(t):
+    """Return integer nanoseconds since epoch for a single time value."""
+    if isinstance(t, datetime.datetime):
+        if t.tzinfo is not None:
+            t = t.replace(tzinfo=None) - t.utcoffset()
+        td = t - _epoch_naive
+        secs = td.days * 86400 + td.seconds
+        return secs * _NS_PER_SEC + td.microseconds * 1000
+    if isinstance(t, np.datetime64):
+        return int(t.astype("datetime64[ns]").astype(np.int64))
+    if isinstance(t, numbers.Integral):
+        return int(t) * _NS_PER_SEC
+    # float timestamp, split so that the fraction is converted exactly
+    secs = int(np.floor(t))
+    return secs * _NS_PER_SEC + int(round((t - secs) * _NS_PER_SEC))
+
+
+def _times_to_ns(times):
+    """Return an int64 array of nanoseconds since epoch for array_like times."""
+    times = np.asarray(times)
+    kind = times.dtype.kind
+    if kind == "M":
+        return times.astype("datetime64[ns]").astype(np.int64)
+    if kind in "iu":
+        return times.astype(np.int64) * _NS_PER_SEC
+    if kind == "f":
+        secs = np.floor(times)
+        frac_ns = np.round((times - secs) * _NS_PER_SEC)
+        return secs.astype(np.int64) * _NS_PER_SEC + frac_ns.astype(np.int64)
+    # datetime objects or mixed values, one at a time
+    ns = [_time_to_ns(t) for t in times.ravel()]
+    return np.array(ns, dtype=np.int64).reshape(times.shape)
+
+
+def times_to_samples(times, sample_rate_numerator, sample_rate_denominator=1):
+    """Get sample indices from an array of times using an exact sample rate.
+
+    This is the array version of `time_to_sample`, using integer arithmetic
+    with the rational sample rate so that there is no float round-off.
+
+
+    Parameters
+    ----------
+    times : array_like of datetime64 | datetime | float | int
+        Times corresponding to the desired sample indices. Arrays of
+        datetime64 (of any unit) and datetime objects are converted exactly,
+        with naive datetimes interpreted as UTC. Numeric values are
+        interpreted as UTC timestamps (seconds since epoch), with floats
+        rounded to the nearest nanosecond.
+
+    sample_rate_numerator : int | Fraction
+        Numerator of the sample rate in Hz, or the rational sample rate.
+
+    sample_rate_denominator : int
+        Denominator of the sample rate in Hz.
+
+
+    Returns
+    -------
+    sample_indices : ndarray of int64
+        Index to the sample at or before each time, given in the number of
+        samples since the epoch (floor(time_since_epoch*sample_rate)). A
+        scalar `times` gives a numpy scalar.
+
+    """
+    num, den = _rational_rate(sample_rate_numerator, sample_rate_denominator)
+    ns = _times_to_ns(times)
+    return _floor_muldiv(ns, num, den * _NS_PER_SEC)[()]
+
+
+def samples_to_timedeltas(samples, sample_rate_numerator, sample_rate_denominator=1):
+    """Get durations for an array of sample counts using an exact sample rate.
+
+    This is the array version of `samples_to_timedelta`, using integer
+    arithmetic with the rational sample rate so that there is no float
+    round-off.
+
+
+    Parameters
+    ----------
+    samples : array_like of int
+        Durations in number of samples.
+
+    sample_rate_numerator : int | Fraction
+        Numerator of the sample rate in Hz, or the rational sample rate.
+
+    sample_rate_denominator : int
+        Denominator of the sample rate in Hz.
+
+
+    Returns
+    -------
+    td : ndarray of timedelta64[ns]
+        Durations corresponding to the numbers of samples, rounded down to
+        whole nanoseconds. A scalar `samples` gives a numpy scalar.
+
+    """
+    num, den = _rational_rate(sample_rate_numerator, sample_rate_denominator)
+    ns = _floor_muldiv(samples, den * _NS_PER_SEC, num)
+    return ns.astype("timedelta64[ns]")[()]
+
+
+def samples_to_datetimes(samples, sample_rate_numerator, sample_rate_denominator=1):
+    """Get times for an array of sample indices using an exact sample rate.
+
+    This is the array version of `sample_to_datetime`, using integer
+    arithmetic with the rational sample rate so that there is no float
+    round-off.
+
+
+    Parameters
+    ----------
+    samples : array_like of int
+        Sample indices in number of samples since epoch.
+
+    sample_rate_numerator : int | Fraction
+        Numerator of the sample rate in Hz, or the rational sample rate.
+
+    sample_rate_denominator : int
+        Denominator of the sample rate in Hz.
+
+
+    Returns
+    -------
+    dt : ndarray of datetime64[ns]
+        UTC times corresponding to the sample indices, rounded down to whole
+        nanoseconds. A scalar `samples` gives a numpy scalar.
+
+    """
+    num, den = _rational_rate(sample_rate_numerator, sample_rate_denominator)
+    ns = _floor_muldiv(samples, den * _NS_PER_SEC, num)
+    return ns.astype("datetime64[ns]")[()]
+
+
+def _parse_identifier_string(iden):
+    """Parse a string identifier, return (int | float | datetime, is_relative).
+
+    See `parse_identifier_to_sample` for the permitted forms. Datetimes
+    parsed from a string without a timezone are naive.
+
+    """
+    is_relative = False
+    if iden.startswith("+"):
+        is_relative = True
+        iden = iden.lstrip("+")
+    try:
+        # int or float
+        iden = ast.literal_eval(iden)
+    except (ValueError, SyntaxError):
+        if is_relative:
+            raise ValueError('"+" identifier must be followed by an integer or float.')
+        if iden.lower().startswith("now"):
+            dt = pytz.utc.localize(datetime.datetime.utcnow())
+            if iden.lower().endswith("ish"):
+                dt = dt.replace(microsecond=0) + datetime.timedelta(seconds=1)
+            iden = dt
+        else:
+            # parse to datetime (dateutil is slow to import, so only here)
+            import dateutil.parser
+
+            iden = dateutil.parser.parse(iden)
+    return iden, is_relative
+
+
 def parse_identifier_to_sample(iden, samples_per_second=None, ref_index=None):
     """Get a sample index from different forms of identifiers.
 
@@ -183,25 +379,7 @@ def parse_identifier_to_sample(iden, samples_per_second=None, ref_index=None):
     if iden is None or iden == "":
         return None
     elif isinstance(iden, six.string_types):
-        if iden.startswith("+"):
-            is_relative = True
-            iden = iden.lstrip("+")
-        try:
-            # int or float
-            iden = ast.literal_eval(iden)
-        except (ValueError, SyntaxError):
-            if is_relative:
-                raise ValueError(
-                    '"+" identifier must be followed by an integer or float.'
-                )
-            if iden.lower().startswith("now"):
-                dt = pytz.utc.localize(datetime.datetime.utcnow())
-                if iden.lower().endswith("ish"):
-                    dt = dt.replace(microsecond=0) + datetime.timedelta(seconds=1)
-                iden = dt
-            else:
-                # parse to datetime
-                iden = dateutil.parser.parse(iden)
+        iden, is_relative = _parse_identifier_string(iden)
 
     if not isinstance(iden, six.integer_types):
         if samples_per_second is None:
@@ -220,6 +398,84 @@ def parse_identifier_to_sample(iden, samples_per_second=None, ref_index=None):
         return idx
 
 
+def parse_identifiers_to_samples(
+    idens, sample_rate_numerator=None, sample_rate_denominator=1, ref_index=None
+):
+    """Get sample indices from an array of identifiers.
+
+    This is the array version of `parse_identifier_to_sample`, where times
+    are converted with `times_to_samples` using the exact rational sample
+    rate.
+
+
+    Parameters
+    ----------
+    idens : array_like of int | float | string | datetime | datetime64
+        Identifiers in any of the forms accepted by
+        `parse_identifier_to_sample` except None or ''. Integer arrays are
+        returned as sample indices, and float and datetime64 arrays are
+        converted as times without looking at individual elements.
+
+    sample_rate_numerator : int | Fraction, required for time identifiers
+        Numerator of the sample rate in Hz, or the rational sample rate.
+
+    sample_rate_denominator : int
+        Denominator of the sample rate in Hz.
+
+    ref_index : int/long, required for '+' string identifiers
+        Reference index from which string identifiers beginning with '+' are
+        offset.
+
+
+    Returns
+    -------
+    sample_indices : ndarray of int64
+        Indices to the identified samples given in the number of samples
+        since the epoch (time_since_epoch*sample_per_second). A scalar
+        `idens` gives a numpy scalar.
+
+    """
+    idens = np.asarray(idens)
+    kind = idens.dtype.kind
+    if kind in "iu":
+        return idens.astype(np.int64)[()]
+    if kind == "S":
+        idens = idens.astype("U")
+    elif kind in "fM":
+        if sample_rate_numerator is None:
+            raise ValueError("sample_rate_numerator required for time identifiers.")
+        return times_to_samples(idens, sample_rate_numerator, sample_rate_denominator)
+
+    flat = idens.ravel()
+    samples = np.empty(flat.shape, dtype=np.int64)
+    is_relative = np.zeros(flat.shape, dtype=bool)
+    time_idx = []
+    times = []
+    for k, iden in enumerate(flat):
+        if iden is None or iden == "":
+            raise ValueError("Empty identifiers cannot be converted to samples.")
+        if isinstance(iden, six.string_types):
+            iden, is_relative[k] = _parse_identifier_string(iden)
+        if isinstance(iden, numbers.Integral):
+            samples[k] = iden
+        else:
+            time_idx.append(k)
+            times.append(iden)
+    if times:
+        if sample_rate_numerator is None:
+            raise ValueError("sample_rate_numerator required for time identifiers.")
+        samples[time_idx] = times_to_samples(
+            np.array(times, dtype=object),
+            sample_rate_numerator,
+            sample_rate_denominator,
+        )
+    if is_relative.any():
+        if ref_index is None:
+            raise ValueError('ref_index required when relative "+" identifier is used.')
+        samples[is_relative] += ref_index
+    return samples.reshape(idens.shape)[()]
+
+
 def parse_identifier_to_time(iden, samples_per_second=None, ref_datetime=None):
     """Get a time from different forms of identifiers.
 
@@ -277,7 +533,9 @@ def parse_identifier_to_time(iden, samples_per_second=None, ref_datetime=None):
                 if iden.lower().endswith("ish"):
                     dt = dt.replace(microsecond=0) + datetime.timedelta(seconds=1)
             else:
-                # parse string to datetime
+                # parse string to datetime (dateutil imported only when needed)
+                import dateutil.parser
+
                 dt = dateutil.parser.parse(iden)
                 if dt.tzinfo is None:
                     # assume UTC if timezone was not specified in the string
@@ -10,29 +10,87 @@
 from __future__ import absolute_import, division, print_function
 
 import datetime
+import errno
 import os
 import re
+import select
 import sys
+import threading
 import time
+import traceback
+import warnings
+from collections import OrderedDict
 from contextlib import contextmanager
 
 import pytz
+from six.moves import queue
 from watchdog.events import (
     DirCreatedEvent,
+    DirDeletedEvent,
+    DirModifiedEvent,
+    DirMovedEvent,
     FileCreatedEvent,
     FileDeletedEvent,
+    FileModifiedEvent,
+    FileMovedEvent,
     RegexMatchingEventHandler,
+    generate_sub_created_events,
+    generate_sub_moved_events,
 )
 from watchdog.observers import Observer
-from watchdog.observers.api import BaseObserver, ObservedWatch
-from watchdog.observers.polling import PollingObserver
+from watchdog.observers.api import (
+    DEFAULT_EMITTER_TIMEOUT,
+    DEFAULT_OBSERVER_TIMEOUT,
+    BaseObserver,
+    EventEmitter,
+    ObservedWatch,
+)
 from watchdog.utils import unicode_paths
 from watchdog.utils.bricks import OrderedSetQueue
 
 from . import list_drf, util
 from .list_drf import RE_DMD, RE_DMDPROP, RE_DRF, RE_DRFDMD, RE_DRFDMDPROP, RE_DRFPROP
-
-__all__ = ("DigitalRFEventHandler", "DirWatcher")
+from .metrics import Metrics, MetricsServer, _add_metrics_group
+
+try:
+    from watchdog.observers.inotify_c import Inotify, InotifyConstants, InotifyEvent
+except Exception:
+    # inotify is Linux-only, and watchdog raises its own errors when the
+    # C library lacks it
+    Inotify = None
+
+# private parts of watchdog's Inotify that _DigitalRFInotify builds on,
+# (methods, attributes set in __init__)
+_INOTIFY_METHODS = (
+    "_add_watch",
+    "_parse_event_buffer",
+    "close",
+    "fd",
+    "is_recursive",
+    "remember_move_from_event",
+    "source_for_move",
+)
+_INOTIFY_ATTRS = ("_event_mask", "_inotify_fd", "_lock", "_path_for_wd", "_wd_for_path")
+
+
+def _inotify_available():
+    """Return True if the watchdog internals used for inotify are present."""
+    if Inotify is None:
+        return False
+    if not all(hasattr(Inotify, name) for name in _INOTIFY_METHODS):
+        return False
+    init_code = getattr(Inotify.__init__, "__code__", None)
+    init_names = getattr(init_code, "co_names", ())
+    return all(name in init_names for name in _INOTIFY_ATTRS)
+
+
+__all__ = (
+    "DigitalRFCatalogHandler",
+    "DigitalRFEventHandler",
+    "DigitalRFInotifyObserver",
+    "DigitalRFPollingObserver",
+    "DirWatcher",
+)
 
 
 class DigitalRFEventHandler(RegexMatchingEventHandler):
@@ -45,8 +103,20 @@ class DigitalRFEventHandler(RegexMatchingEventHandler):
     The triggered methods are: `on_created`, `on_deleted`, `on_modified`, and
     `on_moved`.
 
+    Modified events can be debounced so that a file that is modified many
+    times in quick succession (e.g. a Digital Metadata file being appended)
+    triggers `on_modified` only once it has been quiet for a while. The
+    triggered methods are never called concurrently, even when debounced
+    events are dispatched from their own thread.
+
+    Event counts and handling lag are recorded in a `digital_rf.metrics`
+    registry after `register_metrics` is called.
+
     """
 
+    # metrics.Metrics registry, set by register_metrics
+    metrics = None
+
     def __init__(
         self,
         starttime=None,
@@ -56,6 +126,8 @@ class DigitalRFEventHandler(RegexMatchingEventHandler):
         include_drf_properties=None,
         include_dmd_properties=None,
         ignore_regexes=None,
+        debounce=None,
+        debounce_max_delay=None,
     ):
         """Create Digital RF event handler for given time range and file types.
 
@@ -86,17 +158,34 @@ class DigitalRFEventHandler(RegexMatchingEventHandler):
         ignore_regexes : list
             List of regexes for ignoring matching event paths.
 
+        debounce : float | None
+            Quiet period in seconds. If not None or 0, modified events for a
+            path are held until no further modified event for it has occurred
+            for this long, and then a single modified event is dispatched.
+            Other events for the path discard its held modified event, since
+            they supersede it. Use `flush` to dispatch held events early.
+
+        debounce_max_delay : float | None
+            Maximum time in seconds a modified event is held when the file
+            keeps being modified, so that continuously-written files are still
+            handled periodically. If None, use 10 times `debounce`.
+
         """
-        # convert starttime and endtime to timedeltas for comparison
+        # convert starttime and endtime to timedeltas, and to integer
+        # milliseconds for comparison with file times
+        self._start_ms = None
         if starttime is not None:
             if starttime.tzinfo is None:
                 starttime = pytz.utc.localize(starttime)
             starttime = starttime - util.epoch
+            self._start_ms = list_drf._timedelta_to_ms(starttime, round_up=True)
         self.starttime = starttime
+        self._end_ms = None
         if endtime is not None:
             if endtime.tzinfo is None:
                 endtime = pytz.utc.localize(endtime)
             endtime = endtime - util.epoch
+            self._end_ms = list_drf._timedelta_to_ms(endtime)
         self.endtime = endtime
 
         if include_drf_properties is None:
@@ -123,11 +212,80 @@ class DigitalRFEventHandler(RegexMatchingEventHandler):
 
         if not regexes:
             raise ValueError("Must include at least one file type.")
+        # paths are matched with list_drf.classify_path, while the regexes
+        # are kept for the RegexMatchingEventHandler interface
+        self._kinds = list_drf._include_kinds(
+            include_drf, include_dmd, include_drf_properties, include_dmd_properties
+        )
+
+        self.debounce = debounce
+        if debounce_max_delay is None and debounce:
+            debounce_max_delay = 10 * debounce
+        self.debounce_max_delay = debounce_max_delay
+        # held modified events, path -> [event, first time, last time]
+        self._debounced = OrderedDict()
+        self._debounce_cond = threading.Condition()
+        self._debounce_thread = None
+        # serialize calls to the triggered methods
+        self._dispatch_lock = threading.RLock()
 
         super(DigitalRFEventHandler, self).__init__(
             regexes=regexes, ignore_regexes=ignore_regexes, ignore_directories=True
         )
 
+    def _classify_path(self, path):
+        """Return the `list_drf.PathInfo` of an included path, or None."""
+        path = unicode_paths.decode(path)
+        info = list_drf.classify_path(path)
+        if info is None or info.kind not in self._kinds:
+            return None
+        if self.ignore_regexes and any(r.match(path) for r in self.ignore_regexes):
+            return None
+        return info
+
+    def _match_event(self, event, match_time=True):
+        """Return the event to dispatch if it matches, otherwise None.
+
+        A moved event with only one matching path is changed to a deleted or
+        created event.
+
+        """
+        if self.ignore_directories and event.is_directory:
+            return None
+
+        info = None
+        if event.src_path:
+            info = self._classify_path(event.src_path)
+
+        if getattr(event, "dest_path", None) is not None:
+            dest_info = self._classify_path(event.dest_path)
+            # change move event to deleted/created if both paths didn't match
+            if dest_info is None:
+                if info is not None:
+                    event = FileDeletedEvent(event.src_path)
+            else:
+                if info is None:
+                    event = FileCreatedEvent(event.dest_path)
+                info = dest_info
+
+        if info is None:
+            return None
+
+        # paths matched, now check the time (in integer milliseconds)
+        if match_time and info.time is not None:
+            if self._start_ms is not None and info.time < self._start_ms:
+                return None
+            elif self._end_ms is not None and info.time > self._end_ms:
+                return None
+
+        # the event matched, including time if applicable
+        if self.debounce:
+            if event.event_type == "modified":
+                self._debounce_event(event)
+                return None
+            self._discard_debounced(event.src_path)
+        return event
+
     def dispatch(self, event, match_time=True):
         """Dispatch events to the appropriate methods.
 
@@ -141,66 +299,593 @@ class DigitalRFEventHandler(RegexMatchingEventHandler):
             handler's starttime and endtime.
 
         """
-        if self.ignore_directories and event.is_directory:
-            return
+        event = self._match_event(event, match_time=match_time)
+        if event is not None:
+            self._dispatch_matched(event)
+            if self.metrics is not None:
+                self._record_metrics([event])
 
-        src_match = False
-        if event.src_path:
-            src_path = unicode_paths.decode(event.src_path)
-            if not any(r.match(src_path) for r in self.ignore_regexes):
-                for r in self.regexes:
-                    m = r.match(src_path)
-                    if m:
-                        src_match = True
-                        match = m
-
-        dest_match = False
-        if getattr(event, "dest_path", None) is not None:
-            dest_path = unicode_paths.decode(event.dest_path)
-            if not any(r.match(dest_path) for r in self.ignore_regexes):
-                for r in self.regexes:
-                    m = r.match(dest_path)
-                    if m:
-                        dest_match = True
-                        match = m
-
-            # change move event to deleted/created if both regexes didn't match
-            if src_match and not dest_match:
-                event = FileDeletedEvent(event.src_path)
-            elif dest_match and not src_match:
-                event = FileCreatedEvent(event.dest_path)
-
-        if not src_match and not dest_match:
-            return
+    def dispatch_batch(self, events):
+        """Dispatch a batch of events, such as all those read at once.
 
-        # regexes matched, now check the time
-        if match_time:
-            try:
-                secs = int(match.group("secs"))
-            except (IndexError, TypeError):
-                # no time, don't need to check it
-                pass
-            else:
+        The matching events are passed together to `_dispatch_matched_batch`,
+        which subclasses can override to handle many events at once.
+
+        """
+        matched = []
+        for event in events:
+            event = self._match_event(event)
+            if event is not None:
+                matched.append(event)
+        if matched:
+            self._dispatch_matched_batch(matched)
+            if self.metrics is not None:
+                self._record_metrics(matched)
+
+    def register_metrics(self, metrics):
+        """Record event counts and handling lag in a `Metrics` registry."""
+        metrics.counter("events_total", "Digital RF/Metadata file events handled.")
+        metrics.summary(
+            "handling_lag_seconds",
+            "Time from the last modification of a created file until its event"
+            " was handled, sampled once per batch of events.",
+        )
+        metrics.counter("errors_total", "Errors while handling files.")
+        self.metrics = metrics
+
+    def _record_metrics(self, events):
+        """Count handled events and sample the lag of the newest file."""
+        counts = {}
+        for event in events:
+            counts[event.event_type] = counts.get(event.event_type, 0) + 1
+        for event_type, n in counts.items():
+            self.metrics.inc("events_total", n, type=event_type)
+        for event in reversed(events):
+            if event.event_type in ("created", "moved"):
+                path = getattr(event, "dest_path", None) or event.src_path
                 try:
-                    msecs = int(match.group("frac"))
-                except (IndexError, TypeError):
-                    msecs = 0
-                time = datetime.timedelta(seconds=secs, milliseconds=msecs)
-                if self.starttime is not None and time < self.starttime:
-                    return
-                elif self.endtime is not None and time > self.endtime:
-                    return
-
-        # the event matched, including time if applicable, dispatch
-        self.on_any_event(event)
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    # already gone (e.g. expired), no lag to sample
+                    break
+                lag = max(time.time() - mtime, 0)
+                self.metrics.observe("handling_lag_seconds", lag)
+                break
+
+    def _dispatch_matched(self, event):
+        """Call the methods for an event that has passed all matching."""
         _method_map = {
             "modified": self.on_modified,
             "moved": self.on_moved,
             "created": self.on_created,
             "deleted": self.on_deleted,
         }
-        event_type = event.event_type
-        _method_map[event_type](event)
+        with self._dispatch_lock:
+            self.on_any_event(event)
+            _method_map[event.event_type](event)
+
+    def _dispatch_matched_batch(self, events):
+        """Call the methods for a batch of events that passed all matching."""
+        with self._dispatch_lock:
+            for event in events:
+                self._dispatch_matched(event)
+
+    def _debounce_event(self, event):
+        now = time.time()
+        with self._debounce_cond:
+            entry = self._debounced.get(event.src_path, None)
+            if entry is None:
+                self._debounced[event.src_path] = [event, now, now]
+            else:
+                entry[0] = event
+                entry[2] = now
+            if self._debounce_thread is None:
+                self._debounce_thread = threading.Thread(
+                    target=self._run_debounce, name="DigitalRFDebounce"
+                )
+                self._debounce_thread.daemon = True
+                self._debounce_thread.start()
+            self._debounce_cond.notify()
+
+    def _discard_debounced(self, path):
+        with self._debounce_cond:
+            self._debounced.pop(path, None)
+
+    def _pop_settled(self, now):
+        """Remove and return settled events, plus the time of the next one."""
+        settled = []
+        next_due = None
+        for path, (event, first, last) in list(self._debounced.items()):
+            due = min(last + self.debounce, first + self.debounce_max_delay)
+            if due <= now:
+                settled.append(event)
+                del self._debounced[path]
+            elif next_due is None or due < next_due:
+                next_due = due
+        return settled, next_due
+
+    def _run_debounce(self):
+        """Dispatch held modified events as they settle, until none are left."""
+        while True:
+            with self._debounce_cond:
+                now = time.time()
+                settled, next_due = self._pop_settled(now)
+                if not settled:
+                    if next_due is None:
+                        # nothing held, exit and restart on the next event
+                        self._debounce_thread = None
+                        return
+                    self._debounce_cond.wait(next_due - now)
+                    continue
+            for event in settled:
+                try:
+                    self._dispatch_matched(event)
+                except Exception:
+                    traceback.print_exc()
+                    if self.metrics is not None:
+                        self.metrics.inc("errors_total", source="handler")
+            if self.metrics is not None:
+                self._record_metrics(settled)
+
+    def pending(self):
+        """Return the number of held modified events."""
+        with self._debounce_cond:
+            return len(self._debounced)
+
+    def flush(self):
+        """Dispatch all held modified events now, e.g. before stopping."""
+        with self._debounce_cond:
+            events = [entry[0] for entry in self._debounced.values()]
+            self._debounced.clear()
+        for event in events:
+            self._dispatch_matched(event)
+
+
+class DigitalRFCatalogHandler(DigitalRFEventHandler):
+    """Event handler for keeping a Digital RF file catalog up to date.
+
+    Created and modified files are added to or updated in the catalog, and
+    deleted files are removed from it.
+
+    """
+
+    def __init__(self, catalog, **kwargs):
+        """Create catalog handler for a `digital_rf.catalog.DigitalRFCatalog`.
+
+        Other keyword arguments are passed to `DigitalRFEventHandler`.
+
+        """
+        self.catalog = catalog
+        super(DigitalRFCatalogHandler, self).__init__(**kwargs)
+
+    def on_created(self, event):
+        """Add new file to the catalog."""
+        self.catalog.add_files([event.src_path])
+
+    def on_deleted(self, event):
+        """Remove deleted file from the catalog."""
+        self.catalog.remove_files([event.src_path])
+
+    def on_modified(self, event):
+        """Update modified file in the catalog."""
+        self.catalog.add_files([event.src_path])
+
+    def on_moved(self, event):
+        """Track moved file in the catalog."""
+        self.catalog.remove_files([event.src_path])
+        self.catalog.add_files([event.dest_path])
+
+
+def _keep_inotify_name(name, mask):
+    """Return True if an inotify event for file `name` can be of interest.
+
+    Only HDF5 files are kept, and for temporary 'tmp.' files (written by the
+    Digital RF and Digital Metadata writers before being renamed) only moves
+    from are kept so they can be paired with the move to the final name.
+
+    """
+    if not name.endswith(b".h5"):
+        return False
+    if name.startswith(b"tmp."):
+        return bool(mask & InotifyConstants.IN_MOVED_FROM)
+    return True
+
+
+if Inotify is not None:
+
+    class _DigitalRFInotify(Inotify):
+        """Inotify reader that filters raw events before creating objects.
+
+        Events for files are dropped unless `_keep_inotify_name` is True for
+        them, which removes the bulk of the events generated while files are
+        written and leaves directory events untouched.
+
+        """
+
+        # read up to this many bytes of events at once (~40000 events)
+        event_buffer_size = 1024 * 1024
+
+        def _recursive_simulate(self, src_path):
+            """Return created events for the contents of a new directory."""
+            events = []
+            for root, dirnames, filenames in os.walk(src_path):
+                for dirname in dirnames:
+                    full_path = os.path.join(root, dirname)
+                    try:
+                        wd_dir = self._add_watch(full_path, self._event_mask)
+                    except OSError:
+                        continue
+                    events.append(
+                        InotifyEvent(
+                            wd_dir,
+                            InotifyConstants.IN_CREATE | InotifyConstants.IN_ISDIR,
+                            0,
+                            dirname,
+                            full_path,
+                        )
+                    )
+                wd_parent_dir = self._wd_for_path.get(root, None)
+                if wd_parent_dir is None:
+                    continue
+                for filename in filenames:
+                    if not _keep_inotify_name(filename, InotifyConstants.IN_CREATE):
+                        continue
+                    events.append(
+                        InotifyEvent(
+                            wd_parent_dir,
+                            InotifyConstants.IN_CREATE,
+                            0,
+                            filename,
+                            os.path.join(root, filename),
+                        )
+                    )
+            return events
+
+        def read_events(self, event_buffer_size=None):
+            """Read all available events in one call and return a list."""
+            if event_buffer_size is None:
+                event_buffer_size = self.event_buffer_size
+            while True:
+                try:
+                    event_buffer = os.read(self._inotify_fd, event_buffer_size)
+                except OSError as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    raise
+                break
+
+            is_dir = InotifyConstants.IN_ISDIR
+            event_list = []
+            with self._lock:
+                for wd, mask, cookie, name in Inotify._parse_event_buffer(event_buffer):
+                    if wd == -1:
+                        continue
+                    if (
+                        name
+                        and not mask & is_dir
+                        and not _keep_inotify_name(name, mask)
+                    ):
+                        continue
+                    wd_path = self._path_for_wd.get(wd, None)
+                    if wd_path is None:
+                        # event for a watch that has already been removed
+                        continue
+                    src_path = os.path.join(wd_path, name) if name else wd_path
+                    event = InotifyEvent(wd, mask, cookie, name, src_path)
+
+                    if event.is_moved_from:
+                        self.remember_move_from_event(event)
+                    elif event.is_moved_to:
+                        move_src_path = self.source_for_move(event)
+                        if move_src_path in self._wd_for_path:
+                            moved_wd = self._wd_for_path.pop(move_src_path)
+                            self._wd_for_path[src_path] = moved_wd
+                            self._path_for_wd[moved_wd] = src_path
+
+                    if event.is_ignored:
+                        # clean up book-keeping for deleted watches
+                        path = self._path_for_wd.pop(wd)
+                        if self._wd_for_path.get(path, None) == wd:
+                            del self._wd_for_path[path]
+                        continue
+
+                    event_list.append(event)
+
+                    if self.is_recursive and event.is_directory and event.is_create:
+                        try:
+                            self._add_watch(src_path, self._event_mask)
+                        except OSError:
+                            continue
+                        event_list.extend(self._recursive_simulate(src_path))
+
+            return event_list
+
+
+class DigitalRFInotifyEmitter(EventEmitter):
+    """inotify emitter that reads events in bulk and filters them early.
+
+    All events available from inotify are read with a single system call,
+    file events are filtered on their name before event objects are created
+    (see `_keep_inotify_name`), and move events are paired by their cookie
+    without waiting on each other. A move out of the watched tree is emitted
+    as a deleted event once it has gone unpaired for `move_delay` seconds,
+    and a move into the tree as a created event. Unlike the watchdog
+    emitter, no directory modified events are generated for changes to
+    files.
+
+    """
+
+    # seconds to wait for the move to event paired with a move from event
+    move_delay = 0.5
+
+    def __init__(self, event_queue, watch, timeout=DEFAULT_EMITTER_TIMEOUT):
+        EventEmitter.__init__(self, event_queue, watch, timeout)
+        # not named `_inotify` so that DirWatcher.all_alive does not expect
+        # it to be a thread
+        self._drf_inotify = None
+        self._moves_from = OrderedDict()
+
+    def on_thread_start(self):
+        path = unicode_paths.encode(self.watch.path)
+        self._drf_inotify = _DigitalRFInotify(path, self.watch.is_recursive)
+
+    def on_thread_stop(self):
+        if self._drf_inotify is not None:
+            self._drf_inotify.close()
+
+    def _decode_path(self, path):
+        """Decode path only if a unicode path was passed to this emitter."""
+        if isinstance(self.watch.path, bytes):
+            return path
+        return unicode_paths.decode(path)
+
+    def queue_events(self, timeout):
+        """Read all available events and queue the resulting watchdog events."""
+        inotify = self._drf_inotify
+        try:
+            readable, _, _ = select.select([inotify.fd], [], [], timeout)
+            events = inotify.read_events() if readable else []
+        except (OSError, ValueError, select.error):
+            # inotify is closed when the emitter is stopped
+            if not self.should_keep_running():
+                return
+            raise
+
+        now = time.time()
+        recursive = self.watch.is_recursive
+        for event in events:
+            src_path = self._decode_path(event.src_path)
+            if event.is_moved_from:
+                self._moves_from[event.cookie] = (event, now)
+            elif event.is_moved_to:
+                held = self._moves_from.pop(event.cookie, None)
+                if held is not None:
+                    from_path = self._decode_path(held[0].src_path)
+                    cls = DirMovedEvent if event.is_directory else FileMovedEvent
+                    self.queue_event(cls(from_path, src_path))
+                    if event.is_directory and recursive:
+                        for sub_event in generate_sub_moved_events(from_path, src_path):
+                            self.queue_event(sub_event)
+                else:
+                    cls = DirCreatedEvent if event.is_directory else FileCreatedEvent
+                    self.queue_event(cls(src_path))
+                    if event.is_directory and recursive:
+                        for sub_event in generate_sub_created_events(src_path):
+                            self.queue_event(sub_event)
+            elif event.is_attrib or event.is_modify:
+                cls = DirModifiedEvent if event.is_directory else FileModifiedEvent
+                self.queue_event(cls(src_path))
+            elif event.is_delete:
+                cls = DirDeletedEvent if event.is_directory else FileDeletedEvent
+                self.queue_event(cls(src_path))
+            elif event.is_create:
+                cls = DirCreatedEvent if event.is_directory else FileCreatedEvent
+                self.queue_event(cls(src_path))
+
+        # moves from that have not been paired left the watched tree
+        while self._moves_from:
+            cookie, (event, t) = next(iter(self._moves_from.items()))
+            if now - t < self.move_delay:
+                break
+            del self._moves_from[cookie]
+            src_path = self._decode_path(event.src_path)
+            cls = DirDeletedEvent if event.is_directory else FileDeletedEvent
+            self.queue_event(cls(src_path))
+
+
+class DigitalRFInotifyObserver(BaseObserver):
+    """Observer using `DigitalRFInotifyEmitter`, available only on Linux.
+
+    The emitter builds on private parts of watchdog's inotify support, so it
+    is only available with watchdog versions that have them (checked with
+    `_inotify_available`).
+
+    """
+
+    def __init__(self, timeout=DEFAULT_OBSERVER_TIMEOUT):
+        if Inotify is None:
+            raise RuntimeError("inotify is not available on this system.")
+        if not _inotify_available():
+            raise RuntimeError(
+                "The installed watchdog version is not supported by"
+                " DigitalRFInotifyObserver."
+            )
+        BaseObserver.__init__(
+            self, emitter_class=DigitalRFInotifyEmitter, timeout=timeout
+        )
+
+
+class _PolledDir(object):
+    """State of a directory seen by `DigitalRFPollingEmitter`."""
+
+    __slots__ = ("mtime", "scan_time", "files", "subdirs")
+
+    def __init__(self, mtime, scan_time, files, subdirs):
+        self.mtime = mtime
+        self.scan_time = scan_time
+        # {name: (size, mtime)} of files that can be of interest
+        self.files = files
+        self.subdirs = subdirs
+
+
+class DigitalRFPollingEmitter(EventEmitter):
+    """Polling emitter that rescans only directories that may have changed.
+
+    Every directory in the watched tree is stat'ed on each poll, but it is
+    only listed again if its modification time has changed (or changed
+    recently enough that a coarse timestamp could hide a later change), and
+    the files in it are only stat'ed if it was listed or is not one of the
+    older time-stamped subdirectories of its parent. Since Digital RF data
+    are written in time order, only the `newest_subdirs` newest time-stamped
+    subdirectories of each channel have their files checked for
+    modifications, so a poll costs the number of directories plus the
+    number of recent files instead of the number of all files.
+
+    As with `DigitalRFInotifyEmitter`, only HDF5 files that are not 'tmp.'
+    files are tracked, and no directory modified events are generated.
+
+    """
+
+    # number of newest time-stamped subdirectories of a directory whose
+    # files are always checked for modifications
+    newest_subdirs = 2
+    # seconds within which a directory modification before a scan could be
+    # followed by another with the same (coarse) timestamp
+    settle = 1
+
+    def __init__(self, event_queue, watch, timeout=DEFAULT_EMITTER_TIMEOUT):
+        EventEmitter.__init__(self, event_queue, watch, timeout)
+        self._dirs = {}
+        self._lock = threading.Lock()
+
+    def on_thread_start(self):
+        # initial scan to compare against, without queuing any events
+        try:
+            self._scan_dir(self.watch.path, [], check_files=True)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _keep_name(name):
+        return name.endswith(".h5") and not name.startswith("tmp.")
+
+    def _stat_files(self, path, names, prev_files, events):
+        """Stat files in `path`, add events for changes, return new state."""
+        files = {}
+        for name in names:
+            filepath = os.path.join(path, name)
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                # removed since listing, deleted event if it was known
+                continue
+            files[name] = (st.st_size, st.st_mtime)
+        for name in sorted(set(prev_files) - set(files)):
+            events.append(FileDeletedEvent(os.path.join(path, name)))
+        for name in sorted(files):
+            prev = prev_files.get(name, None)
+            if prev is None:
+                events.append(FileCreatedEvent(os.path.join(path, name)))
+            elif prev != files[name]:
+                events.append(FileModifiedEvent(os.path.join(path, name)))
+        return files
+
+    def _forget_dir(self, path, events):
+        """Add deleted events for a removed directory and its contents."""
+        state = self._dirs.pop(path, None)
+        if state is not None:
+            for name in sorted(state.files):
+                events.append(FileDeletedEvent(os.path.join(path, name)))
+            for name in sorted(state.subdirs):
+                self._forget_dir(os.path.join(path, name), events)
+        events.append(DirDeletedEvent(path))
+
+    def _scan_dir(self, path, events, check_files=False):
+        """Scan the directory at `path` and add events for its changes.
+
+        Raises OSError if the directory does not exist.
+
+        """
+        st = os.stat(path)
+        now = time.time()
+        prev = self._dirs.get(path, None)
+        listed = (
+            prev is None
+            or st.st_mtime != prev.mtime
+            or st.st_mtime + self.settle >= prev.scan_time
+        )
+        if listed:
+            names = os.listdir(path)
+            subdirs = set()
+            filenames = []
+            for name in names:
+                if os.path.isdir(os.path.join(path, name)):
+                    subdirs.add(name)
+                elif self._keep_name(name):
+                    filenames.append(name)
+        else:
+            subdirs = prev.subdirs
+            filenames = prev.files
+        prev_files = prev.files if prev is not None else {}
+        if listed or check_files:
+            files = self._stat_files(path, filenames, prev_files, events)
+        else:
+            files = prev_files
+        self._dirs[path] = _PolledDir(st.st_mtime, now, files, subdirs)
+
+        prev_subdirs = set(prev.subdirs) if prev is not None else set()
+        for name in sorted(prev_subdirs - subdirs):
+            self._forget_dir(os.path.join(path, name), events)
+        # newest time-stamped subdirectories always have their files checked
+        stamped = sorted(n for n in subdirs if list_drf._RE_SUBDIR.match(n))
+        older = set(stamped[: -self.newest_subdirs or None])
+        for name in sorted(subdirs):
+            subpath = os.path.join(path, name)
+            if name not in prev_subdirs:
+                events.append(DirCreatedEvent(subpath))
+            if not self.watch.is_recursive:
+                continue
+            try:
+                self._scan_dir(subpath, events, check_files=name not in older)
+            except OSError:
+                # removed since listing
+                self._dirs[path].subdirs.discard(name)
+                if name in prev_subdirs:
+                    self._forget_dir(subpath, events)
+
+    def queue_events(self, timeout):
+        """Poll the watched directory and queue events for the changes."""
+        # timeout behaves like an interval for polling emitters
+        if self.stopped_event.wait(timeout):
+            return
+        with self._lock:
+            if not self.should_keep_running():
+                return
+            events = []
+            try:
+                self._scan_dir(self.watch.path, events, check_files=True)
+            except OSError:
+                self._forget_dir(self.watch.path, events)
+                self.stop()
+            for event in events:
+                self.queue_event(event)
+
+
+class DigitalRFPollingObserver(BaseObserver):
+    """Observer using `DigitalRFPollingEmitter` for incremental polling."""
+
+    def __init__(self, timeout=DEFAULT_OBSERVER_TIMEOUT):
+        BaseObserver.__init__(
+            self, emitter_class=DigitalRFPollingEmitter, timeout=timeout
+        )
+
+
+def _handles_batches(handler):
+    """Return True if a handler handles a batch of events differently."""
+    base = DigitalRFEventHandler._dispatch_matched_batch
+    method = getattr(type(handler), "_dispatch_matched_batch", base)
+    # compare the underlying functions (Python 2 gives unbound methods)
+    return getattr(method, "__func__", method) is not getattr(base, "__func__", base)
 
 
 class DirWatcher(BaseObserver, RegexMatchingEventHandler):
@@ -214,11 +899,41 @@ class DirWatcher(BaseObserver, RegexMatchingEventHandler):
 
     """
 
-    def __init__(self, path, force_polling=False, **kwargs):
-        """Create observer for the directory at `path`."""
+    # maximum number of queued events that are dispatched together
+    max_batch = 1000
+
+    def __init__(self, path, force_polling=False, inotify=False, **kwargs):
+        """Create observer for the directory at `path`.
+
+        Parameters
+        ----------
+        path : string
+            Directory to watch, which need not exist yet.
+
+        force_polling : bool
+            If True, poll the file system with `DigitalRFPollingObserver`
+            instead of using the native observer for the platform.
+
+        inotify : bool
+            If True and `force_polling` is False, use
+            `DigitalRFInotifyObserver`, which filters events on their file
+            name before creating them. If it is not available (not on Linux,
+            or with an unsupported watchdog version), a warning is issued and
+            the default watchdog observer is used instead. If False, use the
+            default watchdog observer.
+
+        """
         if force_polling:
-            observer_class = PollingObserver
+            observer_class = DigitalRFPollingObserver
+        elif inotify and _inotify_available():
+            observer_class = DigitalRFInotifyObserver
         else:
+            if inotify:
+                warnings.warn(
+                    "The Digital RF inotify observer is not available on this"
+                    " system or watchdog version, using the default observer.",
+                    RuntimeWarning,
+                )
             observer_class = Observer
 
         self.root_observer = observer_class(**kwargs)
@@ -434,13 +1149,51 @@ class DirWatcher(BaseObserver, RegexMatchingEventHandler):
         return True
 
     def dispatch_events(self, event_queue, timeout):
-        """Get events from queue and dispatch them to handlers."""
+        """Get events from queue and dispatch them to handlers in batches.
+
+        After waiting for one event, all other queued events (up to
+        `max_batch`) are taken as well. Each event is dispatched to every
+        handler in turn, as watchdog does, except for handlers that handle
+        whole batches (overriding `_dispatch_matched_batch`, e.g. the
+        ringbuffer handler). These are given all of the events at once
+        through their `dispatch_batch` method after the other handlers have
+        handled them, so that e.g. a file is mirrored before it is expired.
+
+        """
         # override this so that we can schedule without dispatching events
         # immediately even while thread is running
-        if self._dispatching_enabled:
-            super(DirWatcher, self).dispatch_events(event_queue, timeout)
-        else:
+        if not self._dispatching_enabled:
             time.sleep(timeout)
+            return
+        batch = [event_queue.get(block=True, timeout=timeout)]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(event_queue.get(block=False))
+            except queue.Empty:
+                break
+        events_for_watch = OrderedDict()
+        for event, watch in batch:
+            events_for_watch.setdefault(watch, []).append(event)
+
+        try:
+            with self._lock:
+                for watch, events in events_for_watch.items():
+                    handlers = list(self._handlers.get(watch, []))
+                    batch_handlers = [h for h in handlers if _handles_batches(h)]
+                    for event in events:
+                        for handler in handlers:
+                            if handler in batch_handlers:
+                                continue
+                            # to allow unscheduling from within handlers, check
+                            # if the handler is still registered
+                            if handler in self._handlers.get(watch, []):
+                                handler.dispatch(event)
+                    for handler in batch_handlers:
+                        if handler in self._handlers.get(watch, []):
+                            handler.dispatch_batch(events)
+        finally:
+            for _ in batch:
+                event_queue.task_done()
 
     @contextmanager
     def paused_dispatching(self):
@@ -450,13 +1203,30 @@ class DirWatcher(BaseObserver, RegexMatchingEventHandler):
         self._start_dispatching()
 
 
-def _add_watchdog_group(parser):
+def _add_watchdog_group(parser, debounce=0):
     watchdoggroup = parser.add_argument_group(title="watchdog")
     watchdoggroup.add_argument(
         "--force_polling",
         action="store_true",
         help="""Force watchdog to use polling instead of the default observer.""",
     )
+    watchdoggroup.add_argument(
+        "--inotify",
+        action="store_true",
+        help="""Use the Digital RF inotify observer (Linux only), which reads
+                events in bulk and filters them on their file name before
+                creating them, instead of the default observer. Falls back to
+                the default observer if it is not supported.""",
+    )
+    watchdoggroup.add_argument(
+        "--debounce",
+        type=float,
+        default=debounce,
+        help="""Quiet period in seconds after the last modification of a file
+                before its modified event is handled, so that files that are
+                modified many times are handled once. Use 0 to handle every
+                event. (default: %(default)s)""",
+    )
     return parser
 
 
@@ -473,6 +1243,7 @@ def _build_watch_parser(Parser, *args):
     )
 
     parser = _add_watchdog_group(parser)
+    parser = _add_metrics_group(parser)
     parser = list_drf._add_time_group(parser)
     parser = list_drf._add_include_group(parser)
 
@@ -493,7 +1264,7 @@ def _run_watch(args):
 
     # subclass DigitalRFEventHandler to just print events
     class DigitalRFPrint(DigitalRFEventHandler):
-        def __init__(self, dir, force_polling=None, **kwargs):
+        def __init__(self, dir, force_polling=None, inotify=None, **kwargs):
             self.root_dir = dir
             super(DigitalRFPrint, self).__init__(**kwargs)
 
@@ -521,13 +1292,30 @@ def _run_watch(args):
 
     kwargs = vars(args).copy()
     del kwargs["func"]
+    del kwargs["metrics_port"]
+    del kwargs["metrics_host"]
     event_handler = DigitalRFPrint(**kwargs)
-    observer = DirWatcher(args.dir, force_polling=args.force_polling)
+    observer = DirWatcher(
+        args.dir, force_polling=args.force_polling, inotify=args.inotify
+    )
     observer.schedule(event_handler, args.dir, recursive=True)
+    server = None
+    if args.metrics_port is not None:
+        registry = Metrics()
+        event_handler.register_metrics(registry)
+        registry.gauge(
+            "event_queue_depth",
+            "File events waiting to be handled.",
+            observer.event_queue.qsize,
+        )
+        server = MetricsServer(registry, port=args.metrics_port, host=args.metrics_host)
     print("Type Ctrl-C to quit.")
     observer.start()
     now = datetime.datetime.utcnow().replace(microsecond=0)
     print("{0} | Monitoring {1}:".format(now, args.dir))
+    if server is not None:
+        server.start()
+        print("{0} | Serving metrics at {1}".format(now, server))
     sys.stdout.flush()
     try:
         while True:
@@ -536,6 +1324,9 @@ def _run_watch(args):
         observer.stop()
         sys.stdout.write("\n")
         sys.stdout.flush()
+    finally:
+        if server is not None:
+            server.stop()
     observer.join()
 
 
@@ -0,0 +1,136 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Benchmark the per-path cost of classifying Digital RF/Metadata file paths.
+
+Synthetic paths (no files are created) of Digital RF and Digital Metadata
+files, properties files, and temporary and other files that should not match
+are classified with:
+
+    * the path regexes from list_drf, applied one after another as the
+      watchdog event handler used to,
+    * list_drf.classify_path,
+    * the matching of a DigitalRFEventHandler with a time window, and
+    * list_drf.sortkey_drf on the file names.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import datetime
+import os
+import re
+import timeit
+
+from digital_rf import list_drf, watchdog_drf
+from watchdog.events import FileCreatedEvent
+
+# start 2014-03-09 12:30:30
+START_SECS = 1394368230
+
+
+def make_paths(n_paths, other_fraction):
+    """Return synthetic paths, with a fraction that should not match."""
+    paths = []
+    n_other = int(other_fraction * n_paths)
+    for k in range(n_paths - n_other):
+        secs = START_SECS + k // 1000
+        subdir = datetime.datetime.utcfromtimestamp(secs).strftime("%Y-%m-%dT%H-00-00")
+        if k % 10 == 0:
+            name = "metadata@{0}.h5".format(secs)
+            chdir = os.path.join("/data", "ch{0}".format(k % 16), "metadata")
+        else:
+            name = "rf@{0}.{1:03d}.h5".format(secs, k % 1000)
+            chdir = os.path.join("/data", "ch{0}".format(k % 16))
+        paths.append(os.path.join(chdir, subdir, name))
+    for k in range(n_other):
+        chdir = os.path.join("/data", "ch{0}".format(k % 16))
+        if k % 3 == 0:
+            paths.append(os.path.join(chdir, "drf_properties.h5"))
+        elif k % 3 == 1:
+            paths.append(os.path.join(chdir, "2014-03-09T12-00-00", "tmp.rf@1.000.h5"))
+        else:
+            paths.append(os.path.join(chdir, "2014-03-09T12-00-00", "log.txt"))
+    return paths
+
+
+def regex_classify(regexes, paths):
+    """Match each path against all regexes, as the event handler used to."""
+    matched = 0
+    for path in paths:
+        match = None
+        for r in regexes:
+            m = r.match(path)
+            if m:
+                match = m
+        if match is not None:
+            try:
+                secs = int(match.group("secs"))
+            except (IndexError, TypeError):
+                pass
+            else:
+                try:
+                    msecs = int(match.group("frac"))
+                except (IndexError, TypeError):
+                    msecs = 0
+                datetime.timedelta(seconds=secs, milliseconds=msecs)
+            matched += 1
+    return matched
+
+
+def run(args):
+    paths = make_paths(args.paths, args.other)
+    names = [os.path.basename(p) for p in paths]
+    regexes = [re.compile(list_drf.RE_DRFDMD), re.compile(list_drf.RE_DRFDMDPROP)]
+    handler = watchdog_drf.DigitalRFEventHandler(
+        starttime=datetime.datetime.utcfromtimestamp(START_SECS),
+        endtime=datetime.datetime.utcfromtimestamp(START_SECS + args.paths),
+    )
+    events = [FileCreatedEvent(p) for p in paths]
+
+    benchmarks = [
+        ("path regexes", lambda: regex_classify(regexes, paths)),
+        ("classify_path", lambda: [list_drf.classify_path(p) for p in paths]),
+        ("handler match", lambda: [handler._match_event(e) for e in events]),
+        ("sortkey_drf", lambda: [list_drf.sortkey_drf(n) for n in names]),
+    ]
+    for label, fun in benchmarks:
+        secs = min(timeit.repeat(fun, number=1, repeat=args.repeat))
+        print("{0:>14}: {1:.3f} us/path".format(label, 1e6 * secs / len(paths)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-n",
+        "--paths",
+        type=int,
+        default=100000,
+        help="Number of paths to classify. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--other",
+        type=float,
+        default=0.1,
+        help="""Fraction of the paths that are properties, temporary, or other
+                files. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of timing repetitions, the best is reported."
+        " (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
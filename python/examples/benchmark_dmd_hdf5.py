@@ -0,0 +1,340 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Benchmark Digital Metadata write and read in different configurations.
+
+Each case writes metadata with DigitalMetadataWriter.write in blocks of
+samples and reads it back with DigitalMetadataReader.read and read_dataframe.
+The cases cover metadata shapes (many scalar fields, nested dictionaries, and
+array fields), sample rates from 1 Hz to 1 kHz, and input given as a list of
+dicts or as a dict of arrays.
+
+Results are printed as a table and can be saved as JSON with --output. Passing
+the JSON output of an earlier run with --baseline compares the two and exits
+with a non-zero status if any rate dropped by more than --tolerance, so that
+regressions can be tracked across releases.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import digital_rf
+import h5py
+import numpy as np
+
+try:
+    import pandas  # noqa: F401
+except ImportError:
+    HAS_PANDAS = False
+else:
+    HAS_PANDAS = True
+
+# start 2014-03-09 12:30:30
+START_SECS = 1394368230
+SUBDIR_CADENCE_SECS = 3600
+FILE_CADENCE_SECS = 10
+
+SAMPLE_RATES = (1, 100, 1000)
+SHAPES = ("scalars", "nested", "arrays")
+INPUTS = ("list", "dict")
+METRICS = ("write", "read", "read_dataframe")
+
+
+def make_data(shape, ks):
+    """Return list of metadata dicts for sample numbers `ks`."""
+    data = []
+    for k in ks:
+        if shape == "scalars":
+            d = {"f%02i" % i: np.float64(k + i / 10) for i in range(10)}
+            d.update({"i%02i" % i: np.int64(k * i) for i in range(10)})
+        elif shape == "nested":
+            d = dict(
+                receiver=dict(
+                    id="rx0",
+                    gain=np.float64(k % 30),
+                    lo=dict(freq=np.float64(440e6 + k), locked=np.bool_(True)),
+                ),
+                processing=dict(
+                    decimation=np.int64(4),
+                    filter=dict(taps=np.int64(64), cutoff=np.float64(0.45)),
+                ),
+                sample_count=np.int64(k),
+            )
+        elif shape == "arrays":
+            d = dict(
+                center_frequencies=np.linspace(440e6, 450e6, 16) + k,
+                gains=np.full(16, k % 30, dtype=np.float32),
+                calibration=(np.arange(16, dtype=np.complex64) * k).reshape(4, 4),
+                sample_count=np.int64(k),
+            )
+        else:
+            raise ValueError("Unknown shape {0}".format(shape))
+        data.append(d)
+    return data
+
+
+def to_dict_of_arrays(data):
+    """Convert a list of metadata dicts to a dict of stacked arrays."""
+    first = data[0]
+    ret = {}
+    for key, val in first.items():
+        if isinstance(val, dict):
+            ret[key] = to_dict_of_arrays([d[key] for d in data])
+        elif isinstance(val, str):
+            # constant strings are given once for all samples
+            ret[key] = val
+        else:
+            ret[key] = np.stack([d[key] for d in data])
+    return ret
+
+
+def run_case(datadir, shape, sample_rate, input_type, n_samples, block_size):
+    """Write and read one case, returning the time in seconds for each step."""
+    chdir = os.path.join(datadir, "{0}_{1}_{2}".format(shape, sample_rate, input_type))
+    shutil.rmtree(chdir, ignore_errors=True)
+    os.makedirs(chdir)
+    start_sample = START_SECS * sample_rate
+
+    # prepare the input outside of the timing
+    blocks = []
+    for k0 in range(0, n_samples, block_size):
+        ks = range(k0, min(k0 + block_size, n_samples))
+        samples = [start_sample + k for k in ks]
+        data = make_data(shape, ks)
+        if input_type == "dict":
+            data = to_dict_of_arrays(data)
+        blocks.append((samples, data))
+
+    writer = digital_rf.DigitalMetadataWriter(
+        chdir, SUBDIR_CADENCE_SECS, FILE_CADENCE_SECS, sample_rate, 1, "metadata"
+    )
+    t = time.time()
+    for samples, data in blocks:
+        writer.write(samples, data)
+    times = dict(write=time.time() - t)
+
+    end_sample = start_sample + n_samples - 1
+    reader = digital_rf.DigitalMetadataReader(chdir)
+    t = time.time()
+    result = reader.read(start_sample, end_sample)
+    times["read"] = time.time() - t
+    assert len(result) == n_samples
+
+    if HAS_PANDAS:
+        t = time.time()
+        df = reader.read_dataframe(start_sample, end_sample)
+        times["read_dataframe"] = time.time() - t
+        assert len(df) == n_samples
+    else:
+        times["read_dataframe"] = None
+
+    shutil.rmtree(chdir, ignore_errors=True)
+    return times
+
+
+def run_benchmarks(args):
+    """Run all selected cases and return the list of results."""
+    datadir = tempfile.mkdtemp(prefix="benchmark_dmd_", dir=args.datadir)
+    results = []
+    try:
+        for shape, sample_rate, input_type in itertools.product(
+            args.shapes, args.sample_rates, args.inputs
+        ):
+            name = "{0}/{1}Hz/{2}".format(shape, sample_rate, input_type)
+            # keep the best of the repeats to reduce noise
+            best = {}
+            for _ in range(args.repeat):
+                times = run_case(
+                    datadir,
+                    shape,
+                    sample_rate,
+                    input_type,
+                    args.samples,
+                    args.block_size,
+                )
+                for metric, secs in times.items():
+                    if secs is not None and (metric not in best or secs < best[metric]):
+                        best[metric] = secs
+            result = dict(case=name, samples=args.samples)
+            for metric in METRICS:
+                secs = best.get(metric, None)
+                result[metric + "_seconds"] = secs
+                result[metric + "_samples_per_second"] = (
+                    args.samples / secs if secs else None
+                )
+            results.append(result)
+            print(format_result(result))
+            sys.stdout.flush()
+    finally:
+        shutil.rmtree(datadir, ignore_errors=True)
+    return results
+
+
+def format_result(result):
+    """Return one line of the results table."""
+    rates = []
+    for metric in METRICS:
+        rate = result[metric + "_samples_per_second"]
+        rates.append("{0:>16}".format("-" if rate is None else "%.0f" % rate))
+    return "{0:<24}".format(result["case"]) + "".join(rates)
+
+
+def compare(results, baseline, tolerance):
+    """Compare results to a baseline, returning a list of regressions."""
+    baseline_results = {r["case"]: r for r in baseline["results"]}
+    regressions = []
+    print("\nComparison to baseline (ratio of samples per second):")
+    for result in results:
+        base = baseline_results.get(result["case"], None)
+        if base is None:
+            continue
+        ratios = []
+        for metric in METRICS:
+            key = metric + "_samples_per_second"
+            new, old = result.get(key, None), base.get(key, None)
+            if not new or not old:
+                ratios.append("{0:>16}".format("-"))
+                continue
+            ratio = new / old
+            flag = ""
+            if ratio < 1 - tolerance:
+                flag = "*"
+                regressions.append((result["case"], metric, ratio))
+            ratios.append("{0:>16}".format("%.2f%s" % (ratio, flag)))
+        print("{0:<24}".format(result["case"]) + "".join(ratios))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-n",
+        "--samples",
+        type=int,
+        default=3000,
+        help="Number of metadata samples written per case. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-b",
+        "--block_size",
+        type=int,
+        default=100,
+        help="Number of samples per write call. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=3,
+        help="Repeat each case and keep the best time. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--shapes",
+        nargs="+",
+        choices=SHAPES,
+        default=SHAPES,
+        help="Metadata shapes to benchmark. (default: all)",
+    )
+    parser.add_argument(
+        "--sample_rates",
+        nargs="+",
+        type=int,
+        default=SAMPLE_RATES,
+        help="Sample rates in Hz to benchmark. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--inputs",
+        nargs="+",
+        choices=INPUTS,
+        default=INPUTS,
+        help="Forms of write input to benchmark. (default: all)",
+    )
+    parser.add_argument(
+        "--datadir",
+        default=None,
+        help="Directory in which to write temporary data. (default: system tmp)",
+    )
+    parser.add_argument(
+        "-o", "--output", default=None, help="Save the results as JSON to this file."
+    )
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        help="JSON results of an earlier run to compare against.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help=(
+            "Fractional drop in samples per second relative to the baseline"
+            " that is reported as a regression. (default: %(default)s)"
+        ),
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print(
+        "{0:<24}".format("case (samples/second)")
+        + "".join("{0:>16}".format(m) for m in METRICS)
+    )
+    results = run_benchmarks(args)
+
+    output = dict(
+        benchmark="digital_metadata",
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        versions=dict(
+            digital_rf=digital_rf.__version__,
+            python=platform.python_version(),
+            numpy=np.__version__,
+            h5py=h5py.__version__,
+            hdf5=h5py.version.hdf5_version,
+        ),
+        platform=platform.platform(),
+        params=dict(
+            samples=args.samples,
+            block_size=args.block_size,
+            repeat=args.repeat,
+            subdir_cadence_secs=SUBDIR_CADENCE_SECS,
+            file_cadence_secs=FILE_CADENCE_SECS,
+        ),
+        results=results,
+    )
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+        print("\nResults saved to {0}".format(args.output))
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for case, metric, ratio in regressions:
+                print("  {0} {1}: {2:.2f}x baseline".format(case, metric, ratio))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
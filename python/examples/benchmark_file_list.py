@@ -0,0 +1,132 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Benchmark generating the names of the data files spanning a read.
+
+The file names that could contain a span of samples are generated (no files
+are created) with the per-subdirectory numpy arrays and datetime formatting
+that DigitalRFReader._get_file_list used to use, and with the lazy sequence
+it now returns. Each is timed for listing all of the names, and for getting
+only the last name (as get_last_write and forward-filled metadata reads do).
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import datetime
+import os
+import timeit
+
+import numpy as np
+from digital_rf import DigitalRFReader
+
+# start 2014-03-09 12:30:30
+START_SECS = 1394368230
+
+
+def arange_file_list(
+    sample0, sample1, sps, subdir_cadence_seconds, file_cadence_millisecs
+):
+    """Return the list of file names as the reader used to generate them."""
+    start_msts = int(np.uint64(sample0 / sps * 1000))
+    end_msts = int(np.uint64(sample1 / sps * 1000))
+    start_ts = start_msts // 1000
+    end_ts = end_msts // 1000 + 1
+    start_sub_ts = (start_ts // subdir_cadence_seconds) * subdir_cadence_seconds
+    end_sub_ts = (end_ts // subdir_cadence_seconds) * subdir_cadence_seconds
+    ret_list = []
+    for sub_ts in range(
+        start_sub_ts, end_sub_ts + subdir_cadence_seconds, subdir_cadence_seconds
+    ):
+        subdir = datetime.datetime.utcfromtimestamp(sub_ts).strftime(
+            "%Y-%m-%dT%H-%M-%S"
+        )
+        file_msts_in_subdir = np.arange(
+            sub_ts * 1000,
+            (sub_ts + subdir_cadence_seconds) * 1000,
+            file_cadence_millisecs,
+        )
+        valid_in_subdir = np.logical_and(
+            file_msts_in_subdir + file_cadence_millisecs - 1 >= start_msts,
+            file_msts_in_subdir <= end_msts,
+        )
+        for valid_file_ts in np.compress(valid_in_subdir, file_msts_in_subdir):
+            file_basename = "rf@%i.%03i.h5" % (
+                valid_file_ts // 1000,
+                valid_file_ts % 1000,
+            )
+            ret_list.append(os.path.join(subdir, file_basename))
+    return ret_list
+
+
+def run(args):
+    num, den = args.rate, 1
+    sps = np.longdouble(num)
+    sample0 = START_SECS * num
+    sample1 = sample0 + int(args.hours * 3600 * num) - 1
+    params = (args.subdir_cadence, args.file_cadence)
+
+    def lazy_file_list():
+        return DigitalRFReader._get_file_list(sample0, sample1, num, den, *params)
+
+    old = arange_file_list(sample0, sample1, sps, *params)
+    assert list(lazy_file_list()) == old
+
+    benchmarks = [
+        ("arange, all", lambda: arange_file_list(sample0, sample1, sps, *params)),
+        ("lazy, all", lambda: list(lazy_file_list())),
+        ("arange, last", lambda: arange_file_list(sample0, sample1, sps, *params)[-1]),
+        ("lazy, last", lambda: lazy_file_list()[-1]),
+    ]
+    print("{0} hours, {1} files".format(args.hours, len(old)))
+    for label, fun in benchmarks:
+        secs = min(timeit.repeat(fun, number=1, repeat=args.repeat))
+        print("{0:>13}: {1:10.3f} ms".format(label, 1e3 * secs))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--hours",
+        type=float,
+        default=24,
+        help="Length of the read in hours. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        type=int,
+        default=1000000,
+        help="Sample rate in Hz. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--subdir_cadence",
+        type=int,
+        default=3600,
+        help="Subdirectory cadence in seconds. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--file_cadence",
+        type=int,
+        default=1000,
+        help="File cadence in milliseconds. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of timing repetitions, the best is reported."
+        " (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
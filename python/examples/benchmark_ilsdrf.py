@@ -0,0 +1,146 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Benchmark listing of Digital RF files with ilsdrf.
+
+The listing is timed for different numbers of worker threads, either on an
+existing directory or on a synthetic archive of empty files. On a local disk
+directory listings are fast, so --latency can be used to add a delay to each
+listing of a time-stamped subdirectory to emulate a network filesystem.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from digital_rf import list_drf
+
+# start 2014-03-09 12:30:30
+START_SECS = 1394368230
+
+
+def create_archive(root, n_subdirs, n_files):
+    """Create a Digital RF channel of empty files with the given shape."""
+    chdir = os.path.join(root, "ch0")
+    os.makedirs(chdir)
+    open(os.path.join(chdir, "drf_properties.h5"), "w").close()
+    for k in range(n_subdirs):
+        secs = START_SECS + 3600 * k
+        subdir = os.path.join(
+            chdir,
+            datetime.datetime.utcfromtimestamp(secs).strftime("%Y-%m-%dT%H-%M-%S"),
+        )
+        os.makedirs(subdir)
+        for j in range(n_files):
+            name = "rf@{0}.{1:03d}.h5".format(secs + j, 0)
+            open(os.path.join(subdir, name), "w").close()
+    return chdir
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "dir",
+        nargs="?",
+        default=None,
+        help="Directory to list. (default: create a synthetic archive)",
+    )
+    parser.add_argument(
+        "-s",
+        "--subdirs",
+        type=int,
+        default=100,
+        help="Number of subdirectories in the synthetic archive."
+        " (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-f",
+        "--files",
+        type=int,
+        default=360,
+        help="Number of files per subdirectory in the synthetic archive."
+        " (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16],
+        help="Numbers of worker threads to benchmark. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-l",
+        "--latency",
+        type=float,
+        default=0,
+        help="Seconds added to each subdirectory listing. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=3,
+        help="Repeat each listing and keep the best time. (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    tmpdir = None
+    path = args.dir
+    if path is None:
+        tmpdir = tempfile.mkdtemp(prefix="benchmark_ilsdrf_")
+        print(
+            "Creating archive with {0} subdirectories of {1} files".format(
+                args.subdirs, args.files
+            )
+        )
+        path = create_archive(tmpdir, args.subdirs, args.files)
+
+    if args.latency > 0:
+        listdir = list_drf._listdir
+
+        def slow_listdir(p):
+            time.sleep(args.latency)
+            return listdir(p)
+
+        list_drf._listdir = slow_listdir
+
+    try:
+        for workers in args.workers:
+            best = float("inf")
+            for _ in range(args.repeat):
+                t = time.time()
+                n = 0
+                for _f in list_drf.ilsdrf(path, workers=workers):
+                    n += 1
+                best = min(best, time.time() - t)
+            print(
+                "workers={0:<4} {1} files in {2:.3f} s ({3:.0f} files/s)".format(
+                    workers, n, best, n / best
+                )
+            )
+            sys.stdout.flush()
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
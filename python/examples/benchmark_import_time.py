@@ -0,0 +1,110 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Benchmark the import and command startup time of the digital_rf package.
+
+Each case is run in a fresh interpreter and timed from start to exit, with
+the time of a bare interpreter start subtracted. The best of a number of
+repetitions is reported, along with the third party packages that were
+imported. If --max-ms is given, the script exits with an error when a case
+that is expected to be light takes longer than that, so it can be used to
+gate import time regressions.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# (label, code, light) where light cases must not import the heavy packages
+CASES = [
+    ("import digital_rf", "import digital_rf", True),
+    ("list_drf", "from digital_rf import list_drf", True),
+    ("drf ls", "from digital_rf.drf_command import main; main(['ls', {dir!r}])", True),
+    (
+        "drf ls -r",
+        "from digital_rf.drf_command import main; main(['ls', '-r', {dir!r}])",
+        True,
+    ),
+    ("util", "from digital_rf import util", False),
+    ("DigitalRFReader", "from digital_rf import DigitalRFReader", False),
+    ("watchdog_drf", "from digital_rf import watchdog_drf", False),
+]
+
+HEAVY = ("numpy", "h5py", "pandas", "dateutil", "watchdog")
+
+
+def time_code(code, repeat):
+    """Return the best wall time of running `code` and its heavy imports."""
+    script = (
+        "import sys\n{0}\nsys.stderr.write(repr([m for m in {1!r} if m in"
+        " sys.modules]))".format(code, HEAVY)
+    )
+    best = float("inf")
+    heavy = None
+    with open(os.devnull, "w") as devnull:
+        for _ in range(repeat):
+            t = time.time()
+            proc = subprocess.Popen(
+                [sys.executable, "-c", script],
+                stdout=devnull,
+                stderr=subprocess.PIPE,
+            )
+            _, err = proc.communicate()
+            best = min(best, time.time() - t)
+            heavy = err.decode("utf-8").strip().splitlines()[-1]
+    return best, heavy
+
+
+def run(args):
+    data_dir = tempfile.mkdtemp(prefix="drf_import_bench_")
+    try:
+        base, _ = time_code("pass", args.repeat)
+        print("Interpreter startup: {0:.1f} ms".format(1e3 * base))
+        failed = []
+        for label, code, light in CASES:
+            secs, heavy = time_code(code.format(dir=data_dir), args.repeat)
+            ms = 1e3 * (secs - base)
+            print("{0:>16}: {1:7.1f} ms  imports {2}".format(label, ms, heavy))
+            if light and (heavy != "[]" or (args.max_ms and ms > args.max_ms)):
+                failed.append(label)
+    finally:
+        os.rmdir(data_dir)
+    if args.max_ms is not None and failed:
+        sys.exit("Import time regression: {0}".format(json.dumps(failed)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of timing repetitions, the best is reported."
+        " (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="""If given, fail when a light case (package import, `drf ls`)
+                takes longer than this many milliseconds or imports a heavy
+                package. (default: %(default)s)""",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
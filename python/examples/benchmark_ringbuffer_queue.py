@@ -0,0 +1,130 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Benchmark the record queues of the Digital RF ringbuffer handler.
+
+Synthetic file records (no files are created) are added to a dry-run
+ringbuffer handler with a count limit, so that once the queues are full each
+addition also expires the oldest record. A fraction of the records can be
+added out of order, and some of the queued records are then modified and
+removed as for external modifications and deletions.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import os
+import random
+import time
+
+from digital_rf import ringbuffer
+
+# start 2014-03-09 12:30:30
+START_SECS = 1394368230
+
+
+def make_records(handler, n_records, n_channels, shuffle_fraction, seed=0):
+    """Return synthetic records of one-second files in `n_channels` channels."""
+    records = []
+    for k in range(n_records // n_channels):
+        secs = START_SECS + k
+        for ch in range(n_channels):
+            path = os.path.join(
+                "/data", "ch{0}".format(ch), "2014-03-09T12-00-00", "rf@{0}.000.h5"
+            ).format(secs)
+            records.append(handler._get_file_record(path, size=1000))
+    # swap a fraction of the records with a random earlier one so they
+    # arrive out of order
+    rng = random.Random(seed)
+    for _ in range(int(shuffle_fraction * len(records))):
+        k = rng.randrange(1, len(records))
+        j = rng.randrange(max(k - 1000, 0), k)
+        records[k], records[j] = records[j], records[k]
+    return records
+
+
+def run(args):
+    handler = ringbuffer.DigitalRFRingbufferHandler(
+        count=args.count, dryrun=True, include_dmd=False
+    )
+    records = make_records(handler, args.records, args.channels, args.shuffle)
+
+    t = time.time()
+    for rec in records:
+        handler._add_record(rec)
+    add_secs = time.time() - t
+    n_queued = sum(len(q) for q in handler.queues.values())
+    print(
+        "Added {0} records ({1} expired) in {2:.2f} s: {3:.0f} records/s".format(
+            len(records), len(records) - n_queued, add_secs, len(records) / add_secs
+        )
+    )
+
+    rng = random.Random(1)
+    paths = rng.sample(sorted(handler.records), min(args.modify, n_queued))
+    t = time.time()
+    for path in paths:
+        handler._modify_record(handler._get_file_record(path, size=2000))
+    secs = time.time() - t
+    print(
+        "Modified {0} records in {1:.2f} s: {2:.0f} records/s".format(
+            len(paths), secs, len(paths) / secs if secs else float("inf")
+        )
+    )
+
+    t = time.time()
+    handler.remove_files(paths)
+    secs = time.time() - t
+    print(
+        "Removed {0} records in {1:.2f} s: {2:.0f} records/s".format(
+            len(paths), secs, len(paths) / secs if secs else float("inf")
+        )
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-n",
+        "--records",
+        type=int,
+        default=1000000,
+        help="Number of records to add. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-c",
+        "--channels",
+        type=int,
+        default=4,
+        help="Number of channels the records are spread over. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=100000,
+        help="Ringbuffer file count limit per channel. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--shuffle",
+        type=float,
+        default=0.1,
+        help="Fraction of records added out of order. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--modify",
+        type=int,
+        default=100000,
+        help="Number of queued records to modify and remove. (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
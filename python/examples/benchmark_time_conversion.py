@@ -0,0 +1,90 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Benchmark converting many sample indices to times and back.
+
+Sample indices spread over an hour at the given rational sample rate are
+converted to times and back to samples, one at a time with
+util.sample_to_datetime and util.time_to_sample (as plotting tools used to
+do for tick labels and block starts), and as arrays with
+util.samples_to_datetimes and util.times_to_samples. The number of samples
+that the scalar functions fail to get back from their own times is also
+reported.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import fractions
+import timeit
+
+import numpy as np
+from digital_rf import util
+
+# start 2014-03-09 12:30:30
+START_SECS = 1394368230
+
+
+def run(args):
+    rate = fractions.Fraction(args.rate).limit_denominator(10 ** 6)
+    num, den = rate.numerator, rate.denominator
+    sps = np.longdouble(num) / np.longdouble(den)
+    start = START_SECS * num // den
+    rng = np.random.RandomState(0)
+    samples = np.sort(start + rng.randint(0, 3600 * num // den, args.samples))
+
+    def scalar():
+        return [
+            util.time_to_sample(util.sample_to_datetime(s, sps), sps) for s in samples
+        ]
+
+    def vector():
+        return util.times_to_samples(
+            util.samples_to_datetimes(samples, num, den), num, den
+        )
+
+    print("Sample rate: {0}/{1} Hz, {2} samples".format(num, den, len(samples)))
+    for label, fun in (("scalar", scalar), ("array", vector)):
+        secs = min(timeit.repeat(fun, number=1, repeat=args.repeat))
+        wrong = np.count_nonzero(np.asarray(fun()) != samples)
+        print(
+            "{0:>7}: {1:8.3f} us/sample, {2} round trips changed".format(
+                label, 1e6 * secs / len(samples), wrong
+            )
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-n",
+        "--samples",
+        type=int,
+        default=100000,
+        help="Number of sample indices to convert. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        default="100000000/3",
+        help="Sample rate in Hz as a fraction or decimal. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timing repetitions, the best is reported."
+        " (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
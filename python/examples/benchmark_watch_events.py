@@ -0,0 +1,172 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Benchmark the event throughput of the Digital RF directory watcher.
+
+A synthetic file generator writes small files to a number of channels the way
+the Digital RF writer does, by writing a 'tmp.' file and renaming it, along
+with some non-HDF5 files that should be ignored. A counting handler is
+scheduled on a DirWatcher using the chosen observer backend, and the time
+until all created files have been handled gives the event throughput.
+
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from digital_rf import watchdog_drf
+
+# start 2014-03-09 12:30:30
+START_SECS = 1394368230
+
+
+class CountingHandler(watchdog_drf.DigitalRFEventHandler):
+    """Handler that counts created files and the batches they arrive in."""
+
+    def __init__(self, **kwargs):
+        super(CountingHandler, self).__init__(**kwargs)
+        self.created = 0
+        self.batches = 0
+        self.cond = threading.Condition()
+
+    def on_created(self, event):
+        with self.cond:
+            self.created += 1
+            self.cond.notify_all()
+
+    def _dispatch_matched_batch(self, events):
+        self.batches += 1
+        super(CountingHandler, self)._dispatch_matched_batch(events)
+
+    def wait_for(self, n, timeout):
+        deadline = time.time() + timeout
+        with self.cond:
+            while self.created < n and time.time() < deadline:
+                self.cond.wait(deadline - time.time())
+            return self.created
+
+
+def generate_files(root, n_files, n_channels, cadence_ms, payload, extra_every):
+    """Write `n_files` in each of `n_channels` channels via temporary files."""
+    subdir = "2014-03-09T12-30-00"
+    chdirs = [os.path.join(root, "ch{0}".format(k), subdir) for k in range(n_channels)]
+    for chdir in chdirs:
+        os.makedirs(chdir)
+    data = b"\0" * payload
+    for k in range(n_files):
+        secs, msecs = divmod(k * cadence_ms, 1000)
+        name = "rf@{0}.{1:03d}.h5".format(START_SECS + secs, msecs)
+        for chdir in chdirs:
+            tmppath = os.path.join(chdir, "tmp." + name)
+            with open(tmppath, "wb") as f:
+                f.write(data)
+            os.rename(tmppath, os.path.join(chdir, name))
+            if extra_every and k % extra_every == 0:
+                with open(os.path.join(chdir, "log{0}.txt".format(k)), "wb") as f:
+                    f.write(data)
+
+
+def run(args):
+    root = tempfile.mkdtemp(prefix="drf_watch_bench_")
+    try:
+        kwargs = dict(
+            force_polling=args.backend == "polling", inotify=args.backend == "inotify"
+        )
+        handler = CountingHandler()
+        observer = watchdog_drf.DirWatcher(root, **kwargs)
+        observer.schedule(handler, root, recursive=True)
+        observer.start()
+        print("Observer: {0}".format(type(observer.root_observer).__name__))
+        time.sleep(0.5)
+
+        n_total = args.files * args.channels
+        t = time.time()
+        generate_files(
+            root, args.files, args.channels, args.cadence, args.payload, args.extra
+        )
+        gen_secs = time.time() - t
+        n_seen = handler.wait_for(n_total, args.timeout)
+        secs = time.time() - t
+        observer.stop()
+        observer.join()
+
+        print(
+            "Generated {0} files in {1:.2f} s: {2:.0f} files/s".format(
+                n_total, gen_secs, n_total / gen_secs
+            )
+        )
+        print(
+            "Handled {0}/{1} created files in {2:.2f} s ({3} batches):"
+            " {4:.0f} events/s".format(
+                n_seen, n_total, secs, handler.batches, n_seen / secs
+            )
+        )
+    finally:
+        shutil.rmtree(root)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-n",
+        "--files",
+        type=int,
+        default=5000,
+        help="Number of files to write per channel. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-c",
+        "--channels",
+        type=int,
+        default=16,
+        help="Number of channels to write files to. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cadence",
+        type=int,
+        default=1,
+        help="File cadence in milliseconds for the file names. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--payload",
+        type=int,
+        default=64,
+        help="Number of bytes written to each file. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--extra",
+        type=int,
+        default=10,
+        help="""Also write an ignored non-HDF5 file every this many files, or
+                never if 0. (default: %(default)s)""",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=["inotify", "watchdog", "polling"],
+        default="watchdog",
+        help="Observer backend used by the DirWatcher. (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=120,
+        help="Seconds to wait for all events to be handled. (default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
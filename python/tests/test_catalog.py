@@ -0,0 +1,140 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.catalog module."""
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import itertools
+import os
+
+import pytest
+from digital_rf import DigitalRFCatalog, list_drf
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+START_SECS = 1394368200
+
+
+def subdir_name(secs):
+    return datetime.datetime.utcfromtimestamp(secs).strftime("%Y-%m-%dT%H-%M-%S")
+
+
+def make_channel(chdir, propfile, fmt, n_subdirs=4, skip=()):
+    chdir.ensure(dir=True)
+    chdir.join(propfile).write("")
+    for k in range(n_subdirs):
+        secs = START_SECS + 60 * k
+        subdir = chdir.mkdir(subdir_name(secs))
+        if k in skip:
+            continue
+        for j in range(0, 60, 20):
+            subdir.join(fmt.format(secs + j, 500)).write("x" * (k + 1))
+
+
+@pytest.fixture
+def archive(tmpdir):
+    root = tmpdir.mkdir("archive")
+    make_channel(root.join("b"), "drf_properties.h5", "rf@{0}.{1:03d}.h5")
+    make_channel(root.join("b", "meta"), "dmd_properties.h5", "meta@{0}.h5", skip=(1,))
+    make_channel(root.join("a-c"), "metadata.h5", "rf@{0}.{1:03d}.h5", n_subdirs=2)
+    root.mkdir("notachannel").mkdir(subdir_name(START_SECS)).join("x@1.h5").write("")
+    return root
+
+
+@pytest.fixture
+def catalog(archive, tmpdir):
+    cat = DigitalRFCatalog(str(archive), str(tmpdir.join("catalog.sqlite")))
+    cat.update()
+    yield cat
+    cat.close()
+
+
+def to_datetime(secs):
+    return datetime.datetime.utcfromtimestamp(secs)
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+def test_catalog_matches_ilsdrf(archive, catalog):
+    times = [None, START_SECS + 30, START_SECS + 40.5, START_SECS + 140.5005]
+    paths = [archive, archive.join("b"), archive.join("b", subdir_name(START_SECS))]
+    includes = [(True, True), (True, False), (False, True)]
+    for path, (start, end), reverse, recursive, (drf, dmd) in itertools.product(
+        paths, itertools.product(times, times), [False, True], [True, False], includes
+    ):
+        kwargs = dict(
+            reverse=reverse, recursive=recursive, include_drf=drf, include_dmd=dmd
+        )
+        if start is not None:
+            kwargs["starttime"] = to_datetime(start)
+        if end is not None:
+            kwargs["endtime"] = to_datetime(end)
+        expected = list_drf.lsdrf(str(path), **kwargs)
+        assert list(catalog.ifiles(str(path), **kwargs)) == expected, kwargs
+        assert list_drf.lsdrf(str(path), catalog=catalog, **kwargs) == expected
+
+
+def test_catalog_update(archive, catalog, tmpdir):
+    n = len(catalog)
+    assert catalog.update() == 0
+
+    # new file in an old subdirectory
+    subdir = archive.join("b", subdir_name(START_SECS))
+    subdir.join("rf@{0}.000.h5".format(START_SECS + 1)).write("new")
+    st = os.stat(str(subdir))
+    os.utime(str(subdir), (st.st_atime, st.st_mtime + 10))
+    # growing file in the newest subdirectory
+    newest = archive.join("b", subdir_name(START_SECS + 180))
+    newest.join("rf@{0}.500.h5".format(START_SECS + 180)).write("grown" * 10)
+    # removed subdirectory
+    archive.join("b", subdir_name(START_SECS + 60)).remove()
+    assert catalog.update() == 5
+    assert len(catalog) == n - 2
+    assert catalog.update() == 0
+    assert list(catalog.ifiles()) == list_drf.lsdrf(str(archive))
+
+    # removed channel
+    archive.join("a-c").remove()
+    assert catalog.update() == 7
+    assert list(catalog.ifiles()) == list_drf.lsdrf(str(archive))
+
+    # reopen from just the database file
+    catalog.close()
+    catalog = DigitalRFCatalog(db_path=str(tmpdir.join("catalog.sqlite")))
+    assert catalog.root == str(archive)
+    assert list(catalog.ifiles()) == list_drf.lsdrf(str(archive))
+    with pytest.raises(ValueError):
+        DigitalRFCatalog(str(tmpdir), str(tmpdir.join("catalog.sqlite")))
+    catalog.close()
+
+
+def test_catalog_add_remove_and_size(archive, catalog):
+    chdir = archive.join("b")
+    subdir = chdir.join(subdir_name(START_SECS))
+    new = subdir.join("rf@{0}.000.h5".format(START_SECS + 5))
+    new.write("y" * 100)
+    catalog.add_files([str(new), str(archive.join("notachannel", "x.h5"))])
+    assert str(new) in catalog.ifiles(str(chdir))
+
+    sizes = {
+        rec.path: rec.size for rec in catalog.irecords(str(chdir), include_dmd=False)
+    }
+    assert sizes == {
+        p: os.path.getsize(p) for p in list_drf.lsdrf(str(chdir), include_dmd=False)
+    }
+    assert catalog.get_size(str(chdir), include_dmd=False) == sum(sizes.values())
+
+    new.remove()
+    catalog.remove_files([str(new)])
+    assert str(new) not in catalog.ifiles(str(chdir))
@@ -0,0 +1,301 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.digital_metadata module."""
+from __future__ import absolute_import, division, print_function
+
+import os
+
+import digital_rf
+import h5py
+import numpy as np
+import pytest
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+SAMPLE_RATE_NUMERATOR = 10
+SAMPLE_RATE_DENOMINATOR = 1
+FILE_CADENCE_SECS = 10
+START_SAMPLE = 1394368230 * SAMPLE_RATE_NUMERATOR
+
+
+def tuning(k):
+    """Return the (center frequency, gain) setting for the k-th sample."""
+    # configuration changes every 25 samples and is reused every 100
+    freq = 440e6 + 1e6 * ((k // 25) % 4)
+    gain = 10 if k < 150 else 20
+    return freq, gain
+
+
+@pytest.fixture
+def dmd_dir(tmpdir):
+    return tmpdir.mkdir("metadata")
+
+
+@pytest.fixture
+def dmd_writer(dmd_dir):
+    return digital_rf.DigitalMetadataWriter(
+        metadata_dir=str(dmd_dir),
+        subdir_cadence_secs=3600,
+        file_cadence_secs=FILE_CADENCE_SECS,
+        sample_rate_numerator=SAMPLE_RATE_NUMERATOR,
+        sample_rate_denominator=SAMPLE_RATE_DENOMINATOR,
+        file_name="meta",
+    )
+
+
+def write_samples(writer, ks):
+    samples = [START_SAMPLE + k for k in ks]
+    data = []
+    for k in ks:
+        freq, gain = tuning(k)
+        data.append(
+            dict(
+                center_frequencies=np.array([freq]),
+                receiver=dict(gain=gain, name="rx0"),
+                sample_count=k,
+            )
+        )
+    writer.write(samples, data)
+
+
+@pytest.fixture
+def dmd_channel(dmd_dir, dmd_writer):
+    # 200 samples at 10 Hz spans two 10 s files
+    write_samples(dmd_writer, range(0, 200))
+    return dmd_dir
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+def test_query_changes(dmd_channel):
+    reader = digital_rf.DigitalMetadataReader(str(dmd_channel))
+
+    intervals = reader.query("receiver/gain")
+    assert [(i[0], i[1], i[2]) for i in intervals] == [
+        (START_SAMPLE, START_SAMPLE + 150, 10),
+        (START_SAMPLE + 150, None, 20),
+    ]
+
+    # array-valued field with changes that cross the file boundary
+    intervals = reader.query("center_frequencies")
+    assert [i[0] - START_SAMPLE for i in intervals] == list(range(0, 200, 25))
+    for start, stop, value in intervals:
+        assert np.array_equal(value, [tuning(start - START_SAMPLE)[0]])
+
+    # constant field has a single interval
+    assert len(reader.query("receiver/name")) == 1
+    # field that changes every sample
+    assert len(reader.query("sample_count")) == 200
+
+    with pytest.raises(ValueError):
+        reader.query("not_a_field")
+
+
+def test_query_predicate_and_range(dmd_channel):
+    reader = digital_rf.DigitalMetadataReader(str(dmd_channel))
+
+    # equality predicate
+    intervals = reader.query("center_frequencies", np.array([441e6]))
+    assert [(i[0] - START_SAMPLE, i[1] - START_SAMPLE) for i in intervals] == [
+        (25, 50),
+        (125, 150),
+    ]
+    # callable predicate
+    intervals = reader.query("receiver/gain", lambda g: g > 15)
+    assert [i[0] - START_SAMPLE for i in intervals] == [150]
+
+    # range is forward filled at the start and clipped at the end
+    intervals = reader.query(
+        "center_frequencies",
+        start_sample=START_SAMPLE + 30,
+        end_sample=START_SAMPLE + 60,
+    )
+    assert [(i[0] - START_SAMPLE, i[1] - START_SAMPLE) for i in intervals] == [
+        (30, 50),
+        (50, 61),
+    ]
+
+
+def test_query_incremental_and_persisted(dmd_channel, dmd_writer, tmpdir):
+    index_file = str(tmpdir.join("index.h5"))
+    reader = digital_rf.DigitalMetadataReader(str(dmd_channel), index_file=index_file)
+    assert reader.query("receiver/gain")[-1][:2] == (START_SAMPLE + 150, None)
+
+    # only the new data needs indexing, and queries see it
+    write_samples(dmd_writer, range(200, 260))
+    intervals = reader.query("center_frequencies")
+    assert [i[0] - START_SAMPLE for i in intervals] == list(range(0, 260, 25))
+    # without updating, the index doesn't change
+    write_samples(dmd_writer, range(260, 300))
+    assert reader.query("center_frequencies", update=False) == intervals
+
+    # a new reader loads the persisted index without reading data files
+    reader2 = digital_rf.DigitalMetadataReader(str(dmd_channel), index_file=index_file)
+    intervals2 = reader2.query("center_frequencies", update=False)
+    assert [i[0] for i in intervals2] == [i[0] for i in intervals]
+    assert reader2.query("receiver/name", update=False)[0][2] == "rx0"
+    intervals3 = reader2.query("center_frequencies")
+    assert [i[0] - START_SAMPLE for i in intervals3] == list(range(0, 300, 25))
+
+
+def test_bounds_attributes(dmd_channel, dmd_writer):
+    paths = sorted(dmd_channel.visit("meta@*.h5"), key=str)
+    assert len(paths) == 2
+    with h5py.File(str(paths[0]), "r") as f:
+        assert f.attrs["first_sample"] == START_SAMPLE
+        assert f.attrs["last_sample"] == START_SAMPLE + 99
+
+    # bounds are extended by later writes to the same file
+    write_samples(dmd_writer, range(200, 210))
+    paths = sorted(dmd_channel.visit("meta@*.h5"), key=str)
+    with h5py.File(str(paths[-1]), "r") as f:
+        assert f.attrs["first_sample"] == START_SAMPLE + 200
+        assert f.attrs["last_sample"] == START_SAMPLE + 209
+
+    # files without the attributes still give bounds from the group names
+    for path in paths:
+        with h5py.File(str(path), "a") as f:
+            del f.attrs["first_sample"]
+            del f.attrs["last_sample"]
+    reader = digital_rf.DigitalMetadataReader(str(dmd_channel))
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 209)
+
+    # and the attributes are filled in when such a file is written to again
+    write_samples(dmd_writer, range(210, 220))
+    with h5py.File(str(paths[-1]), "r") as f:
+        assert f.attrs["first_sample"] == START_SAMPLE + 200
+        assert f.attrs["last_sample"] == START_SAMPLE + 219
+
+
+def test_bounds_cache_and_read_latest(dmd_channel, dmd_writer):
+    reader = digital_rf.DigitalMetadataReader(str(dmd_channel))
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 199)
+    latest = reader.read_latest()
+    assert list(latest.keys()) == [START_SAMPLE + 199]
+    assert latest[START_SAMPLE + 199]["sample_count"] == 199
+    assert reader.read_latest("sample_count") == {START_SAMPLE + 199: 199}
+
+    # appending to the last file, new files, and new subdirectories are seen
+    write_samples(dmd_writer, range(200, 205))
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 204)
+    write_samples(dmd_writer, range(300, 305))
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 304)
+    write_samples(dmd_writer, range(36000, 36001))
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 36000)
+    assert reader.read_latest("sample_count") == {START_SAMPLE + 36000: 36000}
+
+    # removing the first file moves the first bound
+    first_path = sorted(dmd_channel.visit("meta@*.h5"), key=str)[0]
+    first_path.remove()
+    assert reader.get_bounds() == (START_SAMPLE + 100, START_SAMPLE + 36000)
+
+
+def test_query_update_only_scans_changed_subdirs(dmd_channel, dmd_writer, tmpdir):
+    index_file = str(tmpdir.join("index.h5"))
+    # data in a second (newer) subdirectory
+    write_samples(dmd_writer, range(36000, 36010))
+    reader = digital_rf.DigitalMetadataReader(str(dmd_channel), index_file=index_file)
+    reader.query("sample_count")
+
+    indexed = []
+    index_file_method = reader._index._index_file
+
+    def recording_index_file(path):
+        indexed.append(path)
+        return index_file_method(path)
+
+    reader._index._index_file = recording_index_file
+    # nothing changed, so nothing is re-read
+    assert not reader._index.update()
+    assert indexed == []
+
+    # a modified file in an older, otherwise unchanged subdirectory is skipped
+    old_file = sorted(dmd_channel.visit("meta@*.h5"), key=str)[0]
+    os.utime(str(old_file), None)
+    reader.query("sample_count")
+    assert indexed == []
+
+    # new files in the newest subdirectory and new subdirectories are read
+    write_samples(dmd_writer, range(36100, 36110))
+    write_samples(dmd_writer, range(72000, 72010))
+    intervals = reader.query("sample_count")
+    assert len(indexed) == 2
+    assert intervals[-1][0] == START_SAMPLE + 72009
+
+    # the subdirectory state is persisted with the index
+    reader2 = digital_rf.DigitalMetadataReader(str(dmd_channel), index_file=index_file)
+    reader2.query("sample_count", update=False)
+    assert not reader2._index.update()
+
+
+def test_index_save_uses_unique_tmp_file(dmd_channel, tmpdir):
+    index_dir = tmpdir.mkdir("index")
+    index_file = str(index_dir.join("index.h5"))
+    # a stale temporary file from another reader isn't touched
+    index_dir.join("tmp.index.h5").write("in progress")
+    reader = digital_rf.DigitalMetadataReader(str(dmd_channel), index_file=index_file)
+    reader.query("receiver/gain")
+    assert index_dir.join("tmp.index.h5").read() == "in progress"
+    assert sorted(p.basename for p in index_dir.listdir()) == [
+        "index.h5",
+        "tmp.index.h5",
+    ]
+
+
+def test_bounds_unsorted_and_failed_writes(dmd_dir, dmd_writer):
+    write_samples(dmd_writer, [50, 20, 30])
+    reader = digital_rf.DigitalMetadataReader(str(dmd_dir))
+    assert reader.get_bounds() == (START_SAMPLE + 20, START_SAMPLE + 50)
+    assert reader.read_latest("sample_count") == {START_SAMPLE + 50: 50}
+
+    # a write that fails on a duplicate sample doesn't extend the bounds
+    with pytest.raises(IOError):
+        write_samples(dmd_writer, [50, 60])
+    (path,) = dmd_dir.visit("meta@*.h5")
+    with h5py.File(str(path), "r") as f:
+        assert f.attrs["last_sample"] == START_SAMPLE + 50
+    assert reader.get_bounds() == (START_SAMPLE + 20, START_SAMPLE + 50)
+    assert reader.read_latest("sample_count") == {START_SAMPLE + 50: 50}
+
+    # samples written before the failing one are included
+    with pytest.raises(IOError):
+        write_samples(dmd_writer, [10, 70, 20])
+    assert reader.get_bounds() == (START_SAMPLE + 10, START_SAMPLE + 70)
+
+
+def test_bounds_only_lists_edge_subdir(dmd_channel, dmd_writer, monkeypatch):
+    write_samples(dmd_writer, range(36000, 36010))
+    reader = digital_rf.DigitalMetadataReader(str(dmd_channel))
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 36009)
+    newest = sorted(d.basename for d in dmd_channel.listdir(lambda p: p.isdir()))[-1]
+
+    listed = []
+    listdir = os.listdir
+
+    def recording_listdir(path):
+        listed.append(os.path.relpath(path, str(dmd_channel)))
+        return listdir(path)
+
+    monkeypatch.setattr(os, "listdir", recording_listdir)
+    # writing to the newest subdirectory only relists that subdirectory
+    write_samples(dmd_writer, range(36100, 36110))
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 36109)
+    assert listed == [newest]
+
+
+def test_read_ffill_ignores_later_samples_in_file(dmd_dir, dmd_writer):
+    write_samples(dmd_writer, [0, 50])
+    reader = digital_rf.DigitalMetadataReader(str(dmd_dir))
+    data = reader.read(START_SAMPLE + 20, columns="sample_count", method="ffill")
+    assert data == {START_SAMPLE: 0}
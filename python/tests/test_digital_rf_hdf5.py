@@ -10,6 +10,7 @@
 from __future__ import absolute_import, division, print_function
 
 import datetime
+import fractions
 import itertools
 import os
 
@@ -1319,3 +1320,88 @@ class TestDigitalRFChannel(object):
                     np.testing.assert_equal(
                         rdata, data.reshape((-1, num_subchannels))[bstart:bstop]
                     )
+
+
+def test_read_metadata_blocks(tmpdir):
+    sps = 100
+    start = 1394368230 * sps
+    chdir = tmpdir.mkdir("ch0")
+    with digital_rf.DigitalRFWriter(
+        str(chdir), np.int16, 3600, 1000, start, sps, 1, "uuid", is_complex=False
+    ) as dwo:
+        dwo.rf_write(np.zeros(10000, dtype=np.int16))
+    dmd_writer = digital_rf.DigitalMetadataWriter(
+        str(chdir.mkdir("metadata")), 3600, 10, sps, 1, "metadata"
+    )
+    # tuning changes at 0, 2500, and 7000 samples into the data
+    dmd_writer.write(
+        [start, start + 2500, start + 7000],
+        [
+            dict(center_frequencies=np.array([f]), receiver=dict(gain=g))
+            for f, g in ((440e6, 10), (441e6, 10), (442e6, 20))
+        ],
+    )
+    reader = digital_rf.DigitalRFReader(str(tmpdir))
+
+    blocks = reader.read_metadata_blocks(start + 1000, start + 9999, "ch0", 1000)
+    assert list(blocks.keys()) == list(range(start + 1000, start + 10000, 1000))
+    freqs = [md["center_frequencies"][0] for md in blocks.values()]
+    assert freqs == [440e6] * 2 + [441e6] * 4 + [442e6] * 3
+    gains = [md["receiver"]["gain"] for md in blocks.values()]
+    assert gains == [10] * 6 + [20] * 3
+    for md in blocks.values():
+        assert md["samples_per_second"] == sps
+    # blocks with the same metadata share a dictionary
+    assert blocks[start + 3000] is blocks[start + 6000]
+
+    # agrees with read_metadata at each block start
+    for sample, md in blocks.items():
+        expected = list(reader.read_metadata(sample, sample, "ch0").values())[-1]
+        assert md["center_frequencies"] == expected["center_frequencies"]
+
+    # blocks before any metadata only have the inherent properties
+    blocks = reader.read_metadata_blocks(start - 1000, start - 1, "ch0", 500)
+    assert [sorted(md.keys()) for md in blocks.values()] == [
+        ["sample_rate_denominator", "sample_rate_numerator", "samples_per_second"]
+    ] * 2
+
+    # without a built or persisted index, only the range is read
+    dmd_reader = reader.get_digital_metadata("ch0")
+    assert dmd_reader._index is None
+    # the same results come from the index once it is built
+    dmd_reader.query("center_frequencies")
+    assert dmd_reader._index is not None
+    indexed = reader.read_metadata_blocks(start + 1000, start + 9999, "ch0", 1000)
+    assert [md["center_frequencies"][0] for md in indexed.values()] == freqs
+
+    # non-integer block sizes start blocks at the rounded down multiples
+    blocks = reader.read_metadata_blocks(
+        start, start + 9999, "ch0", fractions.Fraction(9999, 4)
+    )
+    offsets = [0, 2499, 4999, 7499, 9999]
+    assert list(blocks.keys()) == [start + k for k in offsets]
+    freqs = [md["center_frequencies"][0] for md in blocks.values()]
+    assert freqs == [440e6, 440e6, 441e6, 442e6, 442e6]
+
+    with pytest.raises(ValueError):
+        reader.read_metadata_blocks(start, start + 100, "ch0", 0)
+    with pytest.raises(ValueError):
+        reader.read_metadata_blocks(start, start + 100, "ch0", 0.5)
+
+
+def test_get_file_list_boundaries():
+    get_file_list = digital_rf.DigitalRFReader._get_file_list
+    # 2014-03-09 12:30:30 + 3 ms at 1000/3 Hz, exactly at a file boundary
+    sample = 1394368230 * 1000 // 3 + 1
+    subdir = "2014-03-09T12-00-00"
+    assert list(get_file_list(sample, sample, 1000, 3, 3600, 1)) == [
+        # long double arithmetic (as used by the writer) rounds down
+        os.path.join(subdir, "rf@1394368230.002.h5"),
+        os.path.join(subdir, "rf@1394368230.003.h5"),
+    ]
+    # integer rates only give the exact file
+    sample = 1394368230 * 100 + 55
+    assert list(get_file_list(sample, sample + 10, 100, 1, 3600, 100)) == [
+        os.path.join(subdir, "rf@1394368230.500.h5"),
+        os.path.join(subdir, "rf@1394368230.600.h5"),
+    ]
@@ -0,0 +1,78 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the deferred imports of the digital_rf package."""
+from __future__ import absolute_import, division, print_function
+
+import json
+import subprocess
+import sys
+
+import digital_rf
+import pytest
+
+requires_lazy = pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="module __getattr__ requires Python 3.7"
+)
+
+HEAVY_MODULES = (
+    "dateutil",
+    "h5py",
+    "numpy",
+    "pandas",
+    "watchdog",
+    "digital_rf._py_rf_write_hdf5",
+    "digital_rf.digital_rf_hdf5",
+)
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+
+def imported_modules(code):
+    """Return the heavy modules imported by running `code` in a new process."""
+    script = (
+        "import json, sys\n{0}\n"
+        "print(json.dumps([m for m in {1!r} if m in sys.modules]))"
+    ).format(code, HEAVY_MODULES)
+    out = subprocess.check_output([sys.executable, "-c", script])
+    return json.loads(out.decode("utf-8").splitlines()[-1])
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+@requires_lazy
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import digital_rf",
+        "from digital_rf import list_drf",
+        "import digital_rf.metrics",
+        "from digital_rf.drf_command import main; main(['ls', '.'])",
+        "from digital_rf.drf_command import main\n"
+        "try:\n    main(['cp', '-h'])\nexcept SystemExit:\n    pass",
+    ],
+)
+def test_no_heavy_imports(code):
+    assert imported_modules(code) == []
+
+
+@requires_lazy
+def test_lazy_attributes():
+    assert imported_modules("import digital_rf; digital_rf.util") == ["numpy"]
+    assert "h5py" in imported_modules("from digital_rf import DigitalRFReader")
+    assert digital_rf.DigitalRFReader is digital_rf.digital_rf_hdf5.DigitalRFReader
+    assert digital_rf.lsdrf is digital_rf.list_drf.lsdrf
+    assert isinstance(digital_rf.__version__, str)
+    assert "DigitalMetadataWriter" in dir(digital_rf)
+    with pytest.raises(AttributeError):
+        digital_rf.not_an_attribute
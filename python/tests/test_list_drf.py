@@ -0,0 +1,238 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.list_drf module."""
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import os
+import shutil
+
+import pytest
+from digital_rf import drf_command, list_drf
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+START_SECS = 1394368200
+
+
+@pytest.fixture(scope="module")
+def archive(tmpdir_factory):
+    """Create a tree of empty Digital RF and Digital Metadata files."""
+    root = tmpdir_factory.mktemp("archive")
+    for chname, propfile, fmt in (
+        ("rf", "drf_properties.h5", "rf@{0}.{1:03d}.h5"),
+        ("meta", "dmd_properties.h5", "meta@{0}.h5"),
+    ):
+        chdir = root.mkdir(chname)
+        chdir.join(propfile).write("")
+        for k in range(6):
+            secs = START_SECS + 60 * k
+            subdir = chdir.mkdir(
+                datetime.datetime.utcfromtimestamp(secs).strftime("%Y-%m-%dT%H-%M-%S")
+            )
+            # leave a gap in the metadata to exercise forward filling
+            if chname == "meta" and k in (2, 3):
+                continue
+            for j in range(0, 60, 10):
+                subdir.join(fmt.format(secs + j, 500)).write("")
+            subdir.join("tmp." + fmt.format(secs + 60, 0)).write("")
+    return str(root)
+
+
+def to_datetime(secs):
+    return datetime.datetime.utcfromtimestamp(secs)
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize(
+    "start, end",
+    [
+        (None, None),
+        (START_SECS + 95, START_SECS + 250.5),
+        (START_SECS + 130.5005, None),
+        (START_SECS + 200, START_SECS + 210),
+    ],
+)
+def test_ilsdrf_workers(archive, start, end, reverse):
+    kwargs = dict(reverse=reverse)
+    if start is not None:
+        kwargs["starttime"] = to_datetime(start)
+    if end is not None:
+        kwargs["endtime"] = to_datetime(end)
+    files = list_drf.lsdrf(archive, **kwargs)
+    assert files
+    assert list_drf.lsdrf(archive, workers=4, **kwargs) == files
+
+    rf_files = [f for f in files if os.path.basename(f).startswith("rf@")]
+    keys = [list_drf.sortkey_drf(os.path.basename(f)) for f in rf_files]
+    assert keys == sorted(keys, reverse=reverse)
+    for key in keys:
+        secs = key[0] / 1000
+        assert start is None or secs >= start
+        assert end is None or secs <= end
+
+    meta_files = [f for f in files if os.path.basename(f).startswith("meta@")]
+    if start is not None:
+        # the metadata sample in effect at starttime is included
+        first = min(list_drf.sortkey_drf(os.path.basename(f))[0] for f in meta_files)
+        assert first / 1000 <= start
+    assert not any("tmp." in f for f in files)
+
+
+def test_ilsdrf_workers_early_stop(archive):
+    it = list_drf.ilsdrf(archive, workers=2, include_dmd=False)
+    first = [next(it) for _ in range(3)]
+    it.close()
+    assert first == list_drf.lsdrf(archive, include_dmd=False)[:3]
+
+
+@pytest.mark.parametrize("command", ["cp", "cp --link", "mv"])
+def test_cp_mv(archive, tmpdir, command):
+    src = tmpdir.join("src")
+    shutil.copytree(archive, str(src))
+    src_files = list_drf.lsdrf(str(src))
+    contents = {}
+    for k, f in enumerate(src_files):
+        with open(f, "w") as fo:
+            fo.write(str(k) * k)
+        contents[os.path.relpath(f, str(src))] = str(k) * k
+    dest = tmpdir.join("dest")
+
+    args = command.split() + [str(src), str(dest), "-q"]
+    drf_command.main(args)
+    dest_files = list_drf.lsdrf(str(dest))
+    assert [os.path.relpath(f, str(dest)) for f in dest_files] == [
+        os.path.relpath(f, str(src)) for f in src_files
+    ]
+    for f in dest_files:
+        with open(f) as fo:
+            assert fo.read() == contents[os.path.relpath(f, str(dest))]
+    assert not any("tmp." in str(f) for f in dest.visit())
+    if command == "mv":
+        assert list_drf.lsdrf(str(src)) == []
+    else:
+        assert list_drf.lsdrf(str(src)) == src_files
+        linked = os.path.samefile(src_files[-1], dest_files[-1])
+        assert linked == (command == "cp --link")
+        # copying again overwrites the existing files
+        drf_command.main(args)
+        assert list_drf.lsdrf(str(dest)) == dest_files
+
+
+def test_copy_file_fallbacks(tmpdir, monkeypatch):
+    src = tmpdir.join("src.h5")
+    src.write_binary(os.urandom(3 * 2 ** 20 + 17))
+    expected = src.read_binary()
+    for disabled in [[], ["fcntl"], ["fcntl", "copy_file_range"], ["all"]]:
+        with monkeypatch.context() as m:
+            if disabled:
+                m.setattr(list_drf, "fcntl", None)
+            if "copy_file_range" in disabled or "all" in disabled:
+                m.delattr(os, "copy_file_range", raising=False)
+            if "all" in disabled:
+                m.delattr(os, "sendfile", raising=False)
+            dest = tmpdir.join("dest_{0}.h5".format(len(disabled)))
+            assert list_drf._copy_file(str(src), str(dest)) == len(expected)
+            assert dest.read_binary() == expected
+            assert dest.mtime() == src.mtime()
+
+
+def test_copy_file_short_kernel_copy(tmpdir, monkeypatch):
+    src = tmpdir.join("src.h5")
+    src.write_binary(os.urandom(3 * 2 ** 20 + 17))
+    expected = src.read_binary()
+    monkeypatch.setattr(list_drf, "fcntl", None)
+    monkeypatch.delattr(os, "sendfile", raising=False)
+
+    def short_copy_file_range(src_fd, dest_fd, count, offset_src, offset_dst):
+        # copy only the first MiB, then report nothing more to copy
+        if offset_src >= 2 ** 20:
+            return 0
+        data = os.pread(src_fd, min(count, 2 ** 20 - offset_src), offset_src)
+        return os.pwrite(dest_fd, data, offset_dst)
+
+    monkeypatch.setattr(os, "copy_file_range", short_copy_file_range, raising=False)
+    dest = tmpdir.join("dest.h5")
+    assert list_drf._copy_file(str(src), str(dest)) == len(expected)
+    assert dest.read_binary() == expected
+
+
+@pytest.mark.parametrize(
+    "relpath, expected",
+    [
+        ("ch/2014-03-09T12-30-00/rf@1394368230.123.h5", ("drf", "rf", 1394368230123)),
+        ("ch/2014-03-09T12-30-00/meta@1394368230.h5", ("dmd", "meta", 1394368230000)),
+        ("ch/2014-03-09T12-30-00/a@b@1394368230.h5", ("dmd", "a@b", 1394368230000)),
+        ("ch/drf_properties.h5", ("drf_properties", "drf_properties", None)),
+        ("ch/dmd_properties.h5", ("dmd_properties", "dmd_properties", None)),
+        ("ch/metadata.h5", ("properties", "metadata", None)),
+        ("ch/2014-03-09T12-30-00/tmp.rf@1394368230.123.h5", None),
+        ("ch/2014-03-09T12-30-00/rf@1394368230.123.txt", None),
+        ("ch/2014-03-09T12-30-00/sub/rf@1394368230.123.h5", None),
+        ("ch/notasubdir/rf@1394368230.123.h5", None),
+        ("ch/other.h5", None),
+    ],
+)
+def test_classify_path(relpath, expected):
+    chpath = os.path.join(os.sep, "data", "ch")
+    path = os.path.join(os.sep, "data", *relpath.split("/"))
+    info = list_drf.classify_path(path)
+    if expected is None:
+        assert info is None
+    else:
+        assert info == list_drf.PathInfo(chpath, *expected)
+    assert list_drf.classify_path(os.path.basename(path)) is None
+
+
+@pytest.mark.parametrize(
+    "start_ms, end_ms, file_cadence_ms, subdir_cadence_secs",
+    [
+        (1394368230123, 1394368230123, 1000, 3600),
+        (1394368230123, 1394368235000, 1000, 3600),
+        # spanning several subdirectories
+        (1394368230123, 1394376000000, 400000, 3600),
+        (1394367000000, 1394368200999, 100, 60),
+        (1394368200000, 1394368199999, 1000, 3600),
+    ],
+)
+def test_file_name_range(start_ms, end_ms, file_cadence_ms, subdir_cadence_secs):
+    def make_path(subdir, file_ms):
+        return "{0}/f@{1}".format(subdir, file_ms)
+
+    # names of all files in the surrounding subdirectories that overlap
+    expected = []
+    sub_ms = subdir_cadence_secs * 1000
+    for sub_start in range(
+        (start_ms // sub_ms) * sub_ms, (end_ms // sub_ms + 1) * sub_ms, sub_ms
+    ):
+        subdir = datetime.datetime.utcfromtimestamp(sub_start // 1000).strftime(
+            "%Y-%m-%dT%H-%M-%S"
+        )
+        for file_ms in range(sub_start, sub_start + sub_ms, file_cadence_ms):
+            if file_ms + file_cadence_ms > start_ms and file_ms <= end_ms:
+                expected.append(make_path(subdir, file_ms))
+
+    names = list_drf._FileNameRange(
+        start_ms, end_ms, file_cadence_ms, subdir_cadence_secs, make_path
+    )
+    assert len(names) == len(expected)
+    assert list(names) == expected
+    assert list(reversed(names)) == expected[::-1]
+    assert names[1:-1] == expected[1:-1]
+    if expected:
+        assert (names[0], names[-1]) == (expected[0], expected[-1])
+    with pytest.raises(IndexError):
+        names[len(expected)]
@@ -0,0 +1,117 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.metrics module."""
+from __future__ import absolute_import, division, print_function
+
+import os
+
+import pytest
+from digital_rf import metrics, ringbuffer
+from six.moves.urllib.error import HTTPError
+from six.moves.urllib.request import urlopen
+from watchdog.events import FileCreatedEvent
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+START_SECS = 1394366400
+
+
+def parse_samples(text):
+    """Return {sample name with labels: value} from Prometheus text."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+def test_metrics_render():
+    registry = metrics.Metrics()
+    registry.counter("events_total", "Events.")
+    registry.gauge("depth", "Depth.", lambda: 7)
+    registry.gauge("unknown", "Not known yet.", lambda: None)
+    registry.summary("lag_seconds", "Lag.")
+    registry.inc("events_total", type="created")
+    registry.inc("events_total", 2, type="created")
+    registry.inc("events_total", type='we"ird\n')
+    registry.observe("lag_seconds", 0.5)
+    registry.observe("lag_seconds", 1.25)
+
+    text = registry.render()
+    assert "# TYPE drf_events_total counter\n" in text
+    assert "# HELP drf_depth Depth.\n" in text
+    assert parse_samples(text) == {
+        'drf_events_total{type="created"}': 3,
+        'drf_events_total{type="we\\"ird\\n"}': 1,
+        "drf_depth": 7,
+        "drf_lag_seconds_sum": 1.75,
+        "drf_lag_seconds_count": 2,
+    }
+    assert registry.value("events_total", type="created") == 3
+    assert registry.value("depth") == 7
+
+    with pytest.raises(ValueError):
+        registry.gauge("events_total", "Not a counter.")
+
+
+def test_metrics_server():
+    registry = metrics.Metrics()
+    registry.counter("requests_total", "Requests.")
+    registry.inc("requests_total", 5)
+    server = metrics.MetricsServer(registry, port=0)
+    server.start()
+    try:
+        response = urlopen(str(server), timeout=10)
+        assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+        body = response.read().decode("utf-8")
+        assert parse_samples(body) == {"drf_requests_total": 5}
+        with pytest.raises(HTTPError):
+            urlopen(str(server).replace("/metrics", "/other"), timeout=10)
+    finally:
+        server.stop()
+
+
+def test_ringbuffer_handler_metrics(tmpdir):
+    subdir = tmpdir.mkdir("ch0").mkdir("2014-03-09T12-00-00")
+    paths = []
+    for k in range(5):
+        path = subdir.join("rf@{0}.000.h5".format(START_SECS + k))
+        path.write(b"\0" * 100)
+        paths.append(str(path))
+    registry = metrics.Metrics()
+    handler = ringbuffer.DigitalRFRingbufferHandler(count=3)
+    handler.register_metrics(registry)
+    handler.dispatch_batch([FileCreatedEvent(p) for p in paths])
+
+    assert registry.value("events_total", type="created") == 5
+    assert registry.value("ringbuffer_files") == 3
+    assert registry.value("expired_files_total", action="deleted") == 2
+    assert registry.value("expired_bytes_total", action="deleted") == 200
+    assert not os.path.exists(paths[0])
+    lag_sum, lag_count = registry.value("handling_lag_seconds")
+    assert lag_count == 1
+    assert 0 <= lag_sum < 60
+    assert "drf_ringbuffer_files 3" in registry.render()
+
+
+def test_ringbuffer_metrics_endpoint(tmpdir):
+    rb = ringbuffer.DigitalRFRingbuffer(str(tmpdir), count=3, metrics_port=0)
+    assert rb.metrics is not None
+    assert rb.metrics.value("event_queue_depth") == 0
+    samples = parse_samples(rb.metrics.render())
+    assert samples["drf_ringbuffer_files"] == 0
+    assert samples["drf_event_queue_depth"] == 0
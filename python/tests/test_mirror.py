@@ -0,0 +1,401 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.mirror module."""
+from __future__ import absolute_import, division, print_function
+
+import os
+import threading
+import time
+import zlib
+
+import digital_rf
+import h5py
+import numpy as np
+import pytest
+from digital_rf import mirror
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+
+@pytest.fixture
+def src_archive(tmpdir):
+    """Source archive of two channels with small fake data files."""
+    src = tmpdir.mkdir("src")
+    for ch in ("ch0", "ch1"):
+        chdir = src.mkdir(ch)
+        chdir.join("drf_properties.h5").write(b"properties")
+        for subdir in ("2014-03-09T12-00-00", "2014-03-09T13-00-00"):
+            sd = chdir.mkdir(subdir)
+            secs = int(subdir[11:13]) * 3600
+            for k in range(3):
+                name = "rf@{0}.000.h5".format(1394323200 + secs + k)
+                sd.join(name).write(b"x" * (100 + k))
+    return src
+
+
+def relfiles(root):
+    root = str(root)
+    return sorted(
+        os.path.relpath(os.path.join(dirpath, f), root)
+        for dirpath, dirnames, filenames in os.walk(root)
+        for f in filenames
+    )
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+def test_ordered_worker_pool():
+    pool = mirror._OrderedWorkerPool(workers=3, max_queue=4)
+    order = {}
+    lock = threading.Lock()
+    active = set()
+    overlaps = []
+
+    def task(key, k):
+        with lock:
+            if key in active:
+                overlaps.append(key)
+            active.add(key)
+        time.sleep(0.001)
+        with lock:
+            active.discard(key)
+            order.setdefault(key, []).append(k)
+        return 10
+
+    for k in range(20):
+        for key in ("a", "b", "c"):
+            pool.submit(key, task, key, k)
+            assert len(pool) <= 4 + 3
+    assert pool.wait(10)
+    assert overlaps == []
+    assert order == {key: list(range(20)) for key in ("a", "b", "c")}
+    assert pool.n_done == 60
+    assert pool.bytes_done == 600
+    assert "60 files mirrored" in pool.status()
+    assert pool.shutdown() == 0
+
+
+def test_ordered_worker_pool_coalesce_and_shutdown():
+    pool = mirror._OrderedWorkerPool(workers=1, max_queue=None)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def block():
+        started.set()
+        release.wait(10)
+
+    pool.submit("a", block)
+    assert started.wait(10)
+    # identical queued tasks are only run once
+    for _ in range(3):
+        pool.submit("a", calls.append, 1)
+    pool.submit("b", calls.append, 2)
+    assert len(pool) == 3
+    release.set()
+    assert pool.wait(10)
+    assert sorted(calls) == [1, 2]
+
+    started.clear()
+    release.clear()
+    pool.submit("a", block)
+    assert started.wait(10)
+    pool.submit("a", calls.append, 3)
+    threading.Timer(0.1, release.set).start()
+    # running task finishes but the queued one is discarded
+    assert pool.shutdown() == 1
+    assert calls == [1, 2] or calls == [2, 1]
+
+
+@pytest.mark.parametrize("workers", [0, 4])
+@pytest.mark.parametrize("method", ["copy", "move"])
+def test_mirror_existing(src_archive, tmpdir, method, workers):
+    dest = tmpdir.join("dest")
+    src_files = relfiles(src_archive)
+    m = mirror.DigitalRFMirror(
+        str(src_archive),
+        str(dest),
+        method=method,
+        include_dmd=False,
+        workers=workers,
+        max_queue=2,
+    )
+    try:
+        m.start()
+    finally:
+        m.stop()
+        m.observer.join()
+    assert relfiles(dest) == src_files
+    if method == "copy":
+        assert relfiles(src_archive) == src_files
+    else:
+        # only properties files are left
+        assert relfiles(src_archive) == [
+            os.path.join(ch, "drf_properties.h5") for ch in ("ch0", "ch1")
+        ]
+    if workers:
+        assert m.pool.n_done >= len(src_files)
+        assert m.pool.bytes_done == sum(dest.join(f).size() for f in src_files)
+
+
+def test_mirror_to_dest_bytes(src_archive, tmpdir):
+    dest = tmpdir.join("dest")
+    handler = mirror.DigitalRFMirrorHandler(str(src_archive), str(dest))
+    path = str(src_archive.join("ch0", "2014-03-09T12-00-00", "rf@1394366400.000.h5"))
+    assert mirror._channel_key(path) == str(src_archive.join("ch0"))
+    assert mirror._channel_key(
+        str(src_archive.join("ch0", "drf_properties.h5"))
+    ) == str(src_archive.join("ch0"))
+    assert handler.mirror_to_dest(path) == 100
+    # identical file is not mirrored again
+    assert handler.mirror_to_dest(path) == 0
+
+
+def test_mirror_change_detection(src_archive, tmpdir):
+    dest = tmpdir.join("dest")
+    handler = mirror.DigitalRFMirrorHandler(str(src_archive), str(dest))
+    src = src_archive.join("ch0", "drf_properties.h5")
+    dest_path = str(dest.join("ch0", "drf_properties.h5"))
+    assert handler.mirror_to_dest(str(src)) == 10
+    record = handler.get_record(dest_path)
+    assert record[0][:2] == record[1][:2]
+
+    # unchanged source is decided from the stat record without reading
+    assert handler.mirror_to_dest(str(src)) == 0
+
+    # appended source is mirrored again
+    src.write(b" appended", mode="ab")
+    assert handler.mirror_to_dest(str(src)) == 19
+    assert dest.join("ch0", "drf_properties.h5").read_binary() == src.read_binary()
+
+    # destination changed by someone else is mirrored again
+    dest.join("ch0", "drf_properties.h5").write(b"x")
+    assert handler.mirror_to_dest(str(src)) == 19
+
+    # files already at the destination with matching size and mtime are
+    # trusted without a record
+    handler2 = mirror.DigitalRFMirrorHandler(str(src_archive), str(dest))
+    assert handler2.mirror_to_dest(str(src)) == 0
+    assert handler2.get_record(dest_path) is not None
+
+
+def test_mirror_checksum(src_archive, tmpdir):
+    dest = tmpdir.join("dest")
+    handler = mirror.DigitalRFMirrorHandler(
+        str(src_archive), str(dest), checksum="crc32"
+    )
+    src = src_archive.join("ch1", "drf_properties.h5")
+    assert handler.mirror_to_dest(str(src)) == 10
+    dest_path = str(dest.join("ch1", "drf_properties.h5"))
+    digest = handler.get_record(dest_path)[2]
+    assert digest == mirror._file_checksum(str(src), "crc32")
+    assert digest == "{0:08x}".format(zlib.crc32(b"properties") & 0xFFFFFFFF)
+    # mtime is preserved like shutil.copy2
+    assert os.stat(dest_path).st_mtime == os.stat(str(src)).st_mtime
+
+    with pytest.raises(ValueError):
+        mirror.DigitalRFMirrorHandler(str(src_archive), str(dest), checksum="md4")
+    if mirror.xxhash is None:
+        with pytest.raises(ValueError):
+            mirror.DigitalRFMirrorHandler(
+                str(src_archive), str(dest), checksum="xxhash"
+            )
+
+
+def test_debounce_modified_events(src_archive, tmpdir):
+    from watchdog.events import FileCreatedEvent, FileModifiedEvent
+
+    dest = tmpdir.join("dest")
+    calls = []
+
+    class Handler(mirror.DigitalRFMirrorHandler):
+        def on_created(self, event):
+            calls.append(("created", event.src_path))
+
+        def on_modified(self, event):
+            calls.append(("modified", event.src_path))
+
+    handler = Handler(str(src_archive), str(dest), debounce=0.2)
+    path = str(src_archive.join("ch0", "drf_properties.h5"))
+    other = str(src_archive.join("ch1", "drf_properties.h5"))
+    for _ in range(10):
+        handler.dispatch(FileModifiedEvent(path))
+        handler.dispatch(FileModifiedEvent(other))
+    assert calls == []
+    assert handler.pending() == 2
+    deadline = time.time() + 10
+    while handler.pending() and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.05)
+    assert sorted(calls) == [("modified", path), ("modified", other)]
+
+    # other events discard held modified events and are not delayed
+    del calls[:]
+    handler.dispatch(FileModifiedEvent(path))
+    handler.dispatch(FileCreatedEvent(path))
+    assert calls == [("created", path)]
+    assert handler.pending() == 0
+
+    # continuously modified files are still handled after the max delay
+    handler = Handler(str(src_archive), str(dest), debounce=0.2)
+    handler.debounce_max_delay = 0.3
+    del calls[:]
+    t = time.time()
+    while time.time() - t < 1:
+        handler.dispatch(FileModifiedEvent(path))
+        time.sleep(0.02)
+    assert len(calls) >= 2
+
+    # flush dispatches held events immediately
+    handler.flush()
+    del calls[:]
+    handler.dispatch(FileModifiedEvent(other))
+    handler.flush()
+    assert calls == [("modified", other)]
+    assert handler.pending() == 0
+
+
+@pytest.mark.parametrize("workers", [0, 4])
+def test_mirror_move_appended_metadata(tmpdir, workers):
+    src = tmpdir.mkdir("dmdsrc")
+    dest = tmpdir.join("dmddest")
+    chdir = src.mkdir("ch0").mkdir("metadata")
+    m = mirror.DigitalRFMirror(str(src), str(dest), method="move", workers=workers)
+    m.start()
+    try:
+        writer = digital_rf.DigitalMetadataWriter(str(chdir), 3600, 1, 10, 1, "meta")
+        start = 1394368230 * 10
+        # each file gets 10 samples written one at a time, and the previous
+        # file is removed from the source when the next one is created
+        for k in range(30):
+            writer.write(start + k, {"k": k})
+            time.sleep(0.01)
+        reader = None
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            time.sleep(0.1)
+            try:
+                reader = digital_rf.DigitalMetadataReader(
+                    str(dest.join("ch0", "metadata"))
+                )
+                data = reader.read(start, start + 29, "k")
+            except (IOError, OSError, ValueError):
+                continue
+            if len(data) == 30:
+                break
+    finally:
+        m.stop()
+        m.observer.join()
+    assert reader is not None
+    data = reader.read(start, start + 29, "k")
+    assert [int(v) for v in data.values()] == list(range(30))
+
+
+@pytest.fixture
+def drf_archive(tmpdir):
+    """Uncompressed, gapped Digital RF channel."""
+    chdir = tmpdir.mkdir("drfsrc").mkdir("ch0")
+    start = 1394368230 * 1000
+    with digital_rf.DigitalRFWriter(
+        str(chdir),
+        np.complex64,
+        3600,
+        1000,
+        start,
+        1000,
+        1,
+        None,
+        compression_level=0,
+        checksum=False,
+        is_complex=True,
+        num_subchannels=2,
+        is_continuous=False,
+    ) as writer:
+        data = np.arange(3000 * 2, dtype=np.complex64).reshape(3000, 2)
+        writer.rf_write(data[:1500])
+        writer.rf_write(data[1500:], next_sample=1700)
+    return chdir
+
+
+def test_parse_transcode():
+    assert mirror._parse_transcode("gzip:6") == dict(
+        compression="gzip", compression_opts=6, shuffle=False
+    )
+    assert mirror._parse_transcode("lzf+shuffle") == dict(
+        compression="lzf", compression_opts=None, shuffle=True
+    )
+    assert mirror._parse_transcode("gzip:0")["compression"] is None
+    assert mirror._parse_transcode("none")["compression"] is None
+    for spec in ("bzip2", "gzip:10", "none:1"):
+        with pytest.raises(ValueError):
+            mirror._parse_transcode(spec)
+
+
+@pytest.mark.parametrize("chunks", [None, 100])
+def test_transcode_drf_file(drf_archive, tmpdir, chunks):
+    for src in drf_archive.visit("rf@*.h5"):
+        dest = tmpdir.join("transcoded.h5")
+        mirror.transcode_drf_file(
+            str(src), str(dest), "gzip", 6, shuffle=True, chunks=chunks
+        )
+        with h5py.File(str(src), "r") as fsrc, h5py.File(str(dest), "r") as fdest:
+            assert dict(fsrc.attrs) == dict(fdest.attrs)
+            np.testing.assert_array_equal(
+                fsrc["rf_data_index"][...], fdest["rf_data_index"][...]
+            )
+            dsrc, ddest = fsrc["rf_data"], fdest["rf_data"]
+            np.testing.assert_array_equal(dsrc[...], ddest[...])
+            assert dsrc.dtype == ddest.dtype
+            assert dsrc.maxshape == ddest.maxshape
+            for key in dsrc.attrs:
+                assert dsrc.attrs.get_id(key).dtype == ddest.attrs.get_id(key).dtype
+                assert dsrc.attrs[key] == ddest.attrs[key]
+            assert ddest.compression == "gzip"
+            assert ddest.compression_opts == 6
+            assert ddest.shuffle
+            if chunks is not None:
+                assert ddest.chunks[0] == min(chunks, dsrc.shape[0])
+        assert dest.mtime() == src.mtime()
+
+
+@pytest.mark.parametrize("method", ["copy", "move"])
+def test_mirror_transcode(drf_archive, tmpdir, method):
+    src = drf_archive.dirpath()
+    dest = tmpdir.join("drfdest")
+    reader = digital_rf.DigitalRFReader(str(src))
+    bounds = reader.get_bounds("ch0")
+    expected = reader.read(bounds[0], bounds[1], "ch0")
+    src_files = relfiles(src)
+
+    m = mirror.DigitalRFMirror(
+        str(src), str(dest), method=method, transcode="gzip:4", workers=2
+    )
+    try:
+        m.start()
+    finally:
+        m.stop()
+        m.observer.join()
+    assert relfiles(dest) == src_files
+    if method == "move":
+        assert relfiles(src) == [os.path.join("ch0", "drf_properties.h5")]
+
+    reader = digital_rf.DigitalRFReader(str(dest))
+    assert reader.get_bounds("ch0") == bounds
+    result = reader.read(bounds[0], bounds[1], "ch0")
+    assert list(result.keys()) == list(expected.keys())
+    for key in expected:
+        np.testing.assert_array_equal(result[key], expected[key])
+    for f in dest.visit("rf@*.h5"):
+        with h5py.File(str(f), "r") as fdest:
+            assert fdest["rf_data"].compression == "gzip"
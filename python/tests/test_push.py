@@ -0,0 +1,189 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.push module."""
+from __future__ import absolute_import, division, print_function
+
+import os
+import threading
+
+import pytest
+from digital_rf import mirror, push
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+SUBDIR = "2014-03-09T12-00-00"
+
+
+@pytest.fixture
+def src_archive(tmpdir):
+    """Source channel with properties and a few data files of varied size."""
+    chdir = tmpdir.mkdir("src").mkdir("ch0")
+    chdir.join("drf_properties.h5").write(b"properties")
+    sd = chdir.mkdir(SUBDIR)
+    for k in range(5):
+        name = "rf@{0}.000.h5".format(1394366400 + k)
+        sd.join(name).write_binary(os.urandom(1000 * k + 10))
+    return chdir.dirpath()
+
+
+@pytest.fixture
+def receiver(tmpdir):
+    server = push.DigitalRFReceiver(str(tmpdir.join("dest")), port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def relfiles(root):
+    root = str(root)
+    return sorted(
+        os.path.relpath(os.path.join(dirpath, f), root)
+        for dirpath, dirnames, filenames in os.walk(root)
+        for f in filenames
+    )
+
+
+def assert_same_files(src, dest):
+    assert relfiles(dest) == relfiles(src)
+    for f in relfiles(src):
+        with open(os.path.join(str(src), f), "rb") as fs:
+            with open(os.path.join(str(dest), f), "rb") as fd:
+                assert fs.read() == fd.read()
+        assert os.path.getmtime(os.path.join(str(src), f)) == pytest.approx(
+            os.path.getmtime(os.path.join(str(dest), f))
+        )
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+def test_parse_address():
+    assert push.parse_address("example.com:1234") == ("example.com", 1234)
+    assert push.parse_address("example.com") == ("example.com", push.DEFAULT_PORT)
+    assert push.parse_address(("localhost", "80")) == ("localhost", 80)
+
+
+def test_push_files(src_archive, receiver):
+    client = push.DigitalRFPushClient(*receiver.server_address[:2], window=2)
+    results = []
+    for f in relfiles(src_archive):
+        client.send(
+            os.path.join(str(src_archive), f),
+            f,
+            callback=lambda ok, error, f=f: results.append((f, ok, error)),
+        )
+    assert client.flush(10)
+    client.close()
+    # acknowledged in order
+    assert results == [(f, True, None) for f in relfiles(src_archive)]
+    assert_same_files(src_archive, receiver.dest)
+    assert receiver.n_received == 6
+    assert client.n_sent == 6
+
+
+def test_push_rejects_paths(src_archive, receiver):
+    client = push.DigitalRFPushClient(*receiver.server_address[:2])
+    results = []
+    src = os.path.join(str(src_archive), "ch0", "drf_properties.h5")
+    for relpath in ("../evil/drf_properties.h5", "/tmp/drf_properties.h5", "x.txt"):
+        client.send(src, relpath, callback=lambda ok, error: results.append(ok))
+    with pytest.raises(OSError):
+        client.send(src + ".missing", "ch1/drf_properties.h5")
+    client.send(src, "ch0/drf_properties.h5", lambda ok, e: results.append(ok))
+    assert client.flush(10)
+    client.close()
+    assert results == [False, False, False, True]
+    assert relfiles(receiver.dest) == [os.path.join("ch0", "drf_properties.h5")]
+
+
+def test_push_resume(src_archive, receiver):
+    relpath = "/".join(("ch0", SUBDIR, "rf@1394366404.000.h5"))
+    src = os.path.join(str(src_archive), relpath)
+    size = os.path.getsize(src)
+    st = os.stat(src)
+
+    # simulate a connection that dropped after part of the file was sent
+    tmp_path = os.path.join(receiver.dest, "ch0", SUBDIR, "tmp.rf@1394366404.000.h5")
+    os.makedirs(os.path.dirname(tmp_path))
+    with open(src, "rb") as f:
+        partial = f.read(size // 2)
+    with open(tmp_path, "wb") as f:
+        f.write(partial)
+    receiver._partials[os.path.normpath(relpath)] = (size, st.st_mtime)
+    request = dict(id=1, path=relpath, size=size, mtime=st.st_mtime)
+    assert receiver.resume_offset(request) == size // 2
+    # a different version of the file is not resumed
+    assert receiver.resume_offset(dict(request, mtime=st.st_mtime + 1)) == 0
+
+    client = push.DigitalRFPushClient(*receiver.server_address[:2])
+    entry = push._PendingFile(1, src, relpath, size, st.st_mtime, None)
+    client._pending[1] = entry
+    client._next_id = 1
+    # reconnecting resumes the pending file from the receiver's offset
+    with client._send_lock:
+        client._ensure_connected()
+    assert client.flush(10)
+    client.close()
+    assert client.bytes_sent == size - size // 2
+    with open(src, "rb") as fs:
+        with open(os.path.join(receiver.dest, relpath), "rb") as fd:
+            assert fs.read() == fd.read()
+    assert not os.path.exists(tmp_path)
+
+
+def test_push_reconnect(src_archive, receiver):
+    client = push.DigitalRFPushClient(*receiver.server_address[:2])
+    files = relfiles(src_archive)
+    client.send(os.path.join(str(src_archive), files[0]), files[0])
+    assert client.flush(10)
+    # drop the connection, the next send reconnects
+    client._sock.shutdown(2)
+    for f in files[1:]:
+        client.send(os.path.join(str(src_archive), f), f)
+    assert client.flush(10)
+    client.close()
+    assert_same_files(src_archive, receiver.dest)
+
+
+@pytest.mark.parametrize("method", ["copy", "move"])
+def test_mirror_push(src_archive, receiver, method):
+    expected = relfiles(src_archive)
+    src_copy = {}
+    for f in expected:
+        with open(os.path.join(str(src_archive), f), "rb") as fo:
+            src_copy[f] = fo.read()
+    m = mirror.DigitalRFMirror(
+        str(src_archive),
+        None,
+        method=method,
+        push="{0}:{1}".format(*receiver.server_address[:2]),
+    )
+    try:
+        m.start()
+    finally:
+        m.stop()
+        m.observer.join()
+    assert relfiles(receiver.dest) == expected
+    for f in expected:
+        with open(os.path.join(receiver.dest, f), "rb") as fo:
+            assert fo.read() == src_copy[f]
+    if method == "copy":
+        assert relfiles(src_archive) == expected
+    else:
+        assert relfiles(src_archive) == [os.path.join("ch0", "drf_properties.h5")]
+
+    with pytest.raises(ValueError):
+        mirror.DigitalRFMirror(str(src_archive), None)
@@ -0,0 +1,222 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.remote module."""
+from __future__ import absolute_import, division, print_function
+
+import os
+import threading
+
+import digital_rf
+import numpy as np
+import pytest
+from digital_rf.remote import HTTPFileCache
+from six.moves import BaseHTTPServer, SimpleHTTPServer, socketserver
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+SAMPLE_RATE = 10
+START_SAMPLE = 1394368230 * SAMPLE_RATE
+
+
+@pytest.fixture
+def http_root(tmpdir):
+    return tmpdir.mkdir("www")
+
+
+@pytest.fixture
+def http_server(http_root):
+    """Serve `http_root` over HTTP, recording (method, path, code) requests."""
+    root = str(http_root)
+    requests = []
+
+    class Handler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def translate_path(self, path):
+            path = SimpleHTTPServer.SimpleHTTPRequestHandler.translate_path(self, path)
+            return os.path.join(root, os.path.relpath(path, os.getcwd()))
+
+        def log_request(self, code="-", size="-"):
+            requests.append((self.command, self.path.rstrip("/"), int(code)))
+
+        def log_message(self, *args):
+            pass
+
+    class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+        # handle each persistent connection in its own thread
+        daemon_threads = True
+
+    server = Server(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    server.requests = requests
+    server.url = "http://127.0.0.1:{0}".format(server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return HTTPFileCache(str(tmpdir.join("cache")))
+
+
+@pytest.fixture
+def dmd_writer(http_root):
+    return digital_rf.DigitalMetadataWriter(
+        metadata_dir=str(http_root.mkdir("metadata")),
+        subdir_cadence_secs=60,
+        file_cadence_secs=10,
+        sample_rate_numerator=SAMPLE_RATE,
+        sample_rate_denominator=1,
+        file_name="meta",
+    )
+
+
+def write_samples(writer, ks):
+    writer.write(
+        [START_SAMPLE + k for k in ks],
+        [dict(count=k, freq=np.array([440e6 + 1e6 * (k // 50)])) for k in ks],
+    )
+
+
+def set_mtime_back(path, secs=10):
+    """Move a file's mtime back so changes to it get a new Last-Modified."""
+    st = os.stat(str(path))
+    os.utime(str(path), (st.st_atime - secs, st.st_mtime - secs))
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+def test_cache_revalidation(http_server, http_root, cache):
+    f = http_root.join("a.h5")
+    f.write(b"version 1")
+    set_mtime_back(f)
+    url = http_server.url + "/a.h5"
+
+    path = cache.get(url)
+    with open(path, "rb") as fo:
+        assert fo.read() == b"version 1"
+    # unchanged file is revalidated without being transferred again
+    assert cache.get(url) == path
+    assert http_server.requests[-2:] == [("GET", "/a.h5", 200), ("GET", "/a.h5", 304)]
+
+    # changed file is transferred again
+    f.write(b"version 2")
+    path = cache.get(url)
+    with open(path, "rb") as fo:
+        assert fo.read() == b"version 2"
+    assert http_server.requests[-1] == ("GET", "/a.h5", 200)
+
+    # within max_age no request is made at all
+    cache.max_age = 60
+    n = len(http_server.requests)
+    assert cache.get(url) == path
+    assert len(http_server.requests) == n
+
+    with pytest.raises(IOError):
+        cache.get(http_server.url + "/missing.h5")
+    assert cache.get_if_exists(http_server.url + "/missing.h5") is None
+
+
+def test_cache_fetch_many_and_eviction(http_server, http_root, tmpdir):
+    for k in range(10):
+        http_root.join("f{0}.h5".format(k)).write(b"x" * 1000)
+    cache = HTTPFileCache(str(tmpdir.join("cache")), max_size=5500, max_workers=4)
+    urls = [http_server.url + "/f{0}.h5".format(k) for k in range(10)]
+    paths = cache.fetch_many(urls + [http_server.url + "/missing.h5"])
+    assert paths[-1] is None
+    # only the five most recently fetched files fit in the cache
+    cached = [p for p in paths[:-1] if os.path.exists(p)]
+    assert len(cached) == 5
+
+    assert set(cache.listdir(http_server.url)) == set(
+        "f{0}.h5".format(k) for k in range(10)
+    )
+
+
+def test_remote_metadata_reader(http_server, http_root, dmd_writer, cache):
+    write_samples(dmd_writer, range(0, 1000))
+    url = http_server.url + "/metadata"
+    reader = digital_rf.DigitalMetadataReader(url, cache=cache)
+    local_reader = digital_rf.DigitalMetadataReader(str(http_root.join("metadata")))
+
+    assert reader.get_fields() == ["count", "freq"]
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 999)
+    assert reader.read_latest("count") == {START_SAMPLE + 999: 999}
+
+    data = reader.read(START_SAMPLE + 95, START_SAMPLE + 405, "count")
+    assert data == local_reader.read(START_SAMPLE + 95, START_SAMPLE + 405, "count")
+    assert list(data.values()) == list(range(95, 406))
+    # files that could exist but aren't in the directory listings (after the
+    # last sample) are not requested
+    n = len(http_server.requests)
+    data = reader.read(START_SAMPLE + 1500, columns="count", method="ffill")
+    assert data == {START_SAMPLE + 999: 999}
+    requests = http_server.requests[n:]
+    assert [r for r in requests if r[2] == 404] == []
+
+    intervals = reader.query("freq")
+    assert [i[0] - START_SAMPLE for i in intervals] == list(range(0, 1000, 50))
+
+    # new data is seen after revalidation
+    for path in http_root.visit("meta@*.h5"):
+        set_mtime_back(path)
+    write_samples(dmd_writer, range(1000, 1010))
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 1009)
+    assert reader.read_latest("count") == {START_SAMPLE + 1009: 1009}
+
+
+def test_remote_bounds_cached(http_server, http_root, dmd_writer, cache):
+    write_samples(dmd_writer, range(0, 1000))
+    for path in http_root.visit("meta@*.h5"):
+        set_mtime_back(path)
+    reader = digital_rf.DigitalMetadataReader(
+        http_server.url + "/metadata", cache=cache
+    )
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 999)
+
+    # unchanged channel: directory listings of the channel and the edge
+    # subdirectories, and revalidation of only the last file
+    n = len(http_server.requests)
+    assert reader.get_bounds() == (START_SAMPLE, START_SAMPLE + 999)
+    requests = http_server.requests[n:]
+    assert len(requests) == 4
+    assert [r for r in requests if r[1].endswith(".h5")] == [
+        ("GET", "/metadata/2014-03-09T12-32-00/meta@1394368320.h5", 304)
+    ]
+
+
+def test_remote_pinned_reads(http_server, http_root, dmd_writer, tmpdir):
+    write_samples(dmd_writer, range(0, 1000))
+    file_size = max(p.size() for p in http_root.visit("meta@*.h5"))
+    cache = HTTPFileCache(str(tmpdir.join("cache")), max_size=3 * file_size + 100)
+    reader = digital_rf.DigitalMetadataReader(
+        http_server.url + "/metadata", cache=cache
+    )
+
+    # reads that fit in the cache return all of their data, even when the
+    # files they need evict each other's predecessors
+    for start in range(0, 1000, 50):
+        data = reader.read(START_SAMPLE + start, START_SAMPLE + start + 249, "count")
+        assert list(data.values()) == list(range(start, min(start + 250, 1000)))
+    # reads that don't fit raise an error instead of silently missing data
+    with pytest.raises(IOError):
+        reader.read(START_SAMPLE, START_SAMPLE + 999, "count")
+
+    # the index is updated one subdirectory (of up to 6 files) at a time
+    cache.max_size = 6 * file_size + 100
+    intervals = reader.query("freq")
+    assert [i[0] - START_SAMPLE for i in intervals] == list(range(0, 1000, 50))
@@ -0,0 +1,175 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.retention module."""
+from __future__ import absolute_import, division, print_function
+
+import os
+
+import digital_rf
+import h5py
+import numpy as np
+import pytest
+from digital_rf import retention, ringbuffer
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+# start 2014-03-09 12:30:30 at 100 samples per second
+START = 1394368230 * 100
+
+
+@pytest.fixture
+def archive(tmpdir):
+    """Archive of two complex int16 channels with a gap in the data."""
+    root = tmpdir.mkdir("rb")
+    data = np.empty((750, 2), dtype=[("r", np.int16), ("i", np.int16)])
+    data["r"] = np.arange(1500).reshape(750, 2)
+    data["i"] = -np.arange(1500).reshape(750, 2)
+    for ch in ("ch0", "ch1"):
+        chdir = root.mkdir(ch)
+        with digital_rf.DigitalRFWriter(
+            str(chdir),
+            np.int16,
+            3600,
+            1000,
+            START,
+            100,
+            1,
+            None,
+            compression_level=0,
+            checksum=False,
+            is_complex=True,
+            num_subchannels=2,
+            is_continuous=False,
+        ) as writer:
+            writer.rf_write(data[:450])
+            writer.rf_write_blocks(data[450:], [505], [0])
+    return str(root), data
+
+
+def channel_files(root, ch):
+    chdir = os.path.join(root, ch)
+    return list(
+        digital_rf.ilsdrf(
+            chdir, include_drf_properties=False, include_dmd=False, recursive=False
+        )
+    )
+
+
+def read_channel(root, ch):
+    reader = digital_rf.DigitalRFReader(root)
+    start, end = reader.get_bounds(ch)
+    return reader, reader.read(start, end, ch)
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+@pytest.mark.parametrize("spec", ["move", "recompress:gzip:6"])
+def test_move_recompress_policy(tmpdir, archive, spec):
+    root, data = archive
+    tier = str(tmpdir.join("tier"))
+    policy = retention.make_expire_policy(spec, root, tier, channels="ch0")
+    assert policy.matches(os.path.join(root, "ch0"))
+    assert not policy.matches(os.path.join(root, "ch1"))
+
+    paths = channel_files(root, "ch0")
+    chpath = os.path.join(root, "ch0")
+    for path in paths:
+        dest = policy.expire(path, chpath)
+        assert dest == os.path.join(tier, os.path.relpath(path, root))
+        assert not os.path.exists(path)
+    assert [policy.dest_path(p) for p in paths] == channel_files(tier, "ch0")
+    assert os.path.exists(os.path.join(tier, "ch0", "drf_properties.h5"))
+
+    _, expected = read_channel(root, "ch1")
+    _, blocks = read_channel(tier, "ch0")
+    assert list(blocks) == list(expected)
+    for start in blocks:
+        np.testing.assert_array_equal(blocks[start], expected[start])
+    if spec.startswith("recompress"):
+        with h5py.File(channel_files(tier, "ch0")[0], "r") as f:
+            assert f["rf_data"].compression == "gzip"
+            assert f["rf_data"].compression_opts == 6
+
+
+def test_decimate_policy(tmpdir, archive):
+    root, data = archive
+    tier = str(tmpdir.join("tier"))
+    policy = retention.DecimatePolicy(root, tier, factor=10)
+    chpath = os.path.join(root, "ch0")
+    for path in channel_files(root, "ch0"):
+        policy.expire(path, chpath)
+    assert not channel_files(root, "ch0")
+
+    reader, blocks = read_channel(tier, "ch0")
+    props = reader.get_properties("ch0")
+    assert props["samples_per_second"] == 10
+    assert props["sample_rate_numerator"] == 10
+    assert props["sample_rate_denominator"] == 1
+
+    # whole groups of 10 samples aligned to the (decimated) sample index
+    values = data["r"] + 1j * data["i"]
+    first = values[:450].reshape(45, 10, 2).mean(axis=1)
+    second = values[455:745].reshape(29, 10, 2).mean(axis=1)
+    assert list(blocks) == [START // 10, START // 10 + 51]
+    np.testing.assert_allclose(blocks[START // 10], first)
+    np.testing.assert_allclose(blocks[START // 10 + 51], second)
+
+    # too little data to decimate leaves no file
+    policy = retention.DecimatePolicy(root, tier, factor=1000)
+    path = channel_files(root, "ch1")[0]
+    assert policy.expire(path, os.path.join(root, "ch1")) is None
+    assert not os.path.exists(path)
+    assert not channel_files(tier, "ch1")
+
+
+def test_tiered_retention_ringbuffer(tmpdir, archive):
+    root, data = archive
+    tier = str(tmpdir.join("tier"))
+    tiers = retention.TieredRetention(
+        [retention.MovePolicy(root, tier, channels="ch0")], workers=2
+    )
+    handler = ringbuffer.DigitalRFRingbufferHandler(count=3, retention=tiers)
+    ch0 = channel_files(root, "ch0")
+    ch1 = channel_files(root, "ch1")
+    handler.add_files(ch0 + ch1)
+    assert tiers.wait(10)
+    assert tiers.shutdown() == 0
+    # oldest files of ch0 are moved to the tier, those of ch1 are deleted
+    assert channel_files(root, "ch0") == ch0[-3:]
+    assert channel_files(root, "ch1") == ch1[-3:]
+    assert channel_files(tier, "ch0") == [
+        os.path.join(tier, os.path.relpath(p, root)) for p in ch0[:-3]
+    ]
+    assert not os.path.exists(os.path.join(tier, "ch1"))
+    assert "retiring" in handler.status()
+
+
+def test_ringbuffer_tiers(tmpdir, archive):
+    root, data = archive
+    rb = ringbuffer.DigitalRFRingbuffer(
+        root,
+        count=3,
+        tiers=[("ch*", "decimate:5", str(tmpdir.join("tier")))],
+    )
+    assert isinstance(rb.retention.policies[0], retention.DecimatePolicy)
+    assert rb.event_handler.retention is rb.retention
+    assert "DecimatePolicy" in str(rb)
+    rb.retention.shutdown()
+
+    with pytest.raises(ValueError):
+        ringbuffer.DigitalRFRingbuffer(
+            root, count=3, tiers=[("*", "move", os.path.join(root, "tier"))]
+        )
+    with pytest.raises(ValueError):
+        retention.make_expire_policy("shred", root, str(tmpdir))
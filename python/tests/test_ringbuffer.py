@@ -0,0 +1,241 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.ringbuffer module."""
+from __future__ import absolute_import, division, print_function
+
+import os
+import random
+
+import pytest
+from digital_rf import ringbuffer
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+START_SECS = 1394366400
+
+
+def drf_path(root, ch, k):
+    """Return path of the k-th one second Digital RF file of a channel."""
+    secs = START_SECS + k
+    subdir = "2014-03-09T12-{0:02d}-00".format(k // 60)
+    return os.path.join(root, ch, subdir, "rf@{0}.000.h5".format(secs))
+
+
+def synthetic_records(handler, root, n, channels=("ch0", "ch1")):
+    paths = [drf_path(root, ch, k) for k in range(n) for ch in channels]
+    return paths, [handler._get_file_record(p, 100) for p in paths]
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+def test_record_queue():
+    queue = ringbuffer._RecordQueue()
+    reference = set()
+    rng = random.Random(0)
+    for _ in range(5000):
+        op = rng.random()
+        if op < 0.5 or not reference:
+            key = rng.randrange(1000)
+            path = "f{0}".format(key)
+            assert queue.add(key, path) == ((key, path) not in reference)
+            reference.add((key, path))
+        elif op < 0.8:
+            rec = rng.choice(sorted(reference))
+            queue.remove(*rec)
+            reference.remove(rec)
+        else:
+            rec = min(reference)
+            assert queue.oldest() == rec
+            queue.remove(*rec)
+            reference.remove(rec)
+        assert len(queue) == len(reference)
+        if reference:
+            assert queue.oldest() == min(reference)
+            assert queue.newest()[0] == max(reference)[0]
+    assert list(queue) == sorted(reference)
+    with pytest.raises(ValueError):
+        queue.remove(-1, "missing")
+    for rec in sorted(reference):
+        queue.remove(*rec)
+    with pytest.raises(IndexError):
+        queue.oldest()
+    with pytest.raises(IndexError):
+        queue.newest()
+    # tombstones are compacted
+    assert len(queue._minheap) <= 64
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected",
+    [
+        (dict(count=10), 10),
+        (dict(duration=4999), 5),
+        (dict(size=100 * 16), 8),
+    ],
+)
+def test_ringbuffer_expiry(tmpdir, kwargs, expected):
+    handler = ringbuffer.DigitalRFRingbufferHandler(dryrun=True, **kwargs)
+    root = str(tmpdir)
+    paths, records = synthetic_records(handler, root, 50)
+    # add out of order, oldest files are still expired first
+    rng = random.Random(1)
+    order = list(range(40))
+    rng.shuffle(order)
+    order.extend(range(40, len(records)))
+    for k in order:
+        handler._add_record(records[k])
+        # adding again is a no-op
+        handler._add_record(records[k])
+    for ch in ("ch0", "ch1"):
+        queue = handler.queues[(os.path.join(root, ch), "rf")]
+        assert len(queue) == expected
+        assert [p for key, p in queue] == [
+            drf_path(root, ch, k) for k in range(50 - expected, 50)
+        ]
+    assert sorted(handler.records) == sorted(
+        drf_path(root, ch, k) for ch in ("ch0", "ch1") for k in range(50 - expected, 50)
+    )
+
+    # removed files leave the ringbuffer
+    handler.remove_files([drf_path(root, "ch0", 49)])
+    queue = handler.queues[(os.path.join(root, "ch0"), "rf")]
+    assert queue.newest()[1] == drf_path(root, "ch0", 48)
+    assert len(handler.records) == 2 * expected - 1
+    if "size" in kwargs:
+        assert handler.active_size == 100 * (2 * expected - 1)
+
+
+def test_ringbuffer_snapshot(tmpdir):
+    root = str(tmpdir.mkdir("data"))
+    snapshot = str(tmpdir.join("snapshot.json.gz"))
+    paths = [drf_path(root, ch, k) for ch in ("ch0", "ch1") for k in range(150)]
+    for p in paths:
+        if not os.path.isdir(os.path.dirname(p)):
+            os.makedirs(os.path.dirname(p))
+        with open(p, "wb") as f:
+            f.write(b"0" * 10)
+    for ch in ("ch0", "ch1"):
+        # channels are found from their properties files
+        tmpdir.join("data", ch, "drf_properties.h5").write("")
+    subdirs = sorted(set(os.path.dirname(p) for p in paths))
+
+    def settle(subdir, offset=0):
+        # make a directory look like it was last modified a while ago
+        t = START_SECS + offset
+        os.utime(subdir, (t, t))
+
+    for subdir in subdirs:
+        settle(subdir)
+
+    def make_ringbuffer(**kwargs):
+        return ringbuffer.DigitalRFRingbuffer(
+            root, count=1000, dryrun=True, snapshot=snapshot, **kwargs
+        )
+
+    rb = make_ringbuffer()
+    rb._add_existing_files()
+    assert sorted(rb.event_handler.records) == sorted(paths)
+    rb.save_snapshot()
+    assert os.path.exists(snapshot)
+    assert sorted(rb._snapshot_mtimes) == subdirs
+
+    # change one directory and a file in another that keeps its mtime
+    added = drf_path(root, "ch0", 150)
+    with open(added, "wb") as f:
+        f.write(b"0" * 20)
+    settle(os.path.dirname(added), 1)
+    removed = drf_path(root, "ch1", 0)
+    os.remove(removed)
+    settle(os.path.dirname(removed), 1)
+    with open(drf_path(root, "ch0", 0), "ab") as f:
+        f.write(b"0" * 10)
+    ondisk = sorted(set(paths) - {removed} | {added})
+
+    rb = make_ringbuffer()
+    rb._add_existing_files()
+    assert sorted(rb.event_handler.records) == ondisk
+    records = rb.event_handler.records
+    # unchanged directories are restored from the snapshot without stat
+    assert records[drf_path(root, "ch0", 0)].size == 10
+    assert records[added].size == 20
+    assert len(rb._snapshot_mtimes) == len(subdirs) - 2
+
+    # a restart only verifies the directories that changed since then
+    os.remove(drf_path(root, "ch0", 75))
+    settle(os.path.dirname(drf_path(root, "ch0", 75)), 2)
+    # (a record missing from an unchanged directory is not noticed)
+    rb.event_handler.remove_files([drf_path(root, "ch1", 75)])
+    rb._verify_ringbuffer_files(set(records), rb._snapshot_mtimes)
+    assert drf_path(root, "ch0", 75) not in records
+    assert drf_path(root, "ch1", 75) not in records
+    assert drf_path(root, "ch0", 76) in records
+
+    # a snapshot taken with other options is not used
+    rb = make_ringbuffer(include_dmd=False)
+    rb._add_existing_files()
+    assert sorted(rb.event_handler.records) == sorted(
+        set(ondisk) - {drf_path(root, "ch0", 75)}
+    )
+    assert rb._snapshot_mtimes is None
+
+
+@pytest.mark.parametrize("kwargs", [dict(min_free=2000), dict(max_used_fraction=0.8)])
+def test_ringbuffer_free_space(tmpdir, kwargs):
+    root = str(tmpdir)
+    handler = ringbuffer.DigitalRFRingbufferHandler(free_margin=0.05, **kwargs)
+
+    def fake_statvfs(path):
+        # a 10000 byte filesystem holding only the ringbuffer's files
+        used = sum(
+            os.path.getsize(os.path.join(d, f))
+            for d, dirnames, filenames in os.walk(root)
+            for f in filenames
+        )
+        return 10000 - used, 10000
+
+    handler._statvfs = fake_statvfs
+
+    paths = [drf_path(root, "ch0", k) for k in range(100)]
+    for k, p in enumerate(paths):
+        if not os.path.isdir(os.path.dirname(p)):
+            os.makedirs(os.path.dirname(p))
+        with open(p, "wb") as f:
+            f.write(b"0" * 100)
+        handler.add_files([p])
+        handler.join_expiry()
+        assert fake_statvfs(root)[0] >= 2000
+    # deleted down to the low watermark of 2500 bytes free, then refilled
+    ondisk = [p for p in paths if os.path.exists(p)]
+    assert ondisk == paths[-len(ondisk) :]
+    assert 75 <= len(ondisk) <= 80
+    assert sorted(handler.records) == ondisk
+    assert "MB free" in handler.status()
+
+
+def test_ringbuffer_free_space_dryrun(tmpdir):
+    root = str(tmpdir)
+    handler = ringbuffer.DigitalRFRingbufferHandler(
+        min_free=2000, free_margin=0.05, dryrun=True
+    )
+    # files aren't deleted, but the expired records count as freed
+    handler._statvfs = lambda path: (10000 - 100 * len(handler.records), 10000)
+    paths, records = synthetic_records(handler, root, 50)
+    for rec in records:
+        handler._add_record(rec)
+        handler.join_expiry()
+    assert 75 <= len(handler.records) <= 80
+    for ch in ("ch0", "ch1"):
+        queue = handler.queues[(os.path.join(root, ch), "rf")]
+        assert queue.newest()[1] == drf_path(root, ch, 49)
+        assert len(queue) >= 37
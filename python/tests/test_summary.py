@@ -0,0 +1,115 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.summary module."""
+from __future__ import absolute_import, division, print_function
+
+import json
+
+import digital_rf
+import numpy as np
+import pytest
+from digital_rf import drf_command, summary, util
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+SAMPLE_RATE = 100
+START_SAMPLE = 1394368230 * SAMPLE_RATE
+
+
+@pytest.fixture(scope="module")
+def datadir(tmpdir_factory):
+    """Write a Digital RF channel with gaps and a Digital Metadata channel."""
+    root = tmpdir_factory.mktemp("summary")
+    chdir = root.mkdir("rf")
+    with digital_rf.DigitalRFWriter(
+        str(chdir),
+        np.int16,
+        subdir_cadence_secs=10,
+        file_cadence_millisecs=1000,
+        start_global_index=START_SAMPLE,
+        sample_rate_numerator=SAMPLE_RATE,
+        sample_rate_denominator=1,
+        is_complex=False,
+        is_continuous=False,
+    ) as writer:
+        # blocks of (start offset, length), with gaps within and across files
+        for offset, length in [(0, 250), (260, 40), (300, 100), (1000, 550)]:
+            writer.rf_write(np.zeros(length, dtype=np.int16), next_sample=offset)
+    dmd_writer = digital_rf.DigitalMetadataWriter(
+        str(root.mkdir("meta")), 10, 1, SAMPLE_RATE, 1, "meta"
+    )
+    dmd_writer.write([START_SAMPLE + k for k in range(0, 1500, 50)], {"a": 1})
+    return root
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+@pytest.mark.parametrize(
+    "start, end", [(None, None), (100, 1099), (255, 299), (500, 900)]
+)
+def test_summarize_channel(datadir, start, end):
+    sps = np.longdouble(SAMPLE_RATE)
+    kwargs = {}
+    if start is not None:
+        kwargs["starttime"] = util.sample_to_datetime(START_SAMPLE + start, sps)
+        kwargs["endtime"] = util.sample_to_datetime(START_SAMPLE + end, sps)
+    s = summary.summarize_channel(str(datadir.join("rf")), **kwargs)
+
+    reader = digital_rf.DigitalRFReader(str(datadir))
+    bounds = reader.get_bounds("rf")
+    if start is None:
+        start, end = 0, bounds[1] - START_SAMPLE
+    blocks = reader.get_continuous_blocks(
+        START_SAMPLE + start, START_SAMPLE + end, "rf"
+    )
+    assert s["kind"] == "drf"
+    assert s["sample_rate"] == SAMPLE_RATE
+    assert s["n_samples"] == sum(blocks.values())
+    if not blocks:
+        assert s["first_sample"] is None
+        assert s["n_files"] == 0
+        return
+    starts = list(blocks.keys())
+    stops = [k + v for k, v in blocks.items()]
+    assert s["first_sample"] == starts[0]
+    assert s["last_sample"] == stops[-1] - 1
+    assert s["gaps"] == [[e, s - e] for e, s in zip(stops[:-1], starts[1:])]
+    assert s["n_gaps"] == len(blocks) - 1
+    assert s["duty_cycle"] == pytest.approx(
+        sum(blocks.values()) / (stops[-1] - starts[0])
+    )
+    assert s["first_time"].startswith(
+        util.sample_to_datetime(starts[0], np.longdouble(SAMPLE_RATE))
+        .replace(tzinfo=None)
+        .isoformat()[:19]
+    )
+
+
+def test_summary_command(datadir, capsys):
+    drf_command.main(["summary", str(datadir), "-j", "2", "-g", "1"])
+    out = capsys.readouterr().out
+    summaries = {s["kind"]: s for s in map(json.loads, out.splitlines())}
+    assert set(summaries) == {"drf", "dmd"}
+    assert summaries["drf"]["n_gaps"] == 2
+    assert len(summaries["drf"]["gaps"]) == 1
+    assert summaries["dmd"]["first_sample"] == START_SAMPLE
+    assert summaries["dmd"]["last_sample"] == START_SAMPLE + 1450
+    assert summaries["dmd"]["n_files"] == 15
+    assert summaries["dmd"]["n_bytes"] > 0
+
+    # without directories, the current directory is summarized
+    with datadir.as_cwd():
+        drf_command.main(["summary", "-j", "1"])
+    out = capsys.readouterr().out
+    assert {json.loads(line)["kind"] for line in out.splitlines()} == {"drf", "dmd"}
@@ -0,0 +1,127 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.util module."""
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import fractions
+
+import numpy as np
+import pytest
+import pytz
+from digital_rf import util
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+# 2014-03-09 12:00:00
+START_SECS = 1394366400
+
+RATES = [(100, 1), (10 ** 8, 3), (25 * 10 ** 6, 1), (44100, 1), (1000, 7), (1, 3)]
+
+
+@pytest.fixture(params=RATES, ids=["{0}/{1}".format(*r) for r in RATES])
+def rate(request):
+    return request.param
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+def test_times_to_samples_exact(rate):
+    num, den = rate
+    rng = np.random.RandomState(0)
+    ns = START_SECS * 10 ** 9 + rng.randint(-(10 ** 15), 10 ** 15, 1000)
+    # exact boundaries, where float arithmetic can be off by one sample
+    ns[:10] = [(k * den * 10 ** 9) // num for k in range(10)]
+    expected = [(int(t) * num) // (den * 10 ** 9) for t in ns]
+    samples = util.times_to_samples(ns.astype("datetime64[ns]"), num, den)
+    assert samples.dtype == np.int64
+    assert samples.tolist() == expected
+    # datetime64 of other units are converted exactly
+    us = ns // 1000
+    expected = [(int(t) * num) // (den * 10 ** 6) for t in us]
+    samples = util.times_to_samples(us.astype("datetime64[us]"), num, den)
+    assert samples.tolist() == expected
+
+
+def test_samples_to_datetimes_exact(rate):
+    num, den = rate
+    start = START_SECS * num // den
+    samples = start + np.arange(-500, 500)
+    times = util.samples_to_datetimes(samples, num, den)
+    assert times.dtype == np.dtype("datetime64[ns]")
+    expected = [(int(s) * den * 10 ** 9) // num for s in samples]
+    assert times.astype(np.int64).tolist() == expected
+    # round trip back to the same samples when no rounding was needed
+    if (den * 10 ** 9) % num == 0:
+        np.testing.assert_array_equal(util.times_to_samples(times, num, den), samples)
+
+    tds = util.samples_to_timedeltas(samples - start, fractions.Fraction(num, den))
+    assert tds.dtype == np.dtype("timedelta64[ns]")
+    np.testing.assert_array_equal(times - tds, times[500])
+
+
+def test_conversions_match_scalar_functions():
+    sps = 1000
+    times = [
+        datetime.datetime(2014, 3, 9, 12, 0, 0, 123456),
+        pytz.utc.localize(datetime.datetime(2014, 3, 9, 12, 0, 1)),
+        pytz.timezone("US/Eastern").localize(datetime.datetime(2014, 3, 9, 7)),
+        START_SECS + 0.5,
+        START_SECS,
+    ]
+    expected = [util.time_to_sample(t, sps) for t in times]
+    assert util.times_to_samples(times, sps).tolist() == expected
+    assert util.times_to_samples(np.array(times[3:]), sps).tolist() == expected[3:]
+
+    samples = np.array(expected)
+    dts = util.samples_to_datetimes(samples, sps).astype("datetime64[us]")
+    assert dts.tolist() == [
+        util.sample_to_datetime(s, sps).replace(tzinfo=None) for s in expected
+    ]
+
+    # scalars give scalars
+    sample = util.times_to_samples(times[0], sps)
+    assert np.ndim(sample) == 0 and sample == expected[0]
+    assert util.samples_to_datetimes(sample, sps) == np.datetime64(
+        "2014-03-09T12:00:00.123"
+    )
+    assert util.samples_to_timedeltas(1500, sps) == np.timedelta64(1500, "ms")
+
+
+def test_parse_identifiers_to_samples():
+    ref = START_SECS * 100
+    idens = ["2014-03-09T12:00:01Z", "+10", "+1.5", 5, START_SECS + 0.25, "7"]
+    samples = util.parse_identifiers_to_samples(idens, 100, ref_index=ref)
+    assert samples.tolist() == [
+        util.parse_identifier_to_sample(i, 100, ref_index=ref) for i in idens
+    ]
+    assert samples.tolist() == [ref + 100, ref + 10, ref + 150, 5, ref + 25, 7]
+
+    # arrays of a single type are converted without parsing each element
+    ints = np.arange(5)
+    np.testing.assert_array_equal(util.parse_identifiers_to_samples(ints), ints)
+    times = np.array(["2014-03-09T12:00:00", "2014-03-09T12:00:00.5"], "M8[ms]")
+    assert util.parse_identifiers_to_samples(times, 10 ** 8, 3).tolist() == [
+        ref // 3 * 10 ** 6,
+        ref // 3 * 10 ** 6 + 50000000 // 3,
+    ]
+
+    with pytest.raises(ValueError):
+        util.parse_identifiers_to_samples(["+10"])
+    with pytest.raises(ValueError):
+        util.parse_identifiers_to_samples([START_SECS + 0.5, 1])
+    with pytest.raises(ValueError):
+        util.parse_identifiers_to_samples([""], 100)
+    with pytest.raises(ValueError):
+        util.times_to_samples([START_SECS], 0)
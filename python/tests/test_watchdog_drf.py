@@ -0,0 +1,296 @@
+# ----------------------------------------------------------------------------
+# Copyright (c) 2017 Massachusetts Institute of Technology (MIT)
+# All rights reserved.
+#
+# Distributed under the terms of the BSD 3-clause license.
+#
+# The full license is in the LICENSE file, distributed with this software.
+# ----------------------------------------------------------------------------
+"""Tests for the digital_rf.watchdog_drf module."""
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import os
+import shutil
+import threading
+import time
+
+import pytest
+from digital_rf import ringbuffer, watchdog_drf
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileMovedEvent
+from watchdog.observers.api import EventQueue, ObservedWatch
+
+requires_inotify = pytest.mark.skipif(
+    not watchdog_drf._inotify_available(), reason="inotify is not available"
+)
+
+###############################################################################
+#  fixtures  ##################################################################
+###############################################################################
+
+START_SECS = 1394366400
+
+
+class RecordingHandler(watchdog_drf.DigitalRFEventHandler):
+    """Handler that records the batches of events it is given."""
+
+    def __init__(self, **kwargs):
+        super(RecordingHandler, self).__init__(**kwargs)
+        self.batches = []
+        self.cond = threading.Condition()
+
+    def _dispatch_matched_batch(self, events):
+        with self.cond:
+            self.batches.append(list(events))
+            self.cond.notify_all()
+
+    def events(self):
+        return [(e.event_type, e.src_path) for b in self.batches for e in b]
+
+    def wait_for(self, n, timeout=10):
+        deadline = time.time() + timeout
+        with self.cond:
+            while len(self.events()) < n and time.time() < deadline:
+                self.cond.wait(deadline - time.time())
+        return self.events()
+
+
+def write_file(path, tmp=True):
+    """Write a file like the Digital RF writer, via a 'tmp.' file."""
+    dirname, name = os.path.split(path)
+    tmppath = os.path.join(dirname, "tmp." + name) if tmp else path
+    with open(tmppath, "wb") as f:
+        f.write(b"\0" * 100)
+    if tmp:
+        os.rename(tmppath, path)
+
+
+###############################################################################
+#  tests  #####################################################################
+###############################################################################
+
+
+@requires_inotify
+def test_keep_inotify_name():
+    consts = watchdog_drf.InotifyConstants
+    keep = watchdog_drf._keep_inotify_name
+    assert keep(b"rf@1394366400.000.h5", consts.IN_CREATE)
+    assert keep(b"drf_properties.h5", consts.IN_MODIFY)
+    assert not keep(b"notes.txt", consts.IN_CREATE)
+    assert not keep(b"tmp.rf@1394366400.000.h5", consts.IN_CREATE)
+    assert not keep(b"tmp.rf@1394366400.000.h5", consts.IN_MODIFY)
+    assert keep(b"tmp.rf@1394366400.000.h5", consts.IN_MOVED_FROM)
+
+
+@requires_inotify
+def test_inotify_dir_watcher(tmpdir):
+    root = tmpdir.mkdir("rb")
+    chdir = os.path.join(str(root), "ch0")
+    handler = RecordingHandler()
+    observer = watchdog_drf.DirWatcher(chdir, inotify=True)
+    assert isinstance(observer.root_observer, watchdog_drf.DigitalRFInotifyObserver)
+    observer.schedule(handler, chdir, recursive=True)
+    observer.start()
+    try:
+        # channel directory does not exist until after the watch starts
+        time.sleep(0.2)
+        subdir = os.path.join(chdir, "2014-03-09T12-00-00")
+        os.makedirs(subdir)
+        time.sleep(0.2)
+        paths = [
+            os.path.join(subdir, "rf@{0}.000.h5".format(START_SECS + k))
+            for k in range(20)
+        ]
+        for path in paths:
+            write_file(path)
+        write_file(os.path.join(subdir, "notes.txt"), tmp=False)
+        # moving a file out of the watched tree is a deletion
+        os.rename(paths[0], str(tmpdir.join("moved.h5")))
+        expected = [("created", p) for p in paths] + [("deleted", paths[0])]
+        events = handler.wait_for(len(expected))
+        assert observer.all_alive()
+    finally:
+        observer.stop()
+        observer.join()
+    assert events == expected
+    # events read together are handled together
+    assert len(handler.batches) < len(expected)
+
+
+def test_dir_watcher_observer_choice(tmpdir, monkeypatch):
+    # the default watchdog observer is used unless inotify is requested
+    observer = watchdog_drf.DirWatcher(str(tmpdir))
+    assert not isinstance(observer.root_observer, watchdog_drf.DigitalRFInotifyObserver)
+    # without the watchdog internals it needs, fall back with a warning
+    monkeypatch.setattr(
+        watchdog_drf,
+        "_INOTIFY_METHODS",
+        watchdog_drf._INOTIFY_METHODS + ("_not_in_watchdog",),
+    )
+    assert not watchdog_drf._inotify_available()
+    with pytest.warns(RuntimeWarning):
+        observer = watchdog_drf.DirWatcher(str(tmpdir), inotify=True)
+    assert not isinstance(observer.root_observer, watchdog_drf.DigitalRFInotifyObserver)
+    with pytest.raises(RuntimeError):
+        watchdog_drf.DigitalRFInotifyObserver()
+
+
+def test_dispatch_events_order(tmpdir):
+    log = []
+
+    class Handler(watchdog_drf.DigitalRFEventHandler):
+        def __init__(self, name):
+            super(Handler, self).__init__()
+            self.name = name
+
+        def on_created(self, event):
+            log.append((self.name, os.path.basename(event.src_path)))
+
+    class BatchHandler(Handler):
+        def _dispatch_matched_batch(self, events):
+            log.append((self.name, [os.path.basename(e.src_path) for e in events]))
+
+    root = str(tmpdir)
+    observer = watchdog_drf.DirWatcher(root)
+    watch = ObservedWatch(root, True)
+    for handler in (Handler("a"), BatchHandler("c"), Handler("b")):
+        observer.add_handler_for_watch(handler, watch)
+    subdir = os.path.join(root, "ch0", "2014-03-09T12-00-00")
+    names = ["rf@{0}.000.h5".format(START_SECS + k) for k in range(2)]
+    event_queue = EventQueue()
+    for name in names:
+        event_queue.put((FileCreatedEvent(os.path.join(subdir, name)), watch))
+    observer.dispatch_events(event_queue, 1)
+    # per-event handlers (in no particular order) see each event in turn,
+    # then a batch handler gets the whole batch
+    assert sorted(log[:2]) == [("a", names[0]), ("b", names[0])]
+    assert sorted(log[2:4]) == [("a", names[1]), ("b", names[1])]
+    assert log[4:] == [("c", names)]
+
+
+def test_match_event_time_bounds():
+    start = datetime.datetime(2014, 3, 9, 12, 0, 0, 123500)
+    end = datetime.datetime(2014, 3, 9, 12, 0, 1, 500)
+    handler = watchdog_drf.DigitalRFEventHandler(
+        starttime=start, endtime=end, include_dmd=False, ignore_regexes=[".*ignore.*"]
+    )
+    subdir = os.path.join(os.sep, "data", "ch0", "2014-03-09T12-00-00")
+
+    def matched(name, dest_name=None):
+        path = os.path.normpath(os.path.join(subdir, name))
+        if dest_name is None:
+            event = FileCreatedEvent(path)
+        else:
+            event = FileMovedEvent(path, os.path.join(subdir, dest_name))
+        event = handler._match_event(event)
+        return None if event is None else (event.event_type, event.src_path)
+
+    # times are compared in whole milliseconds, rounded inward
+    assert matched("rf@1394366400.123.h5") is None
+    assert matched("rf@1394366400.124.h5") is not None
+    assert matched("rf@1394366401.000.h5") is not None
+    assert matched("rf@1394366401.001.h5") is None
+    # properties files have no time, other files don't match
+    assert matched("../drf_properties.h5") is not None
+    assert matched("../dmd_properties.h5") is None
+    assert matched("meta@1394366400.h5") is None
+    assert matched("ignore@1394366400.500.h5") is None
+    # moves with one matching path become created or deleted events
+    assert matched("tmp.rf@1394366400.500.h5", "rf@1394366400.500.h5") == (
+        "created",
+        os.path.join(subdir, "rf@1394366400.500.h5"),
+    )
+    assert matched("rf@1394366400.500.h5", "rf@1394366400.500.h5.bak") == (
+        "deleted",
+        os.path.join(subdir, "rf@1394366400.500.h5"),
+    )
+
+
+def test_ringbuffer_dispatch_batch(tmpdir):
+    root = str(tmpdir)
+    handler = ringbuffer.DigitalRFRingbufferHandler(count=5, dryrun=True)
+    subdir = os.path.join(root, "ch0", "2014-03-09T12-00-00")
+    paths = [
+        os.path.join(subdir, "rf@{0}.000.h5".format(START_SECS + k)) for k in range(10)
+    ]
+    os.makedirs(subdir)
+    for path in paths:
+        write_file(path, tmp=False)
+
+    # created events out of order in one batch are added oldest first
+    events = [FileCreatedEvent(p) for p in reversed(paths[:8])]
+    events.append(FileDeletedEvent(paths[7]))
+    tmppath = os.path.join(subdir, "tmp.rf@{0}.000.h5".format(START_SECS + 8))
+    events.append(FileMovedEvent(tmppath, paths[8]))
+    events.append(FileCreatedEvent(paths[9]))
+    events.append(FileCreatedEvent(os.path.join(root, "ch0", "notes.txt")))
+    handler.dispatch_batch(events)
+    assert sorted(handler.records) == paths[4:7] + paths[8:]
+
+
+def test_polling_emitter(tmpdir):
+    root = str(tmpdir)
+    chdir = os.path.join(root, "ch0")
+    subdirs = [
+        os.path.join(chdir, "2014-03-09T12-{0:02d}-00".format(k)) for k in range(4)
+    ]
+    paths = []
+    for k, subdir in enumerate(subdirs[:3]):
+        os.makedirs(subdir)
+        for j in range(2):
+            secs = START_SECS + 60 * k + j
+            paths.append(os.path.join(subdir, "rf@{0}.000.h5".format(secs)))
+            write_file(paths[-1], tmp=False)
+    write_file(os.path.join(chdir, "drf_properties.h5"), tmp=False)
+    # directories were last changed long ago
+    for dirpath in [chdir] + subdirs[:3]:
+        os.utime(dirpath, (time.time() - 3600,) * 2)
+
+    event_queue = EventQueue()
+    emitter = watchdog_drf.DigitalRFPollingEmitter(
+        event_queue, ObservedWatch(root, True), timeout=0
+    )
+    emitter.on_thread_start()
+
+    def poll():
+        emitter.queue_events(0)
+        events = []
+        while not event_queue.empty():
+            event = event_queue.get()[0]
+            events.append((event.event_type, event.is_directory, event.src_path))
+        return events
+
+    assert poll() == []
+
+    # in-place modifications are only seen in the newest subdirectories
+    for path in (paths[0], paths[5]):
+        with open(path, "ab") as f:
+            f.write(b"\0")
+    assert poll() == [("modified", False, paths[5])]
+
+    os.makedirs(subdirs[3])
+    newpath = os.path.join(subdirs[3], "rf@{0}.000.h5".format(START_SECS + 180))
+    write_file(newpath)
+    write_file(os.path.join(subdirs[3], "tmp.rf@x.h5"), tmp=False)
+    write_file(os.path.join(subdirs[3], "notes.txt"), tmp=False)
+    assert poll() == [
+        ("created", True, subdirs[3]),
+        ("created", False, newpath),
+    ]
+
+    # removals change the directory mtime so the subdirectory is rescanned,
+    # which also finds the earlier modification
+    os.remove(paths[1])
+    shutil.rmtree(subdirs[1])
+    assert poll() == [
+        ("deleted", False, paths[2]),
+        ("deleted", False, paths[3]),
+        ("deleted", True, subdirs[1]),
+        ("deleted", False, paths[1]),
+        ("modified", False, paths[0]),
+    ]
+
+    shutil.rmtree(root)
+    events = poll()
+    assert ("deleted", True, root) in events
+    assert not emitter.should_keep_running()
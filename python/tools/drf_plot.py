@@ -1183,6 +1183,10 @@ if __name__ == "__main__":
             drf_properties = drf.get_properties(chans[chidx])
             sfreq_ld = drf_properties["samples_per_second"]
             sfreq = float(sfreq_ld)
+            rate = (
+                drf_properties["sample_rate_numerator"],
+                drf_properties["sample_rate_denominator"],
+            )
             toffset = start_sample
 
             print(toffset)
@@ -1190,7 +1194,7 @@ if __name__ == "__main__":
             if atime == 0:
                 atime = ustart
             else:
-                atime = int(np.uint64(atime * sfreq_ld))
+                atime = int(digital_rf.util.times_to_samples(atime, *rate))
 
             sstart = atime + int(toffset)
             dlen = stop_sample - start_sample + 1
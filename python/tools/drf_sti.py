@@ -10,7 +10,8 @@
 """Create a spectral time intensity summary plot for a data set."""
 
 
-import datetime
+import fractions
+import itertools
 import optparse
 import os
 import string
@@ -24,7 +25,6 @@ import matplotlib.gridspec
 import matplotlib.mlab
 import matplotlib.pyplot
 import numpy as np
-import pytz
 import scipy
 import scipy.signal
 
@@ -78,7 +78,9 @@ class DataPlotter(object):
         vmin = 0
         vmax = 0
 
-        sr = self.dio.get_properties(self.channel)["samples_per_second"]
+        props = self.dio.get_properties(self.channel)
+        sr = props["samples_per_second"]
+        rate = (props["sample_rate_numerator"], props["sample_rate_denominator"])
 
         if self.control.verbose:
             print("sample rate: ", sr)
@@ -91,19 +93,13 @@ class DataPlotter(object):
 
         if self.control.start:
             dtst0 = dateutil.parser.parse(self.control.start)
-            st0 = (
-                dtst0 - datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
-            ).total_seconds()
-            st0 = int(st0 * sr)
+            st0 = int(drf.util.times_to_samples(dtst0, *rate))
         else:
             st0 = int(b[0])
 
         if self.control.end:
             dtst0 = dateutil.parser.parse(self.control.end)
-            et0 = (
-                dtst0 - datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
-            ).total_seconds()
-            et0 = int(et0 * sr)
+            et0 = int(drf.util.times_to_samples(dtst0, *rate))
         else:
             et0 = int(b[1])
 
@@ -126,23 +122,29 @@ class DataPlotter(object):
             )
             return
 
-        stripe_stride = (et0 - st0) / blocks
+        # exact stride so that stripe k starts at st0 + floor(k*stripe_stride)
+        # for both the data and the metadata lookup
+        stripe_stride = fractions.Fraction(et0 - st0, blocks)
 
-        bin_stride = stripe_stride / self.control.bins
+        bin_stride = float(stripe_stride) / self.control.bins
 
         start_sample = st0
 
         print("first ", start_sample)
 
-        # get metadata
-        # this could be done better to ensure we catch frequency or sample rate
-        # changes
-        mdt = self.dio.read_metadata(st0, et0, self.channel)
-        try:
-            md = mdt[mdt.keys()[0]]
-            cfreq = md["center_frequencies"].ravel()[self.sub_channel]
-        except (IndexError, KeyError):
-            cfreq = 0.0
+        # get the metadata in effect for each stripe so that we catch
+        # frequency changes
+        md_blocks = self.dio.read_metadata_blocks(
+            st0, et0, self.channel, stripe_stride
+        )
+        stripe_starts = list(md_blocks.keys())
+        stripe_cfreqs = np.zeros(blocks)
+        for k, md in enumerate(itertools.islice(md_blocks.values(), blocks)):
+            try:
+                stripe_cfreqs[k] = md["center_frequencies"].ravel()[self.sub_channel]
+            except (IndexError, KeyError):
+                stripe_cfreqs[k] = 0.0
+        cfreq = stripe_cfreqs[0]
 
         if self.control.verbose:
             print(
@@ -155,10 +157,12 @@ class DataPlotter(object):
 
         for p in np.arange(self.control.frames):
             sti_psd_data = np.zeros([self.control.num_fft, self.control.bins], np.float)
-            sti_times = np.zeros([self.control.bins], np.complex128)
+            sti_samples = np.zeros([self.control.bins], np.int64)
 
             for b in np.arange(self.control.bins):
 
+                start_sample = stripe_starts[p * self.control.bins + b]
+
                 if self.control.verbose:
                     print(
                         "read vector :", self.channel, start_sample, samples_per_stripe
@@ -191,9 +195,7 @@ class DataPlotter(object):
 
                 sti_psd_data[:, b] = np.real(10.0 * np.log10(np.abs(psd_data) + 1e-12))
 
-                sti_times[b] = start_sample / sr
-
-                start_sample += stripe_stride
+                sti_samples[b] = start_sample
 
             # Now Plot the Data
             ax = self.subplots[p]
@@ -237,27 +239,34 @@ class DataPlotter(object):
 
             ax.set_ylabel("f (kHz)", fontsize=8)
 
+            # mark center frequency changes within the frame
+            frame_cfreqs = stripe_cfreqs[
+                p * self.control.bins : (p + 1) * self.control.bins
+            ]
+            for b in np.flatnonzero(np.diff(frame_cfreqs)) + 1:
+                ax.axvline(b, color="w", linestyle="--", linewidth=1)
+                ax.text(
+                    b,
+                    extent[3],
+                    " %4.2f MHz" % (frame_cfreqs[b] / 1e6),
+                    color="w",
+                    fontsize=7,
+                    va="top",
+                )
+
             # plot dates
 
             tick_spacing = np.arange(
                 self.control.bins / 8, self.control.bins, self.control.bins / 8
             )
             ax.set_xticks(tick_spacing)
-            tick_labels = []
-
-            for s in tick_spacing:
-                tick_time = sti_times[s]
-
-                if tick_time == 0:
-                    tick_string = ""
-                else:
-                    gm_tick_time = time.gmtime(np.real(tick_time))
-                    tick_string = "%02d:%02d:%02d" % (
-                        gm_tick_time[3],
-                        gm_tick_time[4],
-                        gm_tick_time[5],
-                    )
-                    tick_labels.append(tick_string)
+            # convert the tick times all at once, as HH:MM:SS
+            tick_times = drf.util.samples_to_datetimes(
+                sti_samples[tick_spacing.astype(int)], *rate
+            )
+            tick_labels = [
+                t[11:19] for t in np.datetime_as_string(tick_times, unit="s")
+            ]
 
             ax.set_xticklabels(tick_labels)
 